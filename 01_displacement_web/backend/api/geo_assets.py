@@ -0,0 +1,78 @@
+"""
+Precompressed map assets built by ../build_geo_assets.py
+
+Asset file names carry a content hash, so they are served with a one-year
+immutable Cache-Control; only manifest.json (which names the current files)
+is revalidated. For each request the smallest variant the client accepts is
+picked: .br, then .gz, then the plain file. Files are read once and kept in
+memory (a few hundred KB in total).
+"""
+
+import json
+import os
+import threading
+
+from api.http_cache import accepted_encodings
+
+DEFAULT_GEO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'geo')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+MANIFEST_CACHE = 'public, max-age=300, must-revalidate'
+
+# (Content-Encoding, file suffix) in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class GeoAssetStore:
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('GEO_ASSETS_DIR', DEFAULT_GEO_DIR)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self._files = {}
+
+    def manifest(self):
+        """Current manifest (reloaded when the build rewrites it), or None if not built"""
+        path = os.path.join(self.root, 'manifest.json')
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(path, encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime = mtime
+                self._files.clear()
+            return self._manifest
+
+    def _read(self, filename):
+        with self._lock:
+            if filename not in self._files:
+                path = os.path.join(self.root, filename)
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        self._files[filename] = f.read()
+                else:
+                    self._files[filename] = None
+            return self._files[filename]
+
+    def asset(self, name, accept_encoding=None):
+        """(body, content_encoding) for an asset listed in the manifest, else None"""
+        manifest = self.manifest()
+        if not manifest:
+            return None
+        # Only files named by the manifest are served (no path traversal)
+        if name not in {level['file'] for level in manifest.get('levels', {}).values()}:
+            return None
+
+        accepted = accepted_encodings(accept_encoding)
+        for coding, suffix in ENCODINGS:
+            if coding in accepted:
+                body = self._read(name + suffix)
+                if body is not None:
+                    return body, coding
+
+        body = self._read(name)
+        return (body, None) if body is not None else None
@@ -0,0 +1,165 @@
+"""
+HTTP response layer: strong ETags, conditional GETs and compression
+
+Static payloads (/api/models, /api/variables, /api/departments,
+/api/department_geo/<name>) are serialized once, hashed into a strong ETag
+and precompressed; a request is then answered from memory with 200 or, when
+If-None-Match matches, 304 and no body.
+
+    http_cache = HttpCache(app)
+    http_cache.register('variables', build_variables, max_age=86400)
+    http_cache.precompute()                      # at startup
+    return http_cache.respond('variables')       # in the route
+
+Every other JSON response (e.g. /api/predict with matches_data) is
+compressed on the fly by an after_request hook when it is larger than
+`min_size` bytes and the client accepts br or gzip.
+"""
+
+import gzip
+import hashlib
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+
+
+def accepted_encodings(accept_encoding):
+    """Codings listed in an Accept-Encoding header with q > 0"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compress(body, coding, static=False):
+    """Static payloads get the slowest/best settings, they are compressed once"""
+    if coding == 'br':
+        return brotli.compress(body, quality=11 if static else 4)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(','))
+
+
+class _Entry:
+    def __init__(self, body, max_age):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.cache_control = f'public, max-age={max_age}'
+        self.encoded = {'gzip': compress(body, 'gzip', static=True)}
+        if brotli is not None:
+            self.encoded['br'] = compress(body, 'br', static=True)
+
+
+class HttpCache:
+    def __init__(self, app=None, min_size=COMPRESS_MIN_BYTES):
+        self.app = None
+        self.min_size = min_size
+        self._builders = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.after_request(self.compress_response)
+
+    # =========================================================================
+    # Static payloads
+    # =========================================================================
+
+    def register(self, key, builder, max_age=3600):
+        """`builder()` returns the JSON-serializable payload for `key`"""
+        self._builders[key] = (builder, max_age)
+
+    def _build(self, key):
+        builder, max_age = self._builders[key]
+        payload = builder()
+        if payload is None:
+            return None
+        # Same serialization as jsonify
+        body = (self.app.json.dumps(payload) + '\n').encode('utf-8')
+        return _Entry(body, max_age)
+
+    def precompute(self):
+        """Serialize, hash and compress every registered payload now instead of on first request"""
+        with self.app.app_context():
+            for key in self._builders:
+                self.entry(key)
+        print(f"✓ {len(self._entries)} static responses precomputed")
+
+    def entry(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = self._build(key)
+            return self._entries[key]
+
+    def invalidate(self, key=None):
+        """Drop one cached payload (or all); it is rebuilt on next use"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def respond(self, key):
+        """200 (negotiated encoding) or 304 for a registered payload; None if the builder returned None"""
+        entry = self.entry(key)
+        if entry is None:
+            return None
+
+        headers = {'ETag': entry.etag, 'Cache-Control': entry.cache_control, 'Vary': 'Accept-Encoding'}
+        if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+            return Response(status=304, headers=headers)
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+        for coding in ('br', 'gzip'):
+            if coding in accepted and coding in entry.encoded:
+                return Response(entry.encoded[coding], mimetype='application/json',
+                                headers={**headers, 'Content-Encoding': coding})
+        return Response(entry.body, mimetype='application/json', headers=headers)
+
+    # =========================================================================
+    # Dynamic responses
+    # =========================================================================
+
+    def compress_response(self, response):
+        """after_request: compress large JSON bodies the client can decode"""
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype != 'application/json'):
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+        coding = 'br' if brotli is not None and 'br' in accepted else 'gzip' if 'gzip' in accepted else None
+        response.vary.add('Accept-Encoding')
+        if coding is None:
+            return response
+
+        response.set_data(compress(body, coding))
+        response.headers['Content-Encoding'] = coding
+        return response
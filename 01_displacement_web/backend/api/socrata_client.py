@@ -1,24 +1,46 @@
+import os
+import httpx
+from requests.adapters import HTTPAdapter
 from sodapy import Socrata
 import pandas as pd
 
-class SocrataClient:
-    def __init__(self):
-        self.client = Socrata("www.datos.gov.co", None)
-        self.dataset_id = "dyjp-uwwh"
+DATASET_ID = "dyjp-uwwh"
+
+def build_where_clause(filters):
+    where_clauses = []
     
-    def query_exact_match(self, filters):
-        where_clauses = []
+    for key, value in filters.items():
+        api_key = key.lower()
         
-        for key, value in filters.items():
-            api_key = key.lower()
-            
-            if isinstance(value, str):
-                escaped_value = value.replace("'", "''")
-                where_clauses.append(f"{api_key}='{escaped_value}'")
-            else:
-                where_clauses.append(f"{api_key}='{value}'")
+        if isinstance(value, str):
+            escaped_value = value.replace("'", "''")
+            where_clauses.append(f"{api_key}='{escaped_value}'")
+        else:
+            where_clauses.append(f"{api_key}='{value}'")
+    
+    return " AND ".join(where_clauses)
+
+def socrata_endpoint():
+    # Overridable so load tests can point the app at a local stub server
+    domain = os.environ.get('SOCRATA_DOMAIN', 'www.datos.gov.co')
+    scheme = os.environ.get('SOCRATA_SCHEME', 'https')
+    return domain, scheme
+
+class SocrataClient:
+    def __init__(self, domain=None, scheme=None):
+        default_domain, default_scheme = socrata_endpoint()
+        domain = domain or default_domain
+        scheme = scheme or default_scheme
+        
+        session_adapter = None
+        if scheme == 'http':
+            session_adapter = {'prefix': 'http://', 'adapter': HTTPAdapter()}
         
-        where_str = " AND ".join(where_clauses)
+        self.client = Socrata(domain, None, session_adapter=session_adapter)
+        self.dataset_id = DATASET_ID
+    
+    def query_exact_match(self, filters):
+        where_str = build_where_clause(filters)
         
         # print(f"\n=== QUERY DEBUG ===")
         # print(f"WHERE: {where_str}")
@@ -60,4 +82,39 @@ class SocrataClient:
             return []
     
     def close(self):
-        self.client.close()
\ No newline at end of file
+        self.client.close()
+
+class AsyncSocrataClient:
+    """Non-blocking SODA client for the ASGI serving mode (same results as SocrataClient)"""
+    
+    def __init__(self, domain=None, scheme=None, timeout=10.0, max_connections=100):
+        default_domain, default_scheme = socrata_endpoint()
+        self.base_url = f"{scheme or default_scheme}://{domain or default_domain}"
+        self.dataset_id = DATASET_ID
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections)
+        )
+    
+    async def query_exact_match(self, filters):
+        params = {
+            '$where': build_where_clause(filters),
+            '$limit': 1000
+        }
+        
+        try:
+            response = await self.client.get(f"/resource/{self.dataset_id}.json", params=params)
+            response.raise_for_status()
+            results = response.json()
+            
+            if results:
+                return pd.DataFrame.from_records(results)
+            else:
+                return pd.DataFrame()
+        except Exception as e:
+            print(f"Error querying API: {e}")
+            return pd.DataFrame()
+    
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,156 @@
+"""
+Wire formats for /api/predict/batch: Arrow IPC stream, MessagePack and JSON
+
+Requests carry the ten input columns; responses carry the columns valid,
+prediction and probability (null for invalid rows). The request format is
+picked from Content-Type and the response format from Accept (default: same
+as the request).
+
+    Arrow    application/vnd.apache.arrow.stream   one table, column per field;
+                                                    model in ?model= or schema metadata
+    msgpack  application/msgpack                    {"model", "columns": {field: [...]}}
+    JSON     application/json                       {"model", "columns": {...}} or {"model", "records": [...]}
+
+Arrow is the fast path: the request body is wrapped without copying, numeric
+columns without nulls become NumPy views of the Arrow buffers, and string
+columns are dictionary-encoded in Arrow and arrive as pandas Categoricals,
+so validation and cleaning work per distinct value. Response columns are
+NumPy arrays handed to Arrow without conversion to Python objects.
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from preprocessing.validation import match_columns
+
+ARROW = 'application/vnd.apache.arrow.stream'
+MSGPACK = 'application/msgpack'
+JSON = 'application/json'
+
+MIMETYPES = {ARROW: 'arrow', 'application/x-msgpack': 'msgpack', MSGPACK: 'msgpack', JSON: 'json'}
+CONTENT_TYPES = {'arrow': ARROW, 'msgpack': MSGPACK, 'json': JSON}
+
+
+def request_format(mimetype):
+    """'arrow' | 'msgpack' | 'json' for a Content-Type, or None if unsupported/unavailable"""
+    fmt = MIMETYPES.get((mimetype or '').lower())
+    if fmt == 'msgpack' and msgpack is None:
+        return None
+    return fmt
+
+
+def response_format(accept, default):
+    """First supported type in the Accept header (order of appearance), else `default`"""
+    for part in (accept or '').split(','):
+        fmt = request_format(part.split(';')[0].strip())
+        if fmt:
+            return fmt
+    return default
+
+
+# =============================================================================
+# Decoding
+# =============================================================================
+
+def decode_arrow(body):
+    """(model, columns) from an Arrow IPC stream"""
+    import pyarrow as pa
+
+    # py_buffer wraps the request bytes: the reader does not copy them
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    metadata = table.schema.metadata or {}
+    model = metadata.get(b'model', b'').decode() or None
+
+    columns = {}
+    for name, field in match_columns(table.column_names).items():
+        column = table.column(name)
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = column.dictionary_encode()
+        if pa.types.is_dictionary(column.type):
+            columns[field] = column.to_pandas()
+        else:
+            # Zero-copy for primitive columns without nulls
+            columns[field] = column.to_numpy(zero_copy_only=False)
+    return model, columns
+
+
+def decode_mapping(payload):
+    """(model, columns) from a decoded JSON/msgpack object"""
+    if not isinstance(payload, dict):
+        raise ValueError('Se esperaba un objeto con "columns" o "records"')
+
+    if 'columns' in payload:
+        raw = payload['columns']
+        if not isinstance(raw, dict):
+            raise ValueError('"columns" debe ser un objeto {columna: [valores]}')
+    elif 'records' in payload:
+        records = payload['records']
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ValueError('"records" debe ser una lista de objetos')
+        names = records[0].keys() if records else []
+        raw = {name: [record.get(name) for record in records] for name in names}
+    else:
+        raise ValueError('Se esperaba un objeto con "columns" o "records"')
+
+    columns = {field: raw[name] for name, field in match_columns(raw).items()}
+    return payload.get('model'), columns
+
+
+def decode_batch(fmt, body):
+    if fmt == 'arrow':
+        return decode_arrow(body)
+    if fmt == 'msgpack':
+        return decode_mapping(msgpack.unpackb(body, raw=False))
+    return decode_mapping(json.loads(body))
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+
+def encode_arrow(valid, probability, errors):
+    import pyarrow as pa
+
+    invalid = ~valid
+    batch = pa.RecordBatch.from_arrays([
+        pa.array(valid),
+        pa.array((probability >= 0.5).astype(np.int8), mask=invalid),
+        pa.array(probability, mask=invalid if invalid.any() else None)
+    ], names=['valid', 'prediction', 'probability'])
+    batch = batch.replace_schema_metadata({'errors': json.dumps(errors)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columns(valid, probability, errors):
+    """Plain-Python columns for JSON/msgpack (None for invalid rows)"""
+    prediction = (probability >= 0.5).astype(np.int8)
+    if valid.all():
+        return {'valid': valid.tolist(), 'prediction': prediction.tolist(),
+                'probability': probability.tolist(), 'errors': errors}
+    valid_list = valid.tolist()
+    return {
+        'valid': valid_list,
+        'prediction': [p if ok else None for p, ok in zip(prediction.tolist(), valid_list)],
+        'probability': [p if ok else None for p, ok in zip(probability.tolist(), valid_list)],
+        'errors': errors
+    }
+
+
+def encode_batch(fmt, valid, probability, errors):
+    """(body, content type) of a batch response"""
+    if fmt == 'arrow':
+        return encode_arrow(valid, probability, errors), ARROW
+    if fmt == 'msgpack':
+        return msgpack.packb(encode_columns(valid, probability, errors), use_bin_type=True), MSGPACK
+    return json.dumps(encode_columns(valid, probability, errors)).encode('utf-8'), JSON
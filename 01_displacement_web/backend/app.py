@@ -1,79 +1,167 @@
-from flask import Flask, request, jsonify
+import hmac
+import os
+import threading
+import time
+
+import numpy as np
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from preprocessing.data_cleaner import clean_input_data, clean_api_results, get_valid_values
-from preprocessing.geo_data import get_department_info, URBAN_CENTER_COORDS, DEPT_CAPITALS
+from preprocessing.data_cleaner import clean_input_data, clean_input_frame, clean_api_results, get_valid_values
+from preprocessing.geo_data import get_department_info, resolve_department, URBAN_CENTER_COORDS, DEPT_CAPITALS
+from preprocessing.history_cube import DIMENSIONS as STATS_DIMENSIONS, get_history_cube
+from preprocessing.municipalities import GEO_COLS, get_municipality_table, get_validation_store
+from preprocessing.neighbor_index import get_neighbor_index
+from preprocessing.validation import InputValidator, select_rows
 from api.socrata_client import SocrataClient
+from api.geo_assets import GeoAssetStore, IMMUTABLE_CACHE, MANIFEST_CACHE
+from api.http_cache import HttpCache
+from api.wire_format import decode_batch, encode_batch, request_format, response_format
 from prediction.predictor import ModelPredictor
+from prediction.bulk_jobs import BulkJobManager, input_format
+from prediction.drift import DriftMonitor
+from prediction.inference_pool import InferencePoolBusy
+from prediction.shadow import read_summaries as read_shadow_summaries
 from chatbot.gemini_client import GeminiClient, test_gemini_connection
 
 app = Flask(__name__)
 CORS(app)
 
 predictor = ModelPredictor()
+validator = InputValidator(available_models=predictor.available_models(), known_models=predictor.registry.names())
 socrata_client = SocrataClient()
+geo_assets = GeoAssetStore()
+http_cache = HttpCache(app)
+# Input drift against the training profile (prediction/drift.py), per process
+drift_monitor = DriftMonitor.from_registry(predictor.registry)
+
+# Optional out-of-process inference (prediction/inference_pool.py).
+# INFERENCE_WORKERS=0 (default) keeps inference inside the web worker.
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '0'))
+INFERENCE_PRELOAD = [m for m in os.environ.get('INFERENCE_PRELOAD', '').split(',') if m]
+inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+def get_inference_pool():
+    """Start the worker pool on first use (never at import: spawned children re-import __main__)"""
+    global inference_pool
+    if INFERENCE_WORKERS <= 0:
+        return None
+    with _inference_pool_lock:
+        if inference_pool is None:
+            from prediction.inference_pool import InferencePool
+            inference_pool = InferencePool(
+                predictor,
+                n_workers=INFERENCE_WORKERS,
+                preload=INFERENCE_PRELOAD,
+                max_pending=int(os.environ.get('INFERENCE_MAX_PENDING', '32'))
+            )
+    return inference_pool
+
+def run_prediction(model_name, cleaned_input, explain=False):
+    """
+    Prediction (pool or in-process). With explain=True the explanation is
+    computed with the same model acquisition, in the worker when there is a pool.
+    """
+    drift_monitor.observe(cleaned_input)
+    pool = get_inference_pool()
+    if pool is not None:
+        result, inference_ms = pool.predict_timed(model_name, cleaned_input, explain=explain)
+        # In-process predictions sample themselves (ModelPredictor.predict)
+        predictor.observe_shadow(model_name, cleaned_input, result, inference_ms)
+        return result
+    return predictor.predict(model_name, cleaned_input, explain=explain)
+
+def run_batch_prediction(model_name, df):
+    """Probabilities for a DataFrame of cleaned rows (pool or in-process, like run_prediction)"""
+    drift_monitor.observe_frame(df)
+    pool = get_inference_pool()
+    if pool is not None:
+        return pool.predict_batch(model_name, df)
+    return predictor.predict_batch(model_name, df)
+
+def run_counterfactuals(model_name, cleaned_input, **options):
+    """Counterfactual search, scored by the pool when there is one (encoding stays here)"""
+    pool = get_inference_pool()
+    score_batch = pool.predict_batch if pool is not None else None
+    return predictor.counterfactuals(model_name, cleaned_input, score_batch, **options)
+
+def wants_explanation(args):
+    return str(args.get('explain', '')).lower() in ('1', 'true', 'yes')
+
+# =============================================================================
+# WARMUP - /ready reports ready only once this has finished
+# =============================================================================
+
+# Models loaded at startup, warmed and kept resident (in-process inference).
+# With INFERENCE_WORKERS > 0 the pool workers warm INFERENCE_PRELOAD instead.
+WARMUP_MODELS = [m for m in os.environ.get('WARMUP_MODELS', '').split(',') if m]
+warmup_status = {'state': 'pending', 'started_at': None, 'finished_at': None, 'steps': {}, 'error': None}
+
+def warmup():
+    """Exercise encoders, scalers and pinned models once so the first request pays no tracing/load cost"""
+    warmup_status.update(state='running', started_at=time.time())
+    steps = warmup_status['steps']
+    try:
+        for family in ('classic', 'nn'):
+            start = time.perf_counter()
+            predictor.warm_encoders(family)
+            steps[f'encoders_{family}'] = {'ok': True, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+        
+        if INFERENCE_WORKERS > 0:
+            start = time.perf_counter()
+            get_inference_pool()  # blocks until every worker has loaded and warmed its preload models
+            steps['inference_pool'] = {'ok': True, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+        else:
+            for model_name in WARMUP_MODELS:
+                start = time.perf_counter()
+                predictor.pin_model(model_name)
+                predictor.warmup(model_name)
+                steps[model_name] = {'ok': True, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+                print(f"✓ {model_name} pinned and warmed up in {steps[model_name]['ms']:.0f} ms")
+        
+        warmup_status['state'] = 'ready'
+    except Exception as e:
+        print(f"✗ Warmup failed: {e}")
+        warmup_status.update(state='failed', error=str(e))
+    warmup_status['finished_at'] = time.time()
+
+_warmup_lock = threading.Lock()
+
+def start_warmup():
+    """
+    Start warmup in the serving process, once. Called by the server entry
+    points (gunicorn.conf.py post_worker_init, the ASGI lifespan, __main__),
+    never at import: a thread started in a pre-fork master does not survive the fork.
+    """
+    with _warmup_lock:
+        if warmup_status['state'] != 'pending':
+            return
+        warmup_status['state'] = 'starting'
+    threading.Thread(target=warmup, name='warmup', daemon=True).start()
 
 # =============================================================================
 # MODEL METRICS - For chatbot context
 # =============================================================================
-MODEL_METRICS = {
-    'Logistic_Regression': {
-        'accuracy': 0.7416,
-        'precision': 0.6305,
-        'recall': 0.7471,
-        'f1_score': 0.6839,
-        'roc_auc': 0.8185
-    },
-    'Random_Forest': {
-        'accuracy': 0.9188,
-        'precision': 0.8712,
-        'recall': 0.9187,
-        'f1_score': 0.8943,
-        'roc_auc': 0.9822
-    },
-    'XGBoost': {
-        'accuracy': 0.8629,
-        'precision': 0.7818,
-        'recall': 0.8788,
-        'f1_score': 0.8274,
-        'roc_auc': 0.9510
-    },
-    'ResNet_Style': {
-        'accuracy': 0.8673,
-        'precision': 0.9822,
-        'recall': 0.6572,
-        'f1_score': 0.7875,
-        'roc_auc': 0.9622
-    },
-    'Deep': {
-        'accuracy': 0.8261,
-        'precision': 0.9716,
-        'recall': 0.5512,
-        'f1_score': 0.7034,
-        'roc_auc': 0.9438
-    }
-}
+def get_model_metrics(model_name):
+    """Test-set metrics declared in db/model_manifest.json"""
+    return predictor.registry.metrics(model_name)
 
 # =============================================================================
 # EXISTING ENDPOINTS
 # =============================================================================
 
-@app.route('/api/models', methods=['GET'])
-def get_models():
-    return jsonify({
-        'models': [
-            {'name': 'Logistic_Regression', 'display': 'Logistic Regression'},
-            {'name': 'Random_Forest', 'display': 'Random Forest'},
-            {'name': 'XGBoost', 'display': 'XGBoost'},
-            {'name': 'ResNet_Style', 'display': 'ResNet Style'},
-            {'name': 'Deep', 'display': 'Deep (Wide & Deep)'}
-        ]
-    })
+# Payloads below only change on deploy: served from http_cache with a strong
+# ETag (304 on If-None-Match) and precompressed bodies.
+MODELS_MAX_AGE = 300
+STATIC_MAX_AGE = 86400
 
-@app.route('/api/variables', methods=['GET'])
-def get_variables():
+def models_payload():
+    return {'models': predictor.registry.listing()}
+
+def variables_payload():
     valid_values = get_valid_values()
     
-    return jsonify({
+    return {
         'categorical': {
             'ESTADO_DEPTO': sorted(list(URBAN_CENTER_COORDS.keys())),
             'SEXO': valid_values['SEXO'],
@@ -85,26 +173,155 @@ def get_variables():
             'VIGENCIA': valid_values['VIGENCIA'],
             'EVENTOS': {'min': 1, 'max': 10000}
         }
-    })
+    }
 
-@app.route('/api/departments', methods=['GET'])
-def get_departments():
+def departments_payload():
     departments = []
     for dept_name in URBAN_CENTER_COORDS.keys():
         info = get_department_info(dept_name)
         if info:
             departments.append(info)
     
-    return jsonify({'departments': departments})
+    return {'departments': departments}
+
+http_cache.register('models', models_payload, max_age=MODELS_MAX_AGE)
+http_cache.register('variables', variables_payload, max_age=STATIC_MAX_AGE)
+http_cache.register('departments', departments_payload, max_age=STATIC_MAX_AGE)
+for _dept_name in URBAN_CENTER_COORDS:
+    http_cache.register(f'department_geo:{_dept_name}',
+                        lambda name=_dept_name: get_department_info(name), max_age=STATIC_MAX_AGE)
+http_cache.precompute()
+
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    return http_cache.respond('models')
+
+@app.route('/api/variables', methods=['GET'])
+def get_variables():
+    return http_cache.respond('variables')
+
+@app.route('/api/departments', methods=['GET'])
+def get_departments():
+    return http_cache.respond('departments')
 
 @app.route('/api/department_geo/<dept_name>', methods=['GET'])
 def get_department_geometry(dept_name):
-    info = get_department_info(dept_name)
+    # Free-text names resolve to the canonical one, so every spelling shares one ETag
+    dept_name = resolve_department(dept_name)
     
-    if not info:
+    if dept_name not in URBAN_CENTER_COORDS:
         return jsonify({'error': 'Department not found'}), 404
     
-    return jsonify(info)
+    return http_cache.respond(f'department_geo:{dept_name}')
+
+MUNICIPALITY_MODE_UNAVAILABLE = {
+    'error': 'Modo municipal no disponible en este deployment.',
+    'message': 'La tabla de municipios no ha sido generada (python -m preprocessing.municipalities coords).'
+}
+
+@app.route('/api/municipalities', methods=['GET'])
+def get_municipalities():
+    table = get_municipality_table()
+    
+    if table is None:
+        return jsonify(MUNICIPALITY_MODE_UNAVAILABLE), 404
+    
+    return jsonify({'municipalities': table.listing(request.args.get('department'))})
+
+@app.route('/api/municipality_geo/<municipality>', methods=['GET'])
+def get_municipality_geometry(municipality):
+    table = get_municipality_table()
+    
+    if table is None:
+        return jsonify(MUNICIPALITY_MODE_UNAVAILABLE), 404
+    
+    row = table.resolve(municipality, request.args.get('department'))
+    if row is None:
+        return jsonify({'error': 'Municipality not found'}), 404
+    
+    return jsonify(table.info(row))
+
+# =============================================================================
+# HISTORICAL STATISTICS - roll-ups and slices of the precomputed RUV cube
+# =============================================================================
+
+HISTORY_CUBE_UNAVAILABLE = {
+    'error': 'Estadísticas históricas no disponibles en este deployment.',
+    'message': 'El cubo no ha sido generado (python -m preprocessing.history_cube --input <dataset>).'
+}
+
+def parse_stats_filters(args, years):
+    """
+    Dimension -> values from ?DIM=a,b. VIGENCIA also accepts ranges like
+    2000-2010, expanded only to the cube's `years` (a range is never enumerated).
+    """
+    filters = {}
+    for dim in STATS_DIMENSIONS:
+        raw = args.get(dim)
+        if not raw:
+            continue
+        values = []
+        for part in raw.split(','):
+            part = part.strip()
+            if dim == 'VIGENCIA' and '-' in part[1:]:
+                low, high = (int(v) for v in part.split('-', 1))
+                values.extend(year for year in years if low <= year <= high)
+            elif part:
+                values.append(part)
+        filters[dim] = values
+    return filters
+
+@app.route('/api/stats/dimensions', methods=['GET'])
+def get_stats_dimensions():
+    cube = get_history_cube()
+    
+    if cube is None:
+        return jsonify(HISTORY_CUBE_UNAVAILABLE), 404
+    
+    return jsonify({'dimensions': cube.dimensions()})
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    cube = get_history_cube()
+    
+    if cube is None:
+        return jsonify(HISTORY_CUBE_UNAVAILABLE), 404
+    
+    group_by = [dim for dim in request.args.get('group_by', '').split(',') if dim]
+    try:
+        filters = parse_stats_filters(request.args, cube.labels['VIGENCIA'])
+        by_hecho = str(request.args.get('by_hecho', '')).lower() in ('1', 'true', 'yes')
+        result = cube.query(group_by, filters, by_hecho=by_hecho)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result)
+
+@app.route('/api/geo/manifest.json', methods=['GET'])
+def get_geo_manifest():
+    manifest = geo_assets.manifest()
+    
+    if not manifest:
+        return jsonify({'error': 'Map assets not built (run build_geo_assets.py)'}), 404
+    
+    response = jsonify(manifest)
+    response.headers['Cache-Control'] = MANIFEST_CACHE
+    return response
+
+@app.route('/api/geo/<asset>', methods=['GET'])
+def get_geo_asset(asset):
+    found = geo_assets.asset(asset, request.headers.get('Accept-Encoding'))
+    
+    if not found:
+        return jsonify({'error': 'Asset not found'}), 404
+    
+    body, encoding = found
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    return response
 
 @app.route('/api/validate_year', methods=['POST'])
 def validate_year():
@@ -132,55 +349,106 @@ def validate_year():
     else:
         return jsonify({'valid': True, 'warning': None})
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
-    data = request.json
+RANDOM_FOREST_UNAVAILABLE = {
+    'error': 'El modelo Random Forest no está disponible en este deployment.',
+    'message': 'El modelo Random Forest (3,9 GB) se excluye del deployment debido a las limitaciones de memoria del nivel gratuito. Utilice uno de los otros modelos disponibles: regresión logística, XGBoost, ResNet-Style o Deep.',
+    'available_models': ['Logistic_Regression', 'XGBoost', 'ResNet_Style', 'Deep']
+}
+
+RANDOM_FOREST_MISSING = {
+    'error': 'El modelo Random Forest no está disponible.',
+    'message': 'El modelo Random Forest (3,9 GB) se excluye del deployment debido a limitaciones de memoria. Utilice Logistic Regression, XGBoost, ResNet-Style o Deep.',
+    'available_models': ['Logistic_Regression', 'XGBoost', 'ResNet_Style', 'Deep']
+}
+
+def check_model_available(model_name):
+    """Return (payload, status) when the requested model cannot be served, else None"""
+    problem = validator.check_model(model_name)
+    if problem is None:
+        return None
+    if problem == 'unknown':
+        return {'error': f'Modelo desconocido: {model_name}', 'available_models': sorted(validator.models)}, 400
+    # Random Forest may not be available in deployment (model file excluded)
+    if model_name == 'Random_Forest':
+        return RANDOM_FOREST_UNAVAILABLE, 503
+    return {'error': f'El modelo {model_name} no está disponible.', 'available_models': sorted(validator.models)}, 503
+
+def validate_predict_input(data):
+    """(input_data, error) where error is (payload, status) listing every invalid field"""
+    input_data, errors = validator.validate(data)
+    if errors:
+        return None, ({'error': 'Datos de entrada inválidos', 'details': errors}, 400)
+    return input_data, None
+
+def apply_municipality(data):
+    """
+    Municipality mode: when the request names a MUNICIPIO (DIVIPOLA code or
+    name), take ESTADO_DEPTO and the geo features from the municipality table.
     
-    model_name = data.get('model')
+    Returns (data, municipality_info, error) where error is (payload, status).
+    """
+    if data.get('MUNICIPIO') in (None, ''):
+        return data, None, None
     
-    # Check if Random Forest is requested (may not be available in deployment)
-    if model_name == 'Random_Forest':
-        try:
-            # Try to load Random Forest - will fail if model file doesn't exist
-            test_predict = predictor.predict(model_name, None, check_only=True)
-        except:
-            return jsonify({
-                'error': 'El modelo Random Forest no está disponible en este deployment.',
-                'message': 'El modelo Random Forest (3,9 GB) se excluye del deployment debido a las limitaciones de memoria del nivel gratuito. Utilice uno de los otros modelos disponibles: regresión logística, XGBoost, ResNet-Style o Deep.',
-                'available_models': ['Logistic_Regression', 'XGBoost', 'ResNet_Style', 'Deep']
-            }), 503
-    
-    input_data = {
-        'ESTADO_DEPTO': data.get('ESTADO_DEPTO'),
-        'SEXO': data.get('SEXO'),
-        'ETNIA': data.get('ETNIA'),
-        'DISCAPACIDAD': data.get('DISCAPACIDAD'),
-        'CICLO_VITAL': data.get('CICLO_VITAL'),
-        'VIGENCIA': int(data.get('VIGENCIA')),
-        'EVENTOS': int(data.get('EVENTOS')),
-        'km_norte_sur': float(data.get('km_norte_sur')),
-        'km_este_oeste': float(data.get('km_este_oeste')),
-        'distancia_total': float(data.get('distancia_total'))
-    }
+    table = get_municipality_table()
+    if table is None:
+        return data, None, (MUNICIPALITY_MODE_UNAVAILABLE, 400)
     
-    cleaned_input = clean_input_data(input_data)
-    if cleaned_input is None:
-        return jsonify({'error': 'Invalid input data'}), 400
+    row = table.resolve(data['MUNICIPIO'], data.get('ESTADO_DEPTO'))
+    if row is None:
+        return data, None, ({'error': f"Municipio no encontrado: {data['MUNICIPIO']}"}, 400)
     
-    try:
-        prediction_result = predictor.predict(model_name, cleaned_input)
-    except FileNotFoundError as e:
+    info = table.info(row)
+    data = {**data, 'ESTADO_DEPTO': info['department'], **{col: info[col] for col in GEO_COLS}}
+    return data, info, None
+
+def municipal_validation(municipality, cleaned_input, prediction_result):
+    """Validation from the local municipality store, or None to use the department lookup"""
+    store = get_validation_store()
+    if municipality is None or store is None:
+        return None
+    
+    displacement_count, other_count = store.lookup(municipality['code'], cleaned_input)
+    result = classify_counts(displacement_count, other_count, prediction_result)
+    result['granularity'] = 'municipality'
+    if result['match_type'] == 'ambiguous':
+        result['submessage'] = 'Aun a nivel municipal, el dataset no distingue estos casos (ej: fechas exactas)'
+    return result
+
+def prediction_error(e):
+    """Map an exception raised by run_prediction to (payload, status)"""
+    if isinstance(e, InferencePoolBusy):
+        return {'error': 'Servidor ocupado, intente de nuevo en unos segundos.'}, 503
+    if isinstance(e, FileNotFoundError):
         # Handle case where model file is missing (Random Forest in deployment)
         if 'Random_Forest' in str(e):
-            return jsonify({
-                'error': 'El modelo Random Forest no está disponible.',
-                'message': 'El modelo Random Forest (3,9 GB) se excluye del deployment debido a limitaciones de memoria. Utilice Logistic Regression, XGBoost, ResNet-Style o Deep.',
-                'available_models': ['Logistic_Regression', 'XGBoost', 'ResNet_Style', 'Deep']
-            }), 503
-        return jsonify({'error': f'Model error: {str(e)}'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            return RANDOM_FOREST_MISSING, 503
+        return {'error': f'Model error: {str(e)}'}, 500
+    return {'error': str(e)}, 500
+
+def build_match_filters(input_data):
+    return {
+        'ESTADO_DEPTO': input_data['ESTADO_DEPTO'],
+        'SEXO': input_data['SEXO'],
+        'ETNIA': input_data['ETNIA'],
+        'DISCAPACIDAD': input_data['DISCAPACIDAD'],
+        'CICLO_VITAL': input_data['CICLO_VITAL'],
+        'VIGENCIA': input_data['VIGENCIA'],
+        'EVENTOS': input_data['EVENTOS']
+    }
+
+def approximate_validation(input_data, prediction_result):
+    """Nearest historical records of the same profile, or None (no index / profile never seen)"""
+    index = get_neighbor_index()
+    if index is None:
+        return None
     
+    cleaned_input = clean_input_data(input_data)
+    if cleaned_input is None:
+        return None
+    return index.validate(cleaned_input, prediction_result)
+
+def build_predict_response(prediction_result, model_name, input_data, matches_df, validation_result=None):
     # Add label
     label = 'Desplazamiento Forzado' if prediction_result['prediction'] == 1 else 'Otro Hecho Victimizante'
     prediction_result['label'] = label
@@ -191,42 +459,72 @@ def predict():
     # Add model name for chatbot
     prediction_result['model'] = model_name
     
-    filters = {
-        'ESTADO_DEPTO': input_data['ESTADO_DEPTO'],
-        'SEXO': input_data['SEXO'],
-        'ETNIA': input_data['ETNIA'],
-        'DISCAPACIDAD': input_data['DISCAPACIDAD'],
-        'CICLO_VITAL': input_data['CICLO_VITAL'],
-        'VIGENCIA': input_data['VIGENCIA'],
-        'EVENTOS': input_data['EVENTOS']
-    }
-    
-    try:
-        matches_df = socrata_client.query_exact_match(filters)
-        matches_df = clean_api_results(matches_df)
-    except Exception as e:
-        print(f"Error querying API: {e}")
-        matches_df = None
-    
-    validation_result = analyze_matches(matches_df, prediction_result)
+    if validation_result is None:
+        validation_result = analyze_matches(matches_df, prediction_result)
+        if validation_result['match_type'] == 'no_match':
+            validation_result = approximate_validation(input_data, prediction_result) or validation_result
     
     # Add matches data for chatbot
     if matches_df is not None and len(matches_df) > 0:
         validation_result['matches_data'] = matches_df.to_dict('records')
     
-    return jsonify({
+    return {
         **prediction_result,
         **validation_result,
         'userInput': input_data  # Add for chatbot
-    })
+    }
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    
+    model_name = data.get('model')
+    
+    unavailable = check_model_available(model_name)
+    if unavailable:
+        payload, status = unavailable
+        return jsonify(payload), status
+    
+    data, municipality, error = apply_municipality(data)
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+    
+    input_data, error = validate_predict_input(data)
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+    
+    cleaned_input = clean_input_data(input_data)
+    if cleaned_input is None:
+        return jsonify({'error': 'Invalid input data'}), 400
+    
+    try:
+        prediction_result = run_prediction(model_name, cleaned_input, wants_explanation(request.args))
+    except Exception as e:
+        payload, status = prediction_error(e)
+        return jsonify(payload), status
+    
+    validation_result = municipal_validation(municipality, cleaned_input, prediction_result)
+    matches_df = None
+    if validation_result is None:
+        try:
+            matches_df = socrata_client.query_exact_match(build_match_filters(input_data))
+            matches_df = clean_api_results(matches_df)
+        except Exception as e:
+            print(f"Error querying API: {e}")
+            matches_df = None
+    
+    response = build_predict_response(prediction_result, model_name, input_data, matches_df, validation_result)
+    if municipality:
+        response['municipality'] = municipality
+    return jsonify(response)
 
 def analyze_matches(matches_df, prediction_result):
     if matches_df is None or len(matches_df) == 0:
-        return {
-            'match_type': 'no_match',
-            'message': '⚠ No hay coincidencia exacta en el dataset',
-            'submessage': 'Se realizará la predicción sin validación'
-        }
+        return classify_counts(0, 0, prediction_result)
     
     displacement_count = 0
     other_count = 0
@@ -240,7 +538,18 @@ def analyze_matches(matches_df, prediction_result):
         else:
             other_count += 1
     
-    total_matches = len(matches_df)
+    return classify_counts(displacement_count, other_count, prediction_result)
+
+def classify_counts(displacement_count, other_count, prediction_result):
+    """no_match / exact_match / ambiguous from the counts of matching records"""
+    total_matches = displacement_count + other_count
+    
+    if total_matches == 0:
+        return {
+            'match_type': 'no_match',
+            'message': '⚠ No hay coincidencia exacta en el dataset',
+            'submessage': 'Se realizará la predicción sin validación'
+        }
     
     if total_matches == 1:
         real_value = 1 if displacement_count > 0 else 0
@@ -265,6 +574,94 @@ def analyze_matches(matches_df, prediction_result):
             'submessage': 'Se requiere mayor granularidad en los datos (ej: información a nivel municipal)'
         }
 
+# =============================================================================
+# BATCH PREDICTION - Arrow IPC / MessagePack / JSON, see api/wire_format.py
+# =============================================================================
+
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', '1000000'))
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    fmt = request_format(request.mimetype)
+    if fmt is None:
+        return jsonify({'error': 'Content-Type no soportado (use application/vnd.apache.arrow.stream, application/msgpack o application/json)'}), 415
+    
+    try:
+        body_model, columns = decode_batch(fmt, request.get_data())
+        model_name = request.args.get('model') or body_model
+        
+        unavailable = check_model_available(model_name)
+        if unavailable:
+            payload, status = unavailable
+            return jsonify(payload), status
+        
+        parsed, valid, errors = validator.validate_columns(columns)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Cuerpo inválido: {e}'}), 400
+    
+    if parsed is None:
+        return jsonify({'error': 'Datos de entrada inválidos', 'details': errors}), 400
+    if len(valid) > BATCH_MAX_ROWS:
+        return jsonify({'error': f'Máximo {BATCH_MAX_ROWS:,} filas por petición (use /api/jobs)'}), 413
+    
+    probability = np.full(len(valid), np.nan)
+    if valid.any():
+        try:
+            probability[valid] = run_batch_prediction(model_name, clean_input_frame(select_rows(parsed, valid)))
+        except Exception as e:
+            payload, status = prediction_error(e)
+            return jsonify(payload), status
+    
+    body, content_type = encode_batch(response_format(request.headers.get('Accept'), fmt), valid, probability, errors)
+    return Response(body, content_type=content_type, headers={'X-Invalid-Rows': str(int((~valid).sum()))})
+
+# =============================================================================
+# COUNTERFACTUALS - what would flip the prediction, see prediction/counterfactual.py
+# =============================================================================
+
+@app.route('/api/predict/counterfactual', methods=['POST'])
+def predict_counterfactual():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    
+    model_name = data.get('model')
+    
+    unavailable = check_model_available(model_name)
+    if unavailable:
+        payload, status = unavailable
+        return jsonify(payload), status
+    
+    data, municipality, error = apply_municipality(data)
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+    
+    input_data, error = validate_predict_input(data)
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+    
+    cleaned_input = clean_input_data(input_data)
+    if cleaned_input is None:
+        return jsonify({'error': 'Invalid input data'}), 400
+    
+    try:
+        max_changes = min(max(int(data.get('max_changes', 2)), 1), 2)
+        limit = min(max(int(data.get('limit', 10)), 1), 100)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_changes y limit deben ser enteros'}), 400
+    
+    try:
+        result = run_counterfactuals(model_name, cleaned_input, max_changes=max_changes, limit=limit)
+    except Exception as e:
+        payload, status = prediction_error(e)
+        return jsonify(payload), status
+    
+    result['model'] = model_name
+    result['userInput'] = input_data
+    return jsonify(result)
+
 @app.route('/api/random', methods=['GET'])
 def get_random_values():
     import random
@@ -287,6 +684,203 @@ def get_random_values():
         'distancia_total': geo_info['distancia_total']
     })
 
+@app.route('/api/inference/status', methods=['GET'])
+def get_inference_status():
+    if INFERENCE_WORKERS <= 0:
+        return jsonify({'mode': 'in_process'})
+    
+    if inference_pool is None:
+        return jsonify({'mode': 'process_pool', 'started': False})
+    
+    return jsonify({'mode': 'process_pool', 'started': True, **inference_pool.status()})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Input drift (PSI/KL per feature) and out-of-range rates of this process, see prediction/drift.py"""
+    return jsonify({'pid': os.getpid(), 'drift': drift_monitor.report()})
+
+# =============================================================================
+# BULK SCORING JOBS - whole CSV/Parquet files, see prediction/bulk_jobs.py
+# =============================================================================
+
+# Server-side input paths are only accepted inside this directory (unset: uploads only)
+BULK_INPUT_ROOT = os.environ.get('BULK_INPUT_ROOT')
+BULK_JOB_WORKERS = int(os.environ.get('BULK_JOB_WORKERS', '1'))
+bulk_jobs = None
+_bulk_jobs_lock = threading.Lock()
+
+def get_bulk_jobs():
+    """Create the job manager on first use (its threads never start at import)"""
+    global bulk_jobs
+    with _bulk_jobs_lock:
+        if bulk_jobs is None:
+            pool = get_inference_pool()
+            if pool is not None:
+                bulk_jobs = BulkJobManager(validator, pool.predict_batch, workers=BULK_JOB_WORKERS)
+            else:
+                bulk_jobs = BulkJobManager(validator, predictor.predict_batch, workers=BULK_JOB_WORKERS,
+                                           acquire_model=predictor.acquire_model,
+                                           release_model=predictor.release_model)
+    return bulk_jobs
+
+def resolve_input_path(path):
+    """Absolute path of a server-side input inside BULK_INPUT_ROOT, else None"""
+    if not BULK_INPUT_ROOT or not path:
+        return None
+    root = os.path.realpath(BULK_INPUT_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root or not os.path.isfile(full):
+        return None
+    return full
+
+def job_links(job_id):
+    return {'status_url': f'/api/jobs/{job_id}', 'result_url': f'/api/jobs/{job_id}/result'}
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    upload = request.files.get('file')
+    data = request.form if upload else (request.get_json(silent=True) or {})
+    model_name = data.get('model')
+    
+    unavailable = check_model_available(model_name)
+    if unavailable:
+        payload, status = unavailable
+        return jsonify(payload), status
+    
+    jobs = get_bulk_jobs()
+    try:
+        if upload:
+            if input_format(upload.filename or '') is None:
+                return jsonify({'error': 'Formato no soportado (use .csv o .parquet)'}), 400
+            job_id = jobs.new_job_dir()
+            path = os.path.join(jobs.job_dir(job_id), 'input' + os.path.splitext(upload.filename)[1].lower())
+            upload.save(path)
+            job_id = jobs.submit(model_name, path, job_id=job_id, source_name=upload.filename)
+        else:
+            path = resolve_input_path(data.get('path'))
+            if path is None:
+                return jsonify({'error': 'Envíe un archivo (campo "file") o una ruta válida dentro de BULK_INPUT_ROOT'}), 400
+            job_id = jobs.submit(model_name, path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({**jobs.status(job_id), **job_links(job_id)}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    status = get_bulk_jobs().status(job_id)
+    
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({**status, **job_links(job_id)})
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    if not get_bulk_jobs().cancel(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job_id': job_id, 'cancelled': True})
+
+def stream_csv(path):
+    """results.parquet as CSV, one row group at a time"""
+    import pyarrow.parquet as pq
+    
+    parquet = pq.ParquetFile(path)
+    yield ','.join(parquet.schema_arrow.names) + '\n'
+    for index in range(parquet.num_row_groups):
+        yield parquet.read_row_group(index).to_pandas().to_csv(index=False, header=False)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    jobs = get_bulk_jobs()
+    status = jobs.status(job_id)
+    
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if status['state'] != 'done':
+        return jsonify({'error': f"El job no ha terminado (estado: {status['state']})", **status}), 409
+    
+    path = jobs.result_path(job_id)
+    if request.args.get('format') == 'csv':
+        return Response(stream_with_context(stream_csv(path)), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={job_id}.csv'})
+    
+    # send_file streams from disk and supports Range requests
+    return send_file(path, mimetype='application/vnd.apache.parquet',
+                     as_attachment=True, download_name=f'{job_id}.parquet')
+
+# =============================================================================
+# HEALTH ENDPOINTS
+# =============================================================================
+
+@app.route('/live', methods=['GET'])
+def live():
+    # Liveness: the process answers, nothing else is checked
+    return jsonify({'status': 'alive'})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Readiness: warmup has finished (render.yaml healthCheckPath)
+    status = 200 if warmup_status['state'] == 'ready' else 503
+    return jsonify({'ready': status == 200, **warmup_status}), status
+
+# =============================================================================
+# ADMIN ENDPOINTS - disabled unless ADMIN_TOKEN is set
+# =============================================================================
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+model_reload = {'state': 'idle', 'started_at': None, 'finished_at': None, 'results': None}
+_model_reload_lock = threading.Lock()
+
+def admin_authorized(headers):
+    if not ADMIN_TOKEN:
+        return False
+    token = headers.get('X-Admin-Token') or headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def reload_models():
+    """Background hot reload: web-process predictor first, then a rolling reload of the pool workers"""
+    try:
+        results = {'web': predictor.reload_models()}
+        if inference_pool is not None:
+            results['workers'] = inference_pool.reload_models()
+        validator.set_models(predictor.available_models(), predictor.registry.names())
+        http_cache.invalidate('models')
+        state = 'done'
+    except Exception as e:
+        print(f"✗ Model reload failed: {e}")
+        results, state = {'error': str(e)}, 'failed'
+    
+    with _model_reload_lock:
+        model_reload.update(state=state, finished_at=time.time(), results=results)
+
+@app.route('/api/admin/models/reload', methods=['GET', 'POST'])
+def admin_reload_models():
+    if not admin_authorized(request.headers):
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    with _model_reload_lock:
+        if request.method == 'GET' or model_reload['state'] == 'running':
+            return jsonify(model_reload), 200 if request.method == 'GET' else 409
+        model_reload.update(state='running', started_at=time.time(), finished_at=None, results=None)
+    
+    threading.Thread(target=reload_models, name='model-reload', daemon=True).start()
+    return jsonify(model_reload), 202
+
+@app.route('/api/admin/shadow', methods=['GET'])
+def admin_shadow_status():
+    """Shadow comparison of candidate models (see prediction/shadow.py)"""
+    if not admin_authorized(request.headers):
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    candidates = {name: {'version': spec.version, 'artifact': spec.artifact, 'sample_rate': rate}
+                  for name, (spec, rate) in predictor.registry.shadow.items()}
+    status = predictor.shadow.status() if predictor.shadow is not None else None
+    # This process's live status, plus the last flush of every web worker process
+    log_dir = predictor.shadow.log_dir if predictor.shadow is not None else None
+    return jsonify({'candidates': candidates, 'status': status, 'summaries': read_shadow_summaries(log_dir)})
+
 # =============================================================================
 # CHATBOT ENDPOINTS
 # =============================================================================
@@ -356,7 +950,7 @@ def explain_prediction():
             }), 400
         
         # Get model metrics
-        model_metrics = MODEL_METRICS.get(model_name, {})
+        model_metrics = get_model_metrics(model_name)
         print(f"[EXPLAIN] Model metrics loaded: {bool(model_metrics)}")
         
         # Initialize Gemini client
@@ -442,4 +1036,7 @@ def chat_message():
 # =============================================================================
 
 if __name__ == '__main__':
+    # The debug reloader re-runs this file in a child that does the serving
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
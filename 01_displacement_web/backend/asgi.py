@@ -0,0 +1,262 @@
+"""
+ASGI serving mode
+
+Serves the same routes and JSON contracts as app.py, but the I/O-bound
+endpoints (/api/predict and /api/chat/*) are native coroutines: Socrata and
+Gemini calls are awaited instead of blocking a worker, and model inference
+runs in a bounded thread pool. Every other route is delegated to the Flask
+app unchanged.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Environment:
+    INFERENCE_THREADS       threads running predictions (default 2)
+    INFERENCE_MAX_PENDING   predictions queued or running before callers wait (default 64)
+    INFERENCE_WORKERS       when > 0, predictions go to the process pool of app.py
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import app as flask_app
+from app import (
+    get_model_metrics, run_prediction, wants_explanation, check_model_available,
+    apply_municipality, municipal_validation, validate_predict_input, prediction_error,
+    build_match_filters, build_predict_response
+)
+from api.http_cache import COMPRESS_MIN_BYTES, accepted_encodings, brotli, compress
+from api.socrata_client import AsyncSocrataClient
+from chatbot.gemini_client import GeminiClient
+from preprocessing.data_cleaner import clean_input_data, clean_api_results
+from preprocessing.municipalities import get_validation_store
+
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', '2'))
+INFERENCE_MAX_PENDING = int(os.environ.get('INFERENCE_MAX_PENDING', '64'))
+
+# Created by the lifespan, so the app can be started again in the same process
+inference_executor = None
+inference_slots = None
+socrata_client = None
+
+
+async def run_inference(fn, *args):
+    """Run CPU-bound work on the inference pool without blocking the event loop"""
+    async with inference_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(inference_executor, fn, *args)
+
+
+async def query_matches(input_data):
+    try:
+        matches_df = await socrata_client.query_exact_match(build_match_filters(input_data))
+        return clean_api_results(matches_df)
+    except Exception as e:
+        print(f"Error querying API: {e}")
+        return None
+
+
+# =============================================================================
+# PREDICTION
+# =============================================================================
+
+async def predict(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({'error': 'Se esperaba un objeto JSON'}, status_code=400)
+
+    model_name = data.get('model')
+
+    unavailable = check_model_available(model_name)
+    if unavailable:
+        payload, status = unavailable
+        return JSONResponse(payload, status_code=status)
+
+    data, municipality, error = apply_municipality(data)
+    if error:
+        payload, status = error
+        return JSONResponse(payload, status_code=status)
+
+    input_data, error = validate_predict_input(data)
+    if error:
+        payload, status = error
+        return JSONResponse(payload, status_code=status)
+
+    cleaned_input = clean_input_data(input_data)
+    if cleaned_input is None:
+        return JSONResponse({'error': 'Invalid input data'}, status_code=400)
+
+    # Inference and the Socrata lookup are independent: run them concurrently.
+    # Municipality mode with a local validation store needs no Socrata call.
+    # The explanation, when asked for, is computed with the same model acquisition
+    prediction_task = asyncio.ensure_future(run_inference(
+        run_prediction, model_name, cleaned_input, wants_explanation(request.query_params)))
+    matches_task = None
+    if municipality is None or get_validation_store() is None:
+        matches_task = asyncio.ensure_future(query_matches(input_data))
+
+    try:
+        prediction_result = await prediction_task
+    except Exception as e:
+        if matches_task is not None:
+            matches_task.cancel()
+        payload, status = prediction_error(e)
+        return JSONResponse(payload, status_code=status)
+
+    matches_df = await matches_task if matches_task is not None else None
+    validation_result = municipal_validation(municipality, cleaned_input, prediction_result)
+
+    response = build_predict_response(prediction_result, model_name, input_data, matches_df, validation_result)
+    if municipality:
+        response['municipality'] = municipality
+    return compressed_json(request, response)
+
+
+def compressed_json(request, payload):
+    """JSONResponse, br/gzip-encoded when large (same rule as HttpCache.compress_response)"""
+    response = JSONResponse(payload)
+    if len(response.body) < COMPRESS_MIN_BYTES:
+        return response
+
+    accepted = accepted_encodings(request.headers.get('accept-encoding'))
+    coding = 'br' if brotli is not None and 'br' in accepted else 'gzip' if 'gzip' in accepted else None
+    response.headers['Vary'] = 'Accept-Encoding'
+    if coding is None:
+        return response
+
+    response.body = compress(response.body, coding)
+    response.headers['Content-Encoding'] = coding
+    response.headers['Content-Length'] = str(len(response.body))
+    return response
+
+
+# =============================================================================
+# CHATBOT
+# =============================================================================
+
+async def test_api_key(request):
+    """Test if Gemini API key is valid"""
+    try:
+        data = await request.json()
+        api_key = data.get('api_key')
+
+        if not api_key:
+            return JSONResponse({'success': False, 'error': 'API key is required'}, status_code=400)
+
+        # list_models has no async variant: keep it off the event loop
+        result = await run_in_threadpool(flask_app.test_gemini_connection, api_key)
+
+        return JSONResponse({'success': result['valid'], 'message': result['message']})
+
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def explain_prediction(request):
+    """Generate AI explanation for a prediction"""
+    try:
+        data = await request.json()
+
+        api_key = data.get('api_key')
+        user_input = data.get('user_input')
+        prediction = data.get('prediction')
+        model_name = data.get('model_name')
+
+        if not api_key:
+            return JSONResponse({'success': False, 'error': 'API key is required'}, status_code=400)
+
+        if not user_input or not prediction or not model_name:
+            return JSONResponse({'success': False, 'error': 'Missing required data'}, status_code=400)
+
+        client = GeminiClient(api_key)
+        explanation = await client.generate_explanation_async(
+            user_input=user_input,
+            prediction=prediction,
+            model_metrics=get_model_metrics(model_name)
+        )
+
+        return JSONResponse({'success': True, 'explanation': explanation})
+
+    except Exception as e:
+        print(f"[EXPLAIN] ✗ Error: {type(e).__name__}: {str(e)}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def chat_message(request):
+    """Handle chat messages with context"""
+    try:
+        data = await request.json()
+        api_key = data.get('api_key')
+        message = data.get('message')
+        context = data.get('context')
+        conversation_history = data.get('conversation_history', [])
+
+        if not api_key:
+            return JSONResponse({'success': False, 'error': 'API key is required'}, status_code=400)
+
+        if not message or not context:
+            return JSONResponse({'success': False, 'error': 'Message and context are required'}, status_code=400)
+
+        client = GeminiClient(api_key)
+        response_text = await client.chat_async(
+            message=message,
+            context=context,
+            conversation_history=conversation_history
+        )
+
+        return JSONResponse({'success': True, 'response': response_text})
+
+    except Exception as e:
+        print(f"Error in chat: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+# =============================================================================
+# APP
+# =============================================================================
+
+@asynccontextmanager
+async def lifespan(app):
+    global inference_executor, inference_slots, socrata_client
+    inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix='inference')
+    inference_slots = asyncio.Semaphore(INFERENCE_MAX_PENDING)
+    socrata_client = AsyncSocrataClient()
+    flask_app.start_warmup()
+    print(f"✓ ASGI mode: {INFERENCE_THREADS} inference threads, {INFERENCE_MAX_PENDING} pending max")
+    yield
+    await socrata_client.close()
+    inference_executor.shutdown(wait=False)
+    if flask_app.bulk_jobs is not None:
+        flask_app.bulk_jobs.shutdown()
+    if flask_app.inference_pool is not None:
+        flask_app.inference_pool.shutdown()
+    if flask_app.predictor.shadow is not None:
+        flask_app.predictor.shadow.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/predict', predict, methods=['POST']),
+        Route('/api/chat/test-key', test_api_key, methods=['POST']),
+        Route('/api/chat/explain', explain_prediction, methods=['POST']),
+        Route('/api/chat/message', chat_message, methods=['POST']),
+        # Everything else (static-ish GET endpoints) is served by the Flask app
+        Mount('/', app=WSGIMiddleware(flask_app.app)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,147 @@
+"""
+Latency/throughput effect of the predictor threading profiles
+
+Thread pools are process-wide, so every profile runs in fresh interpreters
+(PREDICTOR_THREAD_PROFILE set in their environment). `--parallel N` starts N
+of them at once to mimic N gunicorn workers sharing the same cores, which is
+where oversubscription shows up.
+
+    python -m benchmarks.bench_threading --models XGBoost,Deep --parallel 2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROFILES = ['latency', 'auto', 'throughput']
+
+
+def child(args):
+    """Runs inside a fresh interpreter with the profile already in the environment"""
+    from prediction.predictor import ModelPredictor
+    from preprocessing.data_cleaner import clean_input_data
+    from benchmarks.fixtures import synthetic_records, synthetic_frame
+    from benchmarks.run_benchmarks import summarize, keep_resident
+
+    predictor = ModelPredictor(models_dir=args.models_dir)
+    records = [clean_input_data(r) for r in synthetic_records(256)]
+    frame = synthetic_frame(args.batch_size)
+
+    results = {'settings': predictor.threading}
+    with keep_resident(predictor):
+        for model_name in args.models.split(','):
+            try:
+                predictor.predict(model_name, records[0])  # load + warm-up
+            except Exception as e:
+                results[model_name] = {'skipped': str(e)}
+                continue
+
+            timings = []
+            for i in range(args.iterations):
+                t0 = time.perf_counter_ns()
+                predictor.predict(model_name, records[i % len(records)])
+                timings.append(time.perf_counter_ns() - t0)
+
+            predictor.predict_batch(model_name, frame)
+            best = float('inf')
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                predictor.predict_batch(model_name, frame)
+                best = min(best, time.perf_counter() - t0)
+
+            results[model_name] = {
+                'single_row_ms': summarize(timings),
+                'batch_rows_per_s': round(len(frame) / best, 1)
+            }
+
+    print(json.dumps(results))
+    return 0
+
+
+def run_profile(profile, args):
+    env = dict(os.environ, PREDICTOR_THREAD_PROFILE=profile)
+    # Let the profile decide; inherited values would override it
+    for env_var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                    'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        env.pop(env_var, None)
+
+    cmd = [sys.executable, '-m', 'benchmarks.bench_threading', '--child',
+           '--models', args.models, '--models-dir', args.models_dir,
+           '--iterations', str(args.iterations), '--repeats', str(args.repeats),
+           '--batch-size', str(args.batch_size)]
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+             for _ in range(args.parallel)]
+
+    outputs = []
+    for proc in procs:
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"profile {profile} failed: {stderr.strip().splitlines()[-1:]}")
+        outputs.append(json.loads(stdout.strip().splitlines()[-1]))
+    return outputs
+
+
+def aggregate(outputs):
+    """Average the per-process results of one profile"""
+    merged = {'settings': outputs[0]['settings'], 'processes': len(outputs)}
+    for model_name, first in outputs[0].items():
+        if model_name == 'settings':
+            continue
+        if 'skipped' in first:
+            merged[model_name] = first
+            continue
+        per_proc = [o[model_name] for o in outputs]
+        merged[model_name] = {
+            'single_row_p50_ms': round(sum(r['single_row_ms']['p50'] for r in per_proc) / len(per_proc), 4),
+            'single_row_p99_ms': round(max(r['single_row_ms']['p99'] for r in per_proc), 4),
+            # Aggregate throughput of all processes running at once
+            'batch_rows_per_s': round(sum(r['batch_rows_per_s'] for r in per_proc), 1)
+        }
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark predictor threading profiles')
+    parser.add_argument('--models', default='XGBoost,Deep')
+    parser.add_argument('--models-dir', default='../db')
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    parser.add_argument('--parallel', type=int, default=1, help='Concurrent processes per profile')
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=8192)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args)
+
+    print("=" * 60)
+    print(f"THREADING PROFILES ({args.parallel} concurrent process(es) per profile)")
+    print("=" * 60)
+
+    results = {}
+    for profile in args.profiles.split(','):
+        results[profile] = aggregate(run_profile(profile, args))
+        print(f"\n{profile}: {results[profile]['settings']}")
+        for model_name, metrics in results[profile].items():
+            if model_name in ('settings', 'processes'):
+                continue
+            if 'skipped' in metrics:
+                print(f"  ⚠ {model_name} skipped")
+                continue
+            print(f"  {model_name:20s} p50={metrics['single_row_p50_ms']:8.3f}ms  "
+                  f"p99={metrics['single_row_p99_ms']:8.3f}ms  batch={metrics['batch_rows_per_s']:>12,.0f} rows/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
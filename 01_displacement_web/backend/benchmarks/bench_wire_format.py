@@ -0,0 +1,131 @@
+"""
+Serialization cost of the /api/predict/batch wire formats (api/wire_format.py)
+
+For each format and batch size, the best of `--repeats` runs of every stage
+of a round trip, without the model:
+
+    client_encode    DataFrame -> request body
+    server_decode    request body -> columns (decode_batch)
+    server_validate  columns -> typed, validated arrays (validate_columns + select_rows)
+    server_encode    probabilities -> response body (encode_batch)
+    client_decode    response body -> NumPy probabilities
+
+    python -m benchmarks.bench_wire_format --sizes 1000,100000,1000000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from api.wire_format import decode_batch, encode_batch, msgpack
+from benchmarks.fixtures import synthetic_frame
+from preprocessing.validation import InputValidator, select_rows
+
+FORMATS = ['json', 'msgpack', 'arrow']
+STAGES = ['client_encode', 'server_decode', 'server_validate', 'server_encode', 'client_decode']
+
+
+def client_encode(fmt, df):
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata({'model': 'XGBoost'})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    payload = {'model': 'XGBoost', 'columns': {col: df[col].tolist() for col in df.columns}}
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload).encode('utf-8')
+
+
+def client_decode(fmt, body):
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        return table.column('probability').to_numpy()
+    payload = msgpack.unpackb(body, raw=False) if fmt == 'msgpack' else json.loads(body)
+    return np.array(payload['probability'], dtype='float64')
+
+
+def best_of(repeats, fn):
+    """(best seconds, last result)"""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run_size(n_rows, formats, repeats, validator):
+    df = synthetic_frame(n_rows)
+    probability = np.random.default_rng(42).random(n_rows)
+
+    results = {}
+    for fmt in formats:
+        timings = {}
+        timings['client_encode'], request_body = best_of(repeats, lambda: client_encode(fmt, df))
+        timings['server_decode'], (_, columns) = best_of(repeats, lambda: decode_batch(fmt, request_body))
+
+        def validate():
+            parsed, valid, _ = validator.validate_columns(columns)
+            return select_rows(parsed, valid), valid
+        timings['server_validate'], (_, valid) = best_of(repeats, validate)
+
+        timings['server_encode'], (response_body, _) = best_of(
+            repeats, lambda: encode_batch(fmt, valid, probability, {}))
+        timings['client_decode'], decoded = best_of(repeats, lambda: client_decode(fmt, response_body))
+        assert np.allclose(decoded, probability)
+
+        results[fmt] = {
+            'request_bytes': len(request_body),
+            'response_bytes': len(response_body),
+            **{f'{stage}_ms': round(seconds * 1000, 3) for stage, seconds in timings.items()},
+            'server_total_ms': round(sum(timings[s] for s in ('server_decode', 'server_validate', 'server_encode')) * 1000, 3)
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark batch prediction wire formats')
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    formats = args.formats.split(',')
+    if 'msgpack' in formats and msgpack is None:
+        print("⚠ msgpack not installed, skipped")
+        formats.remove('msgpack')
+
+    validator = InputValidator()
+    results = {}
+    for n_rows in (int(size) for size in args.sizes.split(',')):
+        print("=" * 60)
+        print(f"{n_rows:,} ROWS")
+        print("=" * 60)
+        results[n_rows] = run_size(n_rows, formats, args.repeats, validator)
+        baseline = results[n_rows].get('json', {}).get('server_total_ms')
+        for fmt, metrics in results[n_rows].items():
+            speedup = f"  ({baseline / metrics['server_total_ms']:.1f}x vs json)" if baseline else ''
+            print(f"  {fmt:8s} request={metrics['request_bytes'] / 1e6:8.2f}MB  "
+                  f"server={metrics['server_total_ms']:10.1f}ms{speedup}")
+            print("           " + "  ".join(f"{stage}={metrics[stage + '_ms']:.1f}ms" for stage in STAGES))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Offline fixtures for benchmarks and load tests
+Synthetic prediction inputs plus stand-ins for the Socrata and Gemini clients
+"""
+
+import asyncio
+import random
+import time
+
+import pandas as pd
+
+from preprocessing.data_cleaner import get_valid_values
+from preprocessing.geo_data import URBAN_CENTER_COORDS, get_department_info
+
+CATEGORICAL_COLS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+
+
+def synthetic_records(n, seed=42):
+    """Generate n valid, already-cleaned prediction inputs"""
+    rng = random.Random(seed)
+    valid_values = get_valid_values()
+    departments = sorted(URBAN_CENTER_COORDS.keys())
+    geo_cache = {dept: get_department_info(dept) for dept in departments}
+
+    records = []
+    for _ in range(n):
+        dept = rng.choice(departments)
+        geo_info = geo_cache[dept]
+        records.append({
+            'ESTADO_DEPTO': dept,
+            'SEXO': rng.choice(valid_values['SEXO']),
+            'ETNIA': rng.choice(valid_values['ETNIA']),
+            'DISCAPACIDAD': rng.choice(valid_values['DISCAPACIDAD']),
+            'CICLO_VITAL': rng.choice(valid_values['CICLO_VITAL']),
+            'VIGENCIA': rng.randint(1985, 2025),
+            'EVENTOS': rng.randint(1, 1000),
+            'km_norte_sur': geo_info['km_norte_sur'],
+            'km_este_oeste': geo_info['km_este_oeste'],
+            'distancia_total': geo_info['distancia_total']
+        })
+
+    return records
+
+
+def synthetic_frame(n, seed=42):
+    """Same as synthetic_records but as a DataFrame for the batch path"""
+    return pd.DataFrame.from_records(synthetic_records(n, seed=seed))
+
+
+def socrata_rows(filters, n_matches, hecho='Desplazamiento forzado'):
+    """Build Socrata-style (lowercase keys, string values) rows for a filter set"""
+    row = {key.lower(): str(value) for key, value in filters.items()}
+    row['hecho'] = hecho
+    return [dict(row) for _ in range(n_matches)]
+
+
+class StubSocrataClient:
+    """Drop-in replacement for api.socrata_client.SocrataClient that never hits the network"""
+
+    def __init__(self, latency_ms=0.0, n_matches=3, seed=42):
+        self.latency_ms = latency_ms
+        self.n_matches = n_matches
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def query_exact_match(self, filters):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        hecho = self.rng.choice(['Desplazamiento forzado', 'Homicidio', 'Amenaza'])
+        return pd.DataFrame.from_records(socrata_rows(filters, self.n_matches, hecho=hecho))
+
+    def get_unique_values(self, column):
+        return []
+
+    def close(self):
+        pass
+
+
+class StubGeminiClient:
+    """Drop-in replacement for chatbot.gemini_client.GeminiClient"""
+
+    latency_ms = 0.0
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def _reply(self, prompt):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return f"Respuesta simulada ({len(prompt)} caracteres de contexto)"
+
+    def generate_explanation(self, user_input, prediction, model_metrics, conversation_history=None):
+        return self._reply(str(user_input) + str(prediction))
+
+    def chat(self, message, context, conversation_history=None):
+        return self._reply(message + str(context))
+
+    async def _reply_async(self, prompt):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        return f"Respuesta simulada ({len(prompt)} caracteres de contexto)"
+
+    async def generate_explanation_async(self, user_input, prediction, model_metrics, conversation_history=None):
+        return await self._reply_async(str(user_input) + str(prediction))
+
+    async def chat_async(self, message, context, conversation_history=None):
+        return await self._reply_async(message + str(context))
+
+
+def stub_test_gemini_connection(api_key):
+    """Drop-in replacement for chatbot.gemini_client.test_gemini_connection"""
+    return {'valid': True, 'message': 'API key is valid (stub)'}
+
+
+def install_app_stubs(app_module, socrata_latency_ms=0.0, gemini_latency_ms=0.0):
+    """Patch an imported `app` module so every endpoint runs offline"""
+    StubGeminiClient.latency_ms = gemini_latency_ms
+    app_module.socrata_client = StubSocrataClient(latency_ms=socrata_latency_ms)
+    app_module.GeminiClient = StubGeminiClient
+    app_module.test_gemini_connection = stub_test_gemini_connection
+    return app_module
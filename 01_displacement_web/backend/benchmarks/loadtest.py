@@ -0,0 +1,405 @@
+"""
+Load-testing harness for the Flask app under gunicorn
+
+Starts a stub Socrata server, launches gunicorn (or uvicorn for the ASGI
+mode in asgi.py) with each worker/thread configuration, replays a weighted
+mix of requests at fixed concurrency and recommends the configuration with
+the best throughput that stays inside the latency, error and memory budgets.
+
+    python -m benchmarks.loadtest --profile mixed --concurrency 16 --duration 30 \\
+        --sweep 1x1,1x4,2x2,2x4 --socrata-latency-ms 300 --gemini-latency-ms 1500
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from benchmarks.fixtures import synthetic_records
+from benchmarks.run_benchmarks import summarize
+from benchmarks.stub_socrata_server import StubSocrataConfig, start_stub_server
+
+# Relative weight of each request type per workload profile
+PROFILES = {
+    'mixed': {
+        'predict': 0.45, 'departments': 0.15, 'random': 0.20,
+        'chat_message': 0.15, 'chat_explain': 0.05
+    },
+    'browse': {
+        'predict': 0.20, 'departments': 0.40, 'random': 0.40
+    },
+    'predict_heavy': {
+        'predict': 0.90, 'random': 0.10
+    },
+    'chat_heavy': {
+        'predict': 0.30, 'chat_message': 0.50, 'chat_explain': 0.20
+    }
+}
+
+MODEL_ARTIFACTS = {
+    'Logistic_Regression': '02a_classical_models/saved_models/Logistic_Regression_best_model.pkl',
+    'XGBoost': '02a_classical_models/saved_models/XGBoost_best_model.pkl',
+    'ResNet_Style': '02b_neural_networks/saved_models/ResNet_Style_best_model.keras',
+    'Deep': '02b_neural_networks/saved_models/Deep_best_model.keras'
+}
+
+
+# =============================================================================
+# WORKLOAD
+# =============================================================================
+
+class Workload:
+    """Builds (method, path, json) requests following a profile"""
+
+    def __init__(self, profile, models, seed=42):
+        self.kinds = list(PROFILES[profile].keys())
+        self.weights = list(PROFILES[profile].values())
+        self.models = models
+        self.records = synthetic_records(1000, seed=seed)
+
+    def next_request(self, rng):
+        kind = rng.choices(self.kinds, weights=self.weights)[0]
+        record = rng.choice(self.records)
+
+        if kind == 'predict':
+            return kind, 'POST', '/api/predict', dict(record, model=rng.choice(self.models))
+        if kind == 'departments':
+            return kind, 'GET', '/api/departments', None
+        if kind == 'random':
+            return kind, 'GET', '/api/random', None
+
+        context = {
+            'userInput': record,
+            'prediction': {'prediction': 1, 'label': 'Desplazamiento Forzado', 'model': self.models[0]},
+            'modelMetrics': {'accuracy': 0.86, 'roc_auc': 0.95}
+        }
+        if kind == 'chat_message':
+            return kind, 'POST', '/api/chat/message', {
+                'api_key': 'loadtest', 'message': '¿Qué variable pesó más?', 'context': context
+            }
+        return kind, 'POST', '/api/chat/explain', {
+            'api_key': 'loadtest', 'user_input': record,
+            'prediction': context['prediction'], 'model_name': self.models[0]
+        }
+
+
+def run_load(base_url, workload, concurrency, duration, seed=42):
+    """Closed-loop load: each client thread sends its next request as soon as the last one returns"""
+    deadline = time.perf_counter() + duration
+    samples = [[] for _ in range(concurrency)]
+
+    def client(idx):
+        rng = random.Random(seed + idx)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            kind, method, path, body = workload.next_request(rng)
+            t0 = time.perf_counter_ns()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=60)
+                status = response.status_code
+            except requests.RequestException:
+                status = 0
+            samples[idx].append((kind, status, time.perf_counter_ns() - t0))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return [s for per_thread in samples for s in per_thread], elapsed
+
+
+def summarize_samples(samples, elapsed):
+    by_kind = {}
+    for kind, status, latency in samples:
+        by_kind.setdefault(kind, []).append((status, latency))
+
+    def block(rows):
+        errors = sum(1 for status, _ in rows if status == 0 or status >= 500)
+        return {
+            'requests': len(rows),
+            'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+            'latency_ms': summarize([latency for _, latency in rows]) if rows else {}
+        }
+
+    overall = block([(status, latency) for _, status, latency in samples])
+    overall['throughput_rps'] = round(len(samples) / elapsed, 2) if elapsed else 0.0
+    overall['by_endpoint'] = {kind: block(rows) for kind, rows in sorted(by_kind.items())}
+    return overall
+
+
+# =============================================================================
+# GUNICORN
+# =============================================================================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child_pids(parent_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == parent_pid:
+                pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class GunicornServer:
+    def __init__(self, workers, threads, env, timeout=120, server='gunicorn'):
+        self.workers = workers
+        self.threads = threads
+        self.port = free_port()
+        self.env = env
+        self.timeout = timeout
+        self.server = server
+        self.proc = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def command(self):
+        if self.server == 'uvicorn':
+            # ASGI mode: threads size the inference pool, I/O concurrency is unbounded
+            self.env['INFERENCE_THREADS'] = str(self.threads)
+            return [
+                sys.executable, '-m', 'uvicorn', 'benchmarks.loadtest_asgi:app',
+                '--host', '127.0.0.1', '--port', str(self.port),
+                '--workers', str(self.workers),
+                '--log-level', 'warning'
+            ]
+        return [
+            sys.executable, '-m', 'gunicorn', 'benchmarks.loadtest_app:app',
+            '--bind', f'127.0.0.1:{self.port}',
+            '--workers', str(self.workers),
+            '--threads', str(self.threads),
+            '--worker-class', 'gthread' if self.threads > 1 else 'sync',
+            '--timeout', str(self.timeout),
+            '--log-level', 'warning'
+        ]
+
+    def start(self):
+        self.proc = subprocess.Popen(self.command(), env=dict(self.env), stdout=subprocess.DEVNULL)
+
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.server} exited with code {self.proc.returncode}")
+            try:
+                # /ready answers 200 once warmup has finished, so no warmup lands in the measurement
+                if requests.get(self.base_url + '/ready', timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"{self.server} did not become ready in time")
+
+    def worker_memory(self):
+        # A single uvicorn worker serves from the main process: no children to read
+        pids = child_pids(self.proc.pid) or [self.proc.pid]
+        return [round(rss_mb(pid), 2) for pid in pids]
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, server, interval=1.0):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(self.server.worker_memory())
+
+    def summary(self):
+        per_worker = [mb for sample in self.samples for mb in sample]
+        totals = [sum(sample) for sample in self.samples if sample]
+        return {
+            'per_worker_avg_mb': round(sum(per_worker) / len(per_worker), 2) if per_worker else 0.0,
+            'per_worker_max_mb': round(max(per_worker), 2) if per_worker else 0.0,
+            'total_max_mb': round(max(totals), 2) if totals else 0.0
+        }
+
+
+# =============================================================================
+# SWEEP
+# =============================================================================
+
+def parse_sweep(value):
+    configs = []
+    for item in value.split(','):
+        workers, threads = item.lower().split('x')
+        configs.append((int(workers), int(threads)))
+    return configs
+
+
+def deployable_models(models_dir):
+    return [name for name, rel in MODEL_ARTIFACTS.items()
+            if os.path.exists(os.path.join(models_dir, rel))]
+
+
+def recommend(results, slo_p95_ms, max_error_rate, memory_budget_mb):
+    eligible = [
+        r for r in results
+        if r['error_rate'] <= max_error_rate
+        and r['latency_ms'].get('p95', float('inf')) <= slo_p95_ms
+        and r['memory']['total_max_mb'] <= memory_budget_mb
+    ]
+    if not eligible:
+        return None
+    # Best throughput; on ties prefer fewer workers (less memory)
+    best = max(eligible, key=lambda r: (r['throughput_rps'], -r['workers'], -r['threads']))
+    return {'workers': best['workers'], 'threads': best['threads'],
+            'throughput_rps': best['throughput_rps'], 'p95_ms': best['latency_ms']['p95'],
+            'total_memory_mb': best['memory']['total_max_mb']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the Flask app under gunicorn')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='mixed')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load per configuration')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds of unmeasured load first')
+    parser.add_argument('--sweep', default='1x1,1x4,2x2,2x4', help='Comma-separated WORKERSxTHREADS')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn',
+                        help='uvicorn serves the ASGI mode (asgi.py)')
+    parser.add_argument('--models', default=None, help='Comma-separated models for /api/predict')
+    parser.add_argument('--models-dir', default='../db')
+    parser.add_argument('--socrata-latency-ms', type=float, default=250.0)
+    parser.add_argument('--socrata-jitter-ms', type=float, default=50.0)
+    parser.add_argument('--socrata-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency-ms', type=float, default=1000.0)
+    parser.add_argument('--slo-p95-ms', type=float, default=2000.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--memory-budget-mb', type=float, default=512.0,
+                        help='Total RSS budget across workers (Render free tier: 512)')
+    parser.add_argument('--output', default='loadtest_results.json')
+    args = parser.parse_args()
+
+    models = args.models.split(',') if args.models else deployable_models(args.models_dir)
+    if not models:
+        parser.error('No model artifacts found; pass --models explicitly')
+
+    stub, stub_config = start_stub_server(config=StubSocrataConfig(
+        latency_ms=args.socrata_latency_ms,
+        jitter_ms=args.socrata_jitter_ms,
+        error_rate=args.socrata_error_rate
+    ))
+    env = dict(os.environ,
+               SOCRATA_DOMAIN=f'127.0.0.1:{stub.server_address[1]}',
+               SOCRATA_SCHEME='http',
+               FAKE_GEMINI_LATENCY_MS=str(args.gemini_latency_ms))
+
+    workload = Workload(args.profile, models)
+
+    print("=" * 80)
+    print(f"LOAD TEST - {args.server} profile={args.profile} concurrency={args.concurrency} models={models}")
+    print("=" * 80)
+
+    results = []
+    for workers, threads in parse_sweep(args.sweep):
+        server = GunicornServer(workers, threads, dict(env), server=args.server)
+        print(f"\n[{workers} workers x {threads} threads] starting {args.server}...")
+        try:
+            server.start()
+            if args.warmup:
+                run_load(server.base_url, workload, args.concurrency, args.warmup, seed=7)
+
+            sampler = MemorySampler(server)
+            sampler.start()
+            samples, elapsed = run_load(server.base_url, workload, args.concurrency, args.duration)
+            sampler.stopped.set()
+            sampler.join()
+
+            summary = summarize_samples(samples, elapsed)
+            summary.update({'workers': workers, 'threads': threads, 'memory': sampler.summary()})
+            results.append(summary)
+
+            print(f"  ✓ {summary['throughput_rps']:.1f} req/s | "
+                  f"p50={summary['latency_ms']['p50']:.0f}ms p95={summary['latency_ms']['p95']:.0f}ms "
+                  f"p99={summary['latency_ms']['p99']:.0f}ms | errors={summary['error_rate']:.2%} | "
+                  f"RSS/worker={summary['memory']['per_worker_max_mb']:.0f}MB")
+        except RuntimeError as e:
+            print(f"  ✗ {e}")
+        finally:
+            server.stop()
+
+    stub.shutdown()
+
+    recommendation = recommend(results, args.slo_p95_ms, args.max_error_rate, args.memory_budget_mb)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'server': args.server,
+            'profile': args.profile,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'models': models,
+            'socrata': {'latency_ms': args.socrata_latency_ms, 'error_rate': args.socrata_error_rate,
+                        'requests': stub_config.requests, 'errors': stub_config.errors},
+            'gemini_latency_ms': args.gemini_latency_ms,
+            'budgets': {'slo_p95_ms': args.slo_p95_ms, 'max_error_rate': args.max_error_rate,
+                        'memory_budget_mb': args.memory_budget_mb}
+        },
+        'results': results,
+        'recommendation': recommendation
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 80)
+    if recommendation:
+        print(f"RECOMMENDED: --workers {recommendation['workers']} --threads {recommendation['threads']} "
+              f"({recommendation['throughput_rps']:.1f} req/s, p95 {recommendation['p95_ms']:.0f}ms, "
+              f"{recommendation['total_memory_mb']:.0f}MB)")
+    else:
+        print("No configuration met the latency/error/memory budgets")
+    print(f"✓ Report saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
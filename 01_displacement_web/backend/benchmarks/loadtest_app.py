@@ -0,0 +1,20 @@
+"""
+WSGI entrypoint used by the load-test harness
+
+Same Flask app as app.py, with the Gemini client replaced by the offline stub.
+Socrata is NOT stubbed here: SOCRATA_DOMAIN/SOCRATA_SCHEME point the real
+SocrataClient at benchmarks.stub_socrata_server so the HTTP round trip is kept.
+
+    gunicorn benchmarks.loadtest_app:app --workers 2 --threads 4
+"""
+
+import os
+
+import app as app_module
+from benchmarks.fixtures import StubGeminiClient, stub_test_gemini_connection
+
+StubGeminiClient.latency_ms = float(os.environ.get('FAKE_GEMINI_LATENCY_MS', '0'))
+app_module.GeminiClient = StubGeminiClient
+app_module.test_gemini_connection = stub_test_gemini_connection
+
+app = app_module.app
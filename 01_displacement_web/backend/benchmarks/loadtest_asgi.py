@@ -0,0 +1,15 @@
+"""
+ASGI entrypoint used by the load-test harness (--server uvicorn)
+
+Same as benchmarks.loadtest_app but for the ASGI mode in asgi.py.
+
+    uvicorn benchmarks.loadtest_asgi:app --workers 1
+"""
+
+import benchmarks.loadtest_app  # noqa: F401  (patches the Flask side and test_gemini_connection)
+import asgi as asgi_module
+from benchmarks.fixtures import StubGeminiClient
+
+asgi_module.GeminiClient = StubGeminiClient
+
+app = asgi_module.app
@@ -0,0 +1,444 @@
+"""
+Reproducible benchmark suite for the prediction service
+
+Run from the backend folder so the same relative paths as app.py apply:
+
+    python -m benchmarks.run_benchmarks run --output bench_results.json
+    python -m benchmarks.run_benchmarks compare baseline.json bench_results.json
+
+Socrata and Gemini are replaced by the stubs in benchmarks.fixtures, so the
+suite runs fully offline. Models whose artifact is missing (e.g. Random Forest
+in deployment) are reported as skipped.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ALL_MODELS = ['Logistic_Regression', 'Random_Forest', 'XGBoost', 'ResNet_Style', 'Deep']
+DEFAULT_BATCH_SIZES = [1, 16, 128, 1024, 8192]
+
+# Metrics where a bigger number is better; everything else is a cost
+HIGHER_IS_BETTER = ('rows_per_s',)
+IGNORED_KEYS = ('n', 'skipped')
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def summarize(samples_ns, unit='ms'):
+    """Percentile summary of a list of durations in nanoseconds"""
+    scale = {'ms': 1e6, 'us': 1e3, 's': 1e9}[unit]
+    values = sorted(v / scale for v in samples_ns)
+    n = len(values)
+
+    def pct(p):
+        # Nearest-rank percentile, stable for small n
+        idx = min(n - 1, max(0, math.ceil(p / 100.0 * n) - 1))
+        return round(values[idx], 4)
+
+    return {
+        'n': n,
+        'mean': round(sum(values) / n, 4),
+        'min': round(values[0], 4),
+        'p50': pct(50),
+        'p90': pct(90),
+        'p95': pct(95),
+        'p99': pct(99),
+        'max': round(values[-1], 4)
+    }
+
+
+def current_rss_mb():
+    """Resident set size of this process (Linux /proc, 0 elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 2)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 2)
+    return round(peak / 1024, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+class keep_resident:
+    """Disable the predictor's unload-after-predict so the model stays warm"""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def __enter__(self):
+        self.predictor.unload_model = lambda model_name: None
+        return self.predictor
+
+    def __exit__(self, *exc):
+        del self.predictor.unload_model
+        return False
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+def cold_start_child(model_name, models_dir):
+    """Runs inside a fresh interpreter: import + init + first predict"""
+    t0 = time.perf_counter()
+    from prediction.predictor import ModelPredictor
+    from preprocessing.data_cleaner import clean_input_data
+    from benchmarks.fixtures import synthetic_records
+    t1 = time.perf_counter()
+
+    predictor = ModelPredictor(models_dir=models_dir)
+    t2 = time.perf_counter()
+
+    record = clean_input_data(synthetic_records(1)[0])
+    predictor.predict(model_name, record)
+    t3 = time.perf_counter()
+
+    return {
+        'import_s': round(t1 - t0, 4),
+        'init_s': round(t2 - t1, 4),
+        'first_predict_s': round(t3 - t2, 4),
+        'total_s': round(t3 - t0, 4),
+        'rss_mb': current_rss_mb()
+    }
+
+
+def bench_cold_start(models, models_dir):
+    results = {}
+    for model_name in models:
+        cmd = [sys.executable, '-m', 'benchmarks.run_benchmarks', 'cold-start',
+               '--model', model_name, '--models-dir', models_dir]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            results[model_name] = {'skipped': proc.stderr.strip().splitlines()[-1:] or ['failed']}
+            continue
+        # The child prints load messages before the JSON line
+        results[model_name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  ✓ cold start {model_name}: {results[model_name]['total_s']:.2f}s")
+    return results
+
+
+def available_models(predictor, models):
+    available = []
+    for model_name in models:
+        try:
+            predictor.load_model(model_name)
+            predictor.unload_model(model_name)
+            available.append(model_name)
+        except Exception as e:
+            print(f"  ⚠ {model_name} skipped: {e}")
+    return available
+
+
+def bench_warm_latency(predictor, models, records, iterations):
+    """Single-row latency: service path (load/unload per call) and resident model"""
+    results = {}
+    for model_name in models:
+        service, resident = [], []
+
+        for record in records[:max(1, iterations // 10)]:
+            t0 = time.perf_counter_ns()
+            predictor.predict(model_name, record)
+            service.append(time.perf_counter_ns() - t0)
+
+        with keep_resident(predictor):
+            predictor.predict(model_name, records[0])  # warm-up (graph tracing, caches)
+            for i in range(iterations):
+                record = records[i % len(records)]
+                t0 = time.perf_counter_ns()
+                predictor.predict(model_name, record)
+                resident.append(time.perf_counter_ns() - t0)
+        predictor.unload_model(model_name)
+
+        results[model_name] = {
+            'service': summarize(service),
+            'resident': summarize(resident)
+        }
+        print(f"  ✓ warm latency {model_name}: p50={results[model_name]['resident']['p50']:.2f}ms (resident)")
+    return results
+
+
+def bench_batch_throughput(predictor, models, batch_sizes, repeats):
+    from benchmarks.fixtures import synthetic_frame
+
+    results = {}
+    frames = {bs: synthetic_frame(bs, seed=bs) for bs in batch_sizes}
+
+    for model_name in models:
+        curve = {}
+        with keep_resident(predictor):
+            predictor.predict_batch(model_name, frames[batch_sizes[0]])
+            for bs in batch_sizes:
+                timings = []
+                for _ in range(repeats):
+                    t0 = time.perf_counter_ns()
+                    predictor.predict_batch(model_name, frames[bs])
+                    timings.append(time.perf_counter_ns() - t0)
+                best = min(timings) / 1e9
+                curve[str(bs)] = {'rows_per_s': round(bs / best, 1), 'batch_ms': round(best * 1000, 3)}
+        predictor.unload_model(model_name)
+
+        results[model_name] = curve
+        top = max(curve.values(), key=lambda c: c['rows_per_s'])
+        print(f"  ✓ batch throughput {model_name}: up to {top['rows_per_s']:,.0f} rows/s")
+    return results
+
+
+def bench_preprocessing(predictor, records, iterations):
+    from preprocessing.data_cleaner import clean_input_data
+    from benchmarks.fixtures import synthetic_frame
+
+    steps = {
+        'clean_input_data': lambda r: clean_input_data(r),
+        'preprocess_classic': lambda r: predictor.preprocess_classic(r),
+        'preprocess_nn': lambda r: predictor.preprocess_nn(r),
+    }
+
+    results = {}
+    for name, fn in steps.items():
+        timings = []
+        for i in range(iterations):
+            record = records[i % len(records)]
+            t0 = time.perf_counter_ns()
+            fn(record)
+            timings.append(time.perf_counter_ns() - t0)
+        results[name] = summarize(timings, unit='us')
+
+    frame = synthetic_frame(10000)
+    for name, fn in [('preprocess_classic_batch', predictor.preprocess_classic_batch),
+                     ('preprocess_nn_batch', predictor.preprocess_nn_batch)]:
+        t0 = time.perf_counter_ns()
+        fn(frame)
+        elapsed = time.perf_counter_ns() - t0
+        results[name] = {'rows_per_s': round(len(frame) / (elapsed / 1e9), 1)}
+
+    print(f"  ✓ preprocessing: classic p50={results['preprocess_classic']['p50']:.1f}us, "
+          f"nn p50={results['preprocess_nn']['p50']:.1f}us")
+    return results
+
+
+def bench_endpoints(models, records, iterations):
+    """Full Flask request path with Socrata/Gemini stubbed out"""
+    import app as app_module
+    from benchmarks.fixtures import install_app_stubs
+
+    install_app_stubs(app_module)
+    client = app_module.app.test_client()
+
+    results = {}
+    for model_name in models:
+        timings = []
+        for i in range(iterations):
+            payload = dict(records[i % len(records)], model=model_name)
+            t0 = time.perf_counter_ns()
+            response = client.post('/api/predict', json=payload)
+            timings.append(time.perf_counter_ns() - t0)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_json()}")
+        results[f'/api/predict[{model_name}]'] = summarize(timings)
+
+    for path in ['/api/models', '/api/variables', '/api/departments', '/api/random']:
+        timings = []
+        for _ in range(iterations):
+            t0 = time.perf_counter_ns()
+            client.get(path)
+            timings.append(time.perf_counter_ns() - t0)
+        results[path] = summarize(timings)
+
+    chat_payload = {
+        'api_key': 'stub',
+        'message': '¿Por qué?',
+        'context': {'userInput': records[0], 'prediction': {'prediction': 1}, 'modelMetrics': {}}
+    }
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        client.post('/api/chat/message', json=chat_payload)
+        timings.append(time.perf_counter_ns() - t0)
+    results['/api/chat/message'] = summarize(timings)
+
+    print(f"  ✓ endpoints: {len(results)} routes")
+    return results
+
+
+def run(args):
+    from prediction.predictor import ModelPredictor
+    from preprocessing.data_cleaner import clean_input_data
+    from benchmarks.fixtures import synthetic_records
+
+    models = args.models.split(',') if args.models else ALL_MODELS
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {
+                'models': models,
+                'iterations': args.iterations,
+                'batch_sizes': batch_sizes,
+                'repeats': args.repeats
+            }
+        }
+    }
+
+    print("=" * 60)
+    print("BENCHMARKS - prediction service")
+    print("=" * 60)
+
+    if not args.skip_cold_start:
+        results['cold_start'] = bench_cold_start(models, args.models_dir)
+
+    predictor = ModelPredictor(models_dir=args.models_dir)
+    rss_after_init = current_rss_mb()
+    models = available_models(predictor, models)
+
+    records = [clean_input_data(r) for r in synthetic_records(512)]
+
+    results['warm_latency_ms'] = bench_warm_latency(predictor, models, records, args.iterations)
+    results['batch_throughput'] = bench_batch_throughput(predictor, models, batch_sizes, args.repeats)
+    results['preprocessing_us'] = bench_preprocessing(predictor, records, args.iterations)
+
+    if not args.skip_endpoints:
+        results['endpoints_ms'] = bench_endpoints(models, records, max(10, args.iterations // 5))
+
+    results['memory_mb'] = {
+        'rss_after_init': rss_after_init,
+        'rss_steady': current_rss_mb(),
+        'rss_peak': peak_rss_mb()
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n✓ Results saved to: {args.output}")
+    return 0
+
+
+# =============================================================================
+# COMPARISON
+# =============================================================================
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if key == 'meta' or key in IGNORED_KEYS:
+            continue
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+def compare_results(baseline, candidate, threshold):
+    """Return (regressions, improvements) as lists of (path, old, new, change)"""
+    base_flat = flatten(baseline)
+    cand_flat = flatten(candidate)
+
+    regressions, improvements = [], []
+    for path in sorted(set(base_flat) & set(cand_flat)):
+        old, new = base_flat[path], cand_flat[path]
+        if old == 0:
+            continue
+        change = (new - old) / abs(old)
+        if path.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if change > threshold:
+            regressions.append((path, old, new, change))
+        elif change < -threshold:
+            improvements.append((path, old, new, change))
+    return regressions, improvements
+
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    regressions, improvements = compare_results(baseline, candidate, args.threshold)
+
+    print("=" * 80)
+    print(f"COMPARISON ({args.baseline} → {args.candidate}, threshold {args.threshold:.0%})")
+    print("=" * 80)
+
+    print(f"\nREGRESSIONS: {len(regressions)}")
+    for path, old, new, change in regressions:
+        print(f"  ✗ {path:70s} {old:>12.3f} → {new:>12.3f} ({change:.1%} worse)")
+
+    print(f"\nIMPROVEMENTS: {len(improvements)}")
+    for path, old, new, change in improvements:
+        print(f"  ✓ {path:70s} {old:>12.3f} → {new:>12.3f} ({-change:.1%} better)")
+
+    return 1 if regressions else 0
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite for the prediction service')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Run the benchmarks and write JSON results')
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--models-dir', default='../db')
+    run_parser.add_argument('--models', default=None, help='Comma-separated subset of models')
+    run_parser.add_argument('--iterations', type=int, default=200)
+    run_parser.add_argument('--repeats', type=int, default=3)
+    run_parser.add_argument('--batch-sizes', default=','.join(str(b) for b in DEFAULT_BATCH_SIZES))
+    run_parser.add_argument('--skip-cold-start', action='store_true')
+    run_parser.add_argument('--skip-endpoints', action='store_true')
+
+    cmp_parser = sub.add_parser('compare', help='Flag regressions between two result files')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('candidate')
+    cmp_parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Relative change that counts as a regression (default 0.10)')
+
+    cold_parser = sub.add_parser('cold-start', help=argparse.SUPPRESS)
+    cold_parser.add_argument('--model', required=True)
+    cold_parser.add_argument('--models-dir', default='../db')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'compare':
+        return compare(args)
+    print(json.dumps(cold_start_child(args.model, args.models_dir)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
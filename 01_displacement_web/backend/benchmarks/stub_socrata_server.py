@@ -0,0 +1,111 @@
+"""
+Local stand-in for the datos.gov.co SODA endpoint used by SocrataClient
+
+Answers GET /resource/<dataset>.json?$where=... with rows echoing the filter
+values, after a configurable latency and with a configurable error rate.
+Point the app at it with SOCRATA_DOMAIN=127.0.0.1:<port> SOCRATA_SCHEME=http.
+
+    python -m benchmarks.stub_socrata_server --port 8765 --latency-ms 250 --error-rate 0.02
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fixtures import socrata_rows
+
+WHERE_CLAUSE = re.compile(r"(\w+)='((?:[^']|'')*)'")
+HECHOS = ['Desplazamiento forzado', 'Homicidio', 'Amenaza', 'Desaparición forzada']
+
+
+class StubSocrataConfig:
+    def __init__(self, latency_ms=200.0, jitter_ms=50.0, error_rate=0.0,
+                 match_counts=(0, 1, 1, 3), seed=42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.match_counts = match_counts
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+
+def make_handler(config):
+    class StubSocrataHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass  # keep load-test output readable
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.startswith('/resource/'):
+                self._send(404, {'error': 'not found'})
+                return
+
+            with config.lock:
+                config.requests += 1
+                delay = max(0.0, config.rng.gauss(config.latency_ms, config.jitter_ms))
+                fail = config.rng.random() < config.error_rate
+                n_matches = config.rng.choice(config.match_counts)
+                hecho = config.rng.choice(HECHOS)
+                if fail:
+                    config.errors += 1
+
+            time.sleep(delay / 1000.0)
+
+            if fail:
+                self._send(500, {'error': True, 'message': 'stub failure'})
+                return
+
+            where = parse_qs(url.query).get('$where', [''])[0]
+            filters = {key: value.replace("''", "'") for key, value in WHERE_CLAUSE.findall(where)}
+            self._send(200, socrata_rows(filters, n_matches, hecho=hecho))
+
+    return StubSocrataHandler
+
+
+def start_stub_server(port=0, config=None):
+    """Start the stub in a daemon thread; returns (server, config)"""
+    config = config or StubSocrataConfig()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Socrata (SODA) server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StubSocrataConfig(args.latency_ms, args.jitter_ms, args.error_rate)
+    server, _ = start_stub_server(args.port, config)
+    print(f"✓ Stub Socrata listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,20 @@ TRAINING_RANGES = {
     'EVENTOS': {'min': 0, 'max': 351905}
 }
 
+# Spanish labels for the per-feature contributions of /api/predict?explain=1
+FEATURE_LABELS = {
+    'ESTADO_DEPTO': 'Departamento',
+    'SEXO': 'Género',
+    'ETNIA': 'Etnia',
+    'DISCAPACIDAD': 'Discapacidad',
+    'CICLO_VITAL': 'Rango de edad',
+    'VIGENCIA': 'Año',
+    'EVENTOS': 'Eventos previos',
+    'km_norte_sur': 'Distancia Norte-Sur',
+    'km_este_oeste': 'Distancia Este-Oeste',
+    'distancia_total': 'Distancia Total'
+}
+
 class GeminiClient:
     """Client to interact with Gemini API"""
     
@@ -137,15 +151,8 @@ class GeminiClient:
         
         print(f"[Chatbot] Processing chat message: {message[:50]}...")
         
-        # Build system context
-        system_context = self._build_chat_context(context)
-        
         # Combine system context with user message
-        full_prompt = f"""{system_context}
-
-User question: {message}
-
-Please provide a clear, concise answer based on the prediction context above. Use specific numbers and data when relevant."""
+        full_prompt = self._build_chat_prompt(message, context)
         
         try:
             model = self._get_model()
@@ -163,6 +170,69 @@ Please provide a clear, concise answer based on the prediction context above. Us
             print(f"[Chatbot] ✗ Error in chat: {e}")
             raise
     
+    async def generate_explanation_async(
+        self,
+        user_input: Dict,
+        prediction: Dict,
+        model_metrics: Dict,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> str:
+        """Non-blocking version of generate_explanation for the ASGI serving mode"""
+        
+        print(f"[Chatbot] Generating explanation (async)...")
+        
+        context = self._build_context(user_input, prediction, model_metrics)
+        
+        try:
+            model = self._get_model()
+            
+            if conversation_history:
+                chat_session = model.start_chat(history=self._format_history(conversation_history))
+                response = await chat_session.send_message_async(context)
+            else:
+                response = await model.generate_content_async(context)
+            
+            print(f"[Chatbot] ✓ Explanation generated successfully")
+            return response.text
+            
+        except Exception as e:
+            print(f"[Chatbot] ✗ Error generating explanation: {e}")
+            raise
+    
+    async def chat_async(self, message: str, context: Dict, conversation_history: Optional[List[Dict]] = None) -> str:
+        """Non-blocking version of chat for the ASGI serving mode"""
+        
+        print(f"[Chatbot] Processing chat message (async): {message[:50]}...")
+        
+        full_prompt = self._build_chat_prompt(message, context)
+        
+        try:
+            model = self._get_model()
+            
+            if conversation_history:
+                chat_session = model.start_chat(history=self._format_history(conversation_history))
+                response = await chat_session.send_message_async(full_prompt)
+            else:
+                response = await model.generate_content_async(full_prompt)
+            
+            print(f"[Chatbot] ✓ Chat response generated")
+            return response.text
+            
+        except Exception as e:
+            print(f"[Chatbot] ✗ Error in chat: {e}")
+            raise
+    
+    def _build_chat_prompt(self, message: str, context: Dict) -> str:
+        """Combine the system context with the user's message"""
+        
+        system_context = self._build_chat_context(context)
+        
+        return f"""{system_context}
+
+User question: {message}
+
+Please provide a clear, concise answer based on the prediction context above. Use specific numbers and data when relevant."""
+    
     def _build_context(self, user_input: Dict, prediction: Dict, model_metrics: Dict) -> str:
         """Build structured context for initial explanation"""
         
@@ -265,6 +335,18 @@ Los siguientes valores están fuera del rango histórico del dataset:
 Esto puede afectar la confiabilidad de la predicción ya que el modelo no fue entrenado con datos en estos rangos.
 """
         
+        # Add per-feature contributions if the prediction was explained
+        explanation = prediction.get('explanation')
+        if explanation and explanation.get('contributions'):
+            context += f"""
+CONTRIBUCIÓN DE CADA VARIABLE A ESTA PREDICCIÓN (método: {explanation.get('method', 'N/A')}):
+Valores en log-odds. Positivo empuja hacia Desplazamiento Forzado, negativo hacia Otro Hecho Victimizante.
+"""
+            for item in explanation['contributions'][:5]:
+                label = FEATURE_LABELS.get(item['feature'], item['feature'])
+                direction = 'hacia Desplazamiento Forzado' if item['contribution'] > 0 else 'hacia Otro Hecho Victimizante'
+                context += f"  - {label} ({item.get('value')}): {item['contribution']:+.3f} {direction}\n"
+        
         # Add validation information if present
         match_type = prediction.get('match_type')
         
@@ -308,7 +390,16 @@ VALIDACIÓN CON DATOS OFICIALES DEL RUV:
 Se detectó ambigüedad ({total} coincidencias encontradas):
 - Desplazamiento Forzado: {displacement_count} casos
 - Otros Hechos Victimizantes: {other_count} casos
-
+"""
+            if prediction.get('granularity') == 'municipality':
+                municipality = prediction.get('municipality', {})
+                context += f"""
+Validación a nivel municipal ({municipality.get('municipality', 'N/A')}, {municipality.get('department', 'N/A')}).
+Razón de la ambigüedad: Aun a nivel municipal, el dataset no tiene fechas exactas ni otras
+variables que distingan entre estos casos.
+"""
+            else:
+                context += """
 Razón de la ambigüedad: El dataset carece de suficiente granularidad (ej: datos a nivel municipal
 o fechas exactas) para distinguir entre estos casos. Esto refleja limitaciones de los datos 
 agregados a nivel departamental.
@@ -321,6 +412,25 @@ agregados a nivel departamental.
                     hecho = record.get('hecho', record.get('HECHO', 'N/A'))
                     context += f"{i}. Hecho: {hecho}\n"
         
+        elif match_type == 'approximate_match':
+            displacement_count = prediction.get('displacement_count', 0)
+            other_count = prediction.get('other_count', 0)
+            neighbors = prediction.get('neighbors', [])
+            
+            context += f"""
+VALIDACIÓN CON DATOS OFICIALES DEL RUV:
+No hay coincidencia exacta, pero hay {displacement_count + other_count} registros históricos cercanos
+con el mismo departamento, sexo, etnia, discapacidad y ciclo vital (año y eventos cercanos):
+- Desplazamiento Forzado: {displacement_count} casos
+- Otros Hechos Victimizantes: {other_count} casos
+"""
+            for neighbor in neighbors[:3]:
+                context += f"  - Año {neighbor['VIGENCIA']}, {neighbor['EVENTOS']} eventos: {neighbor['records']} registros\n"
+            if prediction.get('is_consistent'):
+                context += "→ La predicción del modelo es CONSISTENTE con la mayoría de los registros cercanos\n"
+            else:
+                context += "→ La predicción del modelo NO es consistente con la mayoría de los registros cercanos\n"
+        
         elif match_type == 'no_match':
             context += """
 VALIDACIÓN CON DATOS OFICIALES DEL RUV:
@@ -349,7 +459,8 @@ Incluye:
 1. INTERPRETACIÓN: Explica qué significa el resultado de forma clara y directa
 
 2. FACTORES CLAVE: Menciona las variables más relevantes que influyeron en la predicción
-   (incluye las variables geográficas cuando sean significativas)
+   (incluye las variables geográficas cuando sean significativas). Si se incluye la sección
+   CONTRIBUCIÓN DE CADA VARIABLE, basa este punto en esas contribuciones y en su dirección
 
 3. VALIDACIÓN: Explica qué muestran los datos reales del RUV:
    - Si hay coincidencia exacta: describe el registro real encontrado
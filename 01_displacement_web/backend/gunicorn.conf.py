@@ -0,0 +1,12 @@
+"""
+Gunicorn settings (read automatically when gunicorn starts in this folder)
+
+Warmup starts in each worker once it has loaded the app: a thread started at
+import time would run in the master under --preload and die with the fork.
+"""
+
+
+def post_worker_init(worker):
+    from app import start_warmup
+
+    start_warmup()
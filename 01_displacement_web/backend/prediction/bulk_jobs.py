@@ -0,0 +1,297 @@
+"""
+Asynchronous bulk scoring jobs
+
+A job scores a whole CSV or Parquet file (uploaded, or a path under
+BULK_INPUT_ROOT) without ever holding it in memory:
+
+1. the file is read in chunks of `chunk_rows` (CSV: pandas chunked reader,
+   Parquet: row batches);
+2. each chunk is validated column-wise (InputValidator.validate_columns) and
+   the valid rows are cleaned with clean_input_data semantics
+   (clean_input_frame);
+3. the valid rows are scored in one vectorized call;
+4. the chunk's results are appended as a row group to results.parquet.
+
+Memory is bounded by one chunk whatever the file size. Jobs run on a small
+thread pool; their status is written to <jobs_dir>/<job_id>/status.json after
+every chunk, so any web worker can answer a progress poll.
+
+    jobs = BulkJobManager(validator, score_batch)
+    job_id = jobs.submit('XGBoost', '/path/input.csv')
+    jobs.status(job_id)       # {'state': 'running', 'progress': 0.42, ...}
+    jobs.result_path(job_id)  # results.parquet once state == 'done'
+
+results.parquet columns: row (0-based row number in the input), valid,
+prediction and probability (null for invalid rows).
+"""
+
+import copy
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.data_cleaner import clean_input_frame
+from preprocessing.validation import CATEGORICAL_FIELDS, FIELDS, MAX_ERROR_ROWS, match_columns, select_rows
+
+DEFAULT_JOBS_DIR = os.environ.get('BULK_JOBS_DIR', '../db/jobs')
+CHUNK_ROWS = int(os.environ.get('BULK_CHUNK_ROWS', '100000'))
+JOB_TTL_S = float(os.environ.get('BULK_JOB_TTL_HOURS', '24')) * 3600
+
+INPUT_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet'}
+FINAL_STATES = ('done', 'failed', 'cancelled')
+CANCEL_MARKER = 'cancel'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def input_format(filename):
+    return INPUT_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def result_schema():
+    import pyarrow as pa
+
+    return pa.schema([('row', pa.int64()), ('valid', pa.bool_()),
+                      ('prediction', pa.int8()), ('probability', pa.float64())])
+
+
+def read_chunks(path, fmt, chunk_rows):
+    """Yield (DataFrame with schema column names, fraction of the file read)"""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        renames = match_columns(parquet.schema_arrow.names)
+        total = max(parquet.metadata.num_rows, 1)
+        done = 0
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(renames)):
+            done += batch.num_rows
+            yield batch.to_pandas().rename(columns=renames), done / total
+        return
+
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'rb') as f:
+        header = pd.read_csv(f, nrows=0, encoding_errors='replace').columns
+        renames = match_columns(header)
+        f.seek(0)
+        dtype = {col: 'category' for col, field in renames.items() if field in CATEGORICAL_FIELDS}
+        reader = pd.read_csv(f, chunksize=chunk_rows, usecols=list(renames), dtype=dtype,
+                             encoding_errors='replace', low_memory=False)
+        for chunk in reader:
+            yield chunk.rename(columns=renames), min(f.tell() / size, 1.0)
+
+
+class BulkJobManager:
+    def __init__(self, validator, score_batch, jobs_dir=None, workers=1, chunk_rows=CHUNK_ROWS,
+                 acquire_model=None, release_model=None):
+        """
+        score_batch(model_name, df) -> float64 probabilities for a DataFrame of
+        cleaned rows (ModelPredictor.predict_batch or InferencePool.predict_batch).
+        acquire_model/release_model (optional) hold the model for the whole job
+        so an in-process predictor does not reload it for every chunk.
+        """
+        self.validator = validator
+        self.score_batch = score_batch
+        self.acquire_model = acquire_model
+        self.release_model = release_model
+        self.jobs_dir = jobs_dir or DEFAULT_JOBS_DIR
+        self.chunk_rows = chunk_rows
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    # =========================================================================
+    # Job files
+    # =========================================================================
+
+    def job_dir(self, job_id):
+        # job ids are uuid hex: never a path component that escapes jobs_dir
+        if not job_id.isalnum():
+            raise KeyError(job_id)
+        return os.path.join(self.jobs_dir, job_id)
+
+    def result_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'results.parquet')
+
+    def _write_status(self, status):
+        path = os.path.join(self.job_dir(status['job_id']), 'status.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+        os.replace(path + '.tmp', path)
+
+    def status(self, job_id):
+        """Current status (this process, else status.json), or None for an unknown job"""
+        with self._lock:
+            status = self._jobs.get(job_id)
+            if status is not None:
+                return copy.deepcopy(status)
+        try:
+            with open(os.path.join(self.job_dir(job_id), 'status.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            status = self._jobs[job_id]
+            status.update(copy.deepcopy(fields))
+            snapshot = copy.deepcopy(status)
+        self._write_status(snapshot)
+        return snapshot
+
+    # =========================================================================
+    # Submission
+    # =========================================================================
+
+    def new_job_dir(self):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id
+
+    def submit(self, model_name, input_path, job_id=None, source_name=None):
+        """Queue a job over `input_path` (a file inside the job dir when uploaded)"""
+        fmt = input_format(source_name or input_path)
+        if fmt is None:
+            raise ValueError(f"Formato no soportado (use {', '.join(INPUT_FORMATS)})")
+
+        self.purge_expired()
+        job_id = job_id or self.new_job_dir()
+        status = {
+            'job_id': job_id,
+            'state': 'queued',
+            'model': model_name,
+            'source': {'name': source_name or os.path.basename(input_path), 'format': fmt,
+                       'bytes': os.path.getsize(input_path)},
+            'progress': 0.0,
+            'rows_read': 0,
+            'rows_scored': 0,
+            'rows_invalid': 0,
+            'invalid_by_field': {},
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'rows_per_s': None,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job_id] = status
+        self._write_status(status)
+        self._executor.submit(self._run, job_id, model_name, input_path, fmt)
+        return job_id
+
+    def cancel(self, job_id):
+        """Stop a queued/running job after its current chunk; a finished job is deleted"""
+        status = self.status(job_id)
+        if status is None:
+            return False
+        if status['state'] in FINAL_STATES:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            with self._lock:
+                self._jobs.pop(job_id, None)
+        else:
+            # A marker file, so the request may reach any web worker
+            open(os.path.join(self.job_dir(job_id), CANCEL_MARKER), 'w').close()
+        return True
+
+    def purge_expired(self):
+        """Delete finished jobs older than BULK_JOB_TTL_HOURS"""
+        cutoff = time.time() - JOB_TTL_S
+        for job_id in os.listdir(self.jobs_dir):
+            status = self.status(job_id)
+            if status and status['state'] in FINAL_STATES and (status['finished_at'] or 0) < cutoff:
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+
+    # =========================================================================
+    # Execution
+    # =========================================================================
+
+    def _score_chunk(self, model_name, chunk, row_offset, invalid_by_field):
+        """pyarrow Table of results for one chunk; records invalid rows per field"""
+        import pyarrow as pa
+
+        parsed, valid, errors = self.validator.validate_columns({field: chunk[field] for field in FIELDS})
+        for field, error in errors.items():
+            entry = invalid_by_field.setdefault(field, {'message': error['message'], 'count': 0, 'rows': []})
+            entry['count'] += error['count']
+            room = MAX_ERROR_ROWS - len(entry['rows'])
+            if room > 0:
+                entry['rows'].extend(row_offset + row for row in error['rows'][:room])
+
+        n_rows = len(chunk)
+        probability = np.full(n_rows, np.nan)
+        if valid.any():
+            probability[valid] = self.score_batch(model_name, clean_input_frame(select_rows(parsed, valid)))
+
+        return pa.table({
+            'row': pa.array(np.arange(row_offset, row_offset + n_rows, dtype=np.int64)),
+            'valid': pa.array(valid),
+            'prediction': pa.array((probability >= 0.5).astype(np.int8), mask=~valid),
+            'probability': pa.array(probability, mask=~valid)
+        }, schema=result_schema()), int(valid.sum())
+
+    def _run(self, job_id, model_name, input_path, fmt):
+        import pyarrow.parquet as pq
+
+        started = time.time()
+        self._update(job_id, state='running', started_at=started)
+        cancel_marker = os.path.join(self.job_dir(job_id), CANCEL_MARKER)
+        writer = None
+        held = False
+        rows_read = rows_scored = 0
+        invalid_by_field = {}
+        try:
+            if self.acquire_model is not None:
+                self.acquire_model(model_name)
+                held = True
+
+            for chunk, progress in read_chunks(input_path, fmt, self.chunk_rows):
+                if os.path.exists(cancel_marker):
+                    raise JobCancelled()
+
+                table, scored = self._score_chunk(model_name, chunk, rows_read, invalid_by_field)
+                if writer is None:
+                    writer = pq.ParquetWriter(self.result_path(job_id), table.schema, compression='zstd')
+                writer.write_table(table)
+
+                rows_read += len(chunk)
+                rows_scored += scored
+                elapsed = max(time.time() - started, 1e-9)
+                self._update(job_id, progress=round(progress, 4), rows_read=rows_read, rows_scored=rows_scored,
+                             rows_invalid=rows_read - rows_scored, invalid_by_field=invalid_by_field,
+                             rows_per_s=round(rows_read / elapsed, 1))
+
+            if writer is None:
+                # Empty input: still leave a (row-less) result file
+                writer = pq.ParquetWriter(self.result_path(job_id), result_schema(), compression='zstd')
+            writer.close()
+            writer = None
+            print(f"✓ Bulk job {job_id}: {rows_scored:,}/{rows_read:,} rows scored with {model_name}")
+            self._update(job_id, state='done', progress=1.0, finished_at=time.time())
+        except JobCancelled:
+            self._update(job_id, state='cancelled', finished_at=time.time())
+        except Exception as e:
+            print(f"✗ Bulk job {job_id} failed: {e}")
+            self._update(job_id, state='failed', error=str(e), finished_at=time.time())
+        finally:
+            if held:
+                self.release_model(model_name)
+            if writer is not None:
+                writer.close()
+            # Uploaded inputs are not kept once scored
+            if os.path.dirname(os.path.abspath(input_path)) == os.path.abspath(self.job_dir(job_id)):
+                os.remove(input_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,265 @@
+"""
+Counterfactual search: the smallest input changes that flip a prediction
+
+The neighbourhood of an input is closed: every other value of each
+categorical feature (the categories the model was encoded with; departments
+only if they have coordinates, and a new department brings its own geo
+features) plus a grid over VIGENCIA and EVENTOS. The search scores it in a
+few batches instead of one /api/predict call per candidate:
+
+1. one batch with the input itself and every single-feature change
+   (VIGENCIA: every year; EVENTOS: a log-spaced grid);
+2. only if no single change flips the prediction, one batch with every pair
+   of changes (each categorical/VIGENCIA value x each value of a later axis);
+3. on the numeric axes, the grid only brackets the crossing: the nearest
+   flipping value on each side of the input is then found by binary search,
+   all brackets refined together (one small batch per halving).
+
+Results are ordered by number of changes, then by distance: 1 per
+categorical change, |delta| / range for VIGENCIA and the same on a log scale
+for EVENTOS.
+
+    search = CounterfactualSearch(predictor)
+    search.search('XGBoost', cleaned_input, score_batch)
+"""
+
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.data_cleaner import get_valid_values
+from preprocessing.validation import EVENTOS_RANGE
+
+THRESHOLD = 0.5
+CATEGORICAL_COLS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+NUMERIC_COLS = ['VIGENCIA', 'EVENTOS']
+GEO_COLS = ['km_norte_sur', 'km_este_oeste', 'distancia_total']
+COLUMNS = CATEGORICAL_COLS + NUMERIC_COLS + GEO_COLS
+
+# Grid points on the EVENTOS axis before binary refinement
+EVENTOS_GRID_POINTS = 40
+MAX_CHANGES = 2
+DEFAULT_LIMIT = 10
+
+
+class Block:
+    """Candidates sharing `fixed` changes and varying one axis over `values`"""
+
+    def __init__(self, fixed, axis, values):
+        self.fixed = fixed
+        self.axis = axis
+        self.values = values
+
+
+class CounterfactualSearch:
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self._axes = {}
+        self._geo = None
+
+    # =========================================================================
+    # Neighbourhood
+    # =========================================================================
+
+    def geo_table(self):
+        """Department -> (km_norte_sur, km_este_oeste, distancia_total)"""
+        if self._geo is None:
+            from preprocessing.geo_data import URBAN_CENTER_COORDS, get_department_info
+
+            table = {}
+            for name in URBAN_CENTER_COORDS:
+                info = get_department_info(name)
+                if info:
+                    table[name] = tuple(info[col] for col in GEO_COLS)
+            self._geo = table
+        return self._geo
+
+    def axes(self, model_name):
+        """Axis -> candidate values (numpy arrays), cached per model family"""
+        family = self.predictor.registry.family(model_name)
+        if family not in self._axes:
+            if self.predictor.explainer is None:
+                from prediction.explainer import Explainer
+                self.predictor.explainer = Explainer(self.predictor)
+
+            categories = self.predictor.explainer.categories(model_name)
+            geo = self.geo_table()
+            axes = {col: np.array(categories[col], dtype=object) for col in CATEGORICAL_COLS if col in categories}
+            axes['ESTADO_DEPTO'] = np.array([d for d in axes['ESTADO_DEPTO'] if d in geo], dtype=object)
+
+            years = get_valid_values()['VIGENCIA']
+            axes['VIGENCIA'] = np.arange(years['min'], years['max_prediction'] + 1)
+            low, high = EVENTOS_RANGE
+            axes['EVENTOS'] = np.unique(np.geomspace(low, high, EVENTOS_GRID_POINTS).round().astype(np.int64))
+            self._axes[family] = axes
+        return self._axes[family]
+
+    def alternatives(self, axes, input_data):
+        return {axis: values[values != input_data[axis]] for axis, values in axes.items()}
+
+    def single_blocks(self, alternatives):
+        return [Block({}, axis, values) for axis, values in alternatives.items() if len(values)]
+
+    def pair_blocks(self, alternatives):
+        # Axes are ordered categorical, VIGENCIA, EVENTOS: a numeric axis is always varied last
+        order = [axis for axis in COLUMNS if axis in alternatives]
+        blocks = []
+        for first, second in itertools.combinations(order, 2):
+            for value in alternatives[first]:
+                blocks.append(Block({first: value}, second, alternatives[second]))
+        return blocks
+
+    # =========================================================================
+    # Scoring
+    # =========================================================================
+
+    def frame(self, input_data, rows):
+        """
+        DataFrame of the input with per-row changes; `rows` is a list of
+        (fixed, axis, values) and yields one row per value.
+        """
+        n = sum(len(values) for _, _, values in rows)
+        columns = {col: np.full(n, input_data[col], dtype=object if col in CATEGORICAL_COLS else None)
+                   for col in COLUMNS}
+
+        start = 0
+        for fixed, axis, values in rows:
+            stop = start + len(values)
+            for col, value in fixed.items():
+                columns[col][start:stop] = value
+            if axis is not None:
+                columns[axis][start:stop] = values
+            start = stop
+
+        df = pd.DataFrame(columns)
+        # A new department brings the distances of its capital
+        moved = df['ESTADO_DEPTO'].to_numpy() != input_data['ESTADO_DEPTO']
+        if moved.any():
+            geo = self.geo_table()
+            df.loc[moved, GEO_COLS] = np.array([geo[d] for d in df.loc[moved, 'ESTADO_DEPTO']], dtype='float64')
+        return df
+
+    # =========================================================================
+    # Search
+    # =========================================================================
+
+    def distance(self, changes, input_data, axes):
+        total = 0.0
+        for col, value in changes.items():
+            if col == 'VIGENCIA':
+                total += abs(value - input_data[col]) / (axes[col][-1] - axes[col][0])
+            elif col == 'EVENTOS':
+                total += abs(np.log(value) - np.log(input_data[col])) / np.log(axes[col][-1] / axes[col][0])
+            else:
+                total += 1.0
+        return total
+
+    def brackets(self, block, flipped, probability, input_data):
+        """
+        (fixed, axis, ok_value, flip_value, flip_probability) around the nearest
+        crossing above and below the input value on a numeric axis.
+        """
+        found = []
+        base = input_data[block.axis]
+        for direction in (1, -1):
+            side = (block.values - base) * direction > 0
+            values, flips, probs = block.values[side], flipped[side], probability[side]
+            order = np.argsort(values * direction)
+            values, flips, probs = values[order], flips[order], probs[order]
+            hits = np.flatnonzero(flips)
+            if not len(hits):
+                continue
+            k = hits[0]
+            ok = values[k - 1] if k > 0 else base
+            found.append((block.fixed, block.axis, int(ok), int(values[k]), float(probs[k])))
+        return found
+
+    def refine(self, input_data, brackets, score, base_positive):
+        """Binary search every bracket down to adjacent integers, one batch per halving"""
+        brackets = [list(b) for b in brackets]
+        rounds = rows = 0
+        while True:
+            active = [b for b in brackets if abs(b[3] - b[2]) > 1]
+            if not active:
+                break
+            mids = [(b[2] + b[3]) // 2 for b in active]
+            probability = score(self.frame(input_data, [(b[0], b[1], np.array([m])) for b, m in zip(active, mids)]))
+            for b, mid, p in zip(active, mids, probability):
+                if (p >= THRESHOLD) != base_positive:
+                    b[3], b[4] = mid, float(p)
+                else:
+                    b[2] = mid
+            rounds += 1
+            rows += len(active)
+        return brackets, rounds, rows
+
+    def search(self, model_name, input_data, score, max_changes=MAX_CHANGES, limit=DEFAULT_LIMIT):
+        """
+        Minimal changes to `input_data` (a cleaned input) that move the
+        probability across THRESHOLD. `score(df)` returns probabilities.
+        """
+        start = time.perf_counter()
+        axes = self.axes(model_name)
+        input_data = {**input_data, 'VIGENCIA': int(input_data['VIGENCIA']), 'EVENTOS': int(input_data['EVENTOS'])}
+        alternatives = self.alternatives(axes, input_data)
+
+        blocks = self.single_blocks(alternatives)
+        rows = [({}, None, np.array([0]))] + [(b.fixed, b.axis, b.values) for b in blocks]
+        probability = score(self.frame(input_data, rows))
+        base_probability = float(probability[0])
+        base_positive = base_probability >= THRESHOLD
+        probability = probability[1:]
+        scored = len(probability) + 1
+
+        found, changes_needed, batches = [], None, 1
+        for n_changes in range(1, max_changes + 1):
+            if n_changes == 2:
+                blocks = self.pair_blocks(alternatives)
+                probability = score(self.frame(input_data, [(b.fixed, b.axis, b.values) for b in blocks]))
+                scored += len(probability)
+                batches += 1
+
+            flipped = (probability >= THRESHOLD) != base_positive
+            brackets, offset = [], 0
+            for block in blocks:
+                stop = offset + len(block.values)
+                if block.axis in NUMERIC_COLS:
+                    brackets.extend(self.brackets(block, flipped[offset:stop], probability[offset:stop], input_data))
+                else:
+                    for i in np.flatnonzero(flipped[offset:stop]):
+                        found.append(({**block.fixed, block.axis: block.values[i]}, float(probability[offset + i])))
+                offset = stop
+
+            refined, rounds, rows = self.refine(input_data, brackets, score, base_positive)
+            batches += rounds
+            scored += rows
+            found.extend(({**fixed, axis: flip}, p) for fixed, axis, _, flip, p in refined)
+            if found:
+                changes_needed = n_changes
+                break
+
+        found.sort(key=lambda item: self.distance(item[0], input_data, axes))
+        return {
+            'base_probability': base_probability,
+            'base_prediction': int(base_positive),
+            'threshold': THRESHOLD,
+            'changes_needed': changes_needed,
+            'counterfactuals': [self.format(changes, p, input_data) for changes, p in found[:limit]],
+            'found': len(found),
+            'candidates_scored': scored,
+            'batches': batches,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def format(self, changes, probability, input_data):
+        return {
+            'changes': [
+                {'feature': col, 'from': input_data[col],
+                 'to': int(value) if col in NUMERIC_COLS else str(value)}
+                for col, value in changes.items()
+            ],
+            'probability': probability,
+            'prediction': int(probability >= THRESHOLD)
+        }
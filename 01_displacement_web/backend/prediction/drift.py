@@ -0,0 +1,360 @@
+"""
+Input drift and out-of-range monitoring with constant-memory sketches
+
+Every input that reaches a model is added to the sketches of the current
+window (DRIFT_WINDOW_S, default one hour; the previous window is kept):
+
+- categorical features: a count-min sketch (depth x width counters, one
+  blake2b hash per value) plus an exact count of values the training data
+  never had;
+- numeric features: a KLL quantile sketch (about 3k retained items whatever
+  the traffic) plus an exact count of values outside the training min/max.
+
+The reference is the training profile stored next to the encoders
+(preprocessing.classic.profile in db/model_manifest.json): category shares,
+and decile bin edges with their shares for numerics. For a window with
+enough samples, each feature gets
+
+    PSI = sum((a - e) * ln(a / e))      KL = sum(a * ln(a / e))
+
+over the training categories (+ one bucket for unseen values) or the
+training bins (shares read from the KLL CDF at the bin edges), and the
+out-of-range rate. Observing one request costs a few hash lookups and list
+appends under one lock; everything else happens when /api/metrics is read.
+
+    python -m prediction.drift profile --data ../db/01_cleaned_data/ruv_parquet
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+CATEGORICAL_COLS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+NUMERIC_COLS = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
+
+PROFILE_NAME = 'training_profile.json'
+WINDOW_S = float(os.environ.get('DRIFT_WINDOW_S', '3600'))
+# Scores are only reported once a window has this many inputs
+MIN_SAMPLES = 100
+# PSI above this is reported as drift (0.1-0.25 is usually read as moderate)
+PSI_ALERT = 0.25
+PROFILE_BINS = 10
+EPS = 1e-4
+
+CMS_WIDTH = 1024
+CMS_DEPTH = 4
+KLL_K = 200
+
+
+# =============================================================================
+# SKETCHES
+# =============================================================================
+
+@lru_cache(maxsize=4096)
+def _cms_columns(value, depth, width):
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=4 * depth).digest()
+    return tuple(int.from_bytes(digest[4 * i:4 * i + 4], 'little') % width for i in range(depth))
+
+
+class CountMinSketch:
+    """Frequency estimates in depth x width counters (overestimates only)"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def add(self, value, count=1):
+        self.table[self._rows, _cms_columns(str(value), self.depth, self.width)] += count
+
+    def estimate(self, value):
+        return int(self.table[self._rows, _cms_columns(str(value), self.depth, self.width)].min())
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch: level h holds items of weight 2**h; a full level is
+    sorted and every other item (random offset) is promoted to the next one.
+    """
+
+    def __init__(self, k=KLL_K, rng=None):
+        self.k = k
+        self.levels = [[]]
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = rng or random.Random()
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.levels[0]) >= self.capacity(0):
+            self._compress()
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype='float64')
+        if not len(values):
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        # One cascade per batch: each full level halves into the next in a single sort
+        self.levels[0].extend(values.tolist())
+        while any(len(items) >= self.capacity(level) for level, items in enumerate(self.levels)):
+            self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) >= self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items = sorted(self.levels[level])
+                # An odd item out stays at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self._rng.randint(0, 1)::2])
+                self.levels[level] = keep
+            level += 1
+
+    def cdf(self, points):
+        """Estimated P(X <= point) for each point"""
+        points = np.asarray(points, dtype='float64')
+        if not self.n:
+            return np.zeros(len(points))
+        ranks = np.zeros(len(points))
+        for level, items in enumerate(self.levels):
+            if items:
+                ranks += np.searchsorted(np.sort(items), points, side='right') * (1 << level)
+        return np.minimum(ranks / self.n, 1.0)
+
+    def quantiles(self, qs):
+        items, weights = [], []
+        for level, values in enumerate(self.levels):
+            items.extend(values)
+            weights.extend([1 << level] * len(values))
+        if not items:
+            return [None] * len(qs)
+        order = np.argsort(items)
+        items = np.asarray(items)[order]
+        cumulative = np.cumsum(np.asarray(weights)[order]) / sum(weights)
+        return [float(items[min(np.searchsorted(cumulative, q), len(items) - 1)]) for q in qs]
+
+
+# =============================================================================
+# TRAINING PROFILE
+# =============================================================================
+
+def build_profile(df):
+    """Reference distributions of a training DataFrame (cleaned rows)"""
+    profile = {'rows': int(len(df)), 'categorical': {}, 'numeric': {}}
+    for col in CATEGORICAL_COLS:
+        shares = df[col].astype(str).value_counts(normalize=True)
+        profile['categorical'][col] = {str(value): round(float(share), 6) for value, share in shares.items()}
+
+    for col in NUMERIC_COLS:
+        values = df[col].to_numpy(dtype='float64')
+        values = values[np.isfinite(values)]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, PROFILE_BINS + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='left'), minlength=len(edges) + 1)
+        profile['numeric'][col] = {
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'edges': edges.tolist(),
+            'shares': (counts / max(len(values), 1)).round(6).tolist()
+        }
+    return profile
+
+
+def write_profile(df, path):
+    profile = build_profile(df)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+    print(f"✓ Training profile ({profile['rows']:,} rows) saved to {path}")
+    return profile
+
+
+def divergences(actual, expected):
+    """(PSI, KL) of two share vectors, both smoothed by EPS"""
+    actual = np.maximum(np.asarray(actual, dtype='float64'), EPS)
+    expected = np.maximum(np.asarray(expected, dtype='float64'), EPS)
+    log_ratio = np.log(actual / expected)
+    return float(((actual - expected) * log_ratio).sum()), float((actual * log_ratio).sum())
+
+
+# =============================================================================
+# MONITOR
+# =============================================================================
+
+class DriftWindow:
+    """Sketches of the inputs seen during one window"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.started_at = time.time()
+        self.n = 0
+        self.categories = {col: CountMinSketch() for col in CATEGORICAL_COLS}
+        self.quantiles = {col: KLLSketch() for col in NUMERIC_COLS}
+        self.unseen = dict.fromkeys(CATEGORICAL_COLS, 0)
+        self.out_of_range = dict.fromkeys(NUMERIC_COLS, 0)
+        if profile:
+            self._known = {col: frozenset(shares) for col, shares in profile['categorical'].items()}
+            self._ranges = {col: (ref['min'], ref['max']) for col, ref in profile['numeric'].items()}
+
+    def observe(self, input_data):
+        # Read every numeric first so a malformed input leaves no partial counts
+        numbers = {col: float(input_data[col]) for col in NUMERIC_COLS}
+        self.n += 1
+        for col in CATEGORICAL_COLS:
+            value = str(input_data.get(col))
+            self.categories[col].add(value)
+            if self.profile and value not in self._known[col]:
+                self.unseen[col] += 1
+        for col, value in numbers.items():
+            self.quantiles[col].update(value)
+            if self.profile:
+                low, high = self._ranges[col]
+                if value < low or value > high:
+                    self.out_of_range[col] += 1
+
+    def observe_frame(self, df):
+        # Read every column first so a malformed frame leaves no partial counts
+        numbers = {col: df[col].to_numpy(dtype='float64') for col in NUMERIC_COLS}
+        counts = {col: df[col].astype(str).value_counts() for col in CATEGORICAL_COLS}
+        self.n += len(df)
+        for col in CATEGORICAL_COLS:
+            for value, count in counts[col].items():
+                self.categories[col].add(value, int(count))
+                if self.profile and value not in self._known[col]:
+                    self.unseen[col] += int(count)
+        for col, values in numbers.items():
+            self.quantiles[col].update_many(values)
+            if self.profile:
+                low, high = self._ranges[col]
+                self.out_of_range[col] += int(((values < low) | (values > high)).sum())
+
+    def report(self):
+        features = {}
+        scored = self.profile is not None and self.n >= MIN_SAMPLES
+
+        for col in CATEGORICAL_COLS:
+            entry = {}
+            if self.profile:
+                reference = self.profile['categorical'][col]
+                entry['unseen_rate'] = round(self.unseen[col] / self.n, 4) if self.n else None
+                if scored:
+                    actual = [min(self.categories[col].estimate(v), self.n) / self.n for v in reference]
+                    psi, kl = divergences(actual + [self.unseen[col] / self.n], list(reference.values()) + [0.0])
+                    entry.update(psi=round(psi, 4), kl=round(kl, 4))
+            features[col] = entry
+
+        for col in NUMERIC_COLS:
+            sketch = self.quantiles[col]
+            p5, p50, p95 = sketch.quantiles([0.05, 0.5, 0.95])
+            entry = {'p5': p5, 'p50': p50, 'p95': p95}
+            if self.profile:
+                reference = self.profile['numeric'][col]
+                entry['out_of_range_rate'] = round(self.out_of_range[col] / self.n, 4) if self.n else None
+                if scored:
+                    cdf = sketch.cdf(reference['edges'])
+                    actual = np.diff(np.concatenate([[0.0], cdf, [1.0]]))
+                    psi, kl = divergences(actual, reference['shares'])
+                    entry.update(psi=round(psi, 4), kl=round(kl, 4))
+            features[col] = entry
+
+        return {
+            'started_at': self.started_at,
+            'inputs': self.n,
+            'features': features,
+            'drifted': [col for col, entry in features.items() if (entry.get('psi') or 0) > PSI_ALERT]
+        }
+
+
+class DriftMonitor:
+    def __init__(self, profile=None, profile_path=None, window_s=WINDOW_S):
+        self.profile = profile
+        self.profile_path = profile_path
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self.current = DriftWindow(profile)
+        self.previous = None
+
+    @classmethod
+    def from_registry(cls, registry):
+        """Monitor against the profile named in the manifest (no scores when it is missing)"""
+        if 'profile' not in registry.preprocessing.get('classic', {}):
+            return cls()
+        path = registry.preprocessing_path('classic', 'profile')
+        if not os.path.exists(path):
+            print(f"⚠ Training profile not found ({path}): drift scores disabled")
+            return cls(profile_path=path)
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), path)
+
+    def _window(self):
+        if time.time() - self.current.started_at >= self.window_s:
+            self.previous, self.current = self.current, DriftWindow(self.profile)
+        return self.current
+
+    def observe(self, input_data):
+        """One cleaned input; never raises into the request path"""
+        try:
+            with self._lock:
+                self._window().observe(input_data)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠ Drift monitor skipped an input: {e}")
+
+    def observe_frame(self, df):
+        try:
+            with self._lock:
+                self._window().observe_frame(df)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠ Drift monitor skipped a batch: {e}")
+
+    def report(self):
+        with self._lock:
+            self._window()
+            current = self.current.report()
+            previous = self.previous.report() if self.previous is not None else None
+        return {
+            'profile': self.profile_path if self.profile else None,
+            'window_s': self.window_s,
+            'psi_alert': PSI_ALERT,
+            'current': current,
+            'previous': previous
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Training distributions for drift monitoring')
+    parser.add_argument('command', choices=['profile'])
+    parser.add_argument('--data', required=True, help='Parquet dir from training.ingest, or a CSV')
+    parser.add_argument('--models-dir', default='../db')
+    args = parser.parse_args(argv)
+
+    from prediction.registry import ModelRegistry
+    from training.features import load_training_frame
+
+    path = ModelRegistry(args.models_dir).preprocessing_path('classic', 'profile')
+    write_profile(load_training_frame(args.data), path)
+
+
+if __name__ == '__main__':
+    main()
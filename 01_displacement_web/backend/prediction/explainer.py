@@ -0,0 +1,438 @@
+"""
+Per-feature contributions for a prediction (the "why" behind a probability)
+
+    XGBoost              exact TreeSHAP (booster pred_contribs)
+    Logistic_Regression  coefficient x encoded value
+    Random_Forest        one-at-a-time ablation against a reference input
+    ResNet_Style, Deep   integrated gradients on the numeric input, ablation
+                         over every category for the embedding inputs
+
+Everything is in log-odds and reported per original feature (one-hot columns
+of the classic encoders are summed back to their source column). For every
+method base_value + sum(contributions) equals the logit of the predicted
+probability: for TreeSHAP and the linear model base_value is the model's
+expected value / intercept, for the approximations it absorbs the part of
+the logit not attributed to any single feature.
+
+The categorical grid (every category combination x year, for a few EVENTOS
+values) can be precomputed per model; grid inputs are then answered with an
+array lookup and no model load:
+
+    python -m prediction.explainer --models XGBoost,Logistic_Regression
+    python -m prediction.explainer --models Deep --years 2015-2025 --eventos 1,2
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLS = ['SEXO', 'ETNIA', 'CICLO_VITAL', 'DISCAPACIDAD', 'ESTADO_DEPTO']
+NUMERIC_COLS = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
+FEATURES = CATEGORICAL_COLS + NUMERIC_COLS
+
+GEO_COLS = ['km_norte_sur', 'km_este_oeste', 'distancia_total']
+GRID_COLS = CATEGORICAL_COLS + ['VIGENCIA', 'EVENTOS']
+GRID_DIR = 'explanations'
+
+IG_STEPS = 16
+PROBA_EPS = 1e-7
+
+
+def logit(proba):
+    proba = np.clip(np.asarray(proba, dtype='float64'), PROBA_EPS, 1 - PROBA_EPS)
+    return np.log(proba) - np.log1p(-proba)
+
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def scaler_center(scaler):
+    """Reference value (raw units) of a fitted scaler: mean, median or mid-range"""
+    if hasattr(scaler, 'center_') and scaler.center_ is not None:
+        return float(np.ravel(scaler.center_)[0])
+    if hasattr(scaler, 'mean_') and scaler.mean_ is not None:
+        return float(np.ravel(scaler.mean_)[0])
+    if hasattr(scaler, 'data_min_'):
+        return float((np.ravel(scaler.data_min_)[0] + np.ravel(scaler.data_max_)[0]) / 2)
+    return 0.0
+
+
+class ContributionGrid:
+    """Dense contribution table over GRID_COLS, addressed by mixed-radix index"""
+
+    def __init__(self, axes, contribs, base, geo, method, model_fingerprint):
+        self.axes = axes
+        self.contribs = contribs
+        self.base = base
+        self.geo = geo
+        self.method = method
+        self.model_fingerprint = model_fingerprint
+
+        shape = [len(axes[col]) for col in GRID_COLS]
+        self.strides = [int(np.prod(shape[i + 1:])) for i in range(len(shape))]
+        self.positions = {col: {value: i for i, value in enumerate(axes[col])} for col in GRID_COLS}
+
+    def index(self, input_data):
+        """Row of the table for a cleaned input, or None when it is off the grid"""
+        idx = 0
+        for col, stride in zip(GRID_COLS, self.strides):
+            value = input_data.get(col)
+            if col in ('VIGENCIA', 'EVENTOS'):
+                try:
+                    if int(value) != float(value):
+                        return None
+                    value = int(value)
+                except (TypeError, ValueError):
+                    return None
+            pos = self.positions[col].get(value)
+            if pos is None:
+                return None
+            idx += pos * stride
+
+        # The table was built with the department's own geo features
+        dept_geo = self.geo[self.positions['ESTADO_DEPTO'][input_data['ESTADO_DEPTO']]]
+        try:
+            given = np.array([float(input_data[col]) for col in GEO_COLS])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if np.abs(given - dept_geo).max() > 0.01:
+            return None
+        return idx
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {'axes': self.axes, 'method': self.method, 'model_fingerprint': self.model_fingerprint}
+        np.savez_compressed(path, contribs=self.contribs, base=self.base, geo=self.geo,
+                            meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['axes'], data['contribs'], data['base'], data['geo'],
+                       meta['method'], meta['model_fingerprint'])
+
+
+class Explainer:
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self._grids = {}
+
+    # =========================================================================
+    # Encoder metadata
+    # =========================================================================
+
+    def categories(self, model_name):
+        """Category values each categorical column was encoded with, per model family"""
+        if self.predictor.is_classic(model_name):
+            found = {}
+            for enc in self.predictor.encoders['classic'].values():
+                for col, cats in zip(enc.feature_names_in_, enc.categories_):
+                    found[col] = [str(c) for c in cats]
+            return {col: found[col] for col in CATEGORICAL_COLS if col in found}
+        encoders = self.predictor.encoders['nn']
+        return {col: [str(c) for c in encoders[col].categories_[0]] for col in CATEGORICAL_COLS if col in encoders}
+
+    def numeric_reference(self, model_name):
+        """Reference input for the numeric features, in raw units"""
+        scalers = self.predictor.scalers[self.predictor.registry.family(model_name)]
+        return {col: scaler_center(scalers[col]) if col in scalers else 0.0 for col in NUMERIC_COLS}
+
+    def _group_matrix(self, columns):
+        """(n_encoded_columns, n_features) 0/1 matrix summing encoded columns per feature"""
+        owners = sorted(CATEGORICAL_COLS, key=len, reverse=True)
+        G = np.zeros((len(columns), len(FEATURES)))
+        for j, name in enumerate(columns):
+            if name in FEATURES:
+                G[j, FEATURES.index(name)] = 1
+                continue
+            # One-hot columns are named <feature>_<category>
+            owner = next((col for col in owners if name.startswith(col + '_')), None)
+            if owner is None:
+                raise ValueError(f"Cannot map encoded column '{name}' to a feature")
+            G[j, FEATURES.index(owner)] = 1
+        return G
+
+    # =========================================================================
+    # Methods
+    # =========================================================================
+
+    def method_for(self, model, model_name):
+        if model_name == 'XGBoost' and (hasattr(model, 'get_booster') or hasattr(model, 'inplace_predict')):
+            return 'tree_shap'
+        if self.predictor.is_classic(model_name) and hasattr(model, 'coef_'):
+            return 'linear'
+        if self.predictor.is_classic(model_name):
+            return 'ablation'
+        return 'integrated_gradients'
+
+    def _tree_shap(self, model, X):
+        import xgboost as xgb
+
+        # XGBClassifier, or the raw Booster written by out-of-core training
+        model = self.predictor.xgb_model(model, 'XGBoost', len(X))
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        dmatrix = xgb.DMatrix(X.to_numpy(dtype='float32'), feature_names=booster.feature_names)
+        raw = booster.predict(dmatrix, pred_contribs=True)
+        return raw[:, :-1] @ self._group_matrix(list(X.columns)), raw[:, -1].astype('float64')
+
+    def _linear(self, model, X):
+        coef = np.ravel(model.coef_)
+        terms = X.to_numpy(dtype='float64') * coef
+        base = np.full(len(X), float(np.ravel(model.intercept_)[0]))
+        return terms @ self._group_matrix(list(X.columns)), base
+
+    def _ablation(self, model, model_name, df, columns, replacements):
+        """
+        f(x) - mean_v f(x with column := v), one column at a time.
+
+        All variants of all rows are scored in a single vectorized batch.
+        Returns (logits of the rows, contributions for `columns`).
+        """
+        variants = [df]
+        for col in columns:
+            for value in replacements[col]:
+                variant = df.copy()
+                variant[col] = value
+                variants.append(variant)
+
+        big = pd.concat(variants, ignore_index=True)
+        X = self.predictor.encode_batch(model_name, big)
+        logits = logit(self.predictor.predict_proba_encoded(model, model_name, X)).reshape(len(variants), len(df))
+
+        contribs, offset = [], 1
+        for col in columns:
+            n_values = len(replacements[col])
+            contribs.append(logits[0] - logits[offset:offset + n_values].mean(axis=0))
+            offset += n_values
+        return logits[0], np.stack(contribs, axis=1)
+
+    def _integrated_gradients(self, model, inputs, reference):
+        """Integrated gradients of the logit w.r.t. the scaled numeric input (right Riemann sum)"""
+        import tensorflow as tf
+
+        X_cat, X_num = inputs[:-1], inputs[-1]
+        n = len(X_num)
+        alphas = (np.arange(1, IG_STEPS + 1) / IG_STEPS).astype('float32')
+        path = reference + alphas[:, None, None] * (X_num - reference)
+
+        # Keras 3 rejects nested call() arguments that mix arrays and tensors
+        cat = [tf.convert_to_tensor(np.tile(c, IG_STEPS)) for c in X_cat]
+        x = tf.convert_to_tensor(path.reshape(-1, X_num.shape[1]))
+        with tf.GradientTape() as tape:
+            tape.watch(x)
+            proba = tf.clip_by_value(model(cat + [x], training=False), PROBA_EPS, 1 - PROBA_EPS)
+            out = tf.math.log(proba) - tf.math.log1p(-proba)
+        grads = tape.gradient(out, x).numpy().reshape(IG_STEPS, n, -1).mean(axis=0)
+        return grads * (X_num - reference)
+
+    def _scaled_reference(self, model_name):
+        """numeric_reference as the (1, 5) scaled network input"""
+        reference = self.numeric_reference(model_name)
+        scalers = self.predictor.scalers['nn']
+        X = np.array([[reference[col] for col in NUMERIC_COLS]], dtype='float32')
+        for idx, col in enumerate(NUMERIC_COLS):
+            if col in scalers:
+                X[:, idx] = scalers[col].transform(X[:, [idx]]).flatten()
+        return X
+
+    def explain_batch(self, model, model_name, df):
+        """
+        Contributions for a DataFrame of cleaned rows.
+
+        Returns (contributions (n, len(FEATURES)), base_value (n,), method).
+        """
+        df = df.reset_index(drop=True)
+        method = self.method_for(model, model_name)
+
+        if method in ('tree_shap', 'linear'):
+            X = self.predictor.encode_batch(model_name, df)
+            if method == 'tree_shap':
+                contribs, base = self._tree_shap(model, X)
+            else:
+                contribs, base = self._linear(model, X)
+            return contribs, base, method
+
+        categories = self.categories(model_name)
+        cat_cols = [col for col in CATEGORICAL_COLS if col in categories]
+
+        if method == 'ablation':
+            reference = self.numeric_reference(model_name)
+            replacements = {**categories, **{col: [reference[col]] for col in NUMERIC_COLS}}
+            row_logits, parts = self._ablation(model, model_name, df, cat_cols + NUMERIC_COLS, replacements)
+            columns = cat_cols + NUMERIC_COLS
+        else:
+            row_logits, cat_parts = self._ablation(model, model_name, df, cat_cols, categories)
+            inputs = self.predictor.encode_batch(model_name, df)
+            num_parts = self._integrated_gradients(model, inputs, self._scaled_reference(model_name))
+            parts = np.concatenate([cat_parts, num_parts], axis=1)
+            columns = cat_cols + NUMERIC_COLS
+
+        contribs = np.zeros((len(df), len(FEATURES)))
+        for j, col in enumerate(columns):
+            contribs[:, FEATURES.index(col)] = parts[:, j]
+        return contribs, row_logits - contribs.sum(axis=1), method
+
+    # =========================================================================
+    # Single-input entry point
+    # =========================================================================
+
+    def grid_path(self, model_name):
+        return os.path.join(self.predictor.models_dir, GRID_DIR, f'{model_name}_grid.npz')
+
+    def grid(self, model_name):
+        """Precomputed table for a model, if present and built from the current model file"""
+        if model_name in self._grids:
+            return self._grids[model_name]
+
+        grid = None
+        path = self.grid_path(model_name)
+        if os.path.exists(path):
+            try:
+                grid = ContributionGrid.load(path)
+                model_path = self.predictor.model_path(model_name)
+                if not os.path.exists(model_path) or grid.model_fingerprint != file_fingerprint(model_path):
+                    print(f"⚠ {model_name} explanation grid is stale, ignoring it")
+                    grid = None
+                else:
+                    print(f"✓ {model_name} explanation grid loaded ({len(grid.base):,} rows)")
+            except Exception as e:
+                print(f"⚠ Could not load {model_name} explanation grid: {e}")
+                grid = None
+
+        self._grids[model_name] = grid
+        return grid
+
+    def invalidate(self, model_name):
+        """Forget the cached grid (the model was swapped; the grid is re-checked on next use)"""
+        self._grids.pop(model_name, None)
+
+    def format(self, input_data, contribs, base, method, source):
+        ranked = sorted(zip(FEATURES, contribs), key=lambda item: abs(item[1]), reverse=True)
+        return {
+            'method': method,
+            'source': source,
+            'units': 'log-odds',
+            'base_value': float(base),
+            'contributions': [
+                {'feature': feature, 'value': input_data.get(feature), 'contribution': float(value)}
+                for feature, value in ranked
+            ]
+        }
+
+    def explain(self, model_name, input_data, model=None):
+        """
+        Contributions for one cleaned input: grid lookup first, then the model.
+
+        Pass `model` when the caller already holds it (ModelPredictor.predict
+        with explain=True) so it is not acquired a second time.
+        """
+        grid = self.grid(model_name)
+        if grid is not None:
+            idx = grid.index(input_data)
+            if idx is not None:
+                return self.format(input_data, grid.contribs[idx].astype('float64'), grid.base[idx],
+                                   grid.method, 'grid')
+
+        held = model is not None
+        if not held:
+            model = self.predictor.acquire_model(model_name)
+            if not model:
+                raise ValueError(f"Model {model_name} not found")
+        try:
+            contribs, base, method = self.explain_batch(model, model_name, pd.DataFrame([input_data]))
+        finally:
+            if not held:
+                self.predictor.release_model(model_name)
+        return self.format(input_data, contribs[0], base[0], method, 'computed')
+
+    # =========================================================================
+    # Grid precomputation
+    # =========================================================================
+
+    def grid_axes(self, model_name, years, eventos):
+        from preprocessing.geo_data import get_department_info
+
+        axes = self.categories(model_name)
+        # Only departments with coordinates can be requested through the API
+        axes['ESTADO_DEPTO'] = [d for d in axes['ESTADO_DEPTO'] if get_department_info(d)]
+        axes['VIGENCIA'] = [int(y) for y in years]
+        axes['EVENTOS'] = [int(e) for e in eventos]
+        return {col: axes[col] for col in GRID_COLS}
+
+    def build_grid(self, model_name, years, eventos, chunk_rows=50_000):
+        from preprocessing.geo_data import get_department_info
+
+        axes = self.grid_axes(model_name, years, eventos)
+        shape = [len(axes[col]) for col in GRID_COLS]
+        total = int(np.prod(shape))
+        geo = np.array([[get_department_info(d)[col] for col in GEO_COLS] for d in axes['ESTADO_DEPTO']])
+        values = {col: np.asarray(axes[col], dtype=object) for col in GRID_COLS}
+
+        contribs = np.empty((total, len(FEATURES)), dtype='float16')
+        base = np.empty(total, dtype='float32')
+        method = None
+
+        model = self.predictor.acquire_model(model_name)
+        if not model:
+            raise ValueError(f"Model {model_name} not found")
+
+        start_time = time.time()
+        try:
+            for start in range(0, total, chunk_rows):
+                stop = min(total, start + chunk_rows)
+                positions = np.unravel_index(np.arange(start, stop), shape)
+                df = pd.DataFrame({col: values[col][pos] for col, pos in zip(GRID_COLS, positions)})
+                dept_geo = geo[positions[GRID_COLS.index('ESTADO_DEPTO')]]
+                for j, col in enumerate(GEO_COLS):
+                    df[col] = dept_geo[:, j]
+
+                c, b, method = self.explain_batch(model, model_name, df)
+                contribs[start:stop] = c
+                base[start:stop] = b
+                print(f"  ✓ {model_name}: {stop:,}/{total:,} grid rows")
+        finally:
+            self.predictor.release_model(model_name)
+
+        grid = ContributionGrid(axes, contribs, base, geo, method,
+                                file_fingerprint(self.predictor.model_path(model_name)))
+        grid.save(self.grid_path(model_name))
+        self._grids.pop(model_name, None)
+        print(f"✓ {model_name} grid: {total:,} rows in {time.time() - start_time:.0f}s → {self.grid_path(model_name)}")
+        return grid
+
+
+def parse_years(text):
+    if '-' in text:
+        first, last = text.split('-')
+        return list(range(int(first), int(last) + 1))
+    return [int(y) for y in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute explanation grids')
+    parser.add_argument('--models', default='XGBoost,Logistic_Regression',
+                        help='Comma-separated models (the networks and Random Forest are much slower)')
+    parser.add_argument('--models-dir', default='../db')
+    parser.add_argument('--years', default='1985-2025', help='Range "1985-2025" or list "2020,2021"')
+    parser.add_argument('--eventos', default='1', help='Comma-separated EVENTOS values to include')
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    from prediction.predictor import ModelPredictor
+
+    predictor = ModelPredictor(models_dir=args.models_dir, thread_profile='throughput')
+    explainer = Explainer(predictor)
+    eventos = [int(e) for e in args.eventos.split(',')]
+    for model_name in [m for m in args.models.split(',') if m]:
+        explainer.build_grid(model_name, parse_years(args.years), eventos, chunk_rows=args.chunk_rows)
+
+
+if __name__ == '__main__':
+    main()
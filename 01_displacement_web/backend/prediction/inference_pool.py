@@ -0,0 +1,362 @@
+"""
+Out-of-process inference workers
+
+A pool of long-lived worker processes, each holding its models resident. The
+web tier encodes inputs with its own ModelPredictor (encoders and scalers
+only) and ships the encoded arrays to an idle worker over a pipe; the worker
+runs the model and sends back probabilities. Keras/XGBoost thread pools and
+model loads therefore never compete with request handling.
+
+    pool = InferencePool(n_workers=2, preload=['XGBoost', 'Deep'])
+    result = pool.predict('XGBoost', cleaned_input)   # same dict as ModelPredictor.predict
+    result = pool.predict('Deep', cleaned_input, explain=True)  # explained in the worker
+    proba = pool.predict_batch('Deep', df)             # float64 array
+    pool.reload_models()                               # rolling hot reload from the manifest
+
+Backpressure: at most `max_pending` requests may be waiting for or using a
+worker; beyond that callers wait up to `queue_timeout` seconds and then get
+InferencePoolBusy. A health thread pings idle workers every `health_interval`
+seconds and restarts any that died or stopped answering; a worker that
+crashes mid-request is restarted in the background.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class InferencePoolBusy(RuntimeError):
+    """Every worker is busy and the pending queue is full"""
+
+
+class InferenceWorkerError(RuntimeError):
+    """A worker crashed, timed out or failed to run the model"""
+
+
+def _worker_main(conn, models_dir, preload):
+    """Worker process loop: load models once, then answer requests until 'stop'"""
+    # Imported here so the parent's TF state is never inherited (spawn context)
+    from prediction.predictor import ModelPredictor
+
+    predictor = ModelPredictor(models_dir=models_dir)
+    for model_name in preload:
+        try:
+            predictor.load_model(model_name)
+            elapsed_ms = predictor.warmup(model_name)
+            print(f"✓ Worker {os.getpid()}: {model_name} warmed up in {elapsed_ms:.0f} ms")
+        except Exception as e:
+            print(f"⚠ Worker {os.getpid()}: could not preload {model_name}: {e}")
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        op = message[0]
+        if op == 'ping':
+            conn.send(('pong', list(predictor.models)))
+        elif op == 'predict':
+            _, model_name, X, batch_size = message
+            try:
+                # Keep the model resident: no acquire/release in the worker
+                predictor.load_model(model_name)
+                model = predictor.models.get(model_name)
+                if model is None:
+                    raise ValueError(f"Model {model_name} not found")
+                start = time.perf_counter()
+                proba = predictor.predict_proba_encoded(model, model_name, X, batch_size=batch_size)
+                conn.send(('ok', (proba, (time.perf_counter() - start) * 1000)))
+            except Exception as e:
+                conn.send(('error', (type(e).__name__, str(e))))
+        elif op == 'predict_one':
+            # Raw input: explanations need the cleaned row, not the encoded arrays
+            _, model_name, input_data, explain = message
+            try:
+                predictor.pin_model(model_name)
+                model = predictor.models.get(model_name)
+                if model is None:
+                    raise ValueError(f"Model {model_name} not found")
+                conn.send(('ok', predictor.predict_with(model, model_name, input_data, explain=explain)))
+            except Exception as e:
+                conn.send(('error', (type(e).__name__, str(e))))
+        elif op == 'reload':
+            try:
+                conn.send(('ok', predictor.reload_models()))
+            except Exception as e:
+                conn.send(('error', (type(e).__name__, str(e))))
+        elif op == 'stop':
+            break
+
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn, pid):
+        self.process = process
+        self.conn = conn
+        self.pid = pid
+        self.started_at = time.time()
+        self.requests = 0
+        self.last_ping_ms = None
+
+
+class InferencePool:
+    def __init__(self, encoder, n_workers=2, preload=(), max_pending=32, queue_timeout=0.5,
+                 request_timeout=60.0, startup_timeout=300.0, health_interval=5.0):
+        """
+        encoder: ModelPredictor of the web process, used only for encode_batch
+        preload: models every worker loads at start (others load on first use)
+        """
+        self.encoder = encoder
+        self.models_dir = encoder.models_dir
+        self.n_workers = n_workers
+        self.preload = list(preload)
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+
+        self._ctx = mp.get_context('spawn')
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._idle = queue.Queue()
+        self._workers = [None] * n_workers
+        self._restarts = [0] * n_workers
+        self._stopped = threading.Event()
+
+        for index in range(n_workers):
+            self._workers[index] = self._spawn()
+            self._idle.put(index)
+
+        self._health_thread = threading.Thread(target=self._health_loop, name='inference-health', daemon=True)
+        self._health_thread.start()
+        print(f"✓ Inference pool started: {n_workers} workers, preload={self.preload}")
+
+    # -------------------------------------------------------------------------
+    # Worker lifecycle
+    # -------------------------------------------------------------------------
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.models_dir, self.preload),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(self.startup_timeout):
+            process.kill()
+            raise InferenceWorkerError(f"Worker did not start within {self.startup_timeout}s")
+        _, pid = parent_conn.recv()
+        return _Worker(process, parent_conn, pid)
+
+    def _kill(self, worker):
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+
+    def _restart(self, index):
+        """Replace the worker in slot `index` and hand the slot back to the idle queue"""
+        old = self._workers[index]
+        if old is not None:
+            self._kill(old)
+
+        while not self._stopped.is_set():
+            try:
+                self._workers[index] = self._spawn()
+                break
+            except Exception as e:
+                print(f"✗ Inference worker {index} failed to restart: {e}")
+                self._stopped.wait(self.health_interval)
+        else:
+            return
+
+        self._restarts[index] += 1
+        print(f"⚠ Inference worker {index} restarted (pid {self._workers[index].pid})")
+        self._idle.put(index)
+
+    def _restart_in_background(self, index):
+        threading.Thread(target=self._restart, args=(index,), daemon=True).start()
+
+    def _ping(self, worker):
+        start = time.perf_counter()
+        try:
+            worker.conn.send(('ping',))
+            if not worker.conn.poll(self.queue_timeout + 1.0):
+                return False
+            reply = worker.conn.recv()
+        except (EOFError, OSError):
+            return False
+        worker.last_ping_ms = (time.perf_counter() - start) * 1000
+        return reply[0] == 'pong'
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            # Only idle workers are pinged; busy ones report crashes through the request path
+            for _ in range(self.n_workers):
+                try:
+                    index = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+
+                worker = self._workers[index]
+                if worker.process.is_alive() and self._ping(worker):
+                    self._idle.put(index)
+                else:
+                    print(f"⚠ Inference worker {index} (pid {worker.pid}) failed health check")
+                    self._restart_in_background(index)
+
+    # -------------------------------------------------------------------------
+    # Inference
+    # -------------------------------------------------------------------------
+
+    def _call(self, message):
+        """Send one request to an idle worker and return its reply (caller holds _pending)"""
+        try:
+            index = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise InferencePoolBusy(f"No inference worker became available within {self.queue_timeout}s")
+
+        worker = self._workers[index]
+        try:
+            worker.conn.send(message)
+            if not worker.conn.poll(self.request_timeout):
+                raise TimeoutError(f"Worker {index} timed out after {self.request_timeout}s")
+            status, result = worker.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            self._restart_in_background(index)
+            raise InferenceWorkerError(f"Inference worker failed: {e}") from e
+
+        worker.requests += 1
+        self._idle.put(index)
+
+        if status == 'error':
+            error_type, text = result
+            if error_type == 'FileNotFoundError':
+                raise FileNotFoundError(text)
+            raise InferenceWorkerError(f"{error_type}: {text}")
+        return result
+
+    def predict_batch(self, model_name, df, batch_size=2048):
+        """Probability of class 1 for each row of a DataFrame of cleaned rows"""
+        if not self._pending.acquire(timeout=self.queue_timeout):
+            raise InferencePoolBusy("Inference queue is full")
+
+        try:
+            # Encoding stays in the web process so workers only run the model
+            X = self.encoder.encode_batch(model_name, df)
+            proba, _ = self._call(('predict', model_name, X, batch_size))
+        finally:
+            self._pending.release()
+
+        return np.asarray(proba, dtype='float64')
+
+    def predict_timed(self, model_name, input_data, explain=False):
+        """
+        (result, inference_ms): result as ModelPredictor.predict returns it,
+        inference_ms the worker's model call alone (no queueing or transfer).
+        With explain=True the worker also computes the explanation with the
+        model it already holds.
+        """
+        if not self._pending.acquire(timeout=self.queue_timeout):
+            raise InferencePoolBusy("Inference queue is full")
+        try:
+            if explain:
+                return self._call(('predict_one', model_name, dict(input_data), True))
+            X = self.encoder.encode_batch(model_name, pd.DataFrame([input_data]))
+            proba, inference_ms = self._call(('predict', model_name, X, 1))
+        finally:
+            self._pending.release()
+
+        proba = float(proba[0])
+        return {'prediction': 1 if proba >= 0.5 else 0, 'probability': proba}, inference_ms
+
+    def predict(self, model_name, input_data, explain=False):
+        """Single-row prediction with the same return shape as ModelPredictor.predict"""
+        return self.predict_timed(model_name, input_data, explain=explain)[0]
+
+    def reload_models(self, timeout=None):
+        """
+        Rolling model reload: workers take turns re-reading the manifest and
+        swapping changed models (ModelPredictor.reload_models) while the
+        others keep serving. Returns {worker index: result}; workers that are
+        not idle within `timeout` seconds (default startup_timeout) are
+        reported as 'timeout' and keep their current models.
+        """
+        timeout = self.startup_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        results = {}
+        pending = set(range(self.n_workers))
+        while pending and not self._stopped.is_set():
+            try:
+                index = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                for index in sorted(pending):
+                    print(f"⚠ Inference worker {index} did not become idle for reload within {timeout}s")
+                    results[index] = {'status': 'timeout', 'error': f"Worker {index} not idle within {timeout}s"}
+                break
+            if index not in pending:
+                # Already reloaded: back of the queue, wait for another worker
+                self._idle.put(index)
+                time.sleep(0.01)
+                continue
+
+            pending.discard(index)
+            worker = self._workers[index]
+            try:
+                worker.conn.send(('reload',))
+                if not worker.conn.poll(self.startup_timeout):
+                    raise TimeoutError(f"Worker {index} did not reload within {self.startup_timeout}s")
+                status, result = worker.conn.recv()
+            except (EOFError, OSError, TimeoutError) as e:
+                # A restarted worker reads the current manifest when it starts
+                self._restart_in_background(index)
+                results[index] = {'status': 'restarted', 'error': str(e)}
+                continue
+
+            self._idle.put(index)
+            results[index] = result if status == 'ok' else {'status': 'failed', 'error': result[1]}
+        return results
+
+    def status(self):
+        workers = []
+        for index, worker in enumerate(self._workers):
+            workers.append({
+                'index': index,
+                'pid': worker.pid if worker else None,
+                'alive': bool(worker and worker.process.is_alive()),
+                'requests': worker.requests if worker else 0,
+                'restarts': self._restarts[index],
+                'uptime_s': round(time.time() - worker.started_at, 1) if worker else 0,
+                'last_ping_ms': round(worker.last_ping_ms, 2) if worker and worker.last_ping_ms else None
+            })
+        return {
+            'workers': workers,
+            'idle': self._idle.qsize(),
+            'preload': self.preload
+        }
+
+    def shutdown(self):
+        self._stopped.set()
+        for worker in self._workers:
+            if worker is None:
+                continue
+            try:
+                worker.conn.send(('stop',))
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            self._kill(worker)
+        print("✓ Inference pool stopped")
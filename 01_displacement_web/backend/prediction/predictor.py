@@ -1,10 +1,22 @@
+from prediction.threading_config import configure_environment, resolve_profile, apply_runtime
+
+# Must run before numpy/TF/XGBoost create their thread pools
+configure_environment()
+
+import os
+
 import joblib
 import numpy as np
 import pandas as pd
 import keras
-import os
+import threading
+import time
+import copy
+import weakref
 import tensorflow as tf
 
+from prediction.registry import ModelRegistry
+
 @keras.saving.register_keras_serializable()
 def focal_loss_fixed(gamma=2.0, alpha=0.25):
     def focal_loss_fn(y_true, y_pred):
@@ -21,34 +33,70 @@ def focal_loss_fixed(gamma=2.0, alpha=0.25):
     
     return focal_loss_fn
 
+# A valid cleaned input, used to warm models before they serve requests
+WARMUP_INPUT = {
+    'ESTADO_DEPTO': 'Antioquia',
+    'SEXO': 'Mujer',
+    'ETNIA': 'Ninguna',
+    'DISCAPACIDAD': 'Ninguna',
+    'CICLO_VITAL': 'entre 29 y 59',
+    'VIGENCIA': 2020,
+    'EVENTOS': 1,
+    'km_norte_sur': 171.0,
+    'km_este_oeste': -165.0,
+    'distancia_total': 238.0
+}
+
+# Rows in the synthetic batch of warmup() (traces the batched predict path)
+WARMUP_BATCH_ROWS = 32
+
+# Manifest preprocessing files held in memory by load_encoders_scalers
+PREPROCESSING_FILES = {'classic': ('encoders', 'scalers'), 'nn': ('encoders', 'scalers', 'embedding_info')}
+
 class ModelPredictor:
-    def __init__(self, models_dir='../db'):
+    def __init__(self, models_dir='../db', thread_profile=None, registry=None):
         self.models_dir = models_dir
+        # Model files, formats, families and metrics come from db/model_manifest.json
+        self.registry = registry or ModelRegistry(models_dir)
         self.models = {}
         self.encoders = {}
         self.scalers = {}
+        # Models are shared between request threads: count users so one thread
+        # never unloads a model another thread is still predicting with
+        self._lock = threading.Lock()
+        self._model_refs = {}
+        self._pinned = set()
+        # One lock per model name for loading: _lock is never held during a
+        # load, so a cold model never blocks requests for the others
+        self._loading = {}
+        # Threading: TF/BLAS pools are process-wide, XGBoost nthread per model copy
+        self.threading = resolve_profile(thread_profile)
+        apply_runtime(self.threading)
+        # XGBoost copies with nthread fixed, one per thread count (see xgb_model)
+        self._xgb_lock = threading.Lock()
+        self._xgb_copies = weakref.WeakKeyDictionary()
+        self.explainer = None
+        self.counterfactual_search = None
+        # Shadow scorer (prediction/shadow.py), started on the first sampled request
+        self.shadow = None
+        self._shadow_lock = threading.Lock()
         # Don't load models on init - load them on demand
         self.load_encoders_scalers()
     
     def load_encoders_scalers(self):
         """Load only encoders and scalers (lightweight)"""
-        classic_path = os.path.join(self.models_dir, '02a_classical_models/saved_models')
-        nn_path = os.path.join(self.models_dir, '02b_neural_networks/saved_models')
+        path = self.registry.preprocessing_path
         
         try:
             # Load encoders and scalers for classical models
-            self.encoders['classic'] = joblib.load(
-                os.path.join(classic_path, 'categorical_encoders.pkl'))
-            self.scalers['classic'] = joblib.load(
-                os.path.join(classic_path, 'numeric_scalers.pkl'))
+            self.encoders['classic'] = joblib.load(path('classic', 'encoders'))
+            self.scalers['classic'] = joblib.load(path('classic', 'scalers'))
             
             # Load encoders and scalers for neural networks
-            self.encoders['nn'] = joblib.load(
-                os.path.join(nn_path, 'categorical_encoders.pkl'))
-            self.scalers['nn'] = joblib.load(
-                os.path.join(nn_path, 'numeric_scalers.pkl'))
-            self.embedding_info = joblib.load(
-                os.path.join(nn_path, 'embedding_info.pkl'))
+            self.encoders['nn'] = joblib.load(path('nn', 'encoders'))
+            self.scalers['nn'] = joblib.load(path('nn', 'scalers'))
+            self.embedding_info = joblib.load(path('nn', 'embedding_info'))
+            self._preprocessing_identity = self.preprocessing_identity(self.registry.preprocessing)
             
             print("✓ Encoders and scalers loaded successfully")
         except Exception as e:
@@ -60,34 +108,15 @@ class ModelPredictor:
         if model_name in self.models:
             return  # Already loaded
         
-        classic_path = os.path.join(self.models_dir, '02a_classical_models/saved_models')
-        nn_path = os.path.join(self.models_dir, '02b_neural_networks/saved_models')
-        
+        self.models[model_name] = self.read_model(model_name)
+    
+    def read_model(self, model_name):
+        """Load a model from disk and return it (not added to self.models)"""
+        spec = self.registry.spec(model_name)
         try:
-            if model_name == 'Logistic_Regression':
-                self.models[model_name] = joblib.load(
-                    os.path.join(classic_path, 'Logistic_Regression_best_model.pkl'))
-                print(f"✓ {model_name} loaded")
-            
-            elif model_name == 'Random_Forest':
-                self.models[model_name] = joblib.load(
-                    os.path.join(classic_path, 'Random_Forest_best_model.pkl'))
-                print(f"✓ {model_name} loaded")
-            
-            elif model_name == 'XGBoost':
-                self.models[model_name] = joblib.load(
-                    os.path.join(classic_path, 'XGBoost_best_model.pkl'))
-                print(f"✓ {model_name} loaded")
-            
-            elif model_name == 'ResNet_Style':
-                self.models[model_name] = keras.models.load_model(
-                    os.path.join(nn_path, 'ResNet_Style_best_model.keras'))
-                print(f"✓ {model_name} loaded")
-            
-            elif model_name == 'Deep':
-                self.models[model_name] = keras.models.load_model(
-                    os.path.join(nn_path, 'Deep_best_model.keras'))
-                print(f"✓ {model_name} loaded")
+            model = self.registry.load(spec)
+            print(f"✓ {model_name} v{spec.version} loaded")
+            return model
             
         except FileNotFoundError:
             if model_name == 'Random_Forest':
@@ -98,12 +127,204 @@ class ModelPredictor:
             print(f"Error loading {model_name}: {e}")
             raise
     
+    def model_path(self, model_name):
+        return self.registry.path(model_name)
+    
+    def available_models(self):
+        """Models whose file is present (checked on disk, nothing is loaded)"""
+        return self.registry.available()
+    
+    def is_classic(self, model_name):
+        return self.registry.family(model_name) == 'classic'
+    
+    def warm_model(self, model, family):
+        """One prediction on WARMUP_INPUT (builds TF graphs, touches every page of the model)"""
+        df = pd.DataFrame([WARMUP_INPUT])
+        if family == 'classic':
+            proba = self.classic_proba(model, self.preprocess_classic_batch(df))
+        else:
+            X = self.preprocess_nn_batch(df)
+            proba = np.asarray(model(X, training=False)).reshape(-1)
+        if not np.all(np.isfinite(proba)):
+            raise ValueError("warm-up prediction is not finite")
+    
+    def preprocessing_identity(self, preprocessing):
+        """Path, size and mtime of every encoder/scaler file a manifest section points to"""
+        identity = {}
+        for family, keys in PREPROCESSING_FILES.items():
+            for key in keys:
+                path = os.path.join(self.models_dir, preprocessing[family][key])
+                st = os.stat(path) if os.path.exists(path) else None
+                identity[family, key] = (path, st and st.st_size, st and st.st_mtime_ns)
+        return identity
+    
+    def reload_models(self):
+        """
+        Re-read the manifest and swap in every model whose entry changed.
+        
+        Each changed model is verified (size, sha256), loaded and warmed
+        without holding the lock; only the swap itself is locked, so
+        predictions never wait on a load. A resident model is replaced in
+        place (in-flight predictions finish on the object they acquired);
+        on-demand models pick up the new artifact on their next load. A
+        model that fails any step keeps its current version.
+        
+        Encoders and scalers are not hot-swapped: models and their
+        preprocessing would change at different moments under live traffic.
+        A manifest whose preprocessing files differ from the ones in memory
+        (other paths, or the same files rewritten) is refused with a
+        ValueError; that needs a restart.
+        
+        Returns {model_name: {'status': 'swapped' | 'failed', ...}}.
+        """
+        manifest = self.registry.read()
+        if self.preprocessing_identity(manifest['preprocessing']) != self._preprocessing_identity:
+            raise ValueError("Encoder/scaler files changed since startup: restart to load them with their models")
+        results, failed = {}, []
+        
+        for model_name in self.registry.changed(manifest):
+            spec = manifest['specs'][model_name]
+            try:
+                self.registry.verify(spec)
+                model = self.registry.load(spec)
+                self.warm_model(model, spec.family)
+            except Exception as e:
+                print(f"✗ {model_name} v{spec.version} not swapped: {e}")
+                failed.append(model_name)
+                results[model_name] = {'status': 'failed', 'version': spec.version, 'error': str(e)}
+                continue
+            
+            with self._lock:
+                self.registry.replace(spec)
+                if model_name in self.models:
+                    self.models[model_name] = model
+            del model
+            if self.explainer is not None:
+                self.explainer.invalidate(model_name)
+            results[model_name] = {'status': 'swapped', 'version': spec.version}
+            print(f"✓ {model_name} v{spec.version} swapped in")
+        
+        # Metadata-only changes (display names, metrics, new unavailable entries)
+        with self._lock:
+            self.registry.install(manifest, keep=failed)
+        return results
+    
     def unload_model(self, model_name):
         """Unload a model to free memory"""
         if model_name in self.models:
             del self.models[model_name]
             print(f"✓ {model_name} unloaded from memory")
     
+    def pin_model(self, model_name):
+        """Load a model and keep it resident: the pin is a reference release_model never drops"""
+        self.acquire_model(model_name)
+        with self._lock:
+            if model_name in self._pinned:
+                self._model_refs[model_name] -= 1
+            else:
+                self._pinned.add(model_name)
+    
+    def warm_encoders(self, family):
+        """Encode WARMUP_INPUT with the family's encoders and scalers (single-row and batch paths)"""
+        df = pd.DataFrame([WARMUP_INPUT] * WARMUP_BATCH_ROWS)
+        if family == 'classic':
+            self.preprocess_classic(WARMUP_INPUT)
+            self.preprocess_classic_batch(df)
+        else:
+            self.preprocess_nn(WARMUP_INPUT)
+            self.preprocess_nn_batch(df)
+    
+    def warmup(self, model_name):
+        """
+        Run a resident model once through the single-row path (predict) and
+        once through the batched path (predict_batch / inference pool) so TF
+        tracing, XGBoost setup and encoder code paths run before real traffic.
+        Returns the elapsed milliseconds.
+        """
+        model = self.models[model_name]
+        start = time.perf_counter()
+        
+        if self.is_classic(model_name):
+            X = self.preprocess_classic(WARMUP_INPUT)
+            self.classic_proba(self.xgb_model(model, model_name, 1), X)
+        else:
+            model(self.preprocess_nn(WARMUP_INPUT), training=False)
+        
+        df = pd.DataFrame([WARMUP_INPUT] * WARMUP_BATCH_ROWS)
+        proba = self.predict_proba_encoded(model, model_name, self.encode_batch(model_name, df))
+        if not np.all(np.isfinite(proba)):
+            raise ValueError(f"{model_name} warm-up prediction is not finite")
+        
+        return (time.perf_counter() - start) * 1000
+    
+    def acquire_model(self, model_name):
+        """
+        Load (if needed) and pin a model for the duration of one prediction.
+        
+        _lock only guards the cache and the reference counts. The load itself
+        runs under the model's own lock: concurrent requests for a cold model
+        wait for one load, requests for resident models don't wait at all.
+        """
+        with self._lock:
+            model = self._add_ref(model_name)
+            if model is not None:
+                return model
+            loading = self._loading.setdefault(model_name, threading.Lock())
+        
+        with loading:
+            with self._lock:
+                model = self._add_ref(model_name)
+                if model is not None:
+                    return model
+            model = self.read_model(model_name)
+            with self._lock:
+                self.models[model_name] = model
+                return self._add_ref(model_name)
+    
+    def _add_ref(self, model_name):
+        """Resident model with one more reference, or None (call with _lock held)"""
+        model = self.models.get(model_name)
+        if model is not None:
+            self._model_refs[model_name] = self._model_refs.get(model_name, 0) + 1
+        return model
+    
+    def release_model(self, model_name):
+        """Unload the model once no prediction is using it"""
+        with self._lock:
+            refs = self._model_refs.get(model_name, 0) - 1
+            if refs > 0:
+                self._model_refs[model_name] = refs
+                return
+            self._model_refs.pop(model_name, None)
+            self.unload_model(model_name)
+    
+    def xgb_model(self, model, model_name, n_rows):
+        """
+        The model to call for n_rows: for XGBoost, a copy with nthread set for
+        single rows (single-threaded) or batches (the profile's batch count).
+        
+        Each copy is configured once when it is made and never changed, so
+        single-row and batch calls run concurrently without a lock. Copies
+        are keyed by the loaded model and go away with it on unload or swap.
+        Other models are returned as they are.
+        """
+        if model_name != 'XGBoost' or not (hasattr(model, 'set_params') or hasattr(model, 'set_param')):
+            return model
+        
+        nthread = self.threading['xgb_single'] if n_rows == 1 else self.threading['xgb_batch']
+        copies = self._xgb_copies.get(model)
+        if copies is None or nthread not in copies:
+            with self._xgb_lock:
+                copies = self._xgb_copies.setdefault(model, {})
+                if nthread not in copies:
+                    configured = copy.deepcopy(model)
+                    if hasattr(configured, 'set_params'):
+                        configured.set_params(n_jobs=nthread)
+                    else:
+                        configured.set_param('nthread', nthread)
+                    copies[nthread] = configured
+        return copies[nthread]
+    
     def preprocess_classic(self, input_data):
         categorical_cols = ['SEXO', 'ETNIA', 'CICLO_VITAL', 'DISCAPACIDAD', 'ESTADO_DEPTO']
         numeric_cols = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
@@ -166,34 +387,195 @@ class ModelPredictor:
         
         return inputs
     
-    def predict(self, model_name, input_data):
-        # Load model on demand
-        self.load_model(model_name)
+    def preprocess_classic_batch(self, df):
+        """Vectorized preprocess_classic for a DataFrame of already-cleaned rows"""
+        categorical_cols = ['SEXO', 'ETNIA', 'CICLO_VITAL', 'DISCAPACIDAD', 'ESTADO_DEPTO']
+        numeric_cols = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
         
-        model = self.models.get(model_name)
+        X_cat_parts = []
+        encoders = self.encoders['classic']
+        
+        if 'onehot' in encoders:
+            enc = encoders['onehot']
+            onehot_cols = [col for col in categorical_cols if col in enc.feature_names_in_]
+            if onehot_cols:
+                X_cat_encoded = enc.transform(df[onehot_cols].astype(str))
+                X_cat_parts.append(pd.DataFrame(X_cat_encoded, columns=enc.get_feature_names_out()))
+        
+        if 'ordinal' in encoders:
+            enc = encoders['ordinal']
+            ordinal_cols = [col for col in categorical_cols if col in enc.feature_names_in_]
+            if ordinal_cols:
+                X_cat_encoded = enc.transform(df[ordinal_cols].astype(str))
+                X_cat_parts.append(pd.DataFrame(X_cat_encoded, columns=ordinal_cols))
+        
+        X_numeric = pd.DataFrame(df[numeric_cols].to_numpy(dtype='float64'), columns=numeric_cols)
+        
+        for col in numeric_cols:
+            if col in self.scalers['classic']:
+                scaler = self.scalers['classic'][col]
+                X_numeric[col] = scaler.transform(X_numeric[[col]]).ravel()
+        
+        return pd.concat(X_cat_parts + [X_numeric], axis=1)
+    
+    def preprocess_nn_batch(self, df):
+        """Vectorized preprocess_nn for a DataFrame of already-cleaned rows"""
+        categorical_cols = ['SEXO', 'ETNIA', 'CICLO_VITAL', 'DISCAPACIDAD', 'ESTADO_DEPTO']
+        numeric_cols = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
+        
+        X_cat = []
+        encoders = self.encoders['nn']
+        
+        for col in categorical_cols:
+            if col in encoders:
+                enc = encoders[col]
+                X_cat.append(enc.transform(df[[col]].astype(str)).astype('int32').flatten())
+        
+        X_num = df[numeric_cols].to_numpy(dtype='float32', copy=True)
+        
+        for idx, col in enumerate(numeric_cols):
+            if col in self.scalers['nn']:
+                scaler = self.scalers['nn'][col]
+                X_num[:, idx] = scaler.transform(X_num[:, [idx]]).flatten()
+        
+        return X_cat + [X_num]
+    
+    def encode_batch(self, model_name, df):
+        """Encoded model inputs for a DataFrame of cleaned rows (no model needed)"""
+        if self.is_classic(model_name):
+            return self.preprocess_classic_batch(df)
+        return self.preprocess_nn_batch(df)
+    
+    def classic_proba(self, model, X):
+        """Probability of class 1 from a classic model for encoded rows X"""
+        if hasattr(model, 'predict_proba'):
+            proba = model.predict_proba(X)[:, 1]
+        elif hasattr(model, 'inplace_predict'):
+            # Raw xgboost Booster written by training.out_of_core (binary:logistic: already probabilities)
+            proba = model.inplace_predict(X)
+        else:
+            proba = model.predict(X)
+        return np.asarray(proba, dtype='float64')
+    
+    def predict_proba_encoded(self, model, model_name, X, batch_size=2048):
+        """Probability of class 1 for inputs produced by encode_batch"""
+        if self.is_classic(model_name):
+            proba = self.classic_proba(self.xgb_model(model, model_name, len(X)), X)
+        else:
+            proba = model.predict(X, batch_size=batch_size, verbose=0).reshape(-1)
+        
+        return np.asarray(proba, dtype='float64')
+    
+    def predict_batch(self, model_name, df, batch_size=2048):
+        """
+        Score a DataFrame of cleaned rows in one vectorized pass.
+        
+        Returns a float64 array with the probability of class 1 per row.
+        """
+        model = self.acquire_model(model_name)
         
         if not model:
             raise ValueError(f"Model {model_name} not found")
         
-        if model_name in ['Logistic_Regression', 'Random_Forest', 'XGBoost']:
+        try:
+            X = self.encode_batch(model_name, df)
+            return self.predict_proba_encoded(model, model_name, X, batch_size=batch_size)
+        finally:
+            self.release_model(model_name)
+    
+    def predict_with(self, model, model_name, input_data, explain=False):
+        """
+        Single-row prediction with a model the caller already holds (predict,
+        or a pool worker's resident model). With explain=True the result also
+        carries 'explanation', computed with the same model.
+        
+        Returns (result, inference_ms): the time of the model call alone, no
+        load, encoding or explanation (the primary latency of shadow scoring).
+        """
+        if self.is_classic(model_name):
             X = self.preprocess_classic(input_data)
-            
-            if hasattr(model, 'predict_proba'):
-                proba = model.predict_proba(X)[0][1]
-            else:
-                proba = float(model.predict(X)[0])
+            start = time.perf_counter()
+            proba = float(self.classic_proba(self.xgb_model(model, model_name, 1), X)[0])
+            inference_ms = (time.perf_counter() - start) * 1000
             
             pred = 1 if proba >= 0.5 else 0
             
         else:
             X = self.preprocess_nn(input_data)
-            proba = float(model.predict(X, verbose=0)[0][0])
+            start = time.perf_counter()
+            # Direct call: model.predict builds a tf.data pipeline and
+            # dispatches through the inter-op pool, which dominates for one row
+            proba = float(np.asarray(model(X, training=False))[0][0])
+            inference_ms = (time.perf_counter() - start) * 1000
             pred = 1 if proba >= 0.5 else 0
         
-        # Unload model after prediction to free memory
-        self.unload_model(model_name)
-        
-        return {
+        result = {
             'prediction': int(pred),
             'probability': float(proba)
-        }
\ No newline at end of file
+        }
+        if explain:
+            try:
+                result['explanation'] = self.explain(model_name, input_data, model)
+            except Exception as e:
+                # An explanation failure must never fail the prediction itself
+                print(f"⚠ Explanation failed for {model_name}: {e}")
+                result['explanation'] = None
+        return result, inference_ms
+    
+    def predict(self, model_name, input_data, explain=False):
+        # Load model on demand
+        model = self.acquire_model(model_name)
+        
+        if not model:
+            raise ValueError(f"Model {model_name} not found")
+        
+        try:
+            result, inference_ms = self.predict_with(model, model_name, input_data, explain=explain)
+        finally:
+            # Unload model after prediction to free memory
+            self.release_model(model_name)
+        
+        self.observe_shadow(model_name, input_data, result, inference_ms)
+        return result
+    
+    def observe_shadow(self, model_name, input_data, result, latency_ms):
+        """Hand an answered request to the shadow scorer when its model has a candidate"""
+        if model_name not in self.registry.shadow:
+            return
+        if self.shadow is None:
+            with self._shadow_lock:
+                if self.shadow is None:
+                    from prediction.shadow import ShadowScorer
+                    self.shadow = ShadowScorer(self)
+        self.shadow.observe(model_name, input_data, result, latency_ms)
+    
+    def explain(self, model_name, input_data, model=None):
+        """Per-feature contributions for one cleaned input (see prediction/explainer.py)"""
+        if self.explainer is None:
+            from prediction.explainer import Explainer
+            self.explainer = Explainer(self)
+        return self.explainer.explain(model_name, input_data, model)
+    
+    def counterfactuals(self, model_name, input_data, score_batch=None, **options):
+        """
+        Minimal changes that flip the prediction (see prediction/counterfactual.py).
+        
+        score_batch(model_name, df) defaults to this predictor, with the model
+        held for the whole search.
+        """
+        if self.counterfactual_search is None:
+            from prediction.counterfactual import CounterfactualSearch
+            self.counterfactual_search = CounterfactualSearch(self)
+        
+        if score_batch is not None:
+            return self.counterfactual_search.search(
+                model_name, input_data, lambda df: score_batch(model_name, df), **options)
+        
+        model = self.acquire_model(model_name)
+        if not model:
+            raise ValueError(f"Model {model_name} not found")
+        try:
+            score = lambda df: self.predict_proba_encoded(model, model_name, self.encode_batch(model_name, df))
+            return self.counterfactual_search.search(model_name, input_data, score, **options)
+        finally:
+            self.release_model(model_name)
@@ -0,0 +1,269 @@
+"""
+Model registry backed by db/model_manifest.json
+
+The manifest declares, per model, its artifact path (relative to models_dir),
+format (joblib/keras), preprocessing family (classic/nn), size, sha256,
+version, display name and metrics; it also lists the encoder/scaler files of
+each family and the artifacts that ship but are not served (pca_model.pkl).
+Loading, /api/models and the chatbot metrics all read from here.
+
+An optional `shadow` section maps a served model to a candidate entry (same
+fields, plus `sample_rate`) that ModelPredictor scores in the background on
+a sample of live requests, see prediction/shadow.py.
+
+Hot reload (ModelPredictor.reload_models): write the new artifact under a new
+file name, update its manifest entry (`stamp` recomputes size and checksum and
+bumps the version), then POST /api/admin/models/reload. Changed models are
+verified, loaded and warmed in the background and swapped in atomically;
+requests keep using the old version until the swap.
+
+    python -m prediction.registry list
+    python -m prediction.registry verify
+    python -m prediction.registry stamp --models XGBoost
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_NAME = 'model_manifest.json'
+FORMATS = ('joblib', 'keras')
+FAMILIES = ('classic', 'nn')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelSpec:
+    def __init__(self, name, entry):
+        self.name = name
+        self.display = entry.get('display', name)
+        self.version = str(entry.get('version', '1'))
+        self.artifact = entry['artifact']
+        self.format = entry['format']
+        self.family = entry['family']
+        self.size_bytes = entry.get('size_bytes')
+        self.sha256 = entry.get('sha256')
+        self.metrics = entry.get('metrics', {})
+
+        if self.format not in FORMATS:
+            raise ValueError(f"{name}: unknown format '{self.format}' (expected one of {FORMATS})")
+        if self.family not in FAMILIES:
+            raise ValueError(f"{name}: unknown family '{self.family}' (expected one of {FAMILIES})")
+
+    def identity(self):
+        """What must change for a reload to swap the model"""
+        return self.version, self.artifact, self.sha256
+
+
+class ModelRegistry:
+    def __init__(self, models_dir='../db', manifest_path=None):
+        self.models_dir = models_dir
+        self.manifest_path = manifest_path or os.environ.get('MODEL_MANIFEST') or os.path.join(models_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.manifest_version = None
+        self.preprocessing = {}
+        self.unused_artifacts = {}
+        self.shadow = {}
+        # Replaced as a whole (never mutated), so readers need no lock
+        self._specs = {}
+        self.install(self.read())
+
+    # =========================================================================
+    # Manifest
+    # =========================================================================
+
+    def read(self):
+        """Parse and check the manifest on disk without installing it"""
+        with open(self.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        specs = {name: ModelSpec(name, entry) for name, entry in manifest['models'].items()}
+        for family in FAMILIES:
+            if family not in manifest.get('preprocessing', {}):
+                raise ValueError(f"Manifest has no preprocessing files for family '{family}'")
+        shadow = {}
+        for name, entry in manifest.get('shadow', {}).items():
+            if name not in specs:
+                raise ValueError(f"Shadow candidate for unknown model '{name}'")
+            shadow[name] = (ModelSpec(name, entry), entry.get('sample_rate'))
+        return {
+            'manifest_version': manifest.get('manifest_version'),
+            'preprocessing': manifest['preprocessing'],
+            'unused_artifacts': manifest.get('unused_artifacts', {}),
+            'specs': specs,
+            'shadow': shadow
+        }
+
+    def install(self, manifest, keep=()):
+        """Make `manifest` current; models in `keep` stay on their current spec"""
+        with self._lock:
+            specs = dict(manifest['specs'])
+            for name in keep:
+                if name in self._specs:
+                    specs[name] = self._specs[name]
+            self.manifest_version = manifest['manifest_version']
+            self.preprocessing = manifest['preprocessing']
+            self.unused_artifacts = manifest['unused_artifacts']
+            self.shadow = manifest['shadow']
+            self._specs = specs
+
+    def replace(self, spec):
+        """Make `spec` current for its model only"""
+        with self._lock:
+            self._specs = {**self._specs, spec.name: spec}
+
+    def changed(self, manifest):
+        """Models of `manifest` that are new or differ from the installed spec"""
+        current = self._specs
+        return [name for name, spec in manifest['specs'].items()
+                if name not in current or current[name].identity() != spec.identity()]
+
+    # =========================================================================
+    # Lookups
+    # =========================================================================
+
+    def names(self):
+        return list(self._specs)
+
+    def spec(self, model_name):
+        spec = self._specs.get(model_name)
+        if spec is None:
+            raise KeyError(f"Model {model_name} is not in the manifest")
+        return spec
+
+    def path(self, model_name, spec=None):
+        spec = spec or self.spec(model_name)
+        return os.path.join(self.models_dir, spec.artifact)
+
+    def preprocessing_path(self, family, key):
+        return os.path.join(self.models_dir, self.preprocessing[family][key])
+
+    def family(self, model_name):
+        return self.spec(model_name).family
+
+    def metrics(self, model_name):
+        spec = self._specs.get(model_name)
+        return dict(spec.metrics) if spec else {}
+
+    def available(self):
+        """Models whose artifact is present (checked on disk, nothing is loaded)"""
+        return [name for name, spec in self._specs.items() if os.path.exists(self.path(name, spec))]
+
+    def listing(self):
+        """Public model list for /api/models"""
+        available = set(self.available())
+        return [{
+            'name': spec.name,
+            'display': spec.display,
+            'version': spec.version,
+            'available': spec.name in available
+        } for spec in self._specs.values()]
+
+    # =========================================================================
+    # Artifacts
+    # =========================================================================
+
+    def verify(self, spec):
+        """Raise if the artifact is missing or its size/checksum differ from the manifest"""
+        path = self.path(spec.name, spec)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{spec.name} model file not found: {path}")
+        if spec.size_bytes is not None and os.path.getsize(path) != spec.size_bytes:
+            raise ValueError(f"{spec.name}: size {os.path.getsize(path)} != manifest {spec.size_bytes}")
+        if spec.sha256 and file_sha256(path) != spec.sha256:
+            raise ValueError(f"{spec.name}: checksum does not match the manifest")
+
+    def load(self, spec):
+        path = self.path(spec.name, spec)
+        if spec.format == 'keras':
+            import keras
+            return keras.models.load_model(path)
+        import joblib
+        return joblib.load(path)
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def write_manifest(manifest_path, manifest):
+    """Atomic rewrite: a concurrent reload never reads a half-written manifest"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, manifest_path)
+
+
+def stamp(manifest_path, models_dir, names):
+    """Recompute size/sha256 of the given models; bump the version when the checksum changed"""
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    for name in names:
+        entry = manifest['models'][name]
+        path = os.path.join(models_dir, entry['artifact'])
+        if not os.path.exists(path):
+            print(f"⚠ {name}: {path} not found, skipped")
+            continue
+        checksum = file_sha256(path)
+        if checksum == entry.get('sha256'):
+            print(f"✓ {name}: unchanged")
+            continue
+
+        version = str(entry.get('version', '1'))
+        if entry.get('sha256') and version.isdigit():
+            version = str(int(version) + 1)
+        entry.update(version=version, sha256=checksum, size_bytes=os.path.getsize(path))
+        print(f"✓ {name}: version {version}, sha256 {checksum[:12]}…")
+
+    write_manifest(manifest_path, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and update the model manifest')
+    parser.add_argument('command', choices=['list', 'verify', 'stamp'])
+    parser.add_argument('--models-dir', default='../db')
+    parser.add_argument('--manifest', default=None)
+    parser.add_argument('--models', default=None, help='Comma-separated model names (default: all)')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.models_dir, args.manifest)
+    names = args.models.split(',') if args.models else registry.names()
+
+    if args.command == 'list':
+        for entry in registry.listing():
+            spec = registry.spec(entry['name'])
+            status = '✓' if entry['available'] else '✗'
+            print(f"{status} {spec.name:20s} v{spec.version:4s} {spec.family:8s} {spec.format:7s} {spec.artifact}")
+        for name, (spec, rate) in registry.shadow.items():
+            print(f"  (shadow) {name:20s} v{spec.version:4s} {spec.family:8s} {spec.format:7s} {spec.artifact}"
+                  f" sample_rate={rate}")
+        for path, entry in registry.unused_artifacts.items():
+            print(f"  (unused) {path}: {entry.get('note', '')}")
+
+    elif args.command == 'verify':
+        failures = 0
+        for name in names:
+            try:
+                registry.verify(registry.spec(name))
+                print(f"✓ {name}")
+            except Exception as e:
+                failures += 1
+                print(f"✗ {name}: {e}")
+        raise SystemExit(1 if failures else 0)
+
+    elif args.command == 'stamp':
+        stamp(registry.manifest_path, args.models_dir, names)
+
+
+if __name__ == '__main__':
+    main()
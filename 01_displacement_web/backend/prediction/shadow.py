@@ -0,0 +1,319 @@
+"""
+Shadow scoring: compare a candidate model with the served one on live traffic
+
+A candidate is declared in the `shadow` section of db/model_manifest.json,
+keyed by the served model it shadows:
+
+    "shadow": {
+      "XGBoost": {"artifact": "02a_classical_models/saved_models/XGBoost_compact.pkl",
+                  "format": "joblib", "family": "classic", "version": "2",
+                  "sha256": "...", "sample_rate": 0.2}
+    }
+
+After a prediction has been answered, ShadowScorer.observe draws the request
+with probability sample_rate (default SHADOW_SAMPLE_RATE) and puts it on a
+bounded queue without waiting: when the queue is full the sample is dropped
+and counted, so load never reaches the request path. One background thread
+drains the queue in batches, scores each batch with the candidate in one
+vectorized call (the candidate stays resident in the scorer, outside the
+predictor's load/unload cycle) and:
+
+- appends one JSON line per request to <log_dir>/<model>/<YYYY-MM-DD>.jsonl
+  (input, both probabilities, delta, agreement, both latencies);
+- updates running aggregates, written every SHADOW_FLUSH_S seconds to
+  <log_dir>/summary_<pid>.json: agreement rate, mean / mean absolute / p95
+  absolute delta and p50/p95 latency of both models over a recent window.
+  Every web worker process writes its own file; read_summaries merges them.
+
+Latencies are of the model call alone: the primary's comes from
+ModelPredictor.predict_with (or the pool worker), never including model
+load/unload, encoding or an explanation.
+
+Responses are never affected: a candidate that fails to load or score is
+logged and its samples are dropped.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LOG_DIR = os.environ.get('SHADOW_LOG_DIR', '../db/shadow')
+SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1'))
+QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '1000'))
+FLUSH_S = float(os.environ.get('SHADOW_FLUSH_S', '60'))
+
+BATCH_ROWS = 256
+# Recent samples kept per model for percentiles
+WINDOW = 10_000
+THRESHOLD = 0.5
+
+
+class ShadowStats:
+    """Running aggregates for one (model, candidate version)"""
+
+    def __init__(self, primary_version, candidate_version):
+        self.primary_version = primary_version
+        self.candidate_version = candidate_version
+        self.scored = 0
+        self.agreed = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.abs_deltas = deque(maxlen=WINDOW)
+        self.primary_ms = deque(maxlen=WINDOW)
+        self.candidate_ms = deque(maxlen=WINDOW)
+
+    def add(self, primary, candidate, primary_ms, candidate_ms):
+        delta = candidate - primary
+        self.scored += len(delta)
+        self.agreed += int(((primary >= THRESHOLD) == (candidate >= THRESHOLD)).sum())
+        self.delta_sum += float(delta.sum())
+        self.abs_delta_sum += float(np.abs(delta).sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max()))
+        self.abs_deltas.extend(np.abs(delta).tolist())
+        self.primary_ms.extend(primary_ms)
+        self.candidate_ms.extend([candidate_ms] * len(delta))
+
+    def summary(self):
+        if not self.scored:
+            return {'primary_version': self.primary_version, 'candidate_version': self.candidate_version,
+                    'scored': 0}
+
+        def percentiles(values):
+            p50, p95 = np.percentile(np.fromiter(values, dtype='float64'), [50, 95])
+            return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3)}
+
+        return {
+            'primary_version': self.primary_version,
+            'candidate_version': self.candidate_version,
+            'scored': self.scored,
+            'agreement_rate': round(self.agreed / self.scored, 4),
+            'mean_delta': round(self.delta_sum / self.scored, 5),
+            'mean_abs_delta': round(self.abs_delta_sum / self.scored, 5),
+            'max_abs_delta': round(self.max_abs_delta, 5),
+            'p95_abs_delta': round(float(np.percentile(np.fromiter(self.abs_deltas, dtype='float64'), 95)), 5),
+            'primary_ms': percentiles(self.primary_ms),
+            'candidate_ms_per_row': percentiles(self.candidate_ms)
+        }
+
+
+class ShadowScorer:
+    def __init__(self, predictor, log_dir=None, queue_size=QUEUE_SIZE, flush_s=FLUSH_S):
+        self.predictor = predictor
+        self.registry = predictor.registry
+        self.log_dir = log_dir or DEFAULT_LOG_DIR
+        self.flush_s = flush_s
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._candidates = {}
+        self._stats = {}
+        self.sampled = {}
+        self.dropped = {}
+        self.failed = {}
+        self._stopped = threading.Event()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+        self._thread.start()
+
+    # =========================================================================
+    # Request path (never blocks)
+    # =========================================================================
+
+    def observe(self, model_name, input_data, result, latency_ms):
+        entry = self.registry.shadow.get(model_name)
+        if entry is None:
+            return
+        rate = entry[1] if entry[1] is not None else SAMPLE_RATE
+        if random.random() >= rate:
+            return
+
+        item = (model_name, dict(input_data), float(result['probability']), float(latency_ms), time.time())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped[model_name] = self.dropped.get(model_name, 0) + 1
+            return
+        with self._lock:
+            self.sampled[model_name] = self.sampled.get(model_name, 0) + 1
+
+    # =========================================================================
+    # Background scoring
+    # =========================================================================
+
+    def candidate(self, model_name):
+        """(spec, model) of the current candidate; reloaded when its manifest entry changes"""
+        spec, _ = self.registry.shadow[model_name]
+        cached = self._candidates.get(model_name)
+        if cached is None or cached[0].identity() != spec.identity():
+            self.registry.verify(spec)
+            self._candidates[model_name] = (spec, self.registry.load(spec))
+            print(f"✓ Shadow candidate for {model_name} v{spec.version} loaded")
+        return self._candidates[model_name]
+
+    def score(self, spec, model, df):
+        """(probabilities, ms of the model call alone), timed like the primary's inference_ms"""
+        if spec.family == 'classic':
+            X = self.predictor.preprocess_classic_batch(df)
+            start = time.perf_counter()
+            proba = self.predictor.classic_proba(model, X)
+        else:
+            X = self.predictor.preprocess_nn_batch(df)
+            start = time.perf_counter()
+            proba = model.predict(X, batch_size=BATCH_ROWS, verbose=0).reshape(-1)
+        return np.asarray(proba, dtype='float64'), (time.perf_counter() - start) * 1000
+
+    def _drain(self):
+        """Up to BATCH_ROWS queued items, waiting at most until the next flush"""
+        try:
+            items = [self._queue.get(timeout=self.flush_s)]
+        except queue.Empty:
+            return []
+        while len(items) < BATCH_ROWS:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _score_items(self, model_name, items):
+        try:
+            spec, model = self.candidate(model_name)
+            candidate, batch_ms = self.score(spec, model, pd.DataFrame([item[1] for item in items]))
+            candidate_ms = batch_ms / len(items)
+        except Exception as e:
+            print(f"⚠ Shadow scoring for {model_name} failed: {e}")
+            with self._lock:
+                self.failed[model_name] = self.failed.get(model_name, 0) + len(items)
+            return
+
+        primary = np.array([item[2] for item in items])
+        primary_ms = [item[3] for item in items]
+        primary_version = self.registry.spec(model_name).version
+        with self._lock:
+            stats = self._stats.get(model_name)
+            if stats is None or (stats.primary_version, stats.candidate_version) != (primary_version, spec.version):
+                stats = self._stats[model_name] = ShadowStats(primary_version, spec.version)
+            stats.add(primary, candidate, primary_ms, candidate_ms)
+        self._append_log(model_name, items, candidate, candidate_ms, primary_version, spec.version)
+
+    def _append_log(self, model_name, items, candidate, candidate_ms, primary_version, candidate_version):
+        folder = os.path.join(self.log_dir, model_name)
+        os.makedirs(folder, exist_ok=True)
+        day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        lines = []
+        for (_, input_data, primary, primary_ms, ts), proba in zip(items, candidate.tolist()):
+            lines.append(json.dumps({
+                'ts': round(ts, 3),
+                'primary_version': primary_version,
+                'candidate_version': candidate_version,
+                'input': input_data,
+                'primary': round(primary, 6),
+                'candidate': round(proba, 6),
+                'delta': round(proba - primary, 6),
+                'agree': (primary >= THRESHOLD) == (proba >= THRESHOLD),
+                'primary_ms': round(primary_ms, 3),
+                'candidate_ms': round(candidate_ms, 3)
+            }, ensure_ascii=False, default=str))
+        with open(os.path.join(folder, f'{day}.jsonl'), 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stopped.is_set():
+            items = self._drain()
+            by_model = {}
+            for item in items:
+                by_model.setdefault(item[0], []).append(item)
+            for model_name, model_items in by_model.items():
+                if model_name in self.registry.shadow:
+                    self._score_items(model_name, model_items)
+
+            if time.monotonic() - last_flush >= self.flush_s:
+                self.flush()
+                last_flush = time.monotonic()
+
+    # =========================================================================
+    # Aggregates
+    # =========================================================================
+
+    def status(self):
+        with self._lock:
+            models = set(self.registry.shadow) | set(self._stats) | set(self.dropped)
+            return {
+                'queue': {'size': self._queue.qsize(), 'capacity': self._queue.maxsize},
+                'models': {
+                    name: {
+                        'sampled': self.sampled.get(name, 0),
+                        'dropped': self.dropped.get(name, 0),
+                        'failed': self.failed.get(name, 0),
+                        **(self._stats[name].summary() if name in self._stats else {'scored': 0})
+                    } for name in sorted(models)
+                }
+            }
+
+    def flush(self):
+        """Write this process's aggregates to summary_<pid>.json (atomic; merged by read_summaries)"""
+        summary = {'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                   'pid': os.getpid(), **self.status()}
+        path = os.path.join(self.log_dir, f'summary_{os.getpid()}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def shutdown(self):
+        self._stopped.set()
+        self.flush()
+
+
+# Counters summed across processes; rates and means re-weighted by 'scored'
+SUMMED = ('sampled', 'dropped', 'failed', 'scored')
+WEIGHTED = ('agreement_rate', 'mean_delta', 'mean_abs_delta')
+
+
+def read_summaries(log_dir=None):
+    """
+    Merge the summary_<pid>.json of every web worker process. Counters are
+    summed, rates and means weighted by scored rows, max_abs_delta is the
+    maximum; percentiles cannot be merged and stay per process.
+    """
+    log_dir = log_dir or DEFAULT_LOG_DIR
+    processes, models = {}, {}
+    if not os.path.isdir(log_dir):
+        return {'processes': processes, 'models': models}
+
+    for name in sorted(os.listdir(log_dir)):
+        if not (name.startswith('summary_') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(log_dir, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not read shadow summary {name}: {e}")
+            continue
+        processes[str(summary.get('pid', name[8:-5]))] = summary
+
+        for model_name, stats in summary.get('models', {}).items():
+            merged = models.setdefault(model_name, {key: 0 for key in SUMMED})
+            for key in SUMMED:
+                merged[key] += stats.get(key, 0)
+            scored = stats.get('scored', 0)
+            for key in WEIGHTED:
+                if scored and stats.get(key) is not None:
+                    merged[key] = merged.get(key, 0.0) + stats[key] * scored
+            if stats.get('max_abs_delta') is not None:
+                merged['max_abs_delta'] = max(merged.get('max_abs_delta', 0.0), stats['max_abs_delta'])
+
+    for merged in models.values():
+        for key in WEIGHTED:
+            if key in merged:
+                merged[key] = round(merged[key] / merged['scored'], 5)
+    return {'processes': processes, 'models': models}
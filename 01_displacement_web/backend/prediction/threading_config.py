@@ -0,0 +1,102 @@
+"""
+Threading profiles for CPU inference
+
+TensorFlow intra/inter-op pools and OpenMP/BLAS pools are process-wide and can
+only be sized once, before the first op runs. XGBoost's `nthread` belongs to
+each model (ModelPredictor keeps one copy per value). A profile therefore
+fixes the process-wide pools and gives XGBoost one thread count for single
+rows and another for batches:
+
+    latency      1 thread everywhere. Many gunicorn workers share the cores
+                 without oversubscription; best p50/p99 for single rows.
+    throughput   All cores everywhere. Best for one process running batch jobs.
+    auto         (default) Small TF/OpenMP pools, single-threaded XGBoost for
+                 single rows, all cores for batches.
+
+Select with PREDICTOR_THREAD_PROFILE or ModelPredictor(thread_profile=...).
+Individual values can be overridden with TF_INTRA_OP_THREADS,
+TF_INTER_OP_THREADS, OMP_NUM_THREADS, XGB_NTHREAD_SINGLE and XGB_NTHREAD_BATCH.
+"""
+
+import os
+
+DEFAULT_PROFILE = 'auto'
+
+ENV_OVERRIDES = {
+    'intra_op': 'TF_INTRA_OP_THREADS',
+    'inter_op': 'TF_INTER_OP_THREADS',
+    'omp': 'OMP_NUM_THREADS',
+    'xgb_single': 'XGB_NTHREAD_SINGLE',
+    'xgb_batch': 'XGB_NTHREAD_BATCH'
+}
+
+
+def _cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_profiles():
+    cpus = _cpus()
+    return {
+        'latency': {'intra_op': 1, 'inter_op': 1, 'omp': 1, 'xgb_single': 1, 'xgb_batch': 1},
+        'throughput': {'intra_op': cpus, 'inter_op': 2, 'omp': cpus, 'xgb_single': cpus, 'xgb_batch': cpus},
+        'auto': {'intra_op': min(2, cpus), 'inter_op': 1, 'omp': 1, 'xgb_single': 1, 'xgb_batch': cpus}
+    }
+
+
+def resolve_profile(profile=None):
+    """Profile name or dict -> complete settings dict (env overrides applied)"""
+    profiles = thread_profiles()
+
+    if isinstance(profile, dict):
+        settings = dict(profiles[DEFAULT_PROFILE], **profile)
+        settings.setdefault('name', 'custom')
+    else:
+        name = profile or os.environ.get('PREDICTOR_THREAD_PROFILE', DEFAULT_PROFILE)
+        if name not in profiles:
+            raise ValueError(f"Unknown thread profile '{name}' (expected one of {sorted(profiles)})")
+        settings = dict(profiles[name], name=name)
+
+    for key, env_var in ENV_OVERRIDES.items():
+        if os.environ.get(env_var):
+            settings[key] = int(os.environ[env_var])
+
+    return settings
+
+
+def configure_environment(profile=None):
+    """
+    Export the OpenMP/BLAS thread counts. Call before TensorFlow, XGBoost or
+    numpy are imported; values already set in the environment are kept.
+    """
+    settings = resolve_profile(profile)
+    omp = str(settings['omp'])
+    for env_var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(env_var, omp)
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(settings['intra_op']))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', str(settings['inter_op']))
+    return settings
+
+
+def apply_runtime(settings):
+    """Size the TF and BLAS pools of an already-running process (best effort)"""
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(settings['intra_op'])
+        tf.config.threading.set_inter_op_parallelism_threads(settings['inter_op'])
+    except RuntimeError:
+        # TF already executed an op: the pools are fixed, the env vars set by
+        # configure_environment (if it ran early enough) are what applies
+        print("⚠ TensorFlow already initialized, thread pools not resized")
+
+    try:
+        # threadpoolctl ships with scikit-learn; it resizes BLAS/OpenMP pools
+        # even when numpy was imported before configure_environment
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=settings['omp'])
+    except ImportError:
+        pass
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from .category_mappings import (
+    ESTADO_DEPTO_MAPPING, ETNIA_MAPPING, CICLO_VITAL_MAPPING,
+    HECHO_MAPPING, VALUES_TO_REMOVE
+)
+
+DEFAULT_MAPPINGS = {
+    'ESTADO_DEPTO': ESTADO_DEPTO_MAPPING,
+    'ETNIA': ETNIA_MAPPING,
+    'CICLO_VITAL': CICLO_VITAL_MAPPING,
+    'HECHO': HECHO_MAPPING
+}
+
+
+class CleaningEngine:
+    """
+    Single-pass cleaner for RUV frames (Socrata results or chunks of the CSV export).
+
+    Column names are matched case-insensitively (Socrata returns `hecho`,
+    the export `HECHO`) and renamed to uppercase. Cleaned columns become
+    pandas Categorical: mappings are applied to the categories and the codes
+    are remapped, so the cost is O(rows) integer work plus O(categories)
+    string work. Every removal rule feeds one boolean mask, applied once.
+    """
+
+    def __init__(self, mappings=None, values_to_remove=None):
+        self.mappings = DEFAULT_MAPPINGS if mappings is None else mappings
+        self.values_to_remove = VALUES_TO_REMOVE if values_to_remove is None else values_to_remove
+        self.columns = set(self.mappings) | set(self.values_to_remove)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'rows_in': 0, 'rows_out': 0, 'dropped_by': {col: 0 for col in self.columns}}
+
+    def normalize_columns(self, df):
+        """Rename known columns to uppercase, whatever case they arrive in"""
+        renames = {col: col.upper() for col in df.columns
+                   if col != col.upper() and col.upper() in self.columns}
+        if renames:
+            df = df.rename(columns=renames)
+        return df
+
+    def clean_column(self, series, col):
+        """Return (categorical series, keep mask or None) for one column"""
+        cat = series.array if isinstance(series.dtype, pd.CategoricalDtype) else pd.Categorical(series)
+        categories = cat.categories
+        codes = cat.codes
+
+        mapping = self.mappings.get(col)
+        if mapping and categories.isin(list(mapping)).any():
+            # Map each category once, then merge duplicates by remapping codes
+            mapped = categories.map(lambda v: mapping.get(v, v))
+            inverse, categories = pd.factorize(mapped)
+            codes = np.where(codes >= 0, inverse[codes], -1).astype(codes.dtype)
+
+        keep = None
+        remove = self.values_to_remove.get(col)
+        if remove:
+            drop_codes = categories.get_indexer(remove)
+            drop_codes = drop_codes[drop_codes >= 0]
+            if len(drop_codes):
+                keep = ~np.isin(codes, drop_codes)
+
+        cleaned = pd.Series(
+            pd.Categorical.from_codes(codes, categories=categories),
+            index=series.index, name=col
+        )
+        return cleaned, keep
+
+    def clean(self, df):
+        """Clean one DataFrame; returns a new frame (input is not modified)"""
+        if df is None or len(df) == 0:
+            return df
+
+        df = self.normalize_columns(df)
+
+        mask = np.ones(len(df), dtype=bool)
+        cleaned_cols = {}
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            cleaned_cols[col], keep = self.clean_column(df[col], col)
+            if keep is not None:
+                self.stats['dropped_by'][col] += int((mask & ~keep).sum())
+                mask &= keep
+
+        out = df.assign(**cleaned_cols) if cleaned_cols else df
+        if not mask.all():
+            out = out[mask]
+
+        self.stats['rows_in'] += len(df)
+        self.stats['rows_out'] += len(out)
+        return out
+
+    def clean_chunks(self, chunks):
+        """Clean an iterable of DataFrames lazily (memory bounded by one chunk)"""
+        for chunk in chunks:
+            cleaned = self.clean(chunk)
+            if cleaned is not None and len(cleaned):
+                yield cleaned
+
+    def read_csv_chunks(self, path, chunksize=500_000, usecols=None, **read_kwargs):
+        """
+        Stream the RUV CSV export as raw chunks.
+
+        Undecodable bytes become U+FFFD, which is how the mojibake keys in
+        category_mappings look. Known columns are read as str and turned into
+        Categorical by clean(): pandas decodes `category` columns strictly,
+        ignoring encoding_errors.
+        """
+        read_kwargs.setdefault('encoding', 'utf-8')
+        read_kwargs.setdefault('encoding_errors', 'replace')
+
+        header = pd.read_csv(path, nrows=0, encoding=read_kwargs['encoding'],
+                             encoding_errors=read_kwargs['encoding_errors']).columns
+        dtype = {name: str for name in header if name.upper() in self.columns}
+        dtype.update(read_kwargs.pop('dtype', {}) or {})
+
+        return pd.read_csv(path, chunksize=chunksize, usecols=usecols, dtype=dtype,
+                           low_memory=False, **read_kwargs)
+
+    def clean_csv(self, path, chunksize=500_000, usecols=None, **read_kwargs):
+        """Stream and clean the RUV CSV export chunk by chunk"""
+        return self.clean_chunks(self.read_csv_chunks(path, chunksize=chunksize, usecols=usecols, **read_kwargs))
+
+
+def concat_cleaned(chunks):
+    """Concatenate cleaned chunks keeping categorical dtypes (categories unioned)"""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+
+    combined = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            combined[col] = union_categoricals([c[col] for c in chunks], ignore_order=True)
+        else:
+            combined[col] = np.concatenate([c[col].to_numpy() for c in chunks])
+    return pd.DataFrame(combined)
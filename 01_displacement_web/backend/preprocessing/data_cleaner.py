@@ -3,6 +3,10 @@ from .category_mappings import (
     ESTADO_DEPTO_MAPPING, ETNIA_MAPPING, CICLO_VITAL_MAPPING, 
     HECHO_MAPPING, VALUES_TO_REMOVE
 )
+from .cleaning_engine import CleaningEngine
+from .geo_data import resolve_department
+
+_engine = CleaningEngine()
 
 def clean_input_data(data):
     cleaned = data.copy()
@@ -12,6 +16,10 @@ def clean_input_data(data):
             cleaned['ESTADO_DEPTO'] = ESTADO_DEPTO_MAPPING[cleaned['ESTADO_DEPTO']]
         if cleaned['ESTADO_DEPTO'] in VALUES_TO_REMOVE['ESTADO_DEPTO']:
             return None
+        # Free text (case, accents, mis-encodings, typos) -> dataset name
+        resolved = resolve_department(cleaned['ESTADO_DEPTO'])
+        if resolved:
+            cleaned['ESTADO_DEPTO'] = resolved
     
     if 'ETNIA' in cleaned:
         if cleaned['ETNIA'] in ETNIA_MAPPING:
@@ -39,34 +47,27 @@ def clean_input_data(data):
     
     return cleaned
 
+def clean_input_frame(df):
+    """
+    clean_input_data for a DataFrame of validated rows (bulk scoring): the same
+    category mappings and department resolution, each distinct value handled
+    once. Rows with removable values must already be filtered out.
+    """
+    cleaned = _engine.clean(df)
+    
+    if 'ESTADO_DEPTO' in cleaned:
+        departments = cleaned['ESTADO_DEPTO'].astype('category')
+        resolved = [resolve_department(name) or name for name in departments.cat.categories]
+        cleaned['ESTADO_DEPTO'] = pd.Categorical(pd.Index(resolved, dtype=object).take(departments.cat.codes))
+    
+    return cleaned
+
 def clean_api_results(df):
+    """Clean Socrata results (any column case) in a single pass, see CleaningEngine"""
     if df is None or len(df) == 0:
         return df
     
-    df = df.copy()
-    
-    if 'ESTADO_DEPTO' in df.columns:
-        df['ESTADO_DEPTO'] = df['ESTADO_DEPTO'].replace(ESTADO_DEPTO_MAPPING)
-        df = df[~df['ESTADO_DEPTO'].isin(VALUES_TO_REMOVE['ESTADO_DEPTO'])]
-    
-    if 'ETNIA' in df.columns:
-        df['ETNIA'] = df['ETNIA'].replace(ETNIA_MAPPING)
-    
-    if 'CICLO_VITAL' in df.columns:
-        df['CICLO_VITAL'] = df['CICLO_VITAL'].replace(CICLO_VITAL_MAPPING)
-        df = df[~df['CICLO_VITAL'].isin(VALUES_TO_REMOVE['CICLO_VITAL'])]
-    
-    if 'SEXO' in df.columns:
-        df = df[~df['SEXO'].isin(VALUES_TO_REMOVE['SEXO'])]
-    
-    if 'DISCAPACIDAD' in df.columns:
-        df = df[~df['DISCAPACIDAD'].isin(VALUES_TO_REMOVE['DISCAPACIDAD'])]
-    
-    if 'HECHO' in df.columns:
-        df['HECHO'] = df['HECHO'].replace(HECHO_MAPPING)
-        df = df[~df['HECHO'].isin(VALUES_TO_REMOVE['HECHO'])]
-    
-    return df
+    return _engine.clean(df)
 
 def get_valid_values():
     return {
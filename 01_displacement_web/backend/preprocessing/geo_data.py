@@ -1,4 +1,6 @@
 from geopy.distance import geodesic
+from .category_mappings import ESTADO_DEPTO_MAPPING
+from .name_index import NameIndex
 
 DEPT_CAPITALS = {
     'Amazonas': 'Leticia', 'Antioquia': 'Medellín', 'Arauca': 'Arauca',
@@ -53,6 +55,25 @@ URBAN_CENTER_COORDS = {
 
 BOGOTA_COORDS = (4.5981, -74.0758)
 
+# Other spellings of the dataset names (GADM, official and short forms)
+DEPARTMENT_ALIASES = {
+    'Guajira': 'La Guajira',
+    'San Andres': 'Archipielago de San Andrés, Providencia y Santa Catalina',
+    'San Andres y Providencia': 'Archipielago de San Andrés, Providencia y Santa Catalina',
+    'San Andrés y Providencia': 'Archipielago de San Andrés, Providencia y Santa Catalina',
+    'Bogota': 'Bogota, D.C.',
+    'Distrito Capital': 'Bogota, D.C.',
+    'Bogotá D.C.': 'Bogota, D.C.'
+}
+
+DEPARTMENT_INDEX = NameIndex(URBAN_CENTER_COORDS.keys(), aliases={**ESTADO_DEPTO_MAPPING, **DEPARTMENT_ALIASES})
+
+def resolve_department(name, cutoff=0.75):
+    """Dataset department name for free text (accents, case, mis-encodings, typos), or None"""
+    if name in URBAN_CENTER_COORDS:
+        return name
+    return DEPARTMENT_INDEX.resolve(name, cutoff=cutoff)
+
 def calculate_distances(dept_name):
     coords = URBAN_CENTER_COORDS.get(dept_name)
     
@@ -82,6 +103,7 @@ def calculate_distances(dept_name):
     }
 
 def get_department_info(dept_name):
+    dept_name = resolve_department(dept_name)
     coords = URBAN_CENTER_COORDS.get(dept_name)
     if not coords:
         return None
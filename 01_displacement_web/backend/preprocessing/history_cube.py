@@ -0,0 +1,249 @@
+"""
+Historical RUV statistics served from a precomputed cube
+
+Built offline from the Parquet dataset written by training.ingest (or the raw
+RUV CSV): one dense count array over
+
+    ESTADO_DEPTO x SEXO x ETNIA x DISCAPACIDAD x CICLO_VITAL x VIGENCIA x HECHO
+
+stored as a compressed .npz (uint32 counts + the label of every index). A
+query fixes some dimensions to one or more values (slice), sums out the
+dimensions not grouped by (roll-up) and reports the displacement share per
+group. Filters on single values are basic indexing (views, no copy), so a
+query touches only the cells it needs; results are memoized, the cube never
+changes once loaded. No raw record is scanned and Socrata is not called.
+
+    python -m preprocessing.history_cube --input ../db/01_cleaned_data/ruv_parquet
+
+    cube = get_history_cube()
+    cube.query(['VIGENCIA'], {'ESTADO_DEPTO': ['Antioquia']})
+"""
+
+import argparse
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .geo_data import resolve_department
+
+CUBE_PATH = os.environ.get('HISTORY_CUBE_PATH', '../db/history_cube.npz')
+
+DIMENSIONS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL', 'VIGENCIA', 'HECHO']
+NUMERIC_DIMENSIONS = ('VIGENCIA', 'EVENTOS')
+DISPLACEMENT_HECHO = 'Desplazamiento forzado'
+# HECHO label for rows that only carry the binary target (displacement_vs_others CSV)
+OTHER_HECHO = 'Otros hechos'
+
+MAX_QUERY_CACHE = 1024
+# Groups returned by one query (a roll-up over every dimension has millions)
+MAX_ROWS = 20_000
+
+
+def hecho_labels(df):
+    """HECHO per row, falling back to the binary target when HECHO is missing"""
+    from training.ingest import TARGET_COL
+
+    hecho = df['HECHO'].astype(object) if 'HECHO' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    missing = hecho.isna()
+    if missing.any() and TARGET_COL in df.columns:
+        fallback = np.where(df.loc[missing, TARGET_COL].to_numpy() == 1, DISPLACEMENT_HECHO, OTHER_HECHO)
+        hecho = hecho.copy()
+        hecho[missing] = fallback
+    return hecho
+
+
+def read_counts(input_path, dimensions=DIMENSIONS, chunksize=500_000):
+    """Counts per tuple of `dimensions`, aggregated batch by batch (peak memory: one batch)"""
+    if os.path.isdir(input_path):
+        from training.ingest import open_dataset, TARGET_COL
+
+        columns = [col for col in dimensions if col != 'VIGENCIA'] + [TARGET_COL, 'VIGENCIA']
+        batches = (batch.to_pandas() for batch in open_dataset(input_path).to_batches(
+            columns=columns, batch_size=chunksize))
+    else:
+        from .cleaning_engine import CleaningEngine
+        batches = CleaningEngine().clean_csv(input_path, chunksize=chunksize)
+
+    partials = []
+    for i, df in enumerate(batches, 1):
+        columns = {}
+        for col in dimensions:
+            if col == 'HECHO':
+                columns[col] = hecho_labels(df)
+            elif col in NUMERIC_DIMENSIONS:
+                columns[col] = pd.to_numeric(df[col], errors='coerce')
+            else:
+                columns[col] = df[col].astype(object)
+        df = pd.DataFrame(columns).dropna()
+        partials.append(df.groupby(list(dimensions), observed=True).size())
+        print(f"  ✓ batch {i}: {len(df):,} rows, {len(partials[-1]):,} cells")
+
+    if not partials:
+        raise ValueError(f"No rows read from {input_path}")
+    return pd.concat(partials).groupby(level=list(range(len(dimensions)))).sum()
+
+
+class HistoryCube:
+    """Dense counts over DIMENSIONS with the label of every index"""
+
+    def __init__(self, counts, labels):
+        self.counts = counts
+        self.labels = labels
+        self.axis = {dim: i for i, dim in enumerate(DIMENSIONS)}
+        self._positions = {dim: {value: i for i, value in enumerate(values)} for dim, values in labels.items()}
+        self.displacement = self._positions['HECHO'].get(DISPLACEMENT_HECHO)
+        self._query = lru_cache(maxsize=MAX_QUERY_CACHE)(self._rollup)
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        with np.load(path) as data:
+            return cls(data['counts'], json.loads(str(data['labels'])))
+
+    @classmethod
+    def build(cls, input_path, output_path=CUBE_PATH, chunksize=500_000):
+        series = read_counts(input_path, DIMENSIONS, chunksize)
+        labels = {}
+        codes = []
+        for level, dim in enumerate(DIMENSIONS):
+            values = series.index.get_level_values(level)
+            if dim == 'VIGENCIA':
+                values = values.astype(int)
+            uniques = sorted(set(values))
+            labels[dim] = [int(v) for v in uniques] if dim == 'VIGENCIA' else [str(v) for v in uniques]
+            codes.append(pd.Index(uniques).get_indexer(values))
+
+        counts = np.zeros([len(labels[dim]) for dim in DIMENSIONS], dtype='uint32')
+        counts[tuple(codes)] = series.to_numpy()
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        np.savez_compressed(output_path, counts=counts, labels=np.array(json.dumps(labels, ensure_ascii=False)))
+        shape = ' x '.join(f"{dim}={len(labels[dim])}" for dim in DIMENSIONS)
+        print(f"✓ {int(counts.sum()):,} records in {counts.size:,} cells ({shape}) saved to {output_path}")
+        return cls(counts, labels)
+
+    # =========================================================================
+    # Queries
+    # =========================================================================
+
+    def dimensions(self):
+        return {dim: list(self.labels[dim]) for dim in DIMENSIONS}
+
+    def positions(self, dim, values):
+        """Indices of `values` on one dimension; raises ValueError on unknown values"""
+        found, unknown = [], []
+        for value in values:
+            if dim == 'ESTADO_DEPTO':
+                value = resolve_department(value) or value
+            elif dim == 'VIGENCIA':
+                value = int(value)
+            pos = self._positions[dim].get(value)
+            if pos is None:
+                unknown.append(value)
+            else:
+                found.append(pos)
+        if unknown:
+            raise ValueError(f"Valores desconocidos para {dim}: {unknown}")
+        return tuple(sorted(set(found)))
+
+    def _rollup(self, group_by, filters):
+        """Counts grouped by `group_by` (+ HECHO) after slicing on `filters`"""
+        cube = self.counts
+        # Slice the largest dimensions first: later slices run on smaller arrays
+        for dim, positions in sorted(filters, key=lambda item: -self.counts.shape[self.axis[item[0]]]):
+            axis = self.axis[dim]
+            if len(positions) == 1:
+                index = slice(positions[0], positions[0] + 1)
+            else:
+                index = list(positions)
+            cube = cube[(slice(None),) * axis + (index,)]
+
+        keep = [self.axis[dim] for dim in group_by] + [self.axis['HECHO']]
+        summed = cube.sum(axis=tuple(a for a in range(cube.ndim) if a not in keep), dtype='int64')
+        # sum keeps the remaining axes in DIMENSIONS order; reorder to group_by + HECHO
+        order = np.argsort(np.argsort(keep))
+        return summed.transpose(order)
+
+    def query(self, group_by=(), filters=None, by_hecho=False):
+        """
+        Rows of {group values..., total, displacement, displacement_share}
+        (and by_hecho counts), for groups with at least one record.
+        """
+        group_by = tuple(dim for dim in group_by if dim != 'HECHO')
+        for dim in list(group_by) + list(filters or {}):
+            if dim not in self.axis:
+                raise ValueError(f"Dimensión desconocida: {dim} (use {', '.join(DIMENSIONS)})")
+        if len(set(group_by)) != len(group_by):
+            raise ValueError("group_by repite dimensiones")
+
+        key = tuple(sorted((dim, self.positions(dim, values)) for dim, values in (filters or {}).items()))
+        counts = self._query(group_by, key)
+
+        # Sliced axes only keep the filtered positions: map result indices back through them
+        selected = dict(key)
+        hechos = selected.get('HECHO', tuple(range(len(self.labels['HECHO']))))
+        totals = counts.sum(axis=-1)
+        if self.displacement in hechos:
+            displacement = counts[..., hechos.index(self.displacement)]
+        else:
+            displacement = np.zeros_like(totals)
+
+        groups = np.argwhere(totals > 0)
+        if len(groups) > MAX_ROWS:
+            raise ValueError(f"La consulta produce {len(groups):,} grupos (máximo {MAX_ROWS:,}); agregue filtros")
+
+        rows = []
+        for idx in map(tuple, groups):
+            row = {dim: self.labels[dim][selected[dim][i] if dim in selected else i] for dim, i in zip(group_by, idx)}
+            total = int(totals[idx])
+            row.update(total=total, displacement=int(displacement[idx]),
+                       displacement_share=round(int(displacement[idx]) / total, 4))
+            if by_hecho:
+                cells = counts[idx]
+                row['by_hecho'] = {self.labels['HECHO'][hechos[h]]: int(cells[h]) for h in np.flatnonzero(cells)}
+            rows.append(row)
+
+        return {
+            'group_by': list(group_by),
+            'filters': {dim: [self.labels[dim][i] for i in positions] for dim, positions in key},
+            'rows': rows
+        }
+
+
+# =============================================================================
+# LAZY SINGLETON FOR THE API
+# =============================================================================
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def get_history_cube():
+    """The cube, or None when it has not been built"""
+    with _lock:
+        if 'cube' not in _loaded:
+            _loaded['cube'] = None
+            if os.path.exists(CUBE_PATH):
+                try:
+                    _loaded['cube'] = HistoryCube.load(CUBE_PATH)
+                    print(f"✓ History cube loaded from {CUBE_PATH}")
+                except Exception as e:
+                    print(f"⚠ Could not load history cube: {e}")
+        return _loaded['cube']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the historical statistics cube')
+    parser.add_argument('--input', required=True, help='Parquet dir from training.ingest, or the RUV CSV')
+    parser.add_argument('--output', default=CUBE_PATH)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args(argv)
+
+    HistoryCube.build(args.input, args.output, args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
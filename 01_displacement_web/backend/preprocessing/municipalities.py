@@ -0,0 +1,392 @@
+"""
+Optional municipality mode
+
+Two compact artifacts, both built offline and both optional (without them the
+API stays in department mode):
+
+- Coordinate table (~1,100 DIVIPOLA municipalities): code, name, dataset
+  department name, lat/lon and the three geo features, precomputed with a
+  vectorized geodesic (Vincenty, WGS-84) relative to Bogotá, the same
+  reference as preprocessing.geo_data.
+
+      python -m preprocessing.municipalities coords
+      python -m preprocessing.municipalities coords --csv divipola.csv
+
+- Validation store: counts of displacement / other events per
+  (municipality, SEXO, ETNIA, DISCAPACIDAD, CICLO_VITAL, VIGENCIA, EVENTOS),
+  built from a municipality-level RUV extract you provide. Each key is
+  packed into one int64 and the keys are kept sorted, so a lookup is a
+  binary search over a numpy array.
+
+      python -m preprocessing.municipalities validation --input ruv_municipal.csv
+
+The models themselves are trained on department-level geography; in
+municipality mode they receive the municipality's own distances to Bogotá,
+which lie inside the department's range but are finer than the training data.
+"""
+
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .geo_data import BOGOTA_COORDS, resolve_department
+from .name_index import NameIndex, normalize_name
+
+DIVIPOLA_DATASET_ID = os.environ.get('DIVIPOLA_DATASET_ID', 'gdxc-w37w')
+DIVIPOLA_FIELDS = {
+    'code': 'cod_mpio',
+    'name': 'nom_mpio',
+    'department': 'dpto',
+    'lat': 'latitud',
+    'lon': 'longitud'
+}
+
+COORDS_PATH = os.environ.get('MUNICIPALITIES_PATH', '../db/municipalities.npz')
+VALIDATION_PATH = os.environ.get('MUNICIPAL_VALIDATION_PATH', '../db/municipal_validation.npz')
+
+GEO_COLS = ['km_norte_sur', 'km_este_oeste', 'distancia_total']
+
+# WGS-84
+_A = 6378137.0
+_F = 1 / 298.257223563
+_B = _A * (1 - _F)
+
+
+# =============================================================================
+# GEODESY
+# =============================================================================
+
+def geodesic_km(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """Vectorized Vincenty inverse distance on WGS-84, in km (arrays broadcast)"""
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(v, dtype='float64') for v in (lat1, lon1, lat2, lon2)))
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - _F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - _F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(L.shape, dtype=bool)
+    for _ in range(max_iter):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines: cos2_alpha == 0
+            cos_2sm = np.where(cos2_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0)
+        C = _F / 16 * cos2_alpha * (4 + _F * (4 - 3 * cos2_alpha))
+        new_lam = L + (1 - C) * _F * sin_alpha * (
+            sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+        converged = np.abs(new_lam - lam) < tol
+        lam = np.where(active, new_lam, lam)
+        active &= ~converged
+        if not active.any():
+            break
+
+    u2 = cos2_alpha * (_A ** 2 - _B ** 2) / _B ** 2
+    big_a = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    big_b = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sm ** 2) -
+        big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+    distance = _B * big_a * (sigma - delta_sigma) / 1000
+    return np.where(sin_sigma > 0, distance, 0.0)
+
+
+def geo_features(lat, lon):
+    """(n, 3) km_norte_sur, km_este_oeste, distancia_total from Bogotá, as in calculate_distances"""
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    ref_lat, ref_lon = BOGOTA_COORDS
+
+    norte_sur = geodesic_km(ref_lat, ref_lon, lat, ref_lon)
+    este_oeste = geodesic_km(ref_lat, ref_lon, ref_lat, lon)
+    total = geodesic_km(ref_lat, ref_lon, lat, lon)
+
+    norte_sur = np.where(lat < ref_lat, -norte_sur, norte_sur)
+    este_oeste = np.where(lon < ref_lon, -este_oeste, este_oeste)
+    return np.round(np.stack([norte_sur, este_oeste, total], axis=1), 2)
+
+
+# =============================================================================
+# COORDINATE TABLE
+# =============================================================================
+
+def _parse_coordinate(values):
+    # DIVIPOLA exports sometimes use a decimal comma
+    return pd.to_numeric(pd.Series(values).astype(str).str.replace(',', '.', regex=False), errors='coerce')
+
+
+def build_coordinate_table(df, fields=None, output_path=COORDS_PATH):
+    """DIVIPOLA rows -> compact .npz table (rows with unknown department or coordinates are dropped)"""
+    fields = {**DIVIPOLA_FIELDS, **(fields or {})}
+
+    table = pd.DataFrame({
+        'code': pd.to_numeric(df[fields['code']], errors='coerce'),
+        'name': df[fields['name']].astype(str).str.strip(),
+        'department': [resolve_department(d) for d in df[fields['department']]],
+        'lat': _parse_coordinate(df[fields['lat']]),
+        'lon': _parse_coordinate(df[fields['lon']])
+    })
+    valid = table.notna().all(axis=1)
+    dropped = table[~valid]
+    if len(dropped):
+        print(f"⚠ {len(dropped)} rows dropped (unknown department or missing coordinates)")
+    table = table[valid].drop_duplicates('code').sort_values('code').reset_index(drop=True)
+
+    geo = geo_features(table['lat'], table['lon'])
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.savez_compressed(
+        output_path,
+        code=table['code'].to_numpy(dtype='int32'),
+        name=table['name'].to_numpy(dtype=str),
+        department=table['department'].to_numpy(dtype=str),
+        latlon=table[['lat', 'lon']].to_numpy(dtype='float32'),
+        geo=geo.astype('float32')
+    )
+    print(f"✓ {len(table)} municipalities saved to {output_path}")
+    return table
+
+
+def fetch_divipola(dataset_id=DIVIPOLA_DATASET_ID, limit=5000):
+    from sodapy import Socrata
+    from api.socrata_client import socrata_endpoint
+
+    domain, _ = socrata_endpoint()
+    client = Socrata(domain, None)
+    try:
+        return pd.DataFrame.from_records(client.get(dataset_id, limit=limit))
+    finally:
+        client.close()
+
+
+class MunicipalityTable:
+    """In-memory coordinate table with O(1) name/code resolution"""
+
+    def __init__(self, path=COORDS_PATH):
+        with np.load(path) as data:
+            self.codes = data['code']
+            self.names = data['name']
+            self.departments = data['department']
+            self.latlon = data['latlon']
+            self.geo = data['geo']
+
+        self._row_by_code = {int(code): i for i, code in enumerate(self.codes)}
+
+        # Names repeat across departments: resolve within the department
+        # first; the national index only holds names that are unique
+        self._by_department = {}
+        rows_by_key = {}
+        for i, (name, dept) in enumerate(zip(self.names, self.departments)):
+            self._by_department.setdefault(dept, NameIndex()).add(name, i)
+            rows_by_key.setdefault(normalize_name(name), []).append(i)
+        self._national = NameIndex()
+        for rows in rows_by_key.values():
+            if len(rows) == 1:
+                self._national.add(self.names[rows[0]], rows[0])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def resolve(self, municipality, department=None):
+        """Row index for a DIVIPOLA code or free-text name (+ optional department), else None"""
+        if municipality is None:
+            return None
+        text = str(municipality).strip()
+        if text.isdigit():
+            return self._row_by_code.get(int(text))
+
+        if department:
+            index = self._by_department.get(resolve_department(department))
+            return index.resolve(text, cutoff=0.75) if index else None
+        return self._national.resolve(text, cutoff=0.75)
+
+    def info(self, row):
+        """Same shape as get_department_info, plus the municipality fields"""
+        lat, lon = (float(v) for v in self.latlon[row])
+        return {
+            'municipality': str(self.names[row]),
+            'code': int(self.codes[row]),
+            'department': str(self.departments[row]),
+            'lat': lat,
+            'lon': lon,
+            **{col: float(value) for col, value in zip(GEO_COLS, self.geo[row])}
+        }
+
+    def rows_for_codes(self, codes):
+        """Vectorized code -> row (-1 when unknown) for batch inputs"""
+        codes = np.asarray(codes, dtype='int64')
+        rows = np.searchsorted(self.codes, codes)
+        rows = np.clip(rows, 0, len(self.codes) - 1)
+        return np.where(self.codes[rows] == codes, rows, -1)
+
+    def listing(self, department=None):
+        rows = range(len(self.codes))
+        if department:
+            dept = resolve_department(department)
+            rows = [i for i in rows if self.departments[i] == dept]
+        return [{'code': int(self.codes[i]), 'municipality': str(self.names[i]),
+                 'department': str(self.departments[i])} for i in rows]
+
+
+# =============================================================================
+# VALIDATION STORE
+# =============================================================================
+
+KEY_CATEGORICAL = ['SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+# Bits per key field, least significant last: 17+5*4+7+19 = 63
+KEY_BITS = {'code': 17, 'SEXO': 5, 'ETNIA': 5, 'DISCAPACIDAD': 5, 'CICLO_VITAL': 5, 'VIGENCIA': 7, 'EVENTOS': 19}
+YEAR_OFFSET = 1980
+
+
+def pack_keys(codes, cat_codes, years, eventos):
+    """One int64 per row; -1 where a field does not fit its bit width"""
+    fields = [np.asarray(codes, dtype='int64')] + [np.asarray(c, dtype='int64') for c in cat_codes] + [
+        np.asarray(years, dtype='int64') - YEAR_OFFSET, np.asarray(eventos, dtype='int64')]
+
+    key = np.zeros(len(fields[0]), dtype='int64')
+    valid = np.ones(len(fields[0]), dtype=bool)
+    for width, values in zip(KEY_BITS.values(), fields):
+        valid &= (values >= 0) & (values < (1 << width))
+        key = (key << width) | np.where(valid, values, 0)
+    return np.where(valid, key, -1)
+
+
+class MunicipalValidationStore:
+    """Sorted packed keys -> (displacement_count, other_count)"""
+
+    def __init__(self, keys, counts, vocab):
+        self.keys = keys
+        self.counts = counts
+        self.vocab = vocab
+        self._positions = {col: {value: i for i, value in enumerate(values)} for col, values in vocab.items()}
+
+    @classmethod
+    def load(cls, path=VALIDATION_PATH):
+        with np.load(path) as data:
+            return cls(data['keys'], data['counts'], json.loads(str(data['vocab'])))
+
+    @classmethod
+    def build(cls, df, table, output_path=VALIDATION_PATH):
+        """
+        Aggregate a municipality-level RUV extract. Expects the dataset column
+        names (any case) plus either COD_MPIO/CODIGO_MUNICIPIO or MUNICIPIO.
+        """
+        from .cleaning_engine import CleaningEngine
+
+        df = CleaningEngine().clean(df.rename(columns=str.upper))
+        code_col = next((c for c in ('COD_MPIO', 'CODIGO_MUNICIPIO') if c in df.columns), None)
+        if code_col is not None:
+            rows = table.rows_for_codes(pd.to_numeric(df[code_col], errors='coerce').fillna(-1))
+        else:
+            rows = np.array([-1 if r is None else r for r in (
+                table.resolve(m, d) for m, d in zip(df['MUNICIPIO'], df['ESTADO_DEPTO']))])
+        codes = np.where(rows >= 0, table.codes[np.maximum(rows, 0)], -1)
+
+        vocab = {col: sorted(df[col].astype(str).unique().tolist()) for col in KEY_CATEGORICAL}
+        cat_codes = [pd.Categorical(df[col].astype(str), categories=vocab[col]).codes for col in KEY_CATEGORICAL]
+        keys = pack_keys(codes, cat_codes,
+                         pd.to_numeric(df['VIGENCIA'], errors='coerce').fillna(-1),
+                         pd.to_numeric(df['EVENTOS'], errors='coerce').fillna(-1))
+        displacement = df['HECHO'].astype(str).str.lower().str.contains('desplazamiento forzado').to_numpy()
+
+        keep = keys >= 0
+        print(f"✓ {keep.sum():,}/{len(keys):,} records indexed")
+        unique, inverse = np.unique(keys[keep], return_inverse=True)
+        counts = np.zeros((len(unique), 2), dtype='int32')
+        np.add.at(counts[:, 0], inverse, displacement[keep])
+        np.add.at(counts[:, 1], inverse, ~displacement[keep])
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        np.savez_compressed(output_path, keys=unique, counts=counts, vocab=np.array(json.dumps(vocab)))
+        print(f"✓ {len(unique):,} municipality keys saved to {output_path}")
+        return cls(unique, counts, vocab)
+
+    def lookup(self, code, input_data):
+        """(displacement_count, other_count) for one input, (0, 0) if never seen"""
+        cat_codes = []
+        for col in KEY_CATEGORICAL:
+            pos = self._positions[col].get(str(input_data.get(col)))
+            if pos is None:
+                return 0, 0
+            cat_codes.append([pos])
+
+        key = pack_keys([code], cat_codes, [input_data['VIGENCIA']], [input_data['EVENTOS']])[0]
+        if key < 0:
+            return 0, 0
+        i = np.searchsorted(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return int(self.counts[i, 0]), int(self.counts[i, 1])
+        return 0, 0
+
+
+# =============================================================================
+# LAZY SINGLETONS FOR THE API
+# =============================================================================
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _load_once(name, loader, path):
+    with _lock:
+        if name not in _loaded:
+            _loaded[name] = None
+            if os.path.exists(path):
+                try:
+                    _loaded[name] = loader(path)
+                    print(f"✓ Municipality {name} loaded from {path}")
+                except Exception as e:
+                    print(f"⚠ Could not load municipality {name}: {e}")
+        return _loaded[name]
+
+
+def get_municipality_table():
+    """Coordinate table, or None when municipality mode is not built"""
+    return _load_once('table', MunicipalityTable, COORDS_PATH)
+
+
+def get_validation_store():
+    """Validation store, or None when not built"""
+    return _load_once('validation', MunicipalValidationStore.load, VALIDATION_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build municipality mode artifacts')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    coords = sub.add_parser('coords', help='DIVIPOLA coordinate table')
+    coords.add_argument('--csv', help='Local DIVIPOLA export (default: download from datos.gov.co)')
+    coords.add_argument('--dataset-id', default=DIVIPOLA_DATASET_ID)
+    coords.add_argument('--output', default=COORDS_PATH)
+    for key, default in DIVIPOLA_FIELDS.items():
+        coords.add_argument(f'--{key}-field', default=default)
+
+    validation = sub.add_parser('validation', help='Municipality validation store')
+    validation.add_argument('--input', required=True, help='Municipality-level RUV extract (.csv or .parquet)')
+    validation.add_argument('--coords', default=COORDS_PATH)
+    validation.add_argument('--output', default=VALIDATION_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'coords':
+        df = pd.read_csv(args.csv, dtype=str) if args.csv else fetch_divipola(args.dataset_id)
+        fields = {key: getattr(args, f'{key}_field') for key in DIVIPOLA_FIELDS}
+        build_coordinate_table(df, fields=fields, output_path=args.output)
+    else:
+        table = MunicipalityTable(args.coords)
+        if args.input.endswith('.parquet'):
+            df = pd.read_parquet(args.input)
+        else:
+            df = pd.read_csv(args.input, dtype=str, encoding_errors='replace')
+        MunicipalValidationStore.build(df, table, output_path=args.output)
+
+
+if __name__ == '__main__':
+    main()
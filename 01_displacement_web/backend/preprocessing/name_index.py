@@ -0,0 +1,194 @@
+"""
+Index for resolving free-text place names to canonical names
+
+Every known name (and alias) is normalized once when the index is built:
+accents and punctuation are stripped, case and spacing folded, and UTF-8
+text mis-decoded as Latin-1 ('NariÃ±o') is repaired. A query is then resolved
+in four steps:
+
+1. exact lookup of the normalized query in a dict;
+2. lookup with one unknown character: a lost character ('Nari�o', U+FFFD)
+   becomes a wildcard, and every indexed name is also stored with each
+   position wildcarded, so this step is still a single dict lookup;
+3. trigram candidates (inverted index), ranked by Dice similarity;
+4. when no candidate is similar enough, names sharing a trigram that are one
+   typo away (two for queries of 8+ characters) by optimal string alignment
+   distance: short names lose most of their trigrams to a single typo
+   ('Antiokia' scores 0.63 against 'Antioquia').
+
+    index = NameIndex(['Nariño', 'Bogota, D.C.'], aliases={'Bogotá': 'Bogota, D.C.'})
+    index.resolve('nari�o')        # 'Nariño'
+    index.match('Bogota DC')       # ('Bogota, D.C.', 1.0, 'exact')
+    index.match('Narinio', cutoff=0.75)   # ('Nariño', 0.86, 'edit')
+"""
+
+import re
+import unicodedata
+
+REPLACEMENT_CHAR = '\ufffd'
+WILDCARD = '?'
+MOJIBAKE_MARKERS = ('Ã', 'Â')
+
+_PUNCTUATION = re.compile(r"[^\w\s?]")
+_SPACES = re.compile(r"\s+")
+
+
+def repair_mojibake(text):
+    """Undo UTF-8 bytes decoded as Latin-1/cp1252 ('DesapariciÃ³n' -> 'Desaparición')"""
+    if not any(marker in text for marker in MOJIBAKE_MARKERS):
+        return text
+    for codec in ('latin-1', 'cp1252'):
+        try:
+            return text.encode(codec).decode('utf-8')
+        except UnicodeError:
+            continue
+    return text
+
+
+def normalize_name(name):
+    """Comparison key: no accents, punctuation or case; lost characters -> WILDCARD"""
+    text = repair_mojibake(str(name))
+    # A lost multi-byte character may come out as several replacement chars
+    text = re.sub(f"{REPLACEMENT_CHAR}+", WILDCARD, text)
+    text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+    # Periods only abbreviate ('D.C.' == 'DC'); other punctuation separates words
+    text = _PUNCTUATION.sub(' ', text.lower().replace('.', ''))
+    return _SPACES.sub(' ', text).strip()
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps cost 1), or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def max_edits(key):
+    return 1 if len(key) < 8 else 2
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self, names=(), aliases=None):
+        self._exact = {}
+        self._wildcard = {}
+        self._trigrams = {}
+        self._keys = []
+        self._gram_counts = []
+        self._canonical = []
+
+        for name in names:
+            self.add(name)
+        for alias, canonical in (aliases or {}).items():
+            self.add(alias, canonical)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name, canonical=None):
+        """Index `name` as a way of writing `canonical` (default: itself)"""
+        canonical = name if canonical is None else canonical
+        key = normalize_name(name)
+        if not key or key in self._exact:
+            return
+
+        entry = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._gram_counts.append(len(grams))
+        self._canonical.append(canonical)
+        self._exact[key] = entry
+
+        if WILDCARD not in key:
+            for i in range(len(key)):
+                self._wildcard.setdefault(key[:i] + WILDCARD + key[i + 1:], entry)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(entry)
+
+    def candidates(self, query, n=3, cutoff=0.6):
+        """Up to `n` (canonical, score) fuzzy matches with Dice similarity >= cutoff"""
+        key = normalize_name(query)
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for entry in self._trigrams.get(gram, ()):
+                shared[entry] = shared.get(entry, 0) + 1
+
+        scored = []
+        for entry, count in shared.items():
+            score = 2 * count / (len(grams) + self._gram_counts[entry])
+            if score >= cutoff:
+                scored.append((score, entry))
+        scored.sort(key=lambda item: (-item[0], self._keys[item[1]]))
+
+        results, seen = [], set()
+        for score, entry in scored:
+            canonical = self._canonical[entry]
+            if canonical not in seen:
+                seen.add(canonical)
+                results.append((canonical, score))
+            if len(results) == n:
+                break
+        return results
+
+    def match(self, query, cutoff=0.6):
+        """(canonical, score, 'exact' | 'wildcard' | 'fuzzy' | 'edit'), or None"""
+        if query is None:
+            return None
+        key = normalize_name(query)
+        if not key:
+            return None
+
+        entry = self._exact.get(key)
+        if entry is not None:
+            return self._canonical[entry], 1.0, 'exact'
+
+        if key.count(WILDCARD) == 1:
+            entry = self._wildcard.get(key)
+            if entry is not None:
+                return self._canonical[entry], 1.0, 'wildcard'
+
+        found = self.candidates(query, n=1, cutoff=cutoff)
+        if found:
+            canonical, score = found[0]
+            return canonical, score, 'fuzzy'
+        return self._nearest(key)
+
+    def _nearest(self, key):
+        """(canonical, score, 'edit') for the one name within max_edits of `key`, or None"""
+        limit = max_edits(key)
+        entries = set()
+        for gram in trigrams(key):
+            entries.update(self._trigrams.get(gram, ()))
+
+        best, best_distance, tied = None, limit + 1, False
+        for entry in entries:
+            distance = edit_distance(key, self._keys[entry], limit)
+            if distance < best_distance:
+                best, best_distance, tied = entry, distance, False
+            elif distance == best_distance and best is not None and self._canonical[entry] != self._canonical[best]:
+                tied = True
+
+        if best is None or tied:
+            return None
+        return self._canonical[best], 1 - best_distance / max(len(key), 1), 'edit'
+
+    def resolve(self, query, cutoff=0.6):
+        """Canonical name for `query`, or None"""
+        found = self.match(query, cutoff=cutoff)
+        return found[0] if found else None
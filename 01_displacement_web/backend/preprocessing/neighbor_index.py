@@ -0,0 +1,200 @@
+"""
+Approximate-match validation: nearest historical RUV records
+
+When the exact lookup (Socrata or the municipal store) finds nothing, the
+prediction can still be compared with the closest records of the same
+profile. The index, built offline from the local RUV mirror (the Parquet
+dataset of training.ingest, or the RUV CSV), aggregates records per
+
+    (ESTADO_DEPTO, SEXO, ETNIA, DISCAPACIDAD, CICLO_VITAL, VIGENCIA, EVENTOS)
+
+with a count per HECHO class. The five categories are packed into one
+mixed-radix int64 key and the points are sorted by (key, VIGENCIA, EVENTOS),
+so a query is:
+
+1. two binary searches for the range of its exact categorical key;
+2. a vectorized distance over that range (a few hundred points at most):
+   |delta VIGENCIA| + |log2(EVENTOS / query EVENTOS)|, i.e. one year apart
+   weighs as much as twice or half the events;
+3. the nearest points until they hold at least k records.
+
+    python -m preprocessing.neighbor_index --input ../db/01_cleaned_data/ruv_parquet
+
+    index = get_neighbor_index()
+    index.nearest(cleaned_input, k=20)
+"""
+
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .history_cube import DISPLACEMENT_HECHO, read_counts
+
+INDEX_PATH = os.environ.get('NEIGHBOR_INDEX_PATH', '../db/ruv_neighbors.npz')
+
+KEY_COLS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+POINT_COLS = ['VIGENCIA', 'EVENTOS']
+DEFAULT_K = 20
+
+
+class NeighborIndex:
+    """Sorted (key, VIGENCIA, EVENTOS) points with HECHO counts"""
+
+    def __init__(self, keys, years, eventos, counts, vocab):
+        self.keys = keys
+        self.years = years
+        self.eventos = eventos
+        self.log_eventos = np.log2(eventos)
+        self.counts = counts
+        self.vocab = vocab
+        self._positions = {col: {value: i for i, value in enumerate(vocab[col])} for col in KEY_COLS}
+        self._radix = [len(vocab[col]) for col in KEY_COLS]
+        self.displacement = vocab['HECHO'].index(DISPLACEMENT_HECHO) if DISPLACEMENT_HECHO in vocab['HECHO'] else None
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            return cls(data['keys'], data['years'], data['eventos'], data['counts'], json.loads(str(data['vocab'])))
+
+    @classmethod
+    def build(cls, input_path, output_path=INDEX_PATH, chunksize=500_000):
+        series = read_counts(input_path, KEY_COLS + POINT_COLS + ['HECHO'], chunksize)
+        # HECHO becomes the columns of the count matrix: one row per point
+        table = series.unstack('HECHO', fill_value=0)
+        index = table.index.to_frame(index=False)
+
+        vocab = {col: sorted(index[col].astype(str).unique().tolist()) for col in KEY_COLS}
+        vocab['HECHO'] = [str(h) for h in table.columns]
+        codes = [pd.Categorical(index[col].astype(str), categories=vocab[col]).codes for col in KEY_COLS]
+        keys = pack_key(codes, [len(vocab[col]) for col in KEY_COLS])
+        years = index['VIGENCIA'].to_numpy(dtype='int16')
+        eventos = index['EVENTOS'].to_numpy(dtype='int32')
+
+        keep = eventos > 0
+        order = np.lexsort((eventos[keep], years[keep], keys[keep]))
+        keys, years, eventos = keys[keep][order], years[keep][order], eventos[keep][order]
+        counts = table.to_numpy(dtype='uint32')[keep][order]
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        np.savez_compressed(output_path, keys=keys, years=years, eventos=eventos, counts=counts,
+                            vocab=np.array(json.dumps(vocab, ensure_ascii=False)))
+        print(f"✓ {int(counts.sum()):,} records in {len(keys):,} points "
+              f"({len(np.unique(keys)):,} profiles) saved to {output_path}")
+        return cls(keys, years, eventos, counts, vocab)
+
+    def key(self, input_data):
+        """Packed categorical key of a cleaned input, or None for a profile never seen"""
+        codes = []
+        for col in KEY_COLS:
+            pos = self._positions[col].get(str(input_data.get(col)))
+            if pos is None:
+                return None
+            codes.append(pos)
+        return int(pack_key([[c] for c in codes], self._radix)[0])
+
+    def nearest(self, input_data, k=DEFAULT_K):
+        """
+        Nearest points of the same profile until they hold >= k records:
+        (points, hecho totals), or None when the profile has no records.
+        """
+        key = self.key(input_data)
+        if key is None:
+            return None
+        start = np.searchsorted(self.keys, key, side='left')
+        stop = np.searchsorted(self.keys, key, side='right')
+        if start == stop:
+            return None
+
+        distance = (np.abs(self.years[start:stop].astype('float64') - float(input_data['VIGENCIA'])) +
+                    np.abs(self.log_eventos[start:stop] - np.log2(max(float(input_data['EVENTOS']), 1.0))))
+        order = np.argsort(distance, kind='stable')
+        records = self.counts[start:stop].sum(axis=1)[order]
+        # Smallest prefix holding k records (all points at the cut distance included)
+        cut = min(int(np.searchsorted(np.cumsum(records), k)), len(order) - 1)
+        take = order[distance[order] <= distance[order[cut]]]
+
+        points = []
+        for i in take:
+            cells = self.counts[start + i]
+            points.append({
+                'VIGENCIA': int(self.years[start + i]),
+                'EVENTOS': int(self.eventos[start + i]),
+                'distance': round(float(distance[i]), 3),
+                'records': int(cells.sum()),
+                'hecho': {self.vocab['HECHO'][h]: int(cells[h]) for h in np.flatnonzero(cells)}
+            })
+        return points, self.counts[start + take].sum(axis=0)
+
+    def validate(self, input_data, prediction_result, k=DEFAULT_K):
+        """approximate_match validation result, or None when the profile has no records"""
+        found = self.nearest(input_data, k)
+        if found is None:
+            return None
+
+        points, totals = found
+        total = int(totals.sum())
+        displacement_count = int(totals[self.displacement]) if self.displacement is not None else 0
+        share = displacement_count / total
+        majority = 1 if share > 0.5 else 0
+
+        return {
+            'match_type': 'approximate_match',
+            'message': f'≈ Sin coincidencia exacta: {total} registros históricos cercanos',
+            'submessage': 'Mismo departamento, sexo, etnia, discapacidad y ciclo vital, con año y eventos cercanos',
+            'neighbors': points,
+            'displacement_count': displacement_count,
+            'other_count': total - displacement_count,
+            'displacement_share': round(share, 4),
+            'hecho_distribution': {self.vocab['HECHO'][h]: int(totals[h]) for h in np.flatnonzero(totals)},
+            'real_value': majority,
+            'real_label': 'Desplazamiento Forzado' if majority == 1 else 'Otro Hecho Victimizante',
+            'is_consistent': majority == prediction_result['prediction']
+        }
+
+
+def pack_key(codes, radix):
+    """Mixed-radix int64 key per row from per-column category codes"""
+    key = np.zeros(len(codes[0]), dtype='int64')
+    for values, size in zip(codes, radix):
+        key = key * size + np.asarray(values, dtype='int64')
+    return key
+
+
+# =============================================================================
+# LAZY SINGLETON FOR THE API
+# =============================================================================
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def get_neighbor_index():
+    """The index, or None when it has not been built"""
+    with _lock:
+        if 'index' not in _loaded:
+            _loaded['index'] = None
+            if os.path.exists(INDEX_PATH):
+                try:
+                    _loaded['index'] = NeighborIndex.load(INDEX_PATH)
+                    print(f"✓ Neighbor index loaded from {INDEX_PATH}")
+                except Exception as e:
+                    print(f"⚠ Could not load neighbor index: {e}")
+        return _loaded['index']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the nearest-neighbour validation index')
+    parser.add_argument('--input', required=True, help='Parquet dir from training.ingest, or the RUV CSV')
+    parser.add_argument('--output', default=INDEX_PATH)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args(argv)
+
+    NeighborIndex.build(args.input, args.output, args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Request validation, run before any cleaning, lookup or inference
+
+The schema is compiled once from get_valid_values() and the cleaning
+mappings: each categorical field becomes a frozenset of accepted raw values
+(valid values plus the aliases clean_input_data maps onto them), each numeric
+field a (type, min, max) rule. Validating a request is then a handful of set
+lookups and comparisons.
+
+    validator = InputValidator(available_models=predictor.available_models())
+    values, errors = validator.validate(data)       # one request (dict)
+    parsed, valid, errors = validator.validate_columns(columns)   # batch (dict of arrays)
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .category_mappings import ESTADO_DEPTO_MAPPING, ETNIA_MAPPING, CICLO_VITAL_MAPPING, VALUES_TO_REMOVE
+from .data_cleaner import get_valid_values
+from .geo_data import URBAN_CENTER_COORDS, resolve_department
+
+CATEGORICAL_FIELDS = ('ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL')
+INTEGER_FIELDS = ('VIGENCIA', 'EVENTOS')
+FLOAT_FIELDS = ('km_norte_sur', 'km_este_oeste', 'distancia_total')
+FIELDS = CATEGORICAL_FIELDS + INTEGER_FIELDS + FLOAT_FIELDS
+
+EVENTOS_RANGE = (1, 10000)
+# Every point of Colombia (San Andrés included) is within ~1,900 km of Bogotá
+GEO_LIMIT_KM = 2500.0
+
+# Rows listed per field in batch error reports
+MAX_ERROR_ROWS = 10
+
+
+def compile_categories(valid_values):
+    """Field -> frozenset of raw values accepted by clean_input_data"""
+    aliases = {'ETNIA': ETNIA_MAPPING, 'CICLO_VITAL': CICLO_VITAL_MAPPING}
+    categories = {
+        'ESTADO_DEPTO': frozenset(URBAN_CENTER_COORDS) | frozenset(ESTADO_DEPTO_MAPPING)
+    }
+    for field in CATEGORICAL_FIELDS[1:]:
+        valid = set(valid_values[field])
+        valid |= {alias for alias, value in aliases.get(field, {}).items() if value in valid}
+        categories[field] = frozenset(valid - set(VALUES_TO_REMOVE.get(field, ())))
+    return categories
+
+
+def compile_ranges(valid_values):
+    """Field -> (type, min, max); None means unbounded on that side"""
+    return {
+        'VIGENCIA': (int, valid_values['VIGENCIA']['min'], valid_values['VIGENCIA']['max_prediction']),
+        'EVENTOS': (int, *EVENTOS_RANGE),
+        'km_norte_sur': (float, -GEO_LIMIT_KM, GEO_LIMIT_KM),
+        'km_este_oeste': (float, -GEO_LIMIT_KM, GEO_LIMIT_KM),
+        'distancia_total': (float, 0.0, GEO_LIMIT_KM),
+    }
+
+
+def parse_number(value, kind):
+    """int/float from a JSON number or numeric string, else None (bools and NaN rejected)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    if kind is int:
+        return int(number) if number.is_integer() else None
+    return number
+
+
+def match_columns(columns):
+    """Input column name -> schema field, matched case-insensitively; raises if a field is missing"""
+    wanted = {field.upper(): field for field in FIELDS}
+    renames = {col: wanted[col.upper()] for col in columns if col.upper() in wanted}
+    missing = [field for field in FIELDS if field not in renames.values()]
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+    return renames
+
+
+def select_rows(parsed, valid):
+    """DataFrame of the valid rows of validate_columns output (categoricals stay categorical)"""
+    return pd.DataFrame({field: np.asarray(parsed[field])[valid] if field not in CATEGORICAL_FIELDS
+                         else parsed[field][valid].reset_index(drop=True) for field in FIELDS})
+
+
+def range_message(low, high):
+    return f'Debe estar entre {low} y {high}'
+
+
+class InputValidator:
+    def __init__(self, valid_values=None, available_models=None, known_models=None):
+        valid_values = valid_values or get_valid_values()
+        self.categories = compile_categories(valid_values)
+        self.ranges = compile_ranges(valid_values)
+        self.set_models(available_models, known_models)
+
+    def set_models(self, available_models, known_models=None):
+        """Models that can be served / exist in the manifest (updated after a hot reload)"""
+        self.models = frozenset(available_models or ())
+        self.known_models = frozenset(known_models or self.models)
+
+    # =========================================================================
+    # Single request
+    # =========================================================================
+
+    def check_category(self, field, value):
+        """Error message for a categorical value, or None"""
+        if value is None or value == '':
+            return 'Campo requerido'
+        if not isinstance(value, str):
+            return 'Debe ser texto'
+        if value in self.categories[field]:
+            return None
+        if value in VALUES_TO_REMOVE.get(field, ()):
+            return f'Valor no informativo: {value}'
+        # Departments also accept free text (accents, case, typos)
+        if field == 'ESTADO_DEPTO' and resolve_department(value):
+            return None
+        return f'Valor no permitido: {value}'
+
+    def check_number(self, field, value):
+        """(parsed, error message)"""
+        if value is None or value == '':
+            return None, 'Campo requerido'
+        kind, low, high = self.ranges[field]
+        number = parse_number(value, kind)
+        if number is None:
+            return None, 'Debe ser un número entero' if kind is int else 'Debe ser un número'
+        if (low is not None and number < low) or (high is not None and number > high):
+            return None, range_message(low, high)
+        return number, None
+
+    def validate(self, data):
+        """
+        (values, errors) for one request body. `values` has the typed model
+        input; `errors` maps field -> message and is empty when the request
+        is valid.
+        """
+        if not isinstance(data, dict):
+            return None, {'body': 'Se esperaba un objeto JSON'}
+
+        values, errors = {}, {}
+        for field in CATEGORICAL_FIELDS:
+            error = self.check_category(field, data.get(field))
+            if error:
+                errors[field] = error
+            else:
+                values[field] = data[field]
+        for field in INTEGER_FIELDS + FLOAT_FIELDS:
+            number, error = self.check_number(field, data.get(field))
+            if error:
+                errors[field] = error
+            else:
+                values[field] = number
+        return values, errors
+
+    def check_model(self, model_name):
+        """None if the model can be served, else 'unknown' or 'missing' (checked on disk at startup)"""
+        if model_name in self.models:
+            return None
+        return 'missing' if model_name in self.known_models else 'unknown'
+
+    # =========================================================================
+    # Batch (columns)
+    # =========================================================================
+
+    def _category_mask(self, field, column):
+        """Checks each distinct value once: the column is handled as a Categorical"""
+        column = pd.Series(column)
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        allowed = np.array([self.check_category(field, value) is None for value in column.cat.categories] + [False])
+        # code -1 (missing) indexes the trailing False
+        return column, allowed[column.cat.codes.to_numpy()]
+
+    def _number_mask(self, field, column):
+        kind, low, high = self.ranges[field]
+        raw = np.asarray(column)
+        if raw.dtype.kind in 'iuf':
+            # Numeric input (Arrow/NumPy): no per-value Python objects, no copy for float64
+            numbers = raw.astype(float, copy=False)
+        else:
+            raw = pd.Series(raw, dtype=object)
+            numbers = pd.to_numeric(raw.where(~raw.map(lambda v: isinstance(v, bool)), None), errors='coerce')
+            numbers = numbers.to_numpy(dtype=float)
+        valid = np.isfinite(numbers)
+        if kind is int:
+            valid &= np.mod(numbers, 1, where=valid, out=np.ones_like(numbers)) == 0
+        if low is not None:
+            valid &= numbers >= low
+        if high is not None:
+            valid &= numbers <= high
+        return numbers, valid
+
+    def validate_columns(self, columns):
+        """
+        Validate a batch given as {field: array-like}, all of the same length.
+        Returns (parsed, valid, errors): typed columns, a boolean row mask and
+        {field: {'message', 'count', 'rows'}} for the fields with invalid rows.
+        """
+        missing = [field for field in FIELDS if field not in columns]
+        if missing:
+            return None, None, {field: {'message': 'Columna requerida', 'count': None, 'rows': []} for field in missing}
+
+        lengths = {len(columns[field]) for field in FIELDS}
+        if len(lengths) != 1:
+            return None, None, {'columns': {'message': 'Las columnas deben tener la misma longitud', 'count': None, 'rows': []}}
+
+        n_rows = lengths.pop()
+        parsed, errors = {}, {}
+        valid = np.ones(n_rows, dtype=bool)
+        for field in FIELDS:
+            if field in CATEGORICAL_FIELDS:
+                parsed[field], field_valid = self._category_mask(field, columns[field])
+                message = 'Valor no permitido'
+            else:
+                parsed[field], field_valid = self._number_mask(field, columns[field])
+                kind, low, high = self.ranges[field]
+                message = range_message(low, high) + (' (entero)' if kind is int else '')
+                if kind is int:
+                    parsed[field] = np.where(field_valid, parsed[field], 0).astype(np.int64)
+
+            if not field_valid.all():
+                bad_rows = np.flatnonzero(~field_valid)
+                errors[field] = {'message': message, 'count': int(len(bad_rows)),
+                                 'rows': bad_rows[:MAX_ERROR_ROWS].tolist()}
+                valid &= field_valid
+        return parsed, valid, errors
@@ -0,0 +1,83 @@
+"""
+Backend tests. Run from 01_displacement_web/backend:
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Modules import each other as top-level packages and resolve ../db from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(autouse=True)
+def backend_cwd(monkeypatch):
+    monkeypatch.chdir(BACKEND_DIR)
+
+
+def synthetic_ruv(n_rows, seed=0):
+    """
+    Cleaned RUV rows with valid categories, real geo features and a target
+    that depends on EVENTOS and ETNIA (so models have something to learn).
+    """
+    import numpy as np
+    import pandas as pd
+    from preprocessing.geo_data import URBAN_CENTER_COORDS, calculate_distances
+    from training.ingest import TARGET_COL, GEO_COLS
+
+    rng = np.random.default_rng(seed)
+    departments = ['Antioquia', 'Bolivar', 'Cauca', 'Choco', 'Meta', 'Nariño', 'Bogota, D.C.']
+    assert all(d in URBAN_CENTER_COORDS for d in departments)
+    df = pd.DataFrame({
+        'ESTADO_DEPTO': rng.choice(departments, n_rows),
+        'SEXO': rng.choice(['Mujer', 'Hombre'], n_rows),
+        'ETNIA': rng.choice(['Ninguna', 'Afrocolombiano(a)', 'Indigena'], n_rows),
+        'DISCAPACIDAD': rng.choice(['Ninguna', 'Fisica'], n_rows, p=[0.9, 0.1]),
+        'CICLO_VITAL': rng.choice(['entre 0 y 5', 'entre 18 y 28', 'entre 29 y 59'], n_rows),
+        'VIGENCIA': rng.integers(2010, 2016, n_rows),
+        'EVENTOS': rng.geometric(0.3, n_rows),
+        'HECHO': None
+    })
+    geo = {d: calculate_distances(d) for d in departments}
+    for col in GEO_COLS:
+        df[col] = df['ESTADO_DEPTO'].map(lambda d: geo[d][col]).astype('float64')
+
+    score = 0.4 * np.log(df['EVENTOS']) + np.where(df['ETNIA'] == 'Ninguna', -0.5, 0.8)
+    df[TARGET_COL] = (score + rng.normal(0, 0.5, n_rows) > 0.2).astype('int8')
+    return df
+
+
+@pytest.fixture(scope='session')
+def ingested_dataset(tmp_path_factory):
+    """A small Parquet dataset in the training.ingest layout"""
+    import pandas as pd
+    from training.ingest import CATEGORICAL_COLS, PartitionedWriter
+
+    df = synthetic_ruv(6000)
+    for col in CATEGORICAL_COLS + ['HECHO']:
+        df[col] = pd.Categorical(df[col])
+    df['VIGENCIA'] = df['VIGENCIA'].astype('int32')
+    df['EVENTOS'] = df['EVENTOS'].astype('int32')
+
+    root = str(tmp_path_factory.mktemp('ruv_parquet'))
+    writer = PartitionedWriter(root)
+    writer.write(df)
+    writer.close()
+    with open(os.path.join(root, '_ingest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'rows_out': len(df), 'source': 'synthetic'}, f)
+    return root
+
+
+@pytest.fixture
+def models_copy(tmp_path):
+    """A writable copy of ../db (manifest, preprocessing files, models)"""
+    import shutil
+
+    target = tmp_path / 'db'
+    shutil.copytree(os.path.join(BACKEND_DIR, '..', 'db'), target)
+    return str(target)
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+from starlette.testclient import TestClient
+
+import app as flask_app
+import asgi
+from prediction.predictor import WARMUP_INPUT
+
+MATCHES = pd.DataFrame({'hecho': ['Desplazamiento forzado', 'Amenaza', 'Desplazamiento forzado']})
+REQUEST = {**WARMUP_INPUT, 'model': 'Logistic_Regression'}
+
+
+class StubSocrata:
+    delay = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def query_exact_match(self, filters):
+        await asyncio.sleep(self.delay)
+        return MATCHES.copy()
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(asgi, 'AsyncSocrataClient', StubSocrata)
+    monkeypatch.setattr(flask_app, 'start_warmup', lambda: None)
+    monkeypatch.setattr(flask_app.socrata_client, 'query_exact_match', lambda filters: MATCHES.copy())
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def test_predict_matches_the_flask_response(client):
+    flask_response = flask_app.app.test_client().post('/api/predict', json=REQUEST)
+    asgi_response = client.post('/api/predict', json=REQUEST)
+
+    assert asgi_response.status_code == flask_response.status_code == 200
+    assert asgi_response.json() == flask_response.get_json()
+    assert asgi_response.json()['match_type'] == 'ambiguous'
+
+
+def test_errors_use_the_flask_contracts(client):
+    assert client.post('/api/predict', content=b'not json').status_code == 400
+
+    response = client.post('/api/predict', json={**REQUEST, 'EVENTOS': 0})
+    assert response.status_code == 400
+    assert set(response.json()['details']) == {'EVENTOS'}
+    assert client.post('/api/predict', json={**REQUEST, 'model': 'GPT'}).status_code == 400
+
+
+def test_inference_and_lookup_run_concurrently(client, monkeypatch):
+    def slow_prediction(model_name, cleaned_input, explain=False):
+        time.sleep(0.4)
+        return {'prediction': 1, 'probability': 0.9, 'model_name': model_name}
+
+    monkeypatch.setattr(asgi, 'run_prediction', slow_prediction)
+    monkeypatch.setattr(StubSocrata, 'delay', 0.4)
+
+    start = time.perf_counter()
+    response = client.post('/api/predict', json=REQUEST)
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert elapsed < 0.75
+
+
+def test_other_routes_are_served_by_flask(client):
+    response = client.get('/api/models')
+    assert response.status_code == 200
+    assert 'ETag' in response.headers
+    assert client.get('/api/models', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/live').status_code == 200
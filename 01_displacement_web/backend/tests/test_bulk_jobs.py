@@ -0,0 +1,181 @@
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.bulk_jobs import FINAL_STATES, BulkJobManager
+from prediction.predictor import ModelPredictor, WARMUP_INPUT
+from preprocessing.data_cleaner import clean_input_frame
+from preprocessing.validation import FIELDS, InputValidator
+
+MODEL = 'Logistic_Regression'
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return ModelPredictor(models_dir='../db')
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return InputValidator(available_models=[MODEL])
+
+
+@pytest.fixture
+def jobs(validator, predictor, tmp_path):
+    manager = BulkJobManager(validator, predictor.predict_batch, jobs_dir=str(tmp_path / 'jobs'), chunk_rows=64,
+                             acquire_model=predictor.acquire_model, release_model=predictor.release_model)
+    yield manager
+    manager.shutdown()
+
+
+def input_rows(n_rows, seed=0):
+    """Valid rows around WARMUP_INPUT with every 10th row invalid"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame([WARMUP_INPUT] * n_rows)
+    df['EVENTOS'] = rng.integers(1, 30, n_rows)
+    df['SEXO'] = rng.choice(['Mujer', 'Hombre'], n_rows)
+    df['ESTADO_DEPTO'] = rng.choice(['Antioquia', 'Nariño', 'Bogota, D.C.'], n_rows)
+    df.loc[::10, 'EVENTOS'] = 0
+    # Column names in any case
+    return df.rename(columns={'SEXO': 'sexo', 'VIGENCIA': 'Vigencia'})
+
+
+def wait(jobs, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = jobs.status(job_id)
+        if status['state'] in FINAL_STATES:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {status['state']}")
+
+
+def expected_results(predictor, df):
+    df = df.rename(columns={'sexo': 'SEXO', 'Vigencia': 'VIGENCIA'})
+    valid = (df['EVENTOS'] > 0).to_numpy()
+    probability = np.full(len(df), np.nan)
+    probability[valid] = predictor.predict_batch(MODEL, clean_input_frame(df.loc[valid, list(FIELDS)].reset_index(drop=True)))
+    return valid, probability
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_job_scores_every_valid_row_in_order(jobs, predictor, tmp_path, fmt):
+    df = input_rows(300)
+    path = str(tmp_path / f'input.{fmt}')
+    df.to_csv(path, index=False) if fmt == 'csv' else df.to_parquet(path)
+
+    status = wait(jobs, jobs.submit(MODEL, path))
+
+    assert status['state'] == 'done' and status['progress'] == 1.0
+    assert (status['rows_read'], status['rows_scored'], status['rows_invalid']) == (300, 270, 30)
+    assert status['invalid_by_field']['EVENTOS']['rows'] == list(range(0, 100, 10))
+    assert status['invalid_by_field']['EVENTOS']['count'] == 30
+
+    results = pd.read_parquet(jobs.result_path(status['job_id']))
+    valid, probability = expected_results(predictor, df)
+    assert results['row'].tolist() == list(range(300))
+    assert results['valid'].tolist() == valid.tolist()
+    np.testing.assert_allclose(results['probability'].to_numpy(dtype=float), probability, rtol=1e-6)
+    assert results.loc[valid, 'prediction'].tolist() == (probability[valid] >= 0.5).astype(int).tolist()
+    assert results.loc[~valid, 'prediction'].isna().all()
+    # A server-side input is left where it was
+    assert os.path.exists(path)
+
+
+def test_undecodable_bytes_in_a_csv_do_not_fail_the_job(jobs, tmp_path):
+    path = tmp_path / 'input.csv'
+    input_rows(20).to_csv(path, index=False)
+    with open(path, 'ab') as f:
+        f.write(','.join(['Nari\xf1o' if field == 'ESTADO_DEPTO' else str(WARMUP_INPUT[field])
+                          for field in input_rows(1).rename(columns={'sexo': 'SEXO', 'Vigencia': 'VIGENCIA'}).columns])
+                .encode('latin-1') + b'\n')
+
+    status = wait(jobs, jobs.submit(MODEL, str(path)))
+
+    assert status['state'] == 'done', status['error']
+    assert status['rows_read'] == 21
+    assert status['rows_scored'] == 19
+
+
+def test_cancel_stops_after_the_current_chunk(validator, tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_score(model_name, df):
+        started.set()
+        release.wait(10)
+        return np.full(len(df), 0.7)
+
+    jobs = BulkJobManager(validator, slow_score, jobs_dir=str(tmp_path / 'jobs'), chunk_rows=10)
+    path = str(tmp_path / 'input.csv')
+    input_rows(100).to_csv(path, index=False)
+    try:
+        job_id = jobs.submit(MODEL, path)
+        assert started.wait(10)
+        assert jobs.cancel(job_id)
+        release.set()
+        status = wait(jobs, job_id)
+
+        assert status['state'] == 'cancelled'
+        assert status['rows_read'] <= 10
+        # Another web worker reads the same status from disk
+        other = BulkJobManager(validator, slow_score, jobs_dir=jobs.jobs_dir)
+        assert other.status(job_id)['state'] == 'cancelled'
+        other.shutdown()
+
+        assert jobs.cancel(job_id)
+        assert jobs.status(job_id) is None
+    finally:
+        release.set()
+        jobs.shutdown()
+
+
+def test_bad_inputs(jobs, tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('x')
+    with pytest.raises(ValueError):
+        jobs.submit(MODEL, str(path))
+
+    path = tmp_path / 'missing_columns.csv'
+    input_rows(5).drop(columns=['EVENTOS']).to_csv(path, index=False)
+    status = wait(jobs, jobs.submit(MODEL, str(path)))
+    assert status['state'] == 'failed'
+    assert 'EVENTOS' in status['error']
+
+    assert jobs.status('../etc') is None
+    assert jobs.status('0' * 32) is None
+
+
+def test_upload_poll_and_download(jobs, predictor, monkeypatch):
+    import app as backend
+
+    monkeypatch.setattr(backend, 'bulk_jobs', jobs)
+    client = backend.app.test_client()
+    df = input_rows(50)
+
+    response = client.post('/api/jobs', data={'model': MODEL, 'file': (io.BytesIO(df.to_csv(index=False).encode()), 'mine.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.get_json()['source']['name'] == 'mine.csv'
+
+    wait(jobs, job_id)
+    assert client.get(f'/api/jobs/{job_id}').get_json()['state'] == 'done'
+    # The uploaded copy is removed once scored
+    assert not os.path.exists(os.path.join(jobs.job_dir(job_id), 'input.csv'))
+
+    result = pd.read_csv(io.BytesIO(client.get(f'/api/jobs/{job_id}/result?format=csv').data))
+    valid, probability = expected_results(predictor, df)
+    assert result['valid'].tolist() == valid.tolist()
+    np.testing.assert_allclose(result['probability'].to_numpy(dtype=float), probability, rtol=1e-6)
+
+    parquet = client.get(f'/api/jobs/{job_id}/result')
+    assert pd.read_parquet(io.BytesIO(parquet.data))['row'].tolist() == list(range(50))
+
+    assert client.delete(f'/api/jobs/{job_id}').status_code == 200
+    assert client.get(f'/api/jobs/{job_id}').status_code == 404
+    assert client.post('/api/jobs', json={'model': MODEL, 'path': '/etc/passwd'}).status_code == 400
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.category_mappings import (
+    ESTADO_DEPTO_MAPPING, ETNIA_MAPPING, CICLO_VITAL_MAPPING, HECHO_MAPPING, VALUES_TO_REMOVE
+)
+from preprocessing.cleaning_engine import CleaningEngine, concat_cleaned
+from preprocessing.data_cleaner import clean_api_results
+
+RAW_VALUES = {
+    'ESTADO_DEPTO': ['Antioquia', 'Nari�o', 'Nariño', 'SIN DEFINIR', 'Meta'],
+    'SEXO': ['Mujer', 'Hombre', 'No Informa'],
+    'ETNIA': ['Ninguna', 'Indigena (Acreditado RA)', 'Indigena', 'Gitano(a) ROM', 'Negro (Acreditado RA)'],
+    'DISCAPACIDAD': ['Ninguna', 'Fisica', 'Por Establecer'],
+    'CICLO_VITAL': ['entre 29 y 60', 'entre 29 y 59', 'entre 0 y 5', 'ND'],
+    'HECHO': ['Desplazamiento forzado', 'Desaparici�n forzada', 'DesapariciÃ³n forzada', 'Sin informacion'],
+}
+MAPPINGS = {'ESTADO_DEPTO': ESTADO_DEPTO_MAPPING, 'ETNIA': ETNIA_MAPPING,
+            'CICLO_VITAL': CICLO_VITAL_MAPPING, 'HECHO': HECHO_MAPPING}
+
+
+def raw_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.choice(values, n_rows) for col, values in RAW_VALUES.items()})
+    df['EVENTOS'] = rng.integers(1, 50, n_rows)
+    return df
+
+
+def reference_clean(df):
+    """Column-by-column replace/isin, as clean_api_results did before the engine"""
+    df = df.copy()
+    for col, mapping in MAPPINGS.items():
+        df[col] = df[col].replace(mapping)
+    for col, values in VALUES_TO_REMOVE.items():
+        df = df[~df[col].isin(values)]
+    return df
+
+
+def as_strings(df):
+    return df.astype({col: str for col in RAW_VALUES}).reset_index(drop=True)
+
+
+def test_matches_the_per_column_rules_for_any_column_case():
+    df = raw_frame(5000)
+    expected = reference_clean(df)
+
+    cleaned = clean_api_results(df.rename(columns={col: col.lower() for col in RAW_VALUES}))
+
+    assert set(RAW_VALUES) <= set(cleaned.columns)
+    assert all(isinstance(cleaned[col].dtype, pd.CategoricalDtype) for col in RAW_VALUES)
+    pd.testing.assert_frame_equal(as_strings(cleaned)[list(df.columns)], as_strings(expected))
+    assert 0 < len(cleaned) < len(df)
+
+
+def test_mapped_duplicates_merge_into_one_category():
+    cleaned = CleaningEngine().clean(raw_frame(2000))
+
+    assert list(cleaned['HECHO'].cat.categories).count('Desaparición forzada') == 1
+    assert 'Indigena (Acreditado RA)' not in cleaned['ETNIA'].cat.categories
+    assert set(cleaned['ESTADO_DEPTO'].astype(str)) == {'Antioquia', 'Nariño', 'Meta'}
+
+
+def test_stats_count_the_first_rule_that_drops_a_row():
+    engine = CleaningEngine()
+    df = pd.DataFrame({'SEXO': ['No Informa', 'Mujer', 'No Informa'],
+                       'CICLO_VITAL': ['ND', 'ND', 'entre 0 y 5']})
+    cleaned = engine.clean(df)
+
+    assert len(cleaned) == 0
+    assert engine.stats['rows_in'] == 3 and engine.stats['rows_out'] == 0
+    assert sum(engine.stats['dropped_by'].values()) == 3
+
+
+def test_input_frame_is_not_modified():
+    df = raw_frame(100)
+    before = df.copy()
+    CleaningEngine().clean(df)
+    pd.testing.assert_frame_equal(df, before)
+
+
+@pytest.mark.parametrize('chunksize', [7, 1000, 100_000])
+def test_streamed_csv_equals_cleaning_the_whole_file(tmp_path, chunksize):
+    df = raw_frame(3000, seed=1)
+    path = tmp_path / 'ruv.csv'
+    df.to_csv(path, index=False, encoding='utf-8')
+    # One undecodable byte: read as U+FFFD, like the mojibake keys of the mappings
+    with open(path, 'ab') as f:
+        f.write(b'Nari\xf1o,Mujer,Ninguna,Ninguna,entre 0 y 5,Desplazamiento forzado,3\n')
+
+    engine = CleaningEngine()
+    combined = concat_cleaned(engine.clean_csv(str(path), chunksize=chunksize))
+
+    expected = reference_clean(pd.read_csv(path, encoding_errors='replace'))
+    pd.testing.assert_frame_equal(as_strings(combined), as_strings(expected))
+    assert combined['ESTADO_DEPTO'].iloc[-1] == 'Nariño'
+    assert engine.stats['rows_in'] == len(df) + 1
+    assert engine.stats['rows_out'] == len(combined)
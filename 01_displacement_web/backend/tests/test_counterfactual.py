@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.counterfactual import CounterfactualSearch
+from prediction.predictor import ModelPredictor, WARMUP_INPUT
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return ModelPredictor(models_dir='../db')
+
+
+@pytest.fixture
+def search(predictor):
+    return CounterfactualSearch(predictor)
+
+
+def rule(condition):
+    """score(df) that is 0.9 where condition(df) holds, 0.1 elsewhere"""
+    return lambda df: np.where(condition(df), 0.9, 0.1)
+
+
+def changes(counterfactual):
+    return {change['feature']: change['to'] for change in counterfactual['changes']}
+
+
+def test_numeric_crossing_is_refined_to_the_exact_value(search):
+    calls = []
+
+    def score(df):
+        calls.append(len(df))
+        return rule(lambda d: d['EVENTOS'].astype(int) >= 37)(df)
+
+    result = search.search('XGBoost', WARMUP_INPUT, score)
+
+    assert result['base_prediction'] == 0
+    assert result['changes_needed'] == 1
+    assert [changes(c) for c in result['counterfactuals']] == [{'EVENTOS': 37}]
+    # One neighbourhood batch, then one single-row batch per halving
+    assert result['batches'] == len(calls) and calls[1:] == [1] * (len(calls) - 1)
+
+
+def test_categorical_flips_come_before_larger_numeric_moves(search):
+    result = search.search('XGBoost', WARMUP_INPUT, rule(
+        lambda d: (d['ETNIA'] == 'Indigena') | (d['VIGENCIA'].astype(int) <= 1990)))
+
+    found = [changes(c) for c in result['counterfactuals']]
+    # |2020 - 1990| / (2030 - 1985) = 0.67 < 1 for a categorical change
+    assert found == [{'VIGENCIA': 1990}, {'ETNIA': 'Indigena'}]
+
+
+def test_pairs_are_searched_only_when_no_single_change_flips(search):
+    result = search.search('XGBoost', WARMUP_INPUT, rule(
+        lambda d: (d['SEXO'] == 'Hombre') & (d['VIGENCIA'].astype(int) >= 2024)))
+
+    assert result['changes_needed'] == 2
+    assert {'SEXO': 'Hombre', 'VIGENCIA': 2024} in [changes(c) for c in result['counterfactuals']]
+    assert all(len(c['changes']) == 2 for c in result['counterfactuals'])
+
+    no_pairs = search.search('XGBoost', WARMUP_INPUT, rule(
+        lambda d: (d['SEXO'] == 'Hombre') & (d['VIGENCIA'].astype(int) >= 2024)), max_changes=1)
+    assert no_pairs['changes_needed'] is None and no_pairs['counterfactuals'] == []
+
+
+def test_department_changes_bring_their_own_geo(search):
+    seen = []
+
+    def score(df):
+        seen.append(df[df['ESTADO_DEPTO'] == 'Meta'])
+        return np.full(len(df), 0.1)
+
+    search.search('XGBoost', WARMUP_INPUT, score, max_changes=1)
+    from preprocessing.geo_data import get_department_info
+
+    meta = pd.concat(seen)
+    expected = get_department_info('Meta')
+    assert len(meta) == 1
+    assert meta.iloc[0]['distancia_total'] == pytest.approx(expected['distancia_total'])
+
+
+@pytest.mark.parametrize('model_name', ['Logistic_Regression', 'XGBoost'])
+def test_every_counterfactual_flips_the_served_model(predictor, model_name):
+    query = {**WARMUP_INPUT, 'EVENTOS': 3}
+    result = predictor.counterfactuals(model_name, query, limit=20)
+    assert result['base_probability'] == pytest.approx(predictor.predict(model_name, query)['probability'])
+
+    search = predictor.counterfactual_search
+    for counterfactual in result['counterfactuals']:
+        row = search.frame(query, [(changes(counterfactual), None, np.array([0]))])
+        proba = predictor.predict_batch(model_name, row)[0]
+        assert (proba >= 0.5) != result['base_prediction']
+        assert proba == pytest.approx(counterfactual['probability'], abs=1e-6)
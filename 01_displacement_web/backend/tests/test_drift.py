@@ -0,0 +1,146 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from conftest import synthetic_ruv
+from prediction.drift import (
+    MIN_SAMPLES, PSI_ALERT, CountMinSketch, DriftMonitor, KLLSketch, build_profile, divergences
+)
+
+
+@pytest.fixture(scope='module')
+def profile():
+    return build_profile(synthetic_ruv(20000, seed=1))
+
+
+def test_count_min_never_underestimates():
+    sketch = CountMinSketch()
+    counts = {f"value-{i}": i % 7 + 1 for i in range(300)}
+    for value, count in counts.items():
+        sketch.add(value, count)
+
+    estimates = {value: sketch.estimate(value) for value in counts}
+    assert all(estimates[value] >= count for value, count in counts.items())
+    # Some columns collide, but the min over the rows keeps nearly every count exact
+    assert sum(estimates[value] == count for value, count in counts.items()) > 290
+    assert sketch.estimate('never added') <= max(estimates.values())
+
+
+def test_kll_quantiles_stay_accurate_in_bounded_memory():
+    values = np.random.default_rng(0).normal(50, 10, 200_000)
+    sketch = KLLSketch(rng=random.Random(0))
+    sketch.update_many(values[:100_000])
+    for value in values[100_000:120_000]:
+        sketch.update(value)
+    sketch.update_many(values[120_000:])
+
+    assert sketch.n == len(values)
+    assert (sketch.min, sketch.max) == (values.min(), values.max())
+    assert sum(len(items) for items in sketch.levels) < 3000
+    qs = [0.05, 0.5, 0.95]
+    for estimate, exact in zip(sketch.quantiles(qs), np.quantile(values, qs)):
+        assert estimate == pytest.approx(exact, abs=1.0)
+    points = np.quantile(values, [0.1, 0.5, 0.9])
+    assert sketch.cdf(points) == pytest.approx([0.1, 0.5, 0.9], abs=0.01)
+
+
+def test_divergences():
+    assert divergences([0.2, 0.3, 0.5], [0.2, 0.3, 0.5]) == (0.0, 0.0)
+
+    psi, kl = divergences([0.5, 0.5], [0.25, 0.75])
+    assert psi == pytest.approx(0.25 * np.log(2) - 0.25 * np.log(2 / 3))
+    assert kl == pytest.approx(0.5 * np.log(2) + 0.5 * np.log(2 / 3))
+    # A bucket the reference never had is smoothed, not infinite
+    assert np.isfinite(divergences([0.5, 0.5], [1.0, 0.0])).all()
+
+
+def test_profile_shares_and_bins(profile):
+    for col, shares in profile['categorical'].items():
+        assert sum(shares.values()) == pytest.approx(1.0, abs=1e-4)
+    for col, ref in profile['numeric'].items():
+        assert len(ref['shares']) == len(ref['edges']) + 1
+        assert sum(ref['shares']) == pytest.approx(1.0, abs=1e-4)
+        assert ref['min'] <= ref['max']
+
+
+def test_same_distribution_does_not_drift(profile):
+    monitor = DriftMonitor(profile)
+    monitor.observe_frame(synthetic_ruv(5000, seed=2))
+    current = monitor.report()['current']
+
+    assert current['inputs'] == 5000
+    assert current['drifted'] == []
+    assert all(entry['psi'] < 0.05 for entry in current['features'].values())
+    assert current['features']['ETNIA']['unseen_rate'] == 0
+    assert current['features']['VIGENCIA']['out_of_range_rate'] == 0
+
+
+def test_shifted_inputs_are_reported(profile):
+    df = synthetic_ruv(2000, seed=3)
+    df['EVENTOS'] = df['EVENTOS'] + 20
+    df.loc[:999, 'ETNIA'] = 'Gitano(a) ROM'
+    monitor = DriftMonitor(profile)
+    monitor.observe_frame(df)
+    features = monitor.report()['current']['features']
+
+    assert features['EVENTOS']['psi'] > PSI_ALERT
+    assert features['EVENTOS']['out_of_range_rate'] > 0
+    assert features['ETNIA']['unseen_rate'] == 0.5
+    assert features['ETNIA']['psi'] > PSI_ALERT
+    assert features['SEXO']['psi'] < 0.05
+    assert set(monitor.report()['current']['drifted']) == {'EVENTOS', 'ETNIA'}
+
+
+def test_single_inputs_match_the_batch_path(profile):
+    df = synthetic_ruv(MIN_SAMPLES, seed=4)
+    one_by_one, batched = DriftMonitor(profile), DriftMonitor(profile)
+    for row in df.to_dict('records'):
+        one_by_one.observe(row)
+    batched.observe_frame(df)
+
+    a, b = one_by_one.report()['current'], batched.report()['current']
+    assert a['inputs'] == b['inputs'] == MIN_SAMPLES
+    for col in ('ESTADO_DEPTO', 'ETNIA'):
+        assert a['features'][col] == b['features'][col]
+
+
+def test_scores_wait_for_enough_samples_and_windows_roll(profile, monkeypatch):
+    monitor = DriftMonitor(profile, window_s=60)
+    monitor.observe_frame(synthetic_ruv(MIN_SAMPLES - 1, seed=5))
+    assert 'psi' not in monitor.report()['current']['features']['SEXO']
+
+    # A bad input is skipped whole, never raised into the request
+    monitor.observe({'SEXO': 'Mujer'})
+    bad = synthetic_ruv(10, seed=7).astype({'EVENTOS': object})
+    bad.loc[3, 'EVENTOS'] = 'muchos'
+    monitor.observe_frame(bad)
+    assert monitor.current.n == MIN_SAMPLES - 1
+    assert monitor.current.categories['SEXO'].table[0].sum() == MIN_SAMPLES - 1
+
+    started = monitor.current.started_at
+    monkeypatch.setattr('prediction.drift.time.time', lambda: started + 61)
+    report = monitor.report()
+    assert report['previous']['inputs'] == MIN_SAMPLES - 1
+    assert report['current']['inputs'] == 0
+
+
+def test_without_profile_only_quantiles_are_reported():
+    monitor = DriftMonitor()
+    monitor.observe_frame(synthetic_ruv(500, seed=6))
+    report = monitor.report()
+
+    assert report['profile'] is None
+    assert report['current']['features']['ETNIA'] == {}
+    assert set(report['current']['features']['EVENTOS']) == {'p5', 'p50', 'p95'}
+
+
+def test_metrics_endpoint_reports_this_process():
+    import app as backend
+
+    response = backend.app.test_client().get('/api/metrics')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['pid'] == os.getpid()
+    assert body['drift']['window_s'] == backend.drift_monitor.window_s
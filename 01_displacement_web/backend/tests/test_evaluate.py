@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from training import evaluate, train
+from training.features import data_fingerprint
+from training.out_of_core import ParquetSource
+
+
+@pytest.fixture(scope='module')
+def trained_run(ingested_dataset, tmp_path_factory):
+    run_dir = tmp_path_factory.mktemp('run')
+    assert train.main(['--data', ingested_dataset, '--run-dir', str(run_dir), '--jobs', '1',
+                       '--threads-per-job', '1', '--cache-dir', str(run_dir / 'cache'),
+                       '--models', 'Logistic_Regression']) == 0
+    return run_dir
+
+
+def run_evaluate(data, models_dir, cache_dir, *extra):
+    return evaluate.main(['--data', data, '--models-dir', models_dir, '--cache-dir', str(cache_dir),
+                          '--models', 'Logistic_Regression', *extra])
+
+
+def test_scores_exactly_the_training_test_split(ingested_dataset, trained_run, tmp_path):
+    models_dir = str(trained_run / 'models')
+    manifest_path = trained_run / 'models' / 'model_manifest.json'
+    before = json.loads(manifest_path.read_text(encoding='utf-8'))
+    assert before['models']['Logistic_Regression']['held_out']['split'] == 'stratified'
+
+    assert run_evaluate(ingested_dataset, models_dir, tmp_path) == 0
+
+    summary = json.loads((trained_run / 'training_summary.json').read_text(encoding='utf-8'))
+    test = np.load(summary['split_path'])['test']
+    report_path = tmp_path / data_fingerprint(ingested_dataset) / 'evaluation_report.json'
+    metrics = json.loads(report_path.read_text(encoding='utf-8'))['models']['Logistic_Regression']
+    assert metrics['rows'] == len(test)
+    # Same rows, same model: the metrics training reported on its test split
+    trained = summary['models']['Logistic_Regression']['metrics']
+    assert metrics['accuracy'] == pytest.approx(trained['Test_Accuracy'])
+    assert metrics['f1_score'] == pytest.approx(trained['Test_F1'])
+    assert metrics['roc_auc'] == pytest.approx(trained['Test_ROC_AUC'])
+
+    # The manifest is only rewritten on request
+    assert json.loads(manifest_path.read_text(encoding='utf-8')) == before
+    assert run_evaluate(ingested_dataset, models_dir, tmp_path, '--write') == 0
+    entry = json.loads(manifest_path.read_text(encoding='utf-8'))['models']['Logistic_Regression']
+    assert entry['evaluation']['split'] == 'stratified_42'
+    assert entry['evaluation']['rows'] == len(test)
+
+
+def test_models_without_a_recorded_split_are_refused(ingested_dataset, models_copy, tmp_path):
+    with pytest.raises(ValueError, match='no training split recorded'):
+        run_evaluate(ingested_dataset, models_copy, tmp_path)
+
+
+def test_hash_split_matches_out_of_core_training(ingested_dataset):
+    key = data_fingerprint(ingested_dataset)
+    split = evaluate.held_out_split({'held_out': {'dataset': key, 'split': 'hash', 'seed': 42}},
+                                    ingested_dataset, key, '../db')
+    frames = list(evaluate.held_out_frames(ingested_dataset, split, SimpleNamespace(models_dir='../db'), 4096))
+    expected = list(ParquetSource(ingested_dataset, '../db').frames('test'))
+    assert sum(map(len, frames)) == sum(map(len, expected))
+    assert all(a.equals(b) for a, b in zip(frames, expected))
+
+    # A record for another dataset does not apply
+    assert evaluate.held_out_split({'held_out': {'dataset': 'other', 'split': 'hash', 'seed': 42}},
+                                   ingested_dataset, key, '../db') is None
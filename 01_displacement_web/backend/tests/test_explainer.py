@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from prediction.explainer import FEATURES, logit
+from prediction.predictor import ModelPredictor, WARMUP_INPUT
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return ModelPredictor(models_dir='../db')
+
+
+@pytest.mark.parametrize('model_name, method', [
+    ('Logistic_Regression', 'linear'),
+    ('XGBoost', 'tree_shap'),
+    ('Deep', 'integrated_gradients'),
+])
+def test_contributions_add_up_to_the_logit(predictor, model_name, method):
+    result = predictor.predict(model_name, WARMUP_INPUT, explain=True)
+    explanation = result['explanation']
+
+    assert explanation['method'] == method
+    assert explanation['source'] == 'computed'
+    assert sorted(item['feature'] for item in explanation['contributions']) == sorted(FEATURES)
+    total = explanation['base_value'] + sum(item['contribution'] for item in explanation['contributions'])
+    assert total == pytest.approx(float(logit(result['probability'])), abs=1e-3)
+
+
+def test_integrated_gradients_attribute_the_numeric_inputs(predictor):
+    explanation = predictor.predict('Deep', {**WARMUP_INPUT, 'EVENTOS': 5}, explain=True)['explanation']
+    numeric = {item['feature']: item['contribution'] for item in explanation['contributions']
+               if item['feature'] in ('EVENTOS', 'VIGENCIA')}
+    assert all(np.isfinite(value) for value in numeric.values())
+    assert any(value != 0 for value in numeric.values())
+
+
+def test_explained_prediction_acquires_the_model_once(monkeypatch):
+    predictor = ModelPredictor(models_dir='../db')
+    acquired = []
+    acquire = predictor.acquire_model
+
+    def counting_acquire(model_name):
+        acquired.append(model_name)
+        return acquire(model_name)
+
+    monkeypatch.setattr(predictor, 'acquire_model', counting_acquire)
+    result = predictor.predict('Deep', WARMUP_INPUT, explain=True)
+
+    assert result['explanation'] is not None
+    assert acquired == ['Deep']
+    assert 'Deep' not in predictor.models
@@ -0,0 +1,144 @@
+import gzip
+import json
+import math
+import os
+import runpy
+
+import pytest
+
+from api.geo_assets import IMMUTABLE_CACHE, MANIFEST_CACHE, GeoAssetStore
+from conftest import BACKEND_DIR
+
+build = runpy.run_path(os.path.join(BACKEND_DIR, '..', 'build_geo_assets.py'))
+
+# Two departments sharing a wiggly border along x = 1, the second with a tiny island
+BORDER = [(1 + 0.0004 * (-1) ** i, i / 50) for i in range(51)]
+WEST = [(0, 0)] + BORDER + [(0, 1), (0, 0)]
+EAST = [(2, 0), (2, 1)] + BORDER[::-1] + [(2, 0)]
+ISLAND = [(1.5, 1.5), (1.505, 1.5), (1.505, 1.505), (1.5, 1.5)]
+FEATURES = [
+    {'properties': {'NAME_1': 'Oeste', 'GID_1': 'X.1'}, 'geometry': {'type': 'Polygon', 'coordinates': [WEST]}},
+    {'properties': {'NAME_1': 'Este', 'GID_1': 'X.2'},
+     'geometry': {'type': 'MultiPolygon', 'coordinates': [[EAST], [ISLAND]]}},
+]
+
+
+def decode_arc(arc, transform):
+    (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+    x = y = 0
+    points = []
+    for dx, dy in arc:
+        x, y = x + dx, y + dy
+        points.append((x * sx + tx, y * sy + ty))
+    return points
+
+
+def arc_ids(geometry):
+    rings = geometry['arcs'] if geometry['type'] == 'Polygon' else [r for p in geometry['arcs'] for r in p]
+    return {arc for ring in rings for arc in ring}
+
+
+def test_douglas_peucker_keeps_ends_and_stays_within_tolerance():
+    points = [(i / 100, math.sin(i / 10)) for i in range(101)]
+    kept = build['douglas_peucker'](points, 0.01)
+
+    assert kept[0] == points[0] and kept[-1] == points[-1]
+    assert len(kept) < len(points) / 2
+    # Every dropped point is within tolerance of the segment that replaced it
+    for (x1, y1), (x2, y2) in zip(kept, kept[1:]):
+        for px, py in points:
+            if x1 <= px <= x2:
+                distance = abs((x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)) / math.hypot(x2 - x1, y2 - y1)
+                assert distance <= 0.01 + 1e-9
+
+
+def test_shared_border_is_one_arc_at_every_level():
+    topology = build['Topology'](FEATURES)
+    properties = build['feature_properties'](FEATURES, {'Dept Oeste': 'Oeste'})
+
+    # Shared border, the rest of each outer ring, and the island
+    assert len(topology.arcs) == 4
+    for name, level in build['LEVELS'].items():
+        topo = build['build_level'](topology, properties, level)
+        west, east = topo['objects']['departamentos']['geometries']
+        shared = {~arc if arc < 0 else arc for arc in arc_ids(west)} & {~arc if arc < 0 else arc for arc in arc_ids(east)}
+        assert len(shared) == 1
+
+        # The decoded border is within tolerance + one grid cell of the original
+        border = decode_arc(topo['arcs'][shared.pop()], topo['transform'])
+        cell = max(topo['transform']['scale'])
+        assert all(abs(x - 1) <= level['tolerance'] + cell for x, _ in border)
+        assert west['properties']['department'] == 'Dept Oeste'
+        assert east['properties']['department'] == 'Este'
+
+    low = build['build_level'](topology, properties, build['LEVELS']['low'])
+    high = build['build_level'](topology, properties, build['LEVELS']['high'])
+    # The island collapses below the low-zoom tolerance
+    assert low['objects']['departamentos']['geometries'][1]['type'] == 'Polygon'
+    assert high['objects']['departamentos']['geometries'][1]['type'] == 'MultiPolygon'
+    assert sum(map(len, low['arcs'])) < sum(map(len, high['arcs']))
+
+
+@pytest.fixture
+def assets_dir(tmp_path):
+    topology = build['Topology'](FEATURES)
+    properties = build['feature_properties'](FEATURES, {})
+    topologies = {name: build['build_level'](topology, properties, level) for name, level in build['LEVELS'].items()}
+    build['write_assets'](topologies, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_store_serves_the_smallest_accepted_variant(assets_dir):
+    store = GeoAssetStore(assets_dir)
+    name = store.manifest()['levels']['high']['file']
+    plain, encoding = store.asset(name)
+    assert encoding is None
+    assert json.loads(plain)['type'] == 'Topology'
+
+    body, encoding = store.asset(name, 'gzip')
+    assert encoding == 'gzip' and gzip.decompress(body) == plain
+
+    brotli = pytest.importorskip('brotli')
+    body, encoding = store.asset(name, 'gzip, br')
+    assert encoding == 'br' and brotli.decompress(body) == plain
+
+    # Only files named by the manifest
+    assert store.asset('manifest.json') is None
+    assert store.asset('../' + name) is None
+
+
+def test_rebuilt_manifest_is_picked_up(assets_dir):
+    store = GeoAssetStore(assets_dir)
+    old = store.manifest()['levels']['low']['file']
+
+    features = [{**FEATURES[0], 'properties': {'NAME_1': 'Otro'}}]
+    topology = build['Topology'](features)
+    build['write_assets']({'low': build['build_level'](topology, build['feature_properties'](features, {}),
+                                                       build['LEVELS']['low'])}, assets_dir)
+    path = os.path.join(assets_dir, 'manifest.json')
+    os.utime(path, (os.path.getmtime(path) + 5,) * 2)
+
+    new = store.manifest()['levels']['low']['file']
+    assert new != old
+    assert store.asset(old) is None
+    assert store.asset(new) is not None
+
+
+def test_routes_set_cache_headers(assets_dir, monkeypatch, tmp_path):
+    import app as backend
+
+    monkeypatch.setattr(backend, 'geo_assets', GeoAssetStore(assets_dir))
+    client = backend.app.test_client()
+
+    manifest = client.get('/api/geo/manifest.json')
+    assert manifest.headers['Cache-Control'] == MANIFEST_CACHE
+    name = manifest.get_json()['levels']['medium']['file']
+
+    asset = client.get(f'/api/geo/{name}', headers={'Accept-Encoding': 'gzip'})
+    assert asset.status_code == 200
+    assert asset.headers['Cache-Control'] == IMMUTABLE_CACHE
+    assert asset.headers['Content-Encoding'] == 'gzip'
+    assert client.get('/api/geo/nope.topo.json').status_code == 404
+
+    monkeypatch.setattr(backend, 'geo_assets', GeoAssetStore(str(tmp_path / 'empty')))
+    assert client.get('/api/geo/manifest.json').status_code == 404
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.history_cube import DIMENSIONS, DISPLACEMENT_HECHO, HistoryCube, hecho_labels
+
+
+@pytest.fixture(scope='module')
+def records(ingested_dataset):
+    df = pd.read_parquet(ingested_dataset)
+    df['HECHO'] = hecho_labels(df)
+    for dim in DIMENSIONS:
+        df[dim] = df[dim].astype(int) if dim == 'VIGENCIA' else df[dim].astype(str)
+    return df
+
+
+@pytest.fixture(scope='module')
+def cube(ingested_dataset, tmp_path_factory):
+    return HistoryCube.build(ingested_dataset, str(tmp_path_factory.mktemp('cube') / 'history_cube.npz'))
+
+
+def expected_counts(records, group_by, filters):
+    df = records
+    for dim, values in filters.items():
+        df = df[df[dim].isin(values)]
+    grouped = df.groupby(group_by)
+    return {key if isinstance(key, tuple) else (key,): (len(rows), int((rows['HECHO'] == DISPLACEMENT_HECHO).sum()))
+            for key, rows in grouped}
+
+
+@pytest.mark.parametrize('group_by, filters', [
+    (['VIGENCIA'], {}),
+    (['ESTADO_DEPTO'], {'ESTADO_DEPTO': ['Meta', 'Cauca']}),
+    (['ESTADO_DEPTO', 'SEXO'], {'ESTADO_DEPTO': ['Nariño', 'Bolivar', 'Choco'], 'SEXO': ['Mujer']}),
+    (['VIGENCIA', 'ETNIA'], {'VIGENCIA': [2011, 2014], 'ETNIA': ['Indigena', 'Ninguna']}),
+])
+def test_query_matches_a_groupby_of_the_records(cube, records, group_by, filters):
+    result = cube.query(group_by, filters)
+
+    found = {tuple(row[dim] for dim in group_by): (row['total'], row['displacement']) for row in result['rows']}
+    assert found == expected_counts(records, group_by, filters)
+
+
+def test_grouped_labels_follow_the_filtered_positions():
+    labels = {dim: ['a', 'b', 'c'] for dim in DIMENSIONS}
+    labels['VIGENCIA'] = [2000, 2001, 2002]
+    labels['HECHO'] = ['Otros hechos', DISPLACEMENT_HECHO]
+    counts = np.zeros([len(labels[dim]) for dim in DIMENSIONS], dtype='uint32')
+    counts[1, 0, 0, 0, 0, 2, 1] = 5
+    counts[2, 0, 0, 0, 0, 0, 0] = 3
+    cube = HistoryCube(counts, labels)
+
+    rows = cube.query(['ESTADO_DEPTO', 'VIGENCIA'], {'ESTADO_DEPTO': ['b', 'c'], 'VIGENCIA': [2000, 2002]})['rows']
+
+    assert sorted((r['ESTADO_DEPTO'], r['VIGENCIA'], r['total'], r['displacement']) for r in rows) == [
+        ('b', 2002, 5, 5), ('c', 2000, 3, 0)]
+
+
+def test_vigencia_ranges_are_clamped_to_the_cube_years(cube):
+    from app import parse_stats_filters
+
+    years = cube.labels['VIGENCIA']
+    filters = parse_stats_filters({'VIGENCIA': '0-999999999'}, years)
+    assert filters == {'VIGENCIA': years}
+    assert parse_stats_filters({'VIGENCIA': '2012-2013,1990'}, years) == {'VIGENCIA': [2012, 2013, '1990']}
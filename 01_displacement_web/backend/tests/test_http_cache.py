@@ -0,0 +1,117 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from api.http_cache import HttpCache, accepted_encodings, etag_matches
+
+
+@pytest.fixture
+def cached_app():
+    app = Flask(__name__)
+    http_cache = HttpCache(app, min_size=100)
+    payload = {'items': [{'name': f'item {i}', 'value': i} for i in range(200)]}
+    http_cache.register('items', lambda: payload, max_age=600)
+    http_cache.register('nothing', lambda: None)
+    http_cache.precompute()
+
+    @app.route('/items')
+    def items():
+        return http_cache.respond('items')
+
+    @app.route('/dynamic/<int:n>')
+    def dynamic(n):
+        return jsonify({'values': list(range(n))})
+
+    app.http_cache = http_cache
+    app.payload = payload
+    return app
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', {'gzip', 'deflate', 'br'}),
+    ('br;q=0, gzip;q=0.5', {'gzip'}),
+    ('gzip;q=abc, identity', {'identity'}),
+    (None, set()),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('*', '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_conditional_get_returns_304_without_body(cached_app):
+    client = cached_app.test_client()
+    first = client.get('/items')
+    assert first.status_code == 200
+    assert first.get_json() == cached_app.payload
+    assert first.headers['Cache-Control'] == 'public, max-age=600'
+
+    again = client.get('/items', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    stale = client.get('/items', headers={'If-None-Match': '"stale"'})
+    assert stale.status_code == 200
+
+
+def test_precompressed_bodies_decode_to_the_same_payload(cached_app):
+    client = cached_app.test_client()
+    plain = client.get('/items')
+
+    zipped = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == plain.data
+    assert len(zipped.data) < len(plain.data)
+    assert zipped.headers['ETag'] == plain.headers['ETag']
+
+    brotli = pytest.importorskip('brotli')
+    br = client.get('/items', headers={'Accept-Encoding': 'gzip, br'})
+    assert br.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(br.data) == plain.data
+
+
+def test_invalidate_rebuilds_with_a_new_etag(cached_app):
+    client = cached_app.test_client()
+    etag = client.get('/items').headers['ETag']
+
+    cached_app.payload['items'].append({'name': 'new', 'value': -1})
+    assert client.get('/items').headers['ETag'] == etag
+    cached_app.http_cache.invalidate('items')
+    assert client.get('/items').headers['ETag'] != etag
+    assert cached_app.http_cache.entry('nothing') is None
+
+
+def test_large_dynamic_responses_are_compressed(cached_app):
+    client = cached_app.test_client()
+
+    small = client.get('/dynamic/3', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+    large = client.get('/dynamic/500', headers={'Accept-Encoding': 'gzip'})
+    assert large.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in large.headers['Vary']
+    assert json.loads(gzip.decompress(large.data)) == {'values': list(range(500))}
+
+    identity = client.get('/dynamic/500')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_json() == {'values': list(range(500))}
+
+
+def test_department_spellings_share_one_etag():
+    import app as backend
+
+    client = backend.app.test_client()
+    canonical = client.get('/api/department_geo/Bogota, D.C.')
+    spelled = client.get('/api/department_geo/bogotá dc', headers={'If-None-Match': canonical.headers['ETag']})
+
+    assert canonical.status_code == 200
+    assert spelled.status_code == 304
+    assert client.get('/api/department_geo/Texas').status_code == 404
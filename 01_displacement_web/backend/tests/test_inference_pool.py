@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from prediction.inference_pool import InferencePool, InferencePoolBusy
+from prediction.predictor import ModelPredictor
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = InferencePool(ModelPredictor(models_dir='../db'), n_workers=1, health_interval=3600)
+    yield pool
+    pool.shutdown()
+
+
+def test_reload_reports_workers_that_never_become_idle(pool):
+    # Simulate a stuck worker: its slot is taken out of the idle queue
+    index = pool._idle.get()
+    try:
+        results = pool.reload_models(timeout=0.2)
+    finally:
+        pool._idle.put(index)
+
+    assert results == {0: {'status': 'timeout', 'error': 'Worker 0 not idle within 0.2s'}}
+
+
+def test_reload_reaches_idle_workers(pool):
+    results = pool.reload_models(timeout=30)
+    assert list(results) == [0]
+    assert results[0] == {}
+
+
+def test_waiting_for_a_worker_is_bounded_by_the_queue_timeout(pool):
+    from prediction.predictor import WARMUP_INPUT
+
+    # Every worker is busy: the request gives up after queue_timeout, not request_timeout
+    index = pool._idle.get()
+    try:
+        start = time.perf_counter()
+        with pytest.raises(InferencePoolBusy):
+            pool.predict('Logistic_Regression', WARMUP_INPUT)
+        assert time.perf_counter() - start < pool.queue_timeout + 1.0
+    finally:
+        pool._idle.put(index)
+
+
+def test_busy_pool_maps_to_503():
+    from app import prediction_error
+
+    payload, status = prediction_error(InferencePoolBusy("Inference queue is full"))
+    assert status == 503
+    assert 'ocupado' in payload['error']
+
+
+def test_explanation_is_computed_in_the_worker(pool):
+    from prediction.predictor import WARMUP_INPUT
+
+    result = pool.predict('Logistic_Regression', WARMUP_INPUT, explain=True)
+
+    assert result['explanation']['source'] == 'computed'
+    assert result['probability'] == pytest.approx(pool.predict('Logistic_Regression', WARMUP_INPUT)['probability'])
+    # The web process never built an explainer or loaded the model
+    assert pool.encoder.explainer is None
+    assert 'Logistic_Regression' not in pool.encoder.models
+
+
+def test_pool_reports_the_workers_model_time(pool):
+    from prediction.predictor import WARMUP_INPUT
+
+    result, inference_ms = pool.predict_timed('XGBoost', WARMUP_INPUT)
+    assert result == pool.predict('XGBoost', WARMUP_INPUT)
+    assert 0 < inference_ms < 1000
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_ruv
+from preprocessing.geo_data import calculate_distances
+from training.ingest import (
+    CATEGORICAL_COLS, GEO_COLS, PARTITION_COL, POSITIVE_HECHO, TARGET_COL, ingest, load_dataset
+)
+
+HECHOS = [POSITIVE_HECHO, 'Amenaza', 'Desaparici�n forzada', 'Sin informacion']
+SORT_COLS = CATEGORICAL_COLS + ['VIGENCIA', 'EVENTOS', 'HECHO']
+
+
+@pytest.fixture(scope='module')
+def raw_export(tmp_path_factory):
+    """RUV export rows: HECHO instead of the target, removable values, one row without EVENTOS"""
+    rng = np.random.default_rng(3)
+    df = synthetic_ruv(2500, seed=3).drop(columns=GEO_COLS + [TARGET_COL])
+    df['HECHO'] = rng.choice(HECHOS, len(df))
+    df.loc[::50, 'SEXO'] = 'No Informa'
+    df.loc[::70, 'ESTADO_DEPTO'] = 'Nari�o'
+    df['EVENTOS'] = df['EVENTOS'].astype(object)
+    df.loc[7, 'EVENTOS'] = None
+
+    path = str(tmp_path_factory.mktemp('raw') / 'ruv.csv')
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def reference(df):
+    """What the ingest should hold, computed on the whole frame at once"""
+    df = df[(df['SEXO'] != 'No Informa') & (df['HECHO'] != 'Sin informacion') & df['EVENTOS'].notna()].copy()
+    df['ESTADO_DEPTO'] = df['ESTADO_DEPTO'].replace({'Nari�o': 'Nariño'})
+    df['HECHO'] = df['HECHO'].replace({'Desaparici�n forzada': 'Desaparición forzada'})
+    df['EVENTOS'] = df['EVENTOS'].astype(int)
+    df[TARGET_COL] = (df['HECHO'] == POSITIVE_HECHO).astype(int)
+    for col in GEO_COLS:
+        df[col] = df['ESTADO_DEPTO'].map(lambda d: calculate_distances(d)[col]).astype('float32')
+    return df
+
+
+def comparable(df):
+    df = df.astype({col: str for col in CATEGORICAL_COLS + ['HECHO']})
+    df = df.astype({'VIGENCIA': int, 'EVENTOS': int, TARGET_COL: int})
+    return df[SORT_COLS + GEO_COLS + [TARGET_COL]].sort_values(SORT_COLS + GEO_COLS).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('chunksize', [97, 100_000])
+def test_streamed_ingest_matches_cleaning_in_memory(raw_export, tmp_path, chunksize):
+    path, df = raw_export
+    output = str(tmp_path / 'ruv_parquet')
+
+    stats = ingest(path, output, chunksize=chunksize)
+    loaded = load_dataset(output)
+
+    expected = reference(df)
+    pd.testing.assert_frame_equal(comparable(loaded), comparable(expected), check_dtype=False, atol=1e-3)
+    assert all(isinstance(loaded[col].dtype, pd.CategoricalDtype) for col in CATEGORICAL_COLS)
+    assert stats['rows_in'] == len(df)
+    assert stats['rows_out'] == len(expected)
+    assert stats['dropped_missing'] == 1
+    assert stats['rows_per_vigencia'] == {str(k): v for k, v in expected[PARTITION_COL].value_counts().sort_index().items()}
+    with open(os.path.join(output, '_ingest.json'), encoding='utf-8') as f:
+        assert json.load(f)['rows_out'] == stats['rows_out']
+
+
+def test_year_filter_prunes_partitions(raw_export, tmp_path):
+    path, df = raw_export
+    output = str(tmp_path / 'ruv_parquet')
+    ingest(path, output)
+
+    loaded = load_dataset(output, columns=['VIGENCIA', 'EVENTOS'], years=[2011, 2013])
+    assert set(loaded['VIGENCIA']) == {2011, 2013}
+    assert len(loaded) == (reference(df)['VIGENCIA'].isin([2011, 2013])).sum()
+
+
+def test_existing_output_needs_overwrite(raw_export, tmp_path):
+    path, _ = raw_export
+    output = str(tmp_path / 'ruv_parquet')
+    ingest(path, output)
+
+    with pytest.raises(FileExistsError):
+        ingest(path, output)
+    assert ingest(path, output, overwrite=True)['rows_out'] > 0
+
+
+def test_cleaned_csv_keeps_its_binary_target(tmp_path):
+    df = synthetic_ruv(300, seed=4).drop(columns=['HECHO'] + GEO_COLS)
+    path = str(tmp_path / 'displacement_vs_others.csv')
+    df.to_csv(path, index=False)
+
+    ingest(path, str(tmp_path / 'out'))
+    loaded = load_dataset(str(tmp_path / 'out'))
+
+    assert len(loaded) == len(df)
+    assert loaded[TARGET_COL].sum() == df[TARGET_COL].sum()
+    assert loaded['HECHO'].isna().all()
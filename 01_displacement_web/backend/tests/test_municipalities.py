@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.predictor import WARMUP_INPUT
+from preprocessing.geo_data import URBAN_CENTER_COORDS, calculate_distances
+from preprocessing.municipalities import (
+    GEO_COLS, MunicipalityTable, MunicipalValidationStore, build_coordinate_table, geo_features, pack_keys
+)
+
+# DIVIPOLA-style rows: decimal commas, a name repeated in two departments,
+# department names as DIVIPOLA writes them, and one row without coordinates
+DIVIPOLA = pd.DataFrame([
+    ('5001', 'Medellín', 'ANTIOQUIA', '6,2476', '-75,5658'),
+    ('5400', 'La Unión', 'ANTIOQUIA', '5.9739', '-75.3611'),
+    ('52399', 'La Unión', 'NARIÑO', '1.6047', '-77.1314'),
+    ('52001', 'Pasto', 'NARIÑO', '1.2136', '-77.2811'),
+    ('11001', 'Bogotá, D.C.', 'BOGOTÁ, D.C.', '4.6097', '-74.0817'),
+    ('50001', 'Villavicencio', 'META', '', '-73.6266'),
+], columns=['cod_mpio', 'nom_mpio', 'dpto', 'latitud', 'longitud'])
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('municipalities') / 'municipalities.npz')
+    build_coordinate_table(DIVIPOLA, output_path=path)
+    return MunicipalityTable(path)
+
+
+def test_geo_features_match_the_department_distances():
+    departments = sorted(URBAN_CENTER_COORDS)
+    lat, lon = np.array([URBAN_CENTER_COORDS[d] for d in departments]).T
+
+    geo = geo_features(lat, lon)
+
+    expected = np.array([[calculate_distances(d)[col] for col in GEO_COLS] for d in departments])
+    np.testing.assert_allclose(geo, expected, atol=0.011)
+
+
+def test_table_resolves_codes_and_names(table):
+    assert len(table) == 5
+    assert table.info(table.resolve('5001'))['municipality'] == 'Medellín'
+    assert table.resolve('50001') is None
+
+    # A name in two departments needs the department
+    assert table.resolve('La Union') is None
+    nariño = table.resolve('la union', 'Nariño')
+    assert table.info(nariño)['code'] == 52399
+    assert table.info(nariño)['department'] == 'Nariño'
+    assert table.info(table.resolve('Medelin'))['code'] == 5001
+    assert table.resolve('Pasto', 'Antioquia') is None
+
+    assert table.rows_for_codes([52001, 1, 11001]).tolist() == [table.resolve('52001'), -1, table.resolve('11001')]
+    assert [m['code'] for m in table.listing('antioquia')] == [5001, 5400]
+
+
+def test_capital_info_matches_its_department(table):
+    info = table.info(table.resolve('Pasto'))
+    expected = calculate_distances('Nariño')
+    for col in GEO_COLS:
+        assert info[col] == pytest.approx(expected[col], abs=0.011)
+
+
+def test_pack_keys_flags_fields_that_do_not_fit():
+    keys = pack_keys([5001, 5001, 1 << 17], [[0, 0, 0]] * 4, [2010, 1970, 2010], [3, 3, 3])
+    assert keys[0] >= 0
+    assert keys[1:].tolist() == [-1, -1]
+
+
+def test_validation_store_counts_match_a_groupby(table, tmp_path):
+    rng = np.random.default_rng(0)
+    n = 3000
+    extract = pd.DataFrame({
+        'cod_mpio': rng.choice(['5001', '52399', '52001', '99999'], n),
+        'sexo': rng.choice(['Mujer', 'Hombre', 'No Informa'], n),
+        'etnia': rng.choice(['Ninguna', 'Indigena (Acreditado RA)'], n),
+        'discapacidad': 'Ninguna',
+        'ciclo_vital': rng.choice(['entre 18 y 28', 'entre 29 y 60'], n),
+        'vigencia': rng.choice(['2012', '2013'], n),
+        'eventos': rng.choice(['1', '2', '3'], n),
+        'hecho': rng.choice(['Desplazamiento forzado', 'Amenaza'], n),
+    })
+    store = MunicipalValidationStore.build(extract, table, output_path=str(tmp_path / 'store.npz'))
+    loaded = MunicipalValidationStore.load(str(tmp_path / 'store.npz'))
+
+    query = {'SEXO': 'Mujer', 'ETNIA': 'Indigena', 'DISCAPACIDAD': 'Ninguna', 'CICLO_VITAL': 'entre 29 y 59',
+             'VIGENCIA': 2012, 'EVENTOS': 2}
+    rows = extract[(extract['cod_mpio'] == '52399') & (extract['sexo'] == 'Mujer') &
+                   (extract['etnia'] == 'Indigena (Acreditado RA)') & (extract['ciclo_vital'] == 'entre 29 y 60') &
+                   (extract['vigencia'] == '2012') & (extract['eventos'] == '2')]
+    expected = (int((rows['hecho'] == 'Desplazamiento forzado').sum()), int((rows['hecho'] == 'Amenaza').sum()))
+
+    assert sum(expected) > 0
+    assert store.lookup(52399, query) == loaded.lookup(52399, query) == expected
+    assert store.lookup(99999, query) == (0, 0)
+    assert store.lookup(52399, {**query, 'SEXO': 'No Informa'}) == (0, 0)
+    assert store.lookup(52399, {**query, 'EVENTOS': 1 << 20}) == (0, 0)
+
+
+def test_predict_takes_geo_from_the_municipality(table, monkeypatch):
+    import app as backend
+
+    captured = {}
+
+    def run_prediction(model_name, cleaned_input, explain=False):
+        captured.update(cleaned_input)
+        return {'prediction': 1, 'probability': 0.8}
+
+    monkeypatch.setattr(backend, 'get_municipality_table', lambda: table)
+    monkeypatch.setattr(backend, 'get_validation_store', lambda: None)
+    monkeypatch.setattr(backend, 'run_prediction', run_prediction)
+    monkeypatch.setattr(backend.socrata_client, 'query_exact_match', lambda filters: None)
+    client = backend.app.test_client()
+
+    response = client.post('/api/predict', json={**WARMUP_INPUT, 'model': 'Logistic_Regression',
+                                                 'MUNICIPIO': 'La Union', 'ESTADO_DEPTO': 'Nariño'})
+    assert response.status_code == 200
+    info = table.info(table.resolve('52399'))
+    assert response.get_json()['municipality'] == info
+    assert captured['ESTADO_DEPTO'] == 'Nariño'
+    assert [captured[col] for col in GEO_COLS] == [info[col] for col in GEO_COLS]
+
+    response = client.post('/api/predict', json={**WARMUP_INPUT, 'model': 'Logistic_Regression', 'MUNICIPIO': 'Atlantis'})
+    assert response.status_code == 400
+    assert client.get('/api/municipality_geo/5001').get_json()['municipality'] == 'Medellín'
+    assert client.get('/api/municipality_geo/Atlantis').status_code == 404
@@ -0,0 +1,39 @@
+import pytest
+
+from preprocessing.geo_data import resolve_department
+from preprocessing.name_index import NameIndex, edit_distance
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Antioquia', 'Antioquia'),
+    ('ANTIOQUIA', 'Antioquia'),
+    ('Nari�o', 'Nariño'),
+    ('NariÃ±o', 'Nariño'),
+    ('Bogotá D.C.', 'Bogota, D.C.'),
+    ('Vale del cauca', 'Valle del Cauca'),
+    # One-letter typos score below the Dice cutoff on short names
+    ('Antiokia', 'Antioquia'),
+    ('Antiqoia', 'Antioquia'),
+    ('santandr', 'Santander'),
+    ('Guajira', 'La Guajira'),
+    ('Sucer', 'Sucre'),
+])
+def test_resolve_department(text, expected):
+    assert resolve_department(text) == expected
+
+
+@pytest.mark.parametrize('text', ['xyz', 'Madrid', '', None])
+def test_unknown_departments_stay_unresolved(text):
+    assert resolve_department(text) is None
+
+
+def test_edit_distance_counts_adjacent_swaps_once():
+    assert edit_distance('antiqoia', 'antioquia', 2) == 2
+    assert edit_distance('sucer', 'sucre', 1) == 1
+    assert edit_distance('meta', 'cesar', 1) == 2
+
+
+def test_equally_close_names_are_not_guessed():
+    index = NameIndex(['Caro', 'Cara'])
+    assert index.match('Carx', cutoff=0.9) is None
+    assert index.match('Carox', cutoff=0.9) == ('Caro', 0.8, 'edit')
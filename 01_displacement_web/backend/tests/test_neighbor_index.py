@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.history_cube import DISPLACEMENT_HECHO, hecho_labels
+from preprocessing.neighbor_index import KEY_COLS, NeighborIndex
+
+QUERIES = [
+    {'ESTADO_DEPTO': 'Meta', 'SEXO': 'Mujer', 'ETNIA': 'Indigena', 'DISCAPACIDAD': 'Ninguna',
+     'CICLO_VITAL': 'entre 18 y 28', 'VIGENCIA': 2012, 'EVENTOS': 3},
+    {'ESTADO_DEPTO': 'Cauca', 'SEXO': 'Hombre', 'ETNIA': 'Ninguna', 'DISCAPACIDAD': 'Fisica',
+     'CICLO_VITAL': 'entre 0 y 5', 'VIGENCIA': 2030, 'EVENTOS': 40},
+]
+
+
+@pytest.fixture(scope='module')
+def records(ingested_dataset):
+    df = pd.read_parquet(ingested_dataset)
+    df['HECHO'] = hecho_labels(df)
+    for col in KEY_COLS:
+        df[col] = df[col].astype(str)
+    df['VIGENCIA'] = df['VIGENCIA'].astype(int)
+    return df
+
+
+@pytest.fixture(scope='module')
+def index_path(ingested_dataset, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('neighbors') / 'ruv_neighbors.npz')
+    NeighborIndex.build(ingested_dataset, path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def index(index_path):
+    return NeighborIndex.load(index_path)
+
+
+def same_profile(records, query):
+    mask = np.ones(len(records), dtype=bool)
+    for col in KEY_COLS:
+        mask &= (records[col] == query[col]).to_numpy()
+    rows = records[mask]
+    distance = (rows['VIGENCIA'] - query['VIGENCIA']).abs() + np.abs(np.log2(rows['EVENTOS'] / query['EVENTOS']))
+    return rows.assign(distance=distance.to_numpy())
+
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('k', [1, 20, 10_000])
+def test_nearest_is_the_smallest_ball_holding_k_records(index, records, query, k):
+    rows = same_profile(records, query)
+    points, totals = index.nearest(query, k=k)
+
+    # Reported distances are rounded to 3 decimals
+    radius = max(point['distance'] for point in points)
+    inside = rows[rows['distance'] <= radius + 5e-4]
+    assert sum(point['records'] for point in points) == len(inside) == int(totals.sum())
+    assert len(inside) >= min(k, len(rows))
+    # Without the outermost distance the ball would hold fewer than k records
+    assert (rows['distance'] < radius - 5e-4).sum() < k
+
+    hecho = dict(zip(index.vocab['HECHO'], totals.tolist()))
+    assert hecho.get(DISPLACEMENT_HECHO, 0) == int((inside['HECHO'] == DISPLACEMENT_HECHO).sum())
+
+
+def test_unknown_profiles_have_no_neighbors(index):
+    assert index.nearest({**QUERIES[0], 'ESTADO_DEPTO': 'Amazonas'}) is None
+    assert index.validate({**QUERIES[0], 'ETNIA': 'Gitano(a) ROM'}, {'prediction': 1}) is None
+
+
+def test_validate_reports_the_neighbor_majority(index, records):
+    query = QUERIES[0]
+    points, totals = index.nearest(query)
+    result = index.validate(query, {'prediction': 1})
+
+    assert result['match_type'] == 'approximate_match'
+    assert result['displacement_count'] + result['other_count'] == int(totals.sum())
+    assert result['real_value'] == int(result['displacement_share'] > 0.5)
+    assert result['is_consistent'] == (result['real_value'] == 1)
+    assert result['neighbors'] == points
+
+
+def test_built_and_loaded_indexes_agree(index, index_path, ingested_dataset, tmp_path):
+    built = NeighborIndex.build(ingested_dataset, str(tmp_path / 'again.npz'))
+    for query in QUERIES:
+        assert built.nearest(query)[0] == index.nearest(query)[0]
+    assert np.all(np.diff(index.keys) >= 0)
@@ -0,0 +1,60 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.explainer import Explainer, logit
+from prediction.predictor import ModelPredictor
+from training.features import fit_preprocessing, load_training_frame
+from training.out_of_core import ParquetSource, run_out_of_core_job
+from training.train import ensure_manifest
+
+
+@pytest.fixture(scope='module')
+def xgboost_artifact(ingested_dataset, tmp_path_factory):
+    models_dir = str(tmp_path_factory.mktemp('models'))
+    fit_preprocessing(load_training_frame(ingested_dataset), models_dir)
+    ensure_manifest(models_dir, ['XGBoost'])
+
+    jobs_dir = tmp_path_factory.mktemp('jobs')
+    job = {
+        'model': 'XGBoost', 'architecture': 'small',
+        'params': {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.3, 'random_state': 0},
+        'threads': 1, 'models_dir': models_dir, 'data_path': ingested_dataset, 'xgb_mode': 'quantile',
+        'model_path': str(jobs_dir / 'XGBoost__small.pkl'),
+        'proba_path': str(jobs_dir / 'proba.npy'),
+        'labels_path': str(jobs_dir / 'labels.npy'),
+        'checkpoint_path': str(jobs_dir / 'XGBoost__small.json')
+    }
+    checkpoint = run_out_of_core_job(job)
+    return models_dir, job, checkpoint
+
+
+def test_saved_xgboost_predicts_through_the_serving_path(ingested_dataset, xgboost_artifact):
+    models_dir, job, checkpoint = xgboost_artifact
+    assert checkpoint['metrics']['Test_ROC_AUC'] > 0.6
+
+    predictor = ModelPredictor(models_dir=models_dir)
+    model = joblib.load(job['model_path'])
+    df = next(ParquetSource(ingested_dataset, models_dir).frames('test'))
+
+    batch = predictor.predict_proba_encoded(model, 'XGBoost', predictor.encode_batch('XGBoost', df))
+    np.testing.assert_allclose(batch, np.load(job['proba_path'])[:len(df)], atol=1e-5)
+
+    row = df.drop(columns='Desplazamiento_forzado_binaria').iloc[0].to_dict()
+    predictor.models['XGBoost'] = model
+    predictor.pin_model('XGBoost')
+    assert predictor.predict('XGBoost', row)['probability'] == pytest.approx(batch[0], abs=1e-5)
+
+
+def test_saved_xgboost_explains_with_tree_shap(ingested_dataset, xgboost_artifact):
+    models_dir, job, _ = xgboost_artifact
+    predictor = ModelPredictor(models_dir=models_dir)
+    model = joblib.load(job['model_path'])
+    df = pd.read_parquet(ingested_dataset).head(5)
+
+    explainer = Explainer(predictor)
+    contribs, base, method = explainer.explain_batch(model, 'XGBoost', df)
+    assert method == 'tree_shap'
+    proba = predictor.classic_proba(model, predictor.encode_batch('XGBoost', df))
+    np.testing.assert_allclose(base + contribs.sum(axis=1), logit(proba), atol=1e-4)
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.predictor import ModelPredictor, WARMUP_INPUT
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return ModelPredictor(models_dir='../db')
+
+
+def inputs(n):
+    rows = []
+    for i in range(n):
+        rows.append({**WARMUP_INPUT, 'VIGENCIA': 2000 + i % 25, 'EVENTOS': 1 + i % 7})
+    return rows
+
+
+class ThreadCountRecorder:
+    """XGBoost-like model that counts its n_jobs changes"""
+
+    def __init__(self):
+        self.n_jobs = None
+        self.changes = 0
+
+    def set_params(self, n_jobs):
+        self.n_jobs = n_jobs
+        self.changes += 1
+
+
+def test_xgb_copies_are_configured_once(predictor):
+    model = ThreadCountRecorder()
+    single, batch = predictor.threading['xgb_single'], predictor.threading['xgb_batch']
+
+    def call(i):
+        n_rows = 1 if i % 2 else 500
+        return n_rows, predictor.xgb_model(model, 'XGBoost', n_rows)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(call, range(200)))
+
+    for n_rows, configured in results:
+        assert configured.n_jobs == (single if n_rows == 1 else batch)
+        assert configured.changes == 1
+    assert len({id(configured) for _, configured in results}) == len({single, batch})
+    # The shared model is never changed, other models are used as they are
+    assert model.changes == 0
+    assert predictor.xgb_model(model, 'Logistic_Regression', 1) is model
+
+
+def test_concurrent_xgboost_predictions_match_sequential(predictor):
+    rows = inputs(40)
+    df = pd.DataFrame(rows)
+    predictor.pin_model('XGBoost')
+    expected_batch = predictor.predict_batch('XGBoost', df)
+    expected_single = [predictor.predict('XGBoost', row)['probability'] for row in rows]
+
+    def call(i):
+        if i % 4 == 0:
+            return predictor.predict_batch('XGBoost', df)
+        return predictor.predict('XGBoost', rows[i % len(rows)])['probability']
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(call, range(80)))
+
+    for i, result in enumerate(results):
+        if i % 4 == 0:
+            np.testing.assert_allclose(result, expected_batch, rtol=1e-6)
+        else:
+            assert result == pytest.approx(expected_single[i % len(rows)], rel=1e-6)
+
+
+def test_a_cold_load_does_not_block_other_models(monkeypatch):
+    predictor = ModelPredictor(models_dir='../db')
+    predictor.pin_model('Logistic_Regression')
+    loading, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_read(model_name):
+        loads.append(model_name)
+        loading.set()
+        release.wait(10)
+        return object()
+
+    monkeypatch.setattr(predictor, 'read_model', slow_read)
+    with ThreadPoolExecutor(4) as pool:
+        cold = [pool.submit(predictor.acquire_model, 'XGBoost') for _ in range(3)]
+        assert loading.wait(10)
+        # The resident model is served while XGBoost is still loading
+        assert pool.submit(predictor.acquire_model, 'Logistic_Regression').result(timeout=5) is not None
+        release.set()
+        models = [future.result(timeout=10) for future in cold]
+
+    # Concurrent requests for the cold model share one load
+    assert loads == ['XGBoost']
+    assert models[0] is models[1] is models[2]
+    for _ in cold:
+        predictor.release_model('XGBoost')
+    assert 'XGBoost' not in predictor.models
+
+
+def rewrite_manifest(models_dir, update):
+    path = os.path.join(models_dir, 'model_manifest.json')
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    update(manifest)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+
+def test_reload_swaps_a_changed_model(models_copy):
+    predictor = ModelPredictor(models_dir=models_copy)
+    predictor.pin_model('Logistic_Regression')
+    before = predictor.models['Logistic_Regression']
+    rewrite_manifest(models_copy, lambda m: m['models']['Logistic_Regression'].update(version='2'))
+
+    results = predictor.reload_models()
+    assert results['Logistic_Regression']['status'] == 'swapped'
+    assert predictor.models['Logistic_Regression'] is not before
+
+
+def test_reload_refuses_new_preprocessing_paths(models_copy):
+    predictor = ModelPredictor(models_dir=models_copy)
+    classic = os.path.join(models_copy, '02a_classical_models', 'saved_models')
+    shutil.copyfile(os.path.join(classic, 'numeric_scalers.pkl'), os.path.join(classic, 'numeric_scalers_v2.pkl'))
+
+    def retrain(manifest):
+        manifest['preprocessing']['classic']['scalers'] = '02a_classical_models/saved_models/numeric_scalers_v2.pkl'
+        manifest['models']['Logistic_Regression']['version'] = '2'
+    rewrite_manifest(models_copy, retrain)
+
+    with pytest.raises(ValueError, match='restart'):
+        predictor.reload_models()
+    assert predictor.registry.spec('Logistic_Regression').version == '1'
+
+
+def test_reload_refuses_rewritten_preprocessing_files(models_copy):
+    predictor = ModelPredictor(models_dir=models_copy)
+    scalers = os.path.join(models_copy, '02b_neural_networks', 'saved_models', 'numeric_scalers.pkl')
+    with open(scalers, 'rb') as f:
+        content = f.read()
+    with open(scalers, 'wb') as f:
+        f.write(content + b'\0')
+
+    with pytest.raises(ValueError, match='restart'):
+        predictor.reload_models()
@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from prediction.predictor import ModelPredictor, WARMUP_INPUT
+from prediction.shadow import ShadowScorer, read_summaries
+
+
+def test_primary_latency_excludes_model_load(monkeypatch):
+    predictor = ModelPredictor(models_dir='../db')
+    load_model = predictor.load_model
+
+    def slow_load(model_name):
+        time.sleep(0.3)
+        return load_model(model_name)
+
+    latencies = []
+    monkeypatch.setattr(predictor, 'load_model', slow_load)
+    monkeypatch.setattr(predictor, 'observe_shadow', lambda model_name, input_data, result, ms: latencies.append(ms))
+    predictor.predict('Logistic_Regression', WARMUP_INPUT)
+
+    assert len(latencies) == 1
+    assert 0 < latencies[0] < 300
+
+
+def test_each_process_flushes_its_own_summary(tmp_path):
+    scorer = ShadowScorer(SimpleNamespace(registry=SimpleNamespace(shadow={})), log_dir=str(tmp_path), flush_s=3600)
+    scorer.shutdown()
+
+    assert os.listdir(tmp_path) == [f'summary_{os.getpid()}.json']
+    assert read_summaries(str(tmp_path))['processes'][str(os.getpid())]['pid'] == os.getpid()
+
+
+def write_summary(folder, pid, stats):
+    with open(os.path.join(folder, f'summary_{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'pid': pid, 'models': {'XGBoost': stats}}, f)
+
+
+def test_summaries_of_all_processes_are_merged(tmp_path):
+    write_summary(tmp_path, 101, {'sampled': 12, 'dropped': 1, 'failed': 0, 'scored': 10,
+                                  'agreement_rate': 1.0, 'mean_delta': 0.01, 'mean_abs_delta': 0.02,
+                                  'max_abs_delta': 0.05})
+    write_summary(tmp_path, 202, {'sampled': 30, 'dropped': 0, 'failed': 2, 'scored': 30,
+                                  'agreement_rate': 0.9, 'mean_delta': -0.01, 'mean_abs_delta': 0.04,
+                                  'max_abs_delta': 0.2})
+    write_summary(tmp_path, 303, {'sampled': 0, 'dropped': 0, 'failed': 0, 'scored': 0})
+    (tmp_path / 'XGBoost').mkdir()
+
+    merged = read_summaries(str(tmp_path))
+
+    assert sorted(merged['processes']) == ['101', '202', '303']
+    stats = merged['models']['XGBoost']
+    assert (stats['sampled'], stats['dropped'], stats['failed'], stats['scored']) == (42, 1, 2, 40)
+    assert stats['agreement_rate'] == pytest.approx(0.925)
+    assert stats['mean_delta'] == pytest.approx(-0.005)
+    assert stats['mean_abs_delta'] == pytest.approx(0.035)
+    assert stats['max_abs_delta'] == 0.2
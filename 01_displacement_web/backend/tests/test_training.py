@@ -0,0 +1,41 @@
+import json
+import os
+
+import pandas as pd
+
+from prediction.predictor import ModelPredictor
+from training import train
+
+
+def run_training(data, run_dir, *extra):
+    return train.main(['--data', data, '--run-dir', str(run_dir), '--jobs', '1', '--threads-per-job', '1',
+                       '--cache-dir', str(run_dir / 'cache'), *extra])
+
+
+def test_run_dir_is_a_servable_models_dir(ingested_dataset, tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENBLAS_NUM_THREADS', raising=False)
+    assert run_training(ingested_dataset, tmp_path, '--models', 'Logistic_Regression') == 0
+    # The workers' thread budget is not left in the parent's environment
+    assert 'OPENBLAS_NUM_THREADS' not in os.environ
+
+    models_dir = str(tmp_path / 'models')
+    with open(os.path.join(models_dir, 'model_manifest.json'), encoding='utf-8') as f:
+        entry = json.load(f)['models']['Logistic_Regression']
+    assert entry['sha256'] and entry['size_bytes']
+    assert 0 <= entry['metrics']['f1_score'] <= 1
+
+    predictor = ModelPredictor(models_dir=models_dir)
+    predictor.registry.verify(predictor.registry.spec('Logistic_Regression'))
+    df = pd.read_parquet(ingested_dataset).head(50)
+    proba = predictor.predict_batch('Logistic_Regression', df)
+    assert proba.shape == (50,) and ((proba >= 0) & (proba <= 1)).all()
+
+
+def test_resumed_run_keeps_the_manifest(ingested_dataset, tmp_path):
+    assert run_training(ingested_dataset, tmp_path, '--models', 'Logistic_Regression') == 0
+    manifest_path = tmp_path / 'models' / 'model_manifest.json'
+    first = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+    assert run_training(ingested_dataset, tmp_path, '--models', 'Logistic_Regression') == 0
+    second = json.loads(manifest_path.read_text(encoding='utf-8'))
+    assert second['models']['Logistic_Regression']['version'] == first['models']['Logistic_Regression']['version']
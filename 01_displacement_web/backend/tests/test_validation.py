@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction.predictor import WARMUP_INPUT
+from preprocessing.data_cleaner import clean_input_data
+from preprocessing.validation import MAX_ERROR_ROWS, FIELDS, InputValidator, parse_number
+
+MODELS = ['Logistic_Regression', 'XGBoost']
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return InputValidator(available_models=MODELS, known_models=MODELS + ['Random_Forest'])
+
+
+@pytest.mark.parametrize('value, kind, expected', [
+    (3, int, 3), ('3', int, 3), (' 3.0 ', int, 3), (3.5, int, None), (True, int, None),
+    ('nan', float, None), ('inf', float, None), ('', float, None), (None, int, None), ('-12.5', float, -12.5),
+])
+def test_parse_number(value, kind, expected):
+    assert parse_number(value, kind) == expected
+
+
+def test_valid_request_is_typed(validator):
+    values, errors = validator.validate({**WARMUP_INPUT, 'EVENTOS': '2', 'VIGENCIA': 2020.0, 'model': 'XGBoost'})
+
+    assert errors == {}
+    assert set(values) == set(FIELDS)
+    assert values['EVENTOS'] == 2 and type(values['VIGENCIA']) is int
+
+
+def test_every_invalid_field_is_reported(validator):
+    data = {**WARMUP_INPUT, 'SEXO': 'No Informa', 'ETNIA': 'Marciano', 'CICLO_VITAL': None,
+            'EVENTOS': 0, 'VIGENCIA': 2031, 'km_norte_sur': 'lejos'}
+    del data['distancia_total']
+
+    values, errors = validator.validate(data)
+
+    assert set(errors) == {'SEXO', 'ETNIA', 'CICLO_VITAL', 'EVENTOS', 'VIGENCIA', 'km_norte_sur', 'distancia_total'}
+    assert errors['SEXO'] == 'Valor no informativo: No Informa'
+    assert errors['CICLO_VITAL'] == errors['distancia_total'] == 'Campo requerido'
+    assert validator.validate(['no', 'dict']) == (None, {'body': 'Se esperaba un objeto JSON'})
+
+
+def test_accepted_aliases_and_free_text_departments_clean_to_valid_values(validator):
+    data = {**WARMUP_INPUT, 'ETNIA': 'Indigena (Acreditado RA)', 'CICLO_VITAL': 'entre 29 y 60', 'ESTADO_DEPTO': 'bogota dc'}
+    values, errors = validator.validate(data)
+    assert errors == {}
+
+    cleaned = clean_input_data(values)
+    assert (cleaned['ETNIA'], cleaned['CICLO_VITAL'], cleaned['ESTADO_DEPTO']) == ('Indigena', 'entre 29 y 59', 'Bogota, D.C.')
+
+
+def test_model_checks(validator):
+    assert validator.check_model('XGBoost') is None
+    assert validator.check_model('Random_Forest') == 'missing'
+    assert validator.check_model('GPT') == 'unknown'
+
+
+def test_columns_agree_with_single_requests(validator):
+    rows = [
+        WARMUP_INPUT,
+        {**WARMUP_INPUT, 'EVENTOS': '4', 'SEXO': 'Hombre'},
+        {**WARMUP_INPUT, 'EVENTOS': 2.5},
+        {**WARMUP_INPUT, 'ETNIA': 'Marciano', 'VIGENCIA': 1900},
+        {**WARMUP_INPUT, 'km_este_oeste': None, 'DISCAPACIDAD': 'Por Establecer'},
+        {**WARMUP_INPUT, 'EVENTOS': True},
+    ]
+    columns = {field: [row.get(field) for row in rows] for field in FIELDS}
+
+    parsed, valid, errors = validator.validate_columns(columns)
+
+    assert valid.tolist() == [not validator.validate(row)[1] for row in rows]
+    for field, error in errors.items():
+        assert error['rows'] == [i for i, row in enumerate(rows) if field in validator.validate(row)[1]]
+    assert parsed['EVENTOS'][1] == 4 and parsed['EVENTOS'].dtype == np.int64
+
+
+def test_numeric_columns_from_arrow_skip_python_objects(validator):
+    n = 50
+    columns = {field: pd.Categorical([WARMUP_INPUT[field]] * n) for field in FIELDS[:5]}
+    columns.update({field: np.full(n, float(WARMUP_INPUT[field])) for field in FIELDS[5:]})
+    columns['EVENTOS'] = np.arange(n, dtype='int32')
+
+    parsed, valid, errors = validator.validate_columns(columns)
+
+    assert valid.sum() == n - 1
+    assert errors['EVENTOS'] == {'message': 'Debe estar entre 1 y 10000 (entero)', 'count': 1, 'rows': [0]}
+
+
+def test_batch_errors_list_at_most_max_error_rows(validator):
+    n = MAX_ERROR_ROWS * 3
+    columns = {field: [WARMUP_INPUT[field]] * n for field in FIELDS}
+    columns['SEXO'] = ['No Informa'] * n
+
+    _, valid, errors = validator.validate_columns(columns)
+    assert not valid.any()
+    assert errors['SEXO']['count'] == n and len(errors['SEXO']['rows']) == MAX_ERROR_ROWS
+
+    _, _, errors = validator.validate_columns({**columns, 'EVENTOS': [1]})
+    assert 'columns' in errors
+    _, _, errors = validator.validate_columns({field: columns[field] for field in FIELDS[1:]})
+    assert errors == {'ESTADO_DEPTO': {'message': 'Columna requerida', 'count': None, 'rows': []}}
+
+
+def test_invalid_requests_are_rejected_before_inference(monkeypatch):
+    import app as backend
+
+    def fail(*args, **kwargs):
+        raise AssertionError('inference ran for an invalid request')
+
+    monkeypatch.setattr(backend, 'run_prediction', fail)
+    client = backend.app.test_client()
+
+    response = client.post('/api/predict', json={**WARMUP_INPUT, 'model': 'Logistic_Regression', 'EVENTOS': -1, 'SEXO': 'X'})
+    assert response.status_code == 400
+    assert set(response.get_json()['details']) == {'EVENTOS', 'SEXO'}
+
+    response = client.post('/api/predict', json={**WARMUP_INPUT, 'model': 'GPT'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Modelo desconocido: GPT'
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def test_importing_app_does_not_start_warmup():
+    code = "import threading, app; print(app.warmup_status['state'], 'warmup' in [t.name for t in threading.enumerate()])"
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == 'pending False'
+
+
+@pytest.fixture
+def fresh_warmup(monkeypatch):
+    import app
+
+    started = []
+    monkeypatch.setitem(app.warmup_status, 'state', 'pending')
+    monkeypatch.setattr(app, 'warmup', lambda: started.append(True))
+    return started
+
+
+def test_gunicorn_hook_starts_warmup_once(fresh_warmup):
+    import runpy
+    import threading
+
+    hook = runpy.run_path('gunicorn.conf.py')['post_worker_init']
+    hook(None)
+    hook(None)
+    for thread in threading.enumerate():
+        if thread.name == 'warmup':
+            thread.join()
+    assert fresh_warmup == [True]
@@ -0,0 +1,111 @@
+import json
+
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from api.wire_format import ARROW, JSON, MSGPACK, decode_batch, encode_batch, request_format, response_format
+from prediction.predictor import WARMUP_INPUT
+from preprocessing.data_cleaner import clean_input_frame
+from preprocessing.validation import FIELDS
+
+
+def rows():
+    found = [{**WARMUP_INPUT, 'VIGENCIA': 2000 + i, 'EVENTOS': 1 + i % 4} for i in range(6)]
+    found[3]['EVENTOS'] = 0  # out of range: reported, not scored
+    return found
+
+
+def columns(records):
+    return {field: [record[field] for record in records] for field in FIELDS}
+
+
+def arrow_body(records, model=None):
+    table = pa.table(columns(records))
+    if model:
+        table = table.replace_schema_metadata({'model': model})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_response(fmt, body):
+    if fmt == 'arrow':
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        return {name: table.column(name).to_pylist() for name in ('valid', 'prediction', 'probability')}
+    payload = msgpack.unpackb(body, raw=False) if fmt == 'msgpack' else json.loads(body)
+    return {name: payload[name] for name in ('valid', 'prediction', 'probability')}
+
+
+def test_content_negotiation():
+    assert request_format('application/vnd.apache.arrow.stream') == 'arrow'
+    assert request_format('application/x-msgpack') == 'msgpack'
+    assert request_format('text/csv') is None
+    assert response_format('text/html, application/msgpack;q=0.9, application/json', 'arrow') == 'msgpack'
+    assert response_format(None, 'json') == 'json'
+
+
+def test_requests_decode_to_the_same_columns():
+    records = rows()
+    decoded = [
+        decode_batch('arrow', arrow_body(records, model='XGBoost')),
+        decode_batch('msgpack', msgpack.packb({'model': 'XGBoost', 'columns': columns(records)})),
+        decode_batch('json', json.dumps({'model': 'XGBoost', 'records': records}).encode()),
+    ]
+    for model, cols in decoded:
+        assert model == 'XGBoost'
+        assert {field: np.asarray(cols[field]).tolist() for field in FIELDS} == columns(records)
+
+
+def test_missing_columns_are_rejected():
+    with pytest.raises(ValueError, match='Faltan columnas'):
+        decode_batch('json', json.dumps({'columns': {'SEXO': ['Mujer']}}).encode())
+
+
+@pytest.mark.parametrize('fmt', ['arrow', 'msgpack', 'json'])
+def test_responses_round_trip(fmt):
+    valid = np.array([True, False, True])
+    probability = np.array([0.25, np.nan, 0.75])
+    body, content_type = encode_batch(fmt, valid, probability, {'EVENTOS': 'fila 1'})
+
+    assert content_type == {'arrow': ARROW, 'msgpack': MSGPACK, 'json': JSON}[fmt]
+    assert read_response(fmt, body) == {'valid': [True, False, True], 'prediction': [0, None, 1],
+                                        'probability': [0.25, None, 0.75]}
+
+
+@pytest.fixture(scope='module')
+def client():
+    from app import app
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize('request_fmt, response_fmt', [
+    ('arrow', 'arrow'), ('msgpack', 'arrow'), ('json', 'msgpack'), ('arrow', 'json'),
+])
+def test_batch_endpoint_scores_every_format_alike(client, request_fmt, response_fmt):
+    from app import predictor
+
+    records = rows()
+    body = {
+        'arrow': lambda: arrow_body(records),
+        'msgpack': lambda: msgpack.packb({'columns': columns(records)}),
+        'json': lambda: json.dumps({'records': records}).encode(),
+    }[request_fmt]()
+    content_type = {'arrow': ARROW, 'msgpack': MSGPACK, 'json': JSON}
+    response = client.post('/api/predict/batch?model=Logistic_Regression', data=body,
+                           content_type=content_type[request_fmt],
+                           headers={'Accept': content_type[response_fmt]})
+
+    assert response.status_code == 200
+    assert response.headers['X-Invalid-Rows'] == '1'
+    result = read_response(response_fmt, response.data)
+    assert result['valid'] == [True, True, True, False, True, True]
+    assert result['probability'][3] is None
+
+    expected = predictor.predict_batch('Logistic_Regression', clean_input_frame(pd.DataFrame(records).drop(index=3)))
+    scored = [p for p in result['probability'] if p is not None]
+    assert scored == pytest.approx(expected.tolist())
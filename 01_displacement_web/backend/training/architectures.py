@@ -0,0 +1,117 @@
+"""
+Embedding networks from 003_train_neural_networks_embedd.ipynb
+
+Input names and order (one int32 input per categorical column, then one
+float32 numeric input) match ModelPredictor.preprocess_nn.
+"""
+
+import tensorflow as tf
+from keras import backend as K
+from keras.layers import Input, Embedding, Flatten, Dense, BatchNormalization, Dropout, Add, Concatenate
+from keras.models import Model
+from keras.optimizers import Adam
+
+
+def focal_loss(gamma=2.0, alpha=0.25):
+    def focal_loss_fixed(y_true, y_pred):
+        epsilon = K.epsilon()
+        y_pred = K.clip(y_pred, epsilon, 1.0 - epsilon)
+        pt = y_true * y_pred + (1 - y_true) * (1 - y_pred)
+        modulating_factor = K.pow(1.0 - pt, gamma)
+        alpha_factor = y_true * alpha + (1 - y_true) * (1 - alpha)
+        cross_entropy = -K.log(pt)
+        loss = alpha_factor * modulating_factor * cross_entropy
+        return K.mean(loss)
+    return focal_loss_fixed
+
+
+def _compile(model, learning_rate):
+    model.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss=focal_loss(gamma=2.0, alpha=0.25),
+        metrics=[
+            tf.keras.metrics.AUC(name='auc_roc'),
+            tf.keras.metrics.Precision(name='precision'),
+            tf.keras.metrics.Recall(name='recall'),
+            tf.keras.metrics.BinaryAccuracy(name='accuracy')
+        ]
+    )
+    return model
+
+
+def _embedding_inputs(embedding_info, predictor_cat_cols):
+    inputs, embed_outputs = [], []
+    for col in predictor_cat_cols:
+        info = embedding_info[col]
+        inp = Input(shape=(1,), name=f"inp_{col}")
+        emb = Embedding(input_dim=info['n_categories'], output_dim=info['embed_dim'], name=f"emb_{col}")(inp)
+        inputs.append(inp)
+        embed_outputs.append(Flatten()(emb))
+    return inputs, embed_outputs
+
+
+def build_resnet_style(embedding_info, num_numeric_feats, predictor_cat_cols,
+                       num_blocks=3, base_units=256, dropout_rate=0.3,
+                       learning_rate=1e-3):
+    inputs, embed_outputs = _embedding_inputs(embedding_info, predictor_cat_cols)
+
+    if num_numeric_feats > 0:
+        num_inp = Input(shape=(num_numeric_feats,), name="inp_numeric")
+        inputs.append(num_inp)
+        embed_outputs.append(num_inp)
+
+    x = Concatenate()(embed_outputs) if len(embed_outputs) > 1 else embed_outputs[0]
+
+    x = Dense(base_units, activation='relu', name='initial_dense')(x)
+    x = BatchNormalization(name='initial_bn')(x)
+
+    for i in range(num_blocks):
+        shortcut = x
+
+        x = Dense(base_units, activation='relu', name=f'block_{i+1}_dense_1')(x)
+        x = BatchNormalization(name=f'block_{i+1}_bn_1')(x)
+        x = Dropout(dropout_rate, name=f'block_{i+1}_dropout_1')(x)
+
+        x = Dense(base_units, activation='relu', name=f'block_{i+1}_dense_2')(x)
+        x = BatchNormalization(name=f'block_{i+1}_bn_2')(x)
+
+        x = Add(name=f'block_{i+1}_add')([x, shortcut])
+        x = Dropout(dropout_rate, name=f'block_{i+1}_dropout_2')(x)
+
+    output = Dense(1, activation='sigmoid', name='output')(x)
+
+    return _compile(Model(inputs=inputs, outputs=output), learning_rate)
+
+
+def build_wide_and_deep(embedding_info, num_numeric_feats, predictor_cat_cols,
+                        deep_layers=(512, 256, 128), dropout_rate=0.3,
+                        learning_rate=1e-3):
+    inputs, embed_outputs = _embedding_inputs(embedding_info, predictor_cat_cols)
+    wide_inputs = list(inputs)
+
+    if num_numeric_feats > 0:
+        num_inp = Input(shape=(num_numeric_feats,), name="inp_numeric")
+        inputs.append(num_inp)
+        embed_outputs.append(num_inp)
+        wide_inputs.append(num_inp)
+
+    deep = Concatenate(name='deep_concat')(embed_outputs) if len(embed_outputs) > 1 else embed_outputs[0]
+
+    for i, units in enumerate(deep_layers):
+        deep = Dense(units, activation='relu', name=f"deep_dense_{i+1}")(deep)
+        deep = BatchNormalization(name=f"deep_bn_{i+1}")(deep)
+        deep = Dropout(dropout_rate, name=f"deep_dropout_{i+1}")(deep)
+
+    wide = Concatenate(name='wide_concat')(wide_inputs) if len(wide_inputs) > 1 else wide_inputs[0]
+    wide = Flatten(name='wide_flatten')(wide)
+
+    combined = Concatenate(name='wide_deep_concat')([wide, deep])
+    output = Dense(1, activation='sigmoid', name='output')(combined)
+
+    return _compile(Model(inputs=inputs, outputs=output), learning_rate)
+
+
+BUILDERS = {
+    'resnet_style': build_resnet_style,
+    'wide_and_deep': build_wide_and_deep
+}
@@ -0,0 +1,81 @@
+"""
+Architectures searched per model (same grids as the training notebooks)
+
+`n_jobs` and `scale_pos_weight` are filled in by the CLI: the first from the
+per-job thread budget, the second from the class balance of the train split.
+"""
+
+CLASSIC_CONFIGS = {
+    'Logistic_Regression': [
+        {'name': 'Architecture_1', 'params': {
+            'C': 0.1, 'penalty': 'l2', 'solver': 'lbfgs', 'max_iter': 1000,
+            'random_state': 42, 'class_weight': 'balanced'}},
+        {'name': 'Architecture_2', 'params': {
+            'C': 1.0, 'penalty': 'l2', 'solver': 'saga', 'max_iter': 1000,
+            'random_state': 42, 'class_weight': 'balanced'}},
+        {'name': 'Architecture_3', 'params': {
+            'C': 10.0, 'penalty': 'l2', 'solver': 'saga', 'max_iter': 1000,
+            'random_state': 42, 'class_weight': 'balanced'}},
+    ],
+    'Random_Forest': [
+        {'name': 'Architecture_1', 'params': {
+            'n_estimators': 100, 'max_depth': 15, 'min_samples_split': 5, 'min_samples_leaf': 2,
+            'max_features': 'sqrt', 'random_state': 42, 'class_weight': 'balanced'}},
+        {'name': 'Architecture_2', 'params': {
+            'n_estimators': 150, 'max_depth': 20, 'min_samples_split': 2, 'min_samples_leaf': 1,
+            'max_features': 'sqrt', 'random_state': 42, 'class_weight': 'balanced'}},
+        {'name': 'Architecture_3', 'params': {
+            'n_estimators': 220, 'max_depth': 25, 'min_samples_split': 2, 'min_samples_leaf': 1,
+            'max_features': 'sqrt', 'random_state': 42, 'class_weight': 'balanced'}},
+    ],
+    'XGBoost': [
+        {'name': 'Architecture_1', 'params': {
+            'n_estimators': 1800, 'max_depth': 14, 'learning_rate': 0.015, 'subsample': 0.65,
+            'colsample_bytree': 0.55, 'colsample_bylevel': 0.7, 'colsample_bynode': 0.8,
+            'gamma': 0.5, 'min_child_weight': 10, 'max_delta_step': 1, 'reg_alpha': 0.7,
+            'reg_lambda': 2.5, 'random_state': 42, 'eval_metric': 'logloss', 'tree_method': 'hist'}},
+        {'name': 'Architecture_2', 'params': {
+            'n_estimators': 2500, 'max_depth': 13, 'learning_rate': 0.01, 'subsample': 0.6,
+            'colsample_bytree': 0.5, 'colsample_bylevel': 0.65, 'colsample_bynode': 0.75,
+            'gamma': 0.6, 'min_child_weight': 12, 'max_delta_step': 2, 'reg_alpha': 1.0,
+            'reg_lambda': 3.0, 'random_state': 42, 'eval_metric': 'logloss', 'tree_method': 'hist'}},
+        {'name': 'Architecture_3', 'params': {
+            'n_estimators': 3000, 'max_depth': 15, 'learning_rate': 0.008, 'subsample': 0.6,
+            'colsample_bytree': 0.5, 'colsample_bylevel': 0.6, 'colsample_bynode': 0.7,
+            'gamma': 0.7, 'min_child_weight': 15, 'max_delta_step': 3, 'reg_alpha': 1.5,
+            'reg_lambda': 4.0, 'random_state': 42, 'eval_metric': 'logloss', 'tree_method': 'hist'}},
+    ],
+}
+
+NETWORK_CONFIGS = {
+    'ResNet_Style': {
+        'network_type': 'resnet_style',
+        'architectures': [
+            {'name': 'Architecture_1', 'params': {
+                'num_blocks': 2, 'base_units': 256, 'dropout_rate': 0.3,
+                'learning_rate': 1e-3, 'batch_size': 2048, 'epochs': 200}},
+            {'name': 'Architecture_2', 'params': {
+                'num_blocks': 3, 'base_units': 384, 'dropout_rate': 0.3,
+                'learning_rate': 5e-4, 'batch_size': 2048, 'epochs': 200}},
+            {'name': 'Architecture_3', 'params': {
+                'num_blocks': 4, 'base_units': 512, 'dropout_rate': 0.4,
+                'learning_rate': 1e-4, 'batch_size': 4096, 'epochs': 200}},
+        ]
+    },
+    'Deep': {
+        'network_type': 'wide_and_deep',
+        'architectures': [
+            {'name': 'Architecture_1', 'params': {
+                'deep_layers': [256, 128], 'dropout_rate': 0.3,
+                'learning_rate': 1e-3, 'batch_size': 2048, 'epochs': 200}},
+            {'name': 'Architecture_2', 'params': {
+                'deep_layers': [512, 256, 128], 'dropout_rate': 0.3,
+                'learning_rate': 5e-4, 'batch_size': 2048, 'epochs': 200}},
+            {'name': 'Architecture_3', 'params': {
+                'deep_layers': [1024, 512, 256, 128], 'dropout_rate': 0.4,
+                'learning_rate': 1e-4, 'batch_size': 4096, 'epochs': 200}},
+        ]
+    },
+}
+
+ALL_MODELS = list(CLASSIC_CONFIGS) + list(NETWORK_CONFIGS)
@@ -0,0 +1,371 @@
+"""
+Offline evaluation: recompute the model metrics from a held-out set
+
+    python -m training.evaluate --data ../db/01_cleaned_data/ruv_parquet
+    python -m training.evaluate --data holdout.parquet --models XGBoost,Deep --write
+
+--data is either the dataset the models were trained on (Parquet directory
+from training.ingest, or CSV), or a single Parquet file in which every row
+is held out. For a training dataset each model is scored on the test split
+training.train recorded in its manifest entry ('held_out': the seeded hash
+split of out-of-core runs, or the saved test indices of the stratified
+split), so no training row is ever scored; models without a record for that
+dataset are refused.
+
+Each model scores the held-out rows once, batch by batch, through the serving
+path (ModelPredictor.encode_batch + predict_proba_encoded) with the model held
+for the whole pass. Probabilities are cached under --cache-dir per
+(dataset, model checksum), together with the labels and slice keys, so a
+re-run only scores models whose artifact changed. Every metric is then
+computed from the cached arrays with NumPy:
+
+- confusion matrix, accuracy, precision, recall, F1, specificity and log loss
+  at the 0.5 threshold;
+- ROC curve and ROC-AUC from one sort of the probabilities;
+- the same metrics per department (ESTADO_DEPTO) and per year (VIGENCIA),
+  from one bincount and one sort per slice dimension.
+
+Curves and slices go to evaluation_report.json next to the cache. With
+--write the headline metrics are also copied into the model entries of
+db/model_manifest.json (the source of /api/models, get_model_metrics and the
+chatbot); a running server picks them up on POST /api/admin/models/reload.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from training.features import data_fingerprint, PREDICTOR_CAT_COLS, PREDICTOR_NUM_COLS
+from training.ingest import TARGET_COL, PARTITION_COL
+
+THRESHOLD = 0.5
+ROC_POINTS = 200
+# Headline metrics copied into the manifest (keys read by the API and chatbot)
+MANIFEST_METRICS = ('accuracy', 'precision', 'recall', 'f1_score', 'roc_auc')
+
+
+# =============================================================================
+# HELD-OUT DATA
+# =============================================================================
+
+def held_out_split(entry, data_path, data_key, models_dir):
+    """
+    How to draw a model's held-out rows from data_path, or None when unknown.
+
+    A Parquet file is held out as a whole. A training dataset (ingest
+    directory or CSV) is only used through the split training.train recorded
+    in the model's manifest entry, and only if it is the same dataset: any
+    other draw would score rows the model was trained on.
+    """
+    if os.path.isfile(data_path) and data_path.endswith('.parquet'):
+        return {'kind': 'file', 'key': 'all'}
+    held_out = entry.get('held_out')
+    if not held_out or held_out.get('dataset') != data_key:
+        return None
+    if held_out['split'] == 'hash':
+        return {'kind': 'hash', 'key': f"hash_{held_out['seed']}", 'seed': held_out['seed']}
+    return {'kind': 'indices', 'key': f"stratified_{held_out['seed']}",
+            'path': os.path.join(models_dir, held_out['test_indices'])}
+
+
+def held_out_frames(data_path, split, predictor, batch_rows):
+    """Yield DataFrames of held-out rows, batch by batch"""
+    if split['kind'] == 'hash':
+        from training.out_of_core import ParquetSource
+
+        source = ParquetSource(data_path, predictor.models_dir, seed=split['seed'], batch_rows=batch_rows)
+        yield from source.frames('test')
+        return
+
+    if split['kind'] == 'indices':
+        from training.features import load_training_frame
+
+        # Same frame (and row order) the feature cache and its split were built from
+        df = load_training_frame(data_path)
+        test = np.load(split['path'])
+        for start in range(0, len(test), batch_rows):
+            yield df.iloc[test[start:start + batch_rows]].reset_index(drop=True)
+        return
+
+    import pyarrow.parquet as pq
+
+    columns = PREDICTOR_CAT_COLS + PREDICTOR_NUM_COLS + [TARGET_COL]
+    for batch in pq.ParquetFile(data_path).iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+class SliceKeys:
+    """Labels and slice keys of the held-out rows, accumulated batch by batch"""
+
+    def __init__(self):
+        self.y, self.years, self.departments = [], [], []
+        self.department_names = {}
+
+    def add(self, df):
+        self.y.append(df[TARGET_COL].to_numpy(dtype='int8'))
+        self.years.append(df[PARTITION_COL].to_numpy(dtype='int16'))
+        # Batch-local codes mapped onto codes shared across batches
+        names, codes = np.unique(df['ESTADO_DEPTO'].astype(str).to_numpy(), return_inverse=True)
+        lookup = np.array([self.department_names.setdefault(name, len(self.department_names)) for name in names],
+                          dtype='int16')
+        self.departments.append(lookup[codes])
+
+    def save(self, path):
+        names = sorted(self.department_names, key=self.department_names.get)
+        np.savez(path, y=np.concatenate(self.y), year=np.concatenate(self.years),
+                 department=np.concatenate(self.departments), department_names=np.array(names))
+
+
+def score_model(predictor, model_name, data_path, split, batch_rows, keys=None):
+    """Probabilities for every held-out row, one pass with the model held"""
+    model = predictor.acquire_model(model_name)
+    if not model:
+        raise ValueError(f"Model {model_name} not found")
+
+    parts = []
+    try:
+        for df in held_out_frames(data_path, split, predictor, batch_rows):
+            X = predictor.encode_batch(model_name, df)
+            parts.append(predictor.predict_proba_encoded(model, model_name, X).astype('float32'))
+            if keys is not None:
+                keys.add(df)
+    finally:
+        predictor.release_model(model_name)
+    return np.concatenate(parts) if parts else np.empty(0, dtype='float32')
+
+
+# =============================================================================
+# METRICS (vectorized over cached probabilities)
+# =============================================================================
+
+def confusion_counts(y, proba, groups=None, n_groups=1):
+    """(n_groups, 4) array of tn, fp, fn, tp; one bincount for all groups"""
+    cell = 2 * y.astype(np.intp) + (proba >= THRESHOLD)
+    if groups is not None:
+        cell = cell + 4 * groups.astype(np.intp)
+    return np.bincount(cell, minlength=4 * n_groups).reshape(n_groups, 4)
+
+
+def rates(counts):
+    """Threshold metrics for every row of a (..., 4) confusion count array"""
+    tn, fp, fn, tp = (counts[..., i].astype('float64') for i in range(4))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        return {
+            'accuracy': (tp + tn) / np.maximum(tp + tn + fp + fn, 1),
+            'precision': precision,
+            'recall': recall,
+            'f1_score': np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0),
+            'specificity': np.where(tn + fp > 0, tn / (tn + fp), 0.0)
+        }
+
+
+def roc_sorted(y_sorted, proba_sorted):
+    """(fpr, tpr, thresholds, auc) for rows already sorted by descending probability"""
+    positives = int(y_sorted.sum())
+    negatives = len(y_sorted) - positives
+    if positives == 0 or negatives == 0:
+        return None, None, None, None
+
+    # Last row of each run of equal probabilities: one ROC point per distinct threshold
+    ends = np.r_[np.flatnonzero(np.diff(proba_sorted)), len(proba_sorted) - 1]
+    tps = np.cumsum(y_sorted, dtype=np.int64)[ends]
+    fps = ends + 1 - tps
+    fpr = np.r_[0.0, fps / negatives]
+    tpr = np.r_[0.0, tps / positives]
+    thresholds = np.r_[np.inf, proba_sorted[ends]]
+    return fpr, tpr, thresholds, float(np.trapezoid(tpr, fpr))
+
+
+def downsample_curve(fpr, tpr, thresholds, points=ROC_POINTS):
+    if fpr is None:
+        return None
+    idx = np.unique(np.linspace(0, len(fpr) - 1, min(points, len(fpr))).round().astype(np.intp))
+    return {
+        'fpr': np.round(fpr[idx], 5).tolist(),
+        'tpr': np.round(tpr[idx], 5).tolist(),
+        'thresholds': [None if np.isinf(t) else round(float(t), 5) for t in thresholds[idx]]
+    }
+
+
+def overall_metrics(y, proba):
+    counts = confusion_counts(y, proba)[0]
+    metrics = {name: float(value) for name, value in rates(counts).items()}
+
+    order = np.argsort(-proba, kind='stable')
+    fpr, tpr, thresholds, auc = roc_sorted(y[order], proba[order])
+    clipped = np.clip(proba.astype('float64'), 1e-7, 1 - 1e-7)
+    metrics.update(
+        roc_auc=auc,
+        log_loss=float(-np.mean(np.where(y == 1, np.log(clipped), np.log1p(-clipped)))),
+        confusion={'tn': int(counts[0]), 'fp': int(counts[1]), 'fn': int(counts[2]), 'tp': int(counts[3])},
+        roc_curve=downsample_curve(fpr, tpr, thresholds)
+    )
+    return metrics
+
+
+def slice_metrics(y, proba, keys, names):
+    """Metrics per slice value: one bincount for the counts, one lexsort for every AUC"""
+    values, groups = np.unique(keys, return_inverse=True)
+    n_groups = len(values)
+    counts = confusion_counts(y, proba, groups, n_groups)
+    group_rates = rates(counts)
+
+    # Rows grouped by slice, each group by descending probability: every slice is contiguous
+    order = np.lexsort((-proba, groups))
+    bounds = np.r_[0, np.cumsum(counts.sum(axis=1))]
+    y_sorted, proba_sorted = y[order], proba[order]
+
+    result = {}
+    for i, value in enumerate(values):
+        start, stop = bounds[i], bounds[i + 1]
+        auc = roc_sorted(y_sorted[start:stop], proba_sorted[start:stop])[3]
+        label = names[value] if names is not None else int(value)
+        result[str(label)] = {
+            'rows': int(stop - start),
+            'positives': int(counts[i, 2] + counts[i, 3]),
+            **{name: round(float(values_[i]), 4) for name, values_ in group_rates.items()},
+            'roc_auc': None if auc is None else round(auc, 4)
+        }
+    return result
+
+
+def evaluate_probabilities(y, proba, held_out):
+    metrics = overall_metrics(y, proba)
+    metrics['slices'] = {
+        'department': slice_metrics(y, proba, held_out['department'], held_out['department_names']),
+        'year': slice_metrics(y, proba, held_out['year'], None)
+    }
+    return metrics
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+def evaluate(args):
+    from prediction.predictor import ModelPredictor
+    from prediction.registry import write_manifest
+
+    predictor = ModelPredictor(models_dir=args.models_dir)
+    registry = predictor.registry
+    models = args.models.split(',') if args.models else registry.available()
+    missing = [m for m in models if m not in registry.available()]
+    if missing:
+        raise ValueError(f"Models without an artifact on disk: {missing}")
+
+    with open(registry.manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    data_key = data_fingerprint(args.data)
+    splits = {}
+    for model_name in models:
+        split = held_out_split(manifest['models'][model_name], args.data, data_key, args.models_dir)
+        if split is None:
+            raise ValueError(f"{model_name} has no training split recorded for {args.data}: "
+                             f"pass a Parquet file of rows it was not trained on")
+        splits[model_name] = split
+
+    cache_dir = os.path.join(args.cache_dir, data_key)
+
+    print("=" * 60)
+    print(f"EVALUATING {models} on {args.data} ({data_key})")
+    print("=" * 60)
+
+    probabilities, timings = {}, {}
+    for model_name in models:
+        # Models trained on different splits of the same data have different held-out rows
+        split_dir = os.path.join(cache_dir, splits[model_name]['key'])
+        os.makedirs(split_dir, exist_ok=True)
+        keys_path = os.path.join(split_dir, 'held_out.npz')
+
+        spec = registry.spec(model_name)
+        checksum = spec.sha256 or f"v{spec.version}"
+        proba_path = os.path.join(split_dir, f"{model_name}_{checksum[:12]}.npy")
+        if os.path.exists(proba_path) and os.path.exists(keys_path):
+            probabilities[model_name] = np.load(proba_path)
+            print(f"  ✓ {model_name}: cached probabilities")
+            continue
+
+        keys = SliceKeys() if not os.path.exists(keys_path) else None
+        start = time.perf_counter()
+        proba = score_model(predictor, model_name, args.data, splits[model_name], args.batch_rows, keys)
+        seconds = time.perf_counter() - start
+        if keys is not None:
+            keys.save(keys_path)
+        np.save(proba_path, proba)
+
+        probabilities[model_name] = proba
+        timings[model_name] = {'seconds': round(seconds, 2), 'rows_per_s': round(len(proba) / max(seconds, 1e-9), 1)}
+        print(f"  ✓ {model_name}: {len(proba):,} rows scored in {seconds:.1f}s")
+
+    report = {
+        'data': os.path.abspath(args.data),
+        'dataset': data_key,
+        'threshold': THRESHOLD,
+        'evaluated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'models': {}
+    }
+    print("\nMETRICS")
+    for model_name, proba in probabilities.items():
+        split_dir = os.path.join(cache_dir, splits[model_name]['key'])
+        held_out = np.load(os.path.join(split_dir, 'held_out.npz'))
+        y = held_out['y']
+        if len(proba) != len(y):
+            raise ValueError(f"{model_name}: {len(proba)} probabilities for {len(y)} held-out rows "
+                             f"(stale cache in {split_dir}?)")
+        metrics = evaluate_probabilities(y, proba, held_out)
+        metrics.update(split=splits[model_name]['key'], rows=int(len(y)), positives=int(y.sum()),
+                       scoring=timings.get(model_name))
+        report['models'][model_name] = metrics
+        print(f"  {model_name:20s} acc={metrics['accuracy']:.4f} f1={metrics['f1_score']:.4f} "
+              f"auc={metrics['roc_auc'] or 0:.4f} ({len(y):,} rows, {metrics['split']})")
+
+    report_path = os.path.join(cache_dir, 'evaluation_report.json')
+    with open(report_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(report_path + '.tmp', report_path)
+    print(f"\n✓ Report saved to: {report_path}")
+
+    if not args.write:
+        return 0
+
+    with open(registry.manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for model_name, metrics in report['models'].items():
+        entry = manifest['models'][model_name]
+        entry['metrics'] = {key: round(metrics[key], 4) for key in MANIFEST_METRICS if metrics[key] is not None}
+        entry['evaluation'] = {
+            'dataset': data_key,
+            'split': metrics['split'],
+            'rows': metrics['rows'],
+            'evaluated_at': report['evaluated_at'],
+            'sha256': registry.spec(model_name).sha256,
+            'report': os.path.relpath(report_path, args.models_dir)
+        }
+    write_manifest(registry.manifest_path, manifest)
+    print(f"✓ Metrics written to: {registry.manifest_path}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recompute model metrics from a held-out set')
+    parser.add_argument('--data', required=True,
+                        help="Dataset the models were trained on (their recorded test split) or a held-out Parquet file")
+    parser.add_argument('--models', default=None, help='Comma-separated model names (default: all available)')
+    parser.add_argument('--models-dir', default='../db')
+    parser.add_argument('--cache-dir', default='../db/evaluation')
+    parser.add_argument('--batch-rows', type=int, default=262_144)
+    parser.add_argument('--write', action='store_true', help='Also copy the headline metrics into the manifest')
+    args = parser.parse_args(argv)
+
+    return evaluate(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Preprocessing artifacts and the cached encoded feature matrices
+
+Encoders and scalers are written in the saved_models layout read by
+ModelPredictor.load_encoders_scalers; the feature matrices are then produced
+by ModelPredictor's own batch preprocessing, so training and serving share
+one code path. Matrices are cached as .npy files and reopened as memmaps.
+"""
+
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler, MinMaxScaler, RobustScaler
+
+from prediction.drift import PROFILE_NAME, write_profile
+from training.ingest import CATEGORICAL_COLS, NUMERIC_COLS, TARGET_COL
+
+# Same column order as ModelPredictor.preprocess_classic / preprocess_nn
+PREDICTOR_CAT_COLS = ['SEXO', 'ETNIA', 'CICLO_VITAL', 'DISCAPACIDAD', 'ESTADO_DEPTO']
+PREDICTOR_NUM_COLS = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
+
+CLASSIC_DIR = '02a_classical_models/saved_models'
+NN_DIR = '02b_neural_networks/saved_models'
+
+ENCODE_CHUNK_ROWS = 1_000_000
+
+
+def choose_scaler(values):
+    """Scaler selection of the notebooks (outliers -> Robust, bounded -> MinMax, else Standard)"""
+    s = pd.Series(values, dtype='float64').dropna()
+    q1, q3 = s.quantile(0.25), s.quantile(0.75)
+    iqr = q3 - q1
+    outlier_ratio = ((s < q1 - 1.5 * iqr) | (s > q3 + 1.5 * iqr)).mean() if len(s) else 0.0
+
+    if outlier_ratio > 0.05:
+        return RobustScaler()
+    if s.min() >= 0 and s.max() <= 1e6:
+        return MinMaxScaler()
+    return StandardScaler()
+
+
+def choose_categorical_encoding(values, n_rows):
+    """'onehot' for low cardinality, 'ordinal' otherwise (ModelPredictor supports both)"""
+    n_unique = pd.Series(values).nunique()
+    if n_unique <= 30 and n_unique / n_rows < 0.001:
+        return 'onehot'
+    return 'ordinal'
+
+
+def fit_preprocessing(df, models_dir):
+    """
+    Fit and save encoders/scalers for both model families under models_dir.
+
+    Scalers are fitted on raw values: ModelPredictor does not apply the
+    notebooks' log1p step, so fitting on log values would skew serving.
+    """
+    classic_path = os.path.join(models_dir, CLASSIC_DIR)
+    nn_path = os.path.join(models_dir, NN_DIR)
+    os.makedirs(classic_path, exist_ok=True)
+    os.makedirs(nn_path, exist_ok=True)
+
+    # Encoder categories only depend on the distinct values: fit on the
+    # distinct combinations instead of materializing 7M strings per column
+    cat_str = df[PREDICTOR_CAT_COLS].drop_duplicates().astype(str)
+
+    # Classic family: one onehot and one ordinal encoder over column subsets
+    methods = {col: choose_categorical_encoding(df[col], len(df)) for col in PREDICTOR_CAT_COLS}
+    onehot_cols = [col for col in PREDICTOR_CAT_COLS if methods[col] == 'onehot']
+    ordinal_cols = [col for col in PREDICTOR_CAT_COLS if methods[col] == 'ordinal']
+
+    classic_encoders = {}
+    if onehot_cols:
+        classic_encoders['onehot'] = OneHotEncoder(sparse_output=False, handle_unknown='ignore').fit(cat_str[onehot_cols])
+    if ordinal_cols:
+        classic_encoders['ordinal'] = OrdinalEncoder(
+            handle_unknown='use_encoded_value', unknown_value=-1).fit(cat_str[ordinal_cols])
+
+    scalers = {}
+    for col in PREDICTOR_NUM_COLS:
+        scalers[col] = choose_scaler(df[col]).fit(df[[col]].astype('float64'))
+
+    # NN family: one ordinal encoder per column + embedding sizes
+    nn_encoders, embedding_info = {}, {}
+    for col in PREDICTOR_CAT_COLS:
+        enc = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1).fit(cat_str[[col]])
+        n_categories = len(enc.categories_[0])
+        nn_encoders[col] = enc
+        embedding_info[col] = {'n_categories': n_categories, 'embed_dim': min(50, (n_categories + 1) // 2)}
+
+    joblib.dump(classic_encoders, os.path.join(classic_path, 'categorical_encoders.pkl'))
+    joblib.dump(scalers, os.path.join(classic_path, 'numeric_scalers.pkl'))
+    joblib.dump(nn_encoders, os.path.join(nn_path, 'categorical_encoders.pkl'))
+    joblib.dump(embedding_info, os.path.join(nn_path, 'embedding_info.pkl'))
+    joblib.dump(scalers, os.path.join(nn_path, 'numeric_scalers.pkl'))
+    # Reference distributions for drift monitoring (prediction/drift.py)
+    write_profile(df, os.path.join(classic_path, PROFILE_NAME))
+
+    print(f"✓ Preprocessing fitted: onehot={onehot_cols}, ordinal={ordinal_cols}")
+    return embedding_info
+
+
+def preprocessing_manifest():
+    """`preprocessing` section of a manifest for the files written by fit_preprocessing"""
+    return {
+        'classic': {
+            'encoders': f'{CLASSIC_DIR}/categorical_encoders.pkl',
+            'scalers': f'{CLASSIC_DIR}/numeric_scalers.pkl',
+            'profile': f'{CLASSIC_DIR}/{PROFILE_NAME}'
+        },
+        'nn': {
+            'encoders': f'{NN_DIR}/categorical_encoders.pkl',
+            'scalers': f'{NN_DIR}/numeric_scalers.pkl',
+            'embedding_info': f'{NN_DIR}/embedding_info.pkl'
+        }
+    }
+
+
+def artifacts_fingerprint(models_dir):
+    """Hash of the encoder/scaler files: the cache is only valid for these exact artifacts"""
+    digest = hashlib.sha256()
+    for folder in (CLASSIC_DIR, NN_DIR):
+        for name in ('categorical_encoders.pkl', 'numeric_scalers.pkl', 'embedding_info.pkl'):
+            path = os.path.join(models_dir, folder, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def data_fingerprint(data_path):
+    """Cheap identity of the input dataset (ingest stats, or size + mtime of a file)"""
+    stats_path = os.path.join(data_path, '_ingest.json')
+    if os.path.isdir(data_path) and os.path.exists(stats_path):
+        with open(stats_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    st = os.stat(data_path)
+    return hashlib.sha256(f"{os.path.abspath(data_path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def load_training_frame(data_path):
+    """Parquet dataset from training.ingest, or a CSV with the same columns"""
+    columns = CATEGORICAL_COLS + NUMERIC_COLS + [TARGET_COL]
+    if os.path.isdir(data_path):
+        from training.ingest import load_dataset
+        df = load_dataset(data_path, columns=columns)
+    else:
+        df = pd.read_csv(data_path, usecols=columns)
+        for col in NUMERIC_COLS + [TARGET_COL]:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.dropna(subset=columns).reset_index(drop=True)
+
+
+class FeatureCache:
+    """
+    Encoded matrices for one (dataset, artifacts) pair:
+
+        classic_X.npy  float32 (n, n_features)   + classic_columns.json
+        nn_<COL>.npy   int32 (n,) per categorical column
+        nn_num.npy     float32 (n, 5)
+        y.npy          int8 (n,)
+    """
+
+    def __init__(self, root, data_key, artifacts_key):
+        self.path = os.path.join(root, f"{data_key}_{artifacts_key}")
+
+    @classmethod
+    def at(cls, path):
+        """Reopen an existing cache directory (used by the training workers)"""
+        cache = cls.__new__(cls)
+        cache.path = path
+        return cache
+
+    @property
+    def complete(self):
+        return os.path.exists(os.path.join(self.path, '_complete'))
+
+    def build(self, df, models_dir):
+        from prediction.predictor import ModelPredictor
+
+        os.makedirs(self.path, exist_ok=True)
+        predictor = ModelPredictor(models_dir=models_dir)
+        n = len(df)
+
+        probe = predictor.preprocess_classic_batch(df.iloc[:1])
+        classic = np.lib.format.open_memmap(
+            os.path.join(self.path, 'classic_X.npy'), mode='w+', dtype='float32', shape=(n, probe.shape[1]))
+        nn_cat = {col: np.lib.format.open_memmap(
+            os.path.join(self.path, f'nn_{col}.npy'), mode='w+', dtype='int32', shape=(n,))
+            for col in PREDICTOR_CAT_COLS}
+        nn_num = np.lib.format.open_memmap(
+            os.path.join(self.path, 'nn_num.npy'), mode='w+', dtype='float32', shape=(n, len(PREDICTOR_NUM_COLS)))
+
+        for start in range(0, n, ENCODE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + ENCODE_CHUNK_ROWS]
+            stop = start + len(chunk)
+            classic[start:stop] = predictor.preprocess_classic_batch(chunk).to_numpy(dtype='float32')
+            nn_inputs = predictor.preprocess_nn_batch(chunk)
+            for col, values in zip(PREDICTOR_CAT_COLS, nn_inputs[:-1]):
+                nn_cat[col][start:stop] = values
+            nn_num[start:stop] = nn_inputs[-1]
+            print(f"  ✓ encoded {stop:,}/{n:,} rows")
+
+        for array in [classic, nn_num] + list(nn_cat.values()):
+            array.flush()
+        np.save(os.path.join(self.path, 'y.npy'), df[TARGET_COL].to_numpy(dtype='int8'))
+        with open(os.path.join(self.path, 'classic_columns.json'), 'w', encoding='utf-8') as f:
+            json.dump(list(probe.columns), f)
+        open(os.path.join(self.path, '_complete'), 'w').close()
+
+    def classic(self):
+        with open(os.path.join(self.path, 'classic_columns.json'), encoding='utf-8') as f:
+            columns = json.load(f)
+        return np.load(os.path.join(self.path, 'classic_X.npy'), mmap_mode='r'), columns
+
+    def nn(self):
+        X_cat = [np.load(os.path.join(self.path, f'nn_{col}.npy'), mmap_mode='r') for col in PREDICTOR_CAT_COLS]
+        return X_cat, np.load(os.path.join(self.path, 'nn_num.npy'), mmap_mode='r')
+
+    def target(self):
+        return np.load(os.path.join(self.path, 'y.npy'))
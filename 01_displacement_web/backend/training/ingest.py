@@ -0,0 +1,213 @@
+"""
+Streaming RUV ingestion
+
+Reads the raw RUV CSV export (or the cleaned displacement_vs_others CSV) in
+chunks, cleans each chunk with the same rules as the API (CleaningEngine),
+adds the target and the geo features, and appends it to a Parquet dataset
+partitioned by VIGENCIA (hive layout: VIGENCIA=2010/part-0.parquet).
+
+Categorical columns are stored dictionary-encoded, numerics with explicit
+narrow types, so a reload is a memory map + decode with no CSV parsing and
+no object columns. Peak memory is about one chunk.
+
+    python -m training.ingest --input ruv.csv --output ../db/01_cleaned_data/ruv_parquet
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from preprocessing.cleaning_engine import CleaningEngine
+from preprocessing.geo_data import URBAN_CENTER_COORDS, calculate_distances
+
+CATEGORICAL_COLS = ['ESTADO_DEPTO', 'SEXO', 'ETNIA', 'DISCAPACIDAD', 'CICLO_VITAL']
+NUMERIC_COLS = ['EVENTOS', 'VIGENCIA', 'km_norte_sur', 'km_este_oeste', 'distancia_total']
+GEO_COLS = ['km_norte_sur', 'km_este_oeste', 'distancia_total']
+TARGET_COL = 'Desplazamiento_forzado_binaria'
+POSITIVE_HECHO = 'Desplazamiento forzado'
+PARTITION_COL = 'VIGENCIA'
+
+_dictionary = pa.dictionary(pa.int32(), pa.string())
+
+# Schema of every partition file (VIGENCIA lives in the directory name)
+FILE_SCHEMA = pa.schema(
+    [(col, _dictionary) for col in CATEGORICAL_COLS + ['HECHO']] +
+    [('EVENTOS', pa.int32())] +
+    [(col, pa.float32()) for col in GEO_COLS] +
+    [(TARGET_COL, pa.int8())]
+)
+
+
+def geo_table(categories):
+    """(len(categories) + 1, 3) array of distances; the last row (NaN) serves code -1"""
+    table = np.full((len(categories) + 1, len(GEO_COLS)), np.nan, dtype='float32')
+    for i, dept in enumerate(categories):
+        if dept in URBAN_CENTER_COORDS:
+            distances = calculate_distances(dept)
+            table[i] = [distances[col] for col in GEO_COLS]
+    return table
+
+
+def add_features(chunk, stats):
+    """Target, typed numerics and geo features for one cleaned chunk"""
+    chunk = chunk.copy(deep=False)
+
+    # Geo features: one distance computation per department category, then a
+    # gather on the integer codes
+    dept = chunk['ESTADO_DEPTO'].array
+    geo = geo_table(dept.categories)[dept.codes]
+    for i, col in enumerate(GEO_COLS):
+        chunk[col] = geo[:, i]
+
+    chunk['VIGENCIA'] = pd.to_numeric(chunk['VIGENCIA'], errors='coerce')
+    chunk['EVENTOS'] = pd.to_numeric(chunk['EVENTOS'], errors='coerce')
+
+    if 'HECHO' not in chunk.columns:
+        # The cleaned displacement_vs_others CSV only carries the binary target
+        chunk['HECHO'] = pd.Categorical(np.full(len(chunk), None, dtype=object))
+
+    if TARGET_COL in chunk.columns:
+        chunk[TARGET_COL] = pd.to_numeric(chunk[TARGET_COL], errors='coerce')
+    else:
+        chunk[TARGET_COL] = (chunk['HECHO'] == POSITIVE_HECHO).astype('int8')
+
+    required = CATEGORICAL_COLS + NUMERIC_COLS + [TARGET_COL]
+    valid = chunk[required].notna().all(axis=1).to_numpy()
+    stats['dropped_missing'] += int((~valid).sum())
+    if not valid.all():
+        chunk = chunk[valid]
+
+    chunk['VIGENCIA'] = chunk['VIGENCIA'].astype('int32')
+    chunk['EVENTOS'] = chunk['EVENTOS'].astype('int32')
+    chunk[TARGET_COL] = chunk[TARGET_COL].astype('int8')
+
+    return chunk
+
+
+class PartitionedWriter:
+    """One open ParquetWriter per VIGENCIA value, appended to chunk after chunk"""
+
+    def __init__(self, root, compression='zstd'):
+        self.root = root
+        self.compression = compression
+        self.writers = {}
+        self.rows = {}
+
+    def write(self, chunk):
+        years = chunk[PARTITION_COL].to_numpy()
+        order = np.argsort(years, kind='stable')
+        sorted_years = years[order]
+        bounds = np.flatnonzero(np.diff(sorted_years)) + 1
+
+        for idx in np.split(order, bounds):
+            if len(idx) == 0:
+                continue
+            year = int(years[idx[0]])
+            part = chunk.iloc[idx]
+            table = pa.Table.from_pandas(part[FILE_SCHEMA.names], schema=FILE_SCHEMA, preserve_index=False)
+            self._writer(year).write_table(table)
+            self.rows[year] = self.rows.get(year, 0) + len(part)
+
+    def _writer(self, year):
+        if year not in self.writers:
+            folder = os.path.join(self.root, f"{PARTITION_COL}={year}")
+            os.makedirs(folder, exist_ok=True)
+            self.writers[year] = pq.ParquetWriter(
+                os.path.join(folder, 'part-0.parquet'), FILE_SCHEMA,
+                compression=self.compression, use_dictionary=True
+            )
+        return self.writers[year]
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def ingest(input_path, output_dir, chunksize=500_000, overwrite=False):
+    """Stream input_path into a partitioned Parquet dataset; returns the stats dict"""
+    if os.path.exists(output_dir):
+        if not overwrite:
+            raise FileExistsError(f"{output_dir} already exists (use --overwrite)")
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    engine = CleaningEngine()
+    writer = PartitionedWriter(output_dir)
+    stats = {'chunks': 0, 'dropped_missing': 0}
+    start = time.time()
+
+    try:
+        for chunk in engine.clean_csv(input_path, chunksize=chunksize):
+            chunk = add_features(chunk, stats)
+            writer.write(chunk)
+            stats['chunks'] += 1
+            print(f"  ✓ chunk {stats['chunks']}: {engine.stats['rows_in']:,} rows read, "
+                  f"{sum(writer.rows.values()):,} written")
+    finally:
+        writer.close()
+
+    stats.update({
+        'input': os.path.abspath(input_path),
+        'rows_in': engine.stats['rows_in'],
+        'rows_out': sum(writer.rows.values()),
+        'dropped_by_cleaning': engine.stats['dropped_by'],
+        'rows_per_vigencia': {str(k): v for k, v in sorted(writer.rows.items())},
+        'elapsed_s': round(time.time() - start, 1)
+    })
+
+    with open(os.path.join(output_dir, '_ingest.json'), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+    return stats
+
+
+def open_dataset(path):
+    """pyarrow Dataset over an ingested directory (VIGENCIA restored as int32)"""
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COL, pa.int32())]), flavor='hive')
+    return ds.dataset(path, format='parquet', partitioning=partitioning)
+
+
+def load_dataset(path, columns=None, years=None):
+    """
+    Load an ingested dataset as a DataFrame.
+
+    Categoricals come back as pandas Categorical. `years` (iterable of
+    VIGENCIA values) prunes partitions before anything is read.
+    """
+    dataset = open_dataset(path)
+    row_filter = ds.field(PARTITION_COL).isin(list(years)) if years is not None else None
+    table = dataset.to_table(columns=columns, filter=row_filter)
+    return table.to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream the RUV CSV into a partitioned Parquet dataset')
+    parser.add_argument('--input', required=True, help='RUV CSV export or displacement_vs_others CSV')
+    parser.add_argument('--output', default='../db/01_cleaned_data/ruv_parquet')
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"INGEST {args.input} → {args.output}")
+    print("=" * 60)
+
+    stats = ingest(args.input, args.output, chunksize=args.chunksize, overwrite=args.overwrite)
+
+    print(f"\n✓ {stats['rows_out']:,} / {stats['rows_in']:,} rows written "
+          f"({len(stats['rows_per_vigencia'])} VIGENCIA partitions) in {stats['elapsed_s']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Out-of-core training over the Parquet dataset written by training.ingest
+
+Nothing of size O(rows x features) is materialized:
+
+- Rows are read as Arrow record batches, one fragment (VIGENCIA partition)
+  at a time, and encoded per batch with ModelPredictor's batch preprocessing.
+- The train/validation/test split is decided per row from a random stream
+  seeded by (seed, fragment path), so every pass sees the same split
+  without storing indices.
+- XGBoost consumes the batches through an xgb.DataIter into a QuantileDMatrix
+  (histogram bins, ~1 byte per value) or, with `xgb_mode='external'`, an
+  external-memory DMatrix paged to disk.
+- The embedding networks read a tf.data pipeline built from a generator over
+  the same batches, with fragment order and in-batch rows shuffled per epoch.
+
+Random Forest and Logistic Regression have no streaming fit here and stay on
+the in-memory path of training.train.
+"""
+
+import os
+import time
+import zlib
+
+import numpy as np
+import xgboost as xgb
+
+from training.features import PREDICTOR_CAT_COLS, PREDICTOR_NUM_COLS
+from training.ingest import TARGET_COL, PARTITION_COL, open_dataset
+
+OUT_OF_CORE_MODELS = ('XGBoost', 'ResNet_Style', 'Deep')
+READ_BATCH_ROWS = 262_144
+TEST_FRACTION = 0.30
+VAL_FRACTION = 0.20  # of the train part, networks only
+
+READ_COLUMNS = [c for c in PREDICTOR_CAT_COLS + PREDICTOR_NUM_COLS if c != PARTITION_COL] + [TARGET_COL]
+
+
+class ParquetSource:
+    """Deterministic, split-aware batch reader over an ingested dataset"""
+
+    def __init__(self, data_path, models_dir, seed=42, batch_rows=READ_BATCH_ROWS):
+        from prediction.predictor import ModelPredictor
+
+        self.dataset = open_dataset(data_path)
+        self.root = data_path
+        self.fragments = sorted(self.dataset.get_fragments(), key=lambda f: f.path)
+        self.predictor = ModelPredictor(models_dir=models_dir)
+        self.seed = seed
+        self.batch_rows = batch_rows
+
+    def _subset_mask(self, u, subset):
+        if subset == 'test':
+            return u < TEST_FRACTION
+        if subset == 'train':
+            return u >= TEST_FRACTION
+        val_cut = TEST_FRACTION + (1 - TEST_FRACTION) * VAL_FRACTION
+        if subset == 'val':
+            return (u >= TEST_FRACTION) & (u < val_cut)
+        if subset == 'subtrain':
+            return u >= val_cut
+        raise ValueError(f"Unknown subset '{subset}'")
+
+    def frames(self, subset, fragment_order=None, shuffle_seed=None):
+        """Yield cleaned DataFrames for one split subset, batch by batch"""
+        import pyarrow.dataset as ds
+
+        fragments = self.fragments if fragment_order is None else [self.fragments[i] for i in fragment_order]
+        for fragment in fragments:
+            rel_path = os.path.relpath(fragment.path, self.root)
+            rng = np.random.default_rng([self.seed, zlib.crc32(rel_path.encode())])
+            year = ds.get_partition_keys(fragment.partition_expression)[PARTITION_COL]
+
+            for batch in fragment.to_batches(columns=READ_COLUMNS, batch_size=self.batch_rows):
+                # Draw for every row (kept or not) so the stream stays aligned across subsets
+                u = rng.random(batch.num_rows)
+                mask = self._subset_mask(u, subset)
+                if not mask.any():
+                    continue
+
+                df = batch.to_pandas()[mask].reset_index(drop=True)
+                df[PARTITION_COL] = year
+                if shuffle_seed is not None:
+                    order = np.random.default_rng([shuffle_seed, zlib.crc32(rel_path.encode())]).permutation(len(df))
+                    df = df.iloc[order].reset_index(drop=True)
+                yield df
+
+    def classic_batches(self, subset):
+        for df in self.frames(subset):
+            X = self.predictor.preprocess_classic_batch(df)
+            yield X.to_numpy(dtype='float32'), df[TARGET_COL].to_numpy(dtype='float32'), list(X.columns)
+
+    def nn_batches(self, subset, batch_size, epoch=None):
+        """Model-sized batches; with `epoch`, fragment order and rows are shuffled per epoch"""
+        order, shuffle_seed = None, None
+        if epoch is not None:
+            order = np.random.default_rng([self.seed, epoch]).permutation(len(self.fragments))
+            shuffle_seed = self.seed * 1000 + epoch
+
+        for df in self.frames(subset, fragment_order=order, shuffle_seed=shuffle_seed):
+            inputs = self.predictor.preprocess_nn_batch(df)
+            y = df[TARGET_COL].to_numpy(dtype='float32')
+            for start in range(0, len(df), batch_size):
+                stop = start + batch_size
+                yield tuple(arr[start:stop] for arr in inputs), y[start:stop]
+
+    def class_counts(self, subset):
+        """Positives/total of a subset, reading only the target column"""
+        positives, total = 0, 0
+        for fragment in self.fragments:
+            rel_path = os.path.relpath(fragment.path, self.root)
+            rng = np.random.default_rng([self.seed, zlib.crc32(rel_path.encode())])
+            for batch in fragment.to_batches(columns=[TARGET_COL], batch_size=self.batch_rows):
+                mask = self._subset_mask(rng.random(batch.num_rows), subset)
+                y = batch.column(0).to_numpy(zero_copy_only=False)[mask]
+                positives += int(y.sum())
+                total += len(y)
+        return positives, total
+
+
+class ClassicBatchIter(xgb.DataIter):
+    """xgb.DataIter over the encoded classic features of one subset"""
+
+    def __init__(self, source, subset, cache_prefix=None):
+        self.source = source
+        self.subset = subset
+        self._batches = None
+        self.feature_names = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = None
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self.source.classic_batches(self.subset)
+        try:
+            X, y, columns = next(self._batches)
+        except StopIteration:
+            return False
+        self.feature_names = columns
+        input_data(data=X, label=y, feature_names=columns)
+        return True
+
+
+def xgb_native_params(params, threads, scale_pos_weight):
+    """sklearn-style notebook params -> (native params, num_boost_round)"""
+    params = dict(params)
+    rounds = params.pop('n_estimators')
+    params.pop('n_jobs', None)
+    native = {
+        'objective': 'binary:logistic',
+        'nthread': threads,
+        'seed': params.pop('random_state', 0),
+        'scale_pos_weight': scale_pos_weight,
+        **params
+    }
+    return native, rounds
+
+
+def train_xgboost(job, source):
+    positives, total = source.class_counts('train')
+    params, rounds = xgb_native_params(job['params'], job['threads'], (total - positives) / max(positives, 1))
+
+    start = time.time()
+    if job.get('xgb_mode') == 'external':
+        cache_prefix = os.path.join(os.path.dirname(job['model_path']), 'xgb_cache')
+        dtrain = xgb.DMatrix(ClassicBatchIter(source, 'train', cache_prefix=cache_prefix))
+    else:
+        dtrain = xgb.QuantileDMatrix(ClassicBatchIter(source, 'train'), max_bin=params.get('max_bin', 256))
+    print(f"  ✓ {job['model']}/{job['architecture']}: training matrix ready in {time.time() - start:.0f}s")
+
+    booster = xgb.train(params, dtrain, num_boost_round=rounds)
+    minutes = (time.time() - start) / 60
+    del dtrain
+
+    probs, labels = [], []
+    for X, y, columns in source.classic_batches('test'):
+        probs.append(booster.inplace_predict(X))
+        labels.append(y)
+
+    # Served as the raw Booster (ModelPredictor.classic_proba): an XGBClassifier
+    # rebuilt with load_model has no n_classes_ and cannot predict_proba
+    import joblib
+    joblib.dump(booster, job['model_path'])
+    check_artifact(job['model_path'], source, probs[0])
+    return np.concatenate(probs), np.concatenate(labels).astype('int8'), minutes
+
+
+def check_artifact(model_path, source, expected):
+    """Reload the saved model and score the first test batch through the serving path"""
+    import joblib
+
+    model = joblib.load(model_path)
+    df = next(source.frames('test'))
+    proba = source.predictor.classic_proba(model, source.predictor.preprocess_classic_batch(df))
+    if not np.allclose(proba, expected, atol=1e-5):
+        raise ValueError(f"{model_path}: reloaded model does not reproduce the test probabilities")
+
+
+def train_network(job, source):
+    import joblib
+    import tensorflow as tf
+    from keras.callbacks import EarlyStopping, ReduceLROnPlateau
+    from training.architectures import BUILDERS
+    from training.configs import NETWORK_CONFIGS
+    from training.features import NN_DIR
+
+    embedding_info = joblib.load(os.path.join(job['models_dir'], NN_DIR, 'embedding_info.pkl'))
+    params = dict(job['params'])
+    batch_size = params.pop('batch_size')
+    epochs = params.pop('epochs')
+
+    signature = (
+        tuple([tf.TensorSpec((None,), tf.int32) for _ in PREDICTOR_CAT_COLS] +
+              [tf.TensorSpec((None, len(PREDICTOR_NUM_COLS)), tf.float32)]),
+        tf.TensorSpec((None,), tf.float32)
+    )
+
+    epoch_counter = {'n': 0}
+
+    def train_gen():
+        # Called once per epoch by tf.data: reshuffle fragments and rows each time
+        epoch_counter['n'] += 1
+        yield from source.nn_batches('subtrain', batch_size, epoch=epoch_counter['n'])
+
+    train_ds = tf.data.Dataset.from_generator(train_gen, output_signature=signature).prefetch(tf.data.AUTOTUNE)
+    val_ds = tf.data.Dataset.from_generator(
+        lambda: source.nn_batches('val', batch_size), output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+    positives, total = source.class_counts('subtrain')
+    class_weight = {0: total / (2.0 * max(total - positives, 1)), 1: total / (2.0 * max(positives, 1))}
+
+    network_type = NETWORK_CONFIGS[job['model']]['network_type']
+    model = BUILDERS[network_type](embedding_info, len(PREDICTOR_NUM_COLS), PREDICTOR_CAT_COLS, **params)
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True, verbose=0),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-7, verbose=0)
+    ]
+
+    start = time.time()
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks,
+              class_weight=class_weight, verbose=2)
+    minutes = (time.time() - start) / 60
+
+    probs, labels = [], []
+    for inputs, y in source.nn_batches('test', batch_size):
+        probs.append(np.asarray(model.predict_on_batch(list(inputs))).reshape(-1))
+        labels.append(y)
+
+    model.save(job['model_path'])
+    return np.concatenate(probs), np.concatenate(labels).astype('int8'), minutes
+
+
+def run_out_of_core_job(job):
+    """Out-of-core counterpart of training.train.run_job (same checkpoint format)"""
+    from training.train import test_metrics, write_json_atomic
+
+    source = ParquetSource(job['data_path'], job['models_dir'])
+    if job['model'] == 'XGBoost':
+        y_prob, y_test, minutes = train_xgboost(job, source)
+    else:
+        y_prob, y_test, minutes = train_network(job, source)
+
+    np.save(job['proba_path'], y_prob.astype('float32'))
+    np.save(job['labels_path'], y_test)
+
+    checkpoint = {
+        'model': job['model'],
+        'architecture': job['architecture'],
+        'params': job['params'],
+        'model_path': job['model_path'],
+        'proba_path': job['proba_path'],
+        'labels_path': job['labels_path'],
+        'out_of_core': True,
+        'metrics': test_metrics(y_test, y_prob, minutes)
+    }
+    write_json_atomic(job['checkpoint_path'], checkpoint)
+    return checkpoint
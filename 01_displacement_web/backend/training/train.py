@@ -0,0 +1,531 @@
+"""
+Training CLI (replaces the per-model notebook loop)
+
+    python -m training.train --data ../db/01_cleaned_data/ruv_parquet \
+        --models XGBoost,Deep --jobs 3 --threads-per-job 4 --run-dir ../db/training_runs/2025_01
+
+Every (model, architecture) pair is one job in a process pool; each job gets
+`--threads-per-job` threads (n_jobs, OpenMP, TF intra-op). A finished job
+leaves a checkpoint (model file + metrics JSON) in <run-dir>/jobs, so
+re-running the same command skips it. The encoded feature matrices are cached
+under --cache-dir and memory-mapped by every job.
+
+Outputs (<run-dir>/models, or --output) follow the layout read by
+ModelPredictor, so the folder can be used as `models_dir` or copied to ../db:
+
+    model_manifest.json
+    02a_classical_models/saved_models/{Model}_best_model.pkl, encoders, scalers
+    02b_neural_networks/saved_models/{Model}_best_model.keras, encoders, embedding_info, scalers
+    held_out/{dataset}_test_{seed}.npy   test rows of the in-memory split
+
+The manifest is written before any job starts (the feature cache and the
+out-of-core jobs encode through ModelPredictor, which reads it). Promoted
+models are then stamped (size, sha256, version) with their test metrics;
+with --output ../db this updates the served manifest for a hot reload.
+Each promoted entry also records its held-out split ('held_out'), so
+training.evaluate scores exactly the rows the model never saw.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+from training.configs import CLASSIC_CONFIGS, NETWORK_CONFIGS, ALL_MODELS
+
+SPLIT_SEED = 42
+TEST_SIZE = 0.30
+VAL_SIZE = 0.20
+
+# Checkpoint metric -> manifest metric (the keys read by the API and chatbot)
+MANIFEST_METRICS = {
+    'Test_Accuracy': 'accuracy',
+    'Test_Precision': 'precision',
+    'Test_Recall': 'recall',
+    'Test_F1': 'f1_score',
+    'Test_ROC_AUC': 'roc_auc'
+}
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def write_json_atomic(path, payload):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, default=float)
+    os.replace(tmp, path)
+
+
+def job_id(model_name, arch_name):
+    return f"{model_name}__{arch_name}"
+
+
+def model_extension(model_name):
+    return '.pkl' if model_name in CLASSIC_CONFIGS else '.keras'
+
+
+def split_indices(y, cache_path):
+    """Stratified 70/30 split (+ 80/20 validation split of train), cached with the features"""
+    split_file = os.path.join(cache_path, f'split_{SPLIT_SEED}.npz')
+    if os.path.exists(split_file):
+        split = np.load(split_file)
+        return split['train'], split['test'], split['subtrain'], split['val']
+
+    from sklearn.model_selection import train_test_split
+
+    idx = np.arange(len(y))
+    train, test = train_test_split(idx, test_size=TEST_SIZE, random_state=SPLIT_SEED, stratify=y)
+    subtrain, val = train_test_split(train, test_size=VAL_SIZE, random_state=SPLIT_SEED, stratify=y[train])
+    # Sorted indices turn memmap gathers into forward scans
+    train, test, subtrain, val = (np.sort(a) for a in (train, test, subtrain, val))
+    np.savez(split_file, train=train, test=test, subtrain=subtrain, val=val)
+    return train, test, subtrain, val
+
+
+def model_entry(model_name):
+    """Manifest entry of a trained model at its promoted path (no checksum yet)"""
+    from training.features import CLASSIC_DIR, NN_DIR
+
+    classic = model_name in CLASSIC_CONFIGS
+    folder = CLASSIC_DIR if classic else NN_DIR
+    return {
+        'display': model_name.replace('_', ' '),
+        'version': '1',
+        'artifact': f"{folder}/{model_name}_best_model{model_extension(model_name)}",
+        'format': 'joblib' if classic else 'keras',
+        'family': 'classic' if classic else 'nn'
+    }
+
+
+def ensure_manifest(models_dir, models):
+    """
+    model_manifest.json in models_dir listing the preprocessing files and
+    `models`; an existing manifest (resumed run, --output ../db) only gains
+    the entries it lacks.
+    """
+    from prediction.registry import MANIFEST_NAME, write_manifest
+    from training.features import preprocessing_manifest
+
+    path = os.path.join(models_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'manifest_version': 1, 'preprocessing': preprocessing_manifest(), 'models': {}}
+
+    missing = [m for m in models if m not in manifest['models']]
+    if missing or not os.path.exists(path):
+        for model_name in missing:
+            manifest['models'][model_name] = model_entry(model_name)
+        write_manifest(path, manifest)
+    return path
+
+
+def stamp_promoted(manifest_path, models_dir, summary):
+    """Test metrics, size, sha256 and version of the promoted models"""
+    from prediction.registry import stamp, write_manifest
+
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for model_name, result in summary.items():
+        entry = manifest['models'][model_name]
+        entry['artifact'] = result['artifact']
+        entry['metrics'] = {key: round(float(result['metrics'][name]), 4) for name, key in MANIFEST_METRICS.items()}
+    write_manifest(manifest_path, manifest)
+    stamp(manifest_path, models_dir, list(summary))
+
+
+def record_held_out(manifest_path, models_dir, models, data_key, split_path):
+    """
+    Which rows the promoted models never saw, for training.evaluate: the
+    seeded hash split of out-of-core runs (split_path None), or the test
+    indices of the stratified split, copied next to the models so they
+    outlive the feature cache.
+    """
+    from prediction.registry import write_manifest
+
+    if split_path is None:
+        held_out = {'dataset': data_key, 'split': 'hash', 'seed': SPLIT_SEED}
+    else:
+        rel_path = f"held_out/{data_key}_test_{SPLIT_SEED}.npy"
+        os.makedirs(os.path.join(models_dir, 'held_out'), exist_ok=True)
+        np.save(os.path.join(models_dir, rel_path), np.load(split_path)['test'])
+        held_out = {'dataset': data_key, 'split': 'stratified', 'seed': SPLIT_SEED, 'test_indices': rel_path}
+
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for model_name in models:
+        manifest['models'][model_name]['held_out'] = held_out
+    write_manifest(manifest_path, manifest)
+
+
+def test_metrics(y_true, y_prob, training_time_minutes):
+    """Test-set metrics only; train metrics are not recomputed per architecture"""
+    from sklearn.metrics import (
+        accuracy_score, precision_score, recall_score, f1_score, roc_auc_score,
+        matthews_corrcoef, log_loss, confusion_matrix
+    )
+
+    y_pred = (y_prob >= 0.5).astype('int8')
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        'Test_Accuracy': accuracy_score(y_true, y_pred),
+        'Test_Precision': precision_score(y_true, y_pred, zero_division=0),
+        'Test_Recall': recall_score(y_true, y_pred, zero_division=0),
+        'Test_F1': f1_score(y_true, y_pred, zero_division=0),
+        'Test_Specificity': tn / (tn + fp) if (tn + fp) else 0.0,
+        'Test_MCC': matthews_corrcoef(y_true, y_pred),
+        'Test_ROC_AUC': roc_auc_score(y_true, y_prob),
+        'Test_Log_Loss': log_loss(y_true, np.clip(y_prob, 1e-7, 1 - 1e-7)),
+        'Test_Confusion': [int(tn), int(fp), int(fn), int(tp)],
+        'Training_Time_Minutes': training_time_minutes
+    }
+
+
+# =============================================================================
+# JOBS (run in worker processes)
+# =============================================================================
+
+def worker_environment(threads):
+    """
+    Thread budget of one job as environment variables. They are exported in
+    the parent before the pool starts: a spawned worker imports this module
+    (and numpy with it) while unpickling its first job, before any pool
+    initializer could set them, and BLAS/OpenMP size their pools on import.
+    """
+    env = {env_var: str(threads) for env_var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                                                 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS')}
+    env['TF_NUM_INTEROP_THREADS'] = '1'
+    return env
+
+
+def train_classic(job, cache, split):
+    import joblib
+    import pandas as pd
+    import xgboost as xgb
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    model_classes = {
+        'Logistic_Regression': LogisticRegression,
+        'Random_Forest': RandomForestClassifier,
+        'XGBoost': xgb.XGBClassifier
+    }
+
+    X_all, columns = cache.classic()
+    y = cache.target()
+    train, test = split['train'], split['test']
+
+    # DataFrames keep the feature names ModelPredictor passes at serving time
+    X_train = pd.DataFrame(X_all[train], columns=columns)
+    X_test = pd.DataFrame(X_all[test], columns=columns)
+
+    params = dict(job['params'], n_jobs=job['threads'])
+    if job['model'] == 'XGBoost':
+        positives = int(y[train].sum())
+        params['scale_pos_weight'] = (len(train) - positives) / max(positives, 1)
+
+    start = time.time()
+    model = model_classes[job['model']](**params)
+    model.fit(X_train, y[train])
+    minutes = (time.time() - start) / 60
+
+    y_prob = model.predict_proba(X_test)[:, 1]
+    joblib.dump(model, job['model_path'])
+    return y_prob, minutes
+
+
+def train_network(job, cache, split):
+    import joblib
+    import tensorflow as tf
+    from keras.callbacks import EarlyStopping, ReduceLROnPlateau
+    from sklearn.utils.class_weight import compute_class_weight
+    from training.architectures import BUILDERS
+    from training.features import NN_DIR, PREDICTOR_CAT_COLS
+
+    X_cat, X_num = cache.nn()
+    y = cache.target()
+    subtrain, val, test = split['subtrain'], split['val'], split['test']
+
+    embedding_info = joblib.load(os.path.join(job['models_dir'], NN_DIR, 'embedding_info.pkl'))
+    config = NETWORK_CONFIGS[job['model']]
+    params = dict(job['params'])
+    batch_size = params.pop('batch_size')
+    epochs = params.pop('epochs')
+
+    def inputs(idx):
+        return tuple([col[idx] for col in X_cat] + [X_num[idx]])
+
+    train_ds = tf.data.Dataset.from_tensor_slices((inputs(subtrain), y[subtrain].astype('float32')))
+    train_ds = train_ds.shuffle(100000, seed=SPLIT_SEED).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+    val_ds = tf.data.Dataset.from_tensor_slices((inputs(val), y[val].astype('float32')))
+    val_ds = val_ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    classes = np.unique(y[subtrain])
+    weights = compute_class_weight('balanced', classes=classes, y=y[subtrain])
+    class_weight = {int(k): float(v) for k, v in zip(classes, weights)}
+
+    model = BUILDERS[config['network_type']](embedding_info, X_num.shape[1], PREDICTOR_CAT_COLS, **params)
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True, verbose=0),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-7, verbose=0)
+    ]
+
+    start = time.time()
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks,
+              class_weight=class_weight, verbose=2)
+    minutes = (time.time() - start) / 60
+
+    y_prob = model.predict(inputs(test), batch_size=batch_size, verbose=0).reshape(-1)
+    model.save(job['model_path'])
+    return y_prob, minutes
+
+
+def run_job(job):
+    """Train one architecture, write its model, test probabilities and checkpoint"""
+    if job.get('out_of_core'):
+        from training.out_of_core import run_out_of_core_job
+        return run_out_of_core_job(job)
+
+    from training.features import FeatureCache
+
+    cache = FeatureCache.at(job['cache_path'])
+    split = dict(np.load(job['split_path']))
+
+    if job['model'] in CLASSIC_CONFIGS:
+        y_prob, minutes = train_classic(job, cache, split)
+    else:
+        y_prob, minutes = train_network(job, cache, split)
+
+    y_test = cache.target()[split['test']]
+    np.save(job['proba_path'], y_prob.astype('float32'))
+
+    metrics = test_metrics(y_test, y_prob, minutes)
+    checkpoint = {
+        'model': job['model'],
+        'architecture': job['architecture'],
+        'params': job['params'],
+        'model_path': job['model_path'],
+        'proba_path': job['proba_path'],
+        'metrics': metrics
+    }
+    write_json_atomic(job['checkpoint_path'], checkpoint)
+    return checkpoint
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+def plan_jobs(models, run_dir, models_dir, cache_path, split_path, threads, out_of_core=None):
+    jobs_dir = os.path.join(run_dir, 'jobs')
+    os.makedirs(jobs_dir, exist_ok=True)
+
+    jobs = []
+    for model_name in models:
+        if model_name in CLASSIC_CONFIGS:
+            architectures = CLASSIC_CONFIGS[model_name]
+        else:
+            architectures = NETWORK_CONFIGS[model_name]['architectures']
+
+        for arch in architectures:
+            name = job_id(model_name, arch['name'])
+            jobs.append({
+                'model': model_name,
+                'architecture': arch['name'],
+                'params': arch['params'],
+                'threads': threads,
+                'models_dir': models_dir,
+                'cache_path': cache_path,
+                'split_path': split_path,
+                'model_path': os.path.join(jobs_dir, name + model_extension(model_name)),
+                'proba_path': os.path.join(jobs_dir, name + '_test_proba.npy'),
+                'checkpoint_path': os.path.join(jobs_dir, name + '.json')
+            })
+            if out_of_core:
+                jobs[-1].update(out_of_core, labels_path=os.path.join(jobs_dir, name + '_test_labels.npy'))
+    return jobs
+
+
+def load_checkpoint(job):
+    if not os.path.exists(job['checkpoint_path']) or not os.path.exists(job['model_path']):
+        return None
+    with open(job['checkpoint_path'], encoding='utf-8') as f:
+        return json.load(f)
+
+
+def promote_best(checkpoints, models_dir):
+    """Copy the best architecture per model (by Test_F1) into the saved_models layout"""
+    from training.features import CLASSIC_DIR, NN_DIR
+
+    summary = {}
+    by_model = {}
+    for checkpoint in checkpoints:
+        by_model.setdefault(checkpoint['model'], []).append(checkpoint)
+
+    for model_name, results in by_model.items():
+        best = max(results, key=lambda c: c['metrics']['Test_F1'])
+        folder = CLASSIC_DIR if model_name in CLASSIC_CONFIGS else NN_DIR
+        target = os.path.join(models_dir, folder, f"{model_name}_best_model{model_extension(model_name)}")
+        shutil.copyfile(best['model_path'], target)
+        summary[model_name] = {
+            'architecture': best['architecture'],
+            'params': best['params'],
+            'metrics': best['metrics'],
+            'artifact': os.path.relpath(target, models_dir),
+            'proba_path': best['proba_path'],
+            'architectures_tested': {c['architecture']: c['metrics']['Test_F1'] for c in results}
+        }
+        print(f"  ✓ {model_name}: best={best['architecture']} F1={best['metrics']['Test_F1']:.4f}")
+    return summary
+
+
+def train(args):
+    from training.features import (
+        FeatureCache, fit_preprocessing, artifacts_fingerprint, data_fingerprint, load_training_frame,
+        CLASSIC_DIR
+    )
+
+    models = args.models.split(',') if args.models else ALL_MODELS
+    unknown = [m for m in models if m not in ALL_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models: {unknown} (expected {ALL_MODELS})")
+
+    if args.out_of_core:
+        from training.out_of_core import OUT_OF_CORE_MODELS
+        if not os.path.isdir(args.data):
+            raise ValueError("--out-of-core needs the Parquet directory written by training.ingest")
+        unsupported = [m for m in models if m not in OUT_OF_CORE_MODELS]
+        if unsupported:
+            raise ValueError(f"No out-of-core path for {unsupported} (supported: {list(OUT_OF_CORE_MODELS)})")
+
+    run_dir = args.run_dir
+    models_dir = args.output or os.path.join(run_dir, 'models')
+    os.makedirs(run_dir, exist_ok=True)
+
+    print("=" * 60)
+    print(f"TRAINING {models} → {models_dir}")
+    print("=" * 60)
+
+    # 1. Preprocessing artifacts (once per run; resumed runs reuse them)
+    df = None
+    if not os.path.exists(os.path.join(models_dir, CLASSIC_DIR, 'categorical_encoders.pkl')):
+        df = load_training_frame(args.data)
+        print(f"✓ Data loaded: {len(df):,} rows")
+        fit_preprocessing(df, models_dir)
+    manifest_path = ensure_manifest(models_dir, models)
+
+    if args.out_of_core:
+        # 2'. Out-of-core: no feature cache, jobs stream the Parquet dataset
+        del df
+        cache_path, split_path = None, None
+        out_of_core = {'out_of_core': True, 'data_path': args.data, 'xgb_mode': args.xgb_mode}
+    else:
+        # 2. Encoded matrices (shared across runs with the same data + artifacts)
+        cache = FeatureCache(args.cache_dir, data_fingerprint(args.data), artifacts_fingerprint(models_dir))
+        if not cache.complete:
+            if df is None:
+                df = load_training_frame(args.data)
+            print(f"Encoding features into {cache.path} ...")
+            cache.build(df, models_dir)
+        else:
+            print(f"✓ Feature cache hit: {cache.path}")
+        del df
+
+        split_indices(cache.target(), cache.path)
+        cache_path = cache.path
+        split_path = os.path.join(cache.path, f'split_{SPLIT_SEED}.npz')
+        out_of_core = None
+
+    # 3. Jobs: skip the ones with a checkpoint
+    jobs = plan_jobs(models, run_dir, models_dir, cache_path, split_path, args.threads_per_job, out_of_core)
+    checkpoints, pending = [], []
+    for job in jobs:
+        checkpoint = load_checkpoint(job)
+        if checkpoint:
+            print(f"  ✓ {job_id(job['model'], job['architecture'])} already trained (checkpoint)")
+            checkpoints.append(checkpoint)
+        else:
+            pending.append(job)
+
+    print(f"\n{len(pending)} job(s) to run, {len(checkpoints)} resumed, "
+          f"{args.jobs} in parallel × {args.threads_per_job} threads")
+
+    failed = []
+    if pending:
+        ctx = mp.get_context('spawn')
+        # Workers inherit the environment when they start; restore ours afterwards
+        env = worker_environment(args.threads_per_job)
+        saved = {env_var: os.environ.get(env_var) for env_var in env}
+        os.environ.update(env)
+        try:
+            with ProcessPoolExecutor(max_workers=args.jobs, mp_context=ctx) as pool:
+                futures = {pool.submit(run_job, job): job for job in pending}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    name = job_id(job['model'], job['architecture'])
+                    try:
+                        checkpoint = future.result()
+                    except Exception as e:
+                        print(f"  ✗ {name} failed: {type(e).__name__}: {e}")
+                        failed.append(name)
+                        continue
+                    checkpoints.append(checkpoint)
+                    print(f"  ✓ {name}: F1={checkpoint['metrics']['Test_F1']:.4f} "
+                          f"AUC={checkpoint['metrics']['Test_ROC_AUC']:.4f} "
+                          f"({checkpoint['metrics']['Training_Time_Minutes']:.1f} min)")
+        finally:
+            for env_var, value in saved.items():
+                if value is None:
+                    os.environ.pop(env_var, None)
+                else:
+                    os.environ[env_var] = value
+
+    # 4. Best architecture per model → saved_models layout
+    print("\nBEST MODELS")
+    summary = promote_best(checkpoints, models_dir)
+    stamp_promoted(manifest_path, models_dir, summary)
+    record_held_out(manifest_path, models_dir, list(summary), data_fingerprint(args.data), split_path)
+    write_json_atomic(os.path.join(run_dir, 'training_summary.json'), {
+        'data': os.path.abspath(args.data),
+        'models_dir': os.path.abspath(models_dir),
+        'out_of_core': bool(args.out_of_core),
+        'feature_cache': os.path.abspath(cache_path) if cache_path else None,
+        'split_path': os.path.abspath(split_path) if split_path else None,
+        'models': summary,
+        'failed': failed
+    })
+
+    print(f"\n✓ Summary saved to: {os.path.join(run_dir, 'training_summary.json')}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the displacement models')
+    parser.add_argument('--data', required=True, help='Parquet dir from training.ingest, or a CSV')
+    parser.add_argument('--models', default=None, help=f"Comma-separated subset of {ALL_MODELS}")
+    parser.add_argument('--run-dir', default='../db/training_runs/latest',
+                        help='Checkpoints and summary; re-run with the same dir to resume')
+    parser.add_argument('--output', default=None, help='models_dir to write (default <run-dir>/models)')
+    parser.add_argument('--cache-dir', default='../db/feature_cache')
+    parser.add_argument('--jobs', type=int, default=2, help='Architectures trained in parallel')
+    parser.add_argument('--threads-per-job', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the Parquet dataset instead of caching dense matrices (XGBoost, networks)')
+    parser.add_argument('--xgb-mode', choices=['quantile', 'external'], default='quantile',
+                        help='Out-of-core XGBoost: in-memory QuantileDMatrix or disk-paged external memory')
+    args = parser.parse_args(argv)
+
+    return train(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
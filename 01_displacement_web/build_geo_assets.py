@@ -0,0 +1,356 @@
+"""
+Genera los mapas simplificados que sirve el backend en /api/geo/
+
+A partir del GeoJSON GADM nivel 1 (varios MB de polígonos en alta resolución)
+construye un TopoJSON por nivel de zoom:
+
+1. Extrae la topología: los bordes compartidos entre departamentos se
+   convierten en arcos únicos, así la simplificación no abre huecos entre
+   vecinos.
+2. Simplifica cada arco con Douglas-Peucker según la tolerancia del nivel.
+3. Cuantiza las coordenadas a una malla entera y las codifica en deltas.
+4. Agrega como propiedad `department` el nombre del dataset según
+   departamentos_geojson_mapping_manual.json.
+5. Escribe cada archivo con hash de contenido en el nombre, más versiones
+   precomprimidas .gz y .br (si el paquete brotli está instalado).
+
+Uso:
+    python build_geo_assets.py                         # descarga el GeoJSON
+    python build_geo_assets.py --input colombia.geojson
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import math
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_URL = "https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_COL_1.json"
+OBJECT_NAME = 'departamentos'
+MAPPING_FILE = 'departamentos_geojson_mapping_manual.json'
+OUTPUT_DIR = os.path.join('backend', 'static', 'geo')
+
+# Tolerancia en grados y tamaño de la malla de cuantización por nivel
+LEVELS = {
+    'low': {'tolerance': 0.02, 'quantization': 10_000, 'min_zoom': 0, 'max_zoom': 5},
+    'medium': {'tolerance': 0.005, 'quantization': 30_000, 'min_zoom': 6, 'max_zoom': 7},
+    'high': {'tolerance': 0.001, 'quantization': 100_000, 'min_zoom': 8, 'max_zoom': 22},
+}
+
+# Precisión con la que se identifican vértices compartidos (~0.1 m)
+KEY_SCALE = 1e6
+
+
+# =============================================================================
+# TOPOLOGÍA
+# =============================================================================
+
+def polygons_of(geometry):
+    """Lista de polígonos (lista de anillos) de una geometría Polygon/MultiPolygon"""
+    if geometry is None:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def ring_keys(ring):
+    """Anillo como lista cerrada de vértices enteros, sin duplicados consecutivos"""
+    keys = []
+    for x, y in (point[:2] for point in ring):
+        key = (round(x * KEY_SCALE), round(y * KEY_SCALE))
+        if not keys or keys[-1] != key:
+            keys.append(key)
+    if keys[0] != keys[-1]:
+        keys.append(keys[0])
+    return keys
+
+def find_junctions(rings):
+    """Vértices donde un borde compartido empieza o termina (vecinos distintos según el anillo)"""
+    neighbors = {}
+    for ring in rings:
+        points = ring[:-1]
+        n = len(points)
+        for i, point in enumerate(points):
+            prev_point, next_point = points[i - 1], points[(i + 1) % n]
+            pair = (prev_point, next_point) if prev_point < next_point else (next_point, prev_point)
+            neighbors.setdefault(point, set()).add(pair)
+    return {point for point, pairs in neighbors.items() if len(pairs) > 1}
+
+def cut_ring(ring, junctions):
+    """Corta un anillo cerrado en arcos que van de unión a unión"""
+    points = ring[:-1]
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+
+    if not cuts:
+        # Anillo aislado: empezar en el vértice mínimo para que dos copias coincidan
+        start = points.index(min(points))
+        rotated = points[start:] + points[:start]
+        return [rotated + [rotated[0]]]
+
+    start = cuts[0]
+    rotated = points[start:] + points[:start] + [points[start]]
+    positions = [i for i, point in enumerate(rotated) if point in junctions]
+    return [rotated[a:b + 1] for a, b in zip(positions, positions[1:])]
+
+class Topology:
+    """Arcos únicos (un borde compartido se guarda una sola vez) y anillos como índices de arcos"""
+
+    def __init__(self, features):
+        self.features = features
+        self.arcs = []
+        self._index = {}
+
+        all_rings = [ring_keys(ring) for feature in features
+                     for polygon in polygons_of(feature.get('geometry')) for ring in polygon]
+        junctions = find_junctions(all_rings)
+
+        # feature -> polígonos -> anillos -> índices de arco (~i = arco invertido)
+        self.geometries = []
+        for feature in features:
+            polygons = []
+            for polygon in polygons_of(feature.get('geometry')):
+                polygons.append([[self._arc_id(arc) for arc in cut_ring(ring_keys(ring), junctions)]
+                                 for ring in polygon])
+            self.geometries.append(polygons)
+
+    def _arc_id(self, arc):
+        key = tuple(arc)
+        if key in self._index:
+            return self._index[key]
+        reverse = tuple(reversed(arc))
+        if reverse in self._index:
+            return ~self._index[reverse]
+        self._index[key] = len(self.arcs)
+        self.arcs.append([(x / KEY_SCALE, y / KEY_SCALE) for x, y in arc])
+        return self._index[key]
+
+
+# =============================================================================
+# SIMPLIFICACIÓN Y CUANTIZACIÓN
+# =============================================================================
+
+def douglas_peucker(points, tolerance):
+    """Puntos del arco que sobreviven a Douglas-Peucker (extremos siempre incluidos)"""
+    n = len(points)
+    if n <= 2:
+        return list(points)
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last <= first + 1:
+            continue
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy)
+
+        max_dist, max_idx = -1.0, first
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if norm == 0:
+                dist = math.hypot(px - x1, py - y1)
+            else:
+                dist = abs(dx * (py - y1) - dy * (px - x1)) / norm
+            if dist > max_dist:
+                max_dist, max_idx = dist, i
+
+        if max_dist > tolerance:
+            keep[max_idx] = True
+            stack.append((first, max_idx))
+            stack.append((max_idx, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+def quantize_arc(points, transform):
+    """Arco en enteros de la malla, codificado en deltas (TopoJSON)"""
+    (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+    quantized = []
+    for x, y in points:
+        q = (round((x - tx) / sx), round((y - ty) / sy))
+        if not quantized or quantized[-1] != q:
+            quantized.append(q)
+    if len(quantized) == 1:
+        quantized.append(quantized[0])
+
+    encoded, prev = [], (0, 0)
+    for q in quantized:
+        encoded.append([q[0] - prev[0], q[1] - prev[1]])
+        prev = q
+    return encoded
+
+def bounding_box(arcs):
+    xs = [x for arc in arcs for x, _ in arc]
+    ys = [y for arc in arcs for _, y in arc]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def build_level(topology, properties, level):
+    """TopoJSON de un nivel: simplificar, cuantizar y descartar anillos degenerados"""
+    min_x, min_y, max_x, max_y = bounding_box(topology.arcs)
+    q = level['quantization']
+    transform = {
+        'scale': [(max_x - min_x) / (q - 1), (max_y - min_y) / (q - 1)],
+        'translate': [min_x, min_y]
+    }
+    encoded = [quantize_arc(douglas_peucker(arc, level['tolerance']), transform) for arc in topology.arcs]
+
+    def ring_size(ring):
+        # Vértices distintos del anillo tras simplificar
+        return sum(len(encoded[~arc if arc < 0 else arc]) - 1 for arc in ring)
+
+    used, geometries = {}, []
+    for polygons, props in zip(topology.geometries, properties):
+        kept_polygons = []
+        for polygon in polygons:
+            if ring_size(polygon[0]) < 3:
+                continue  # el exterior colapsó: la isla desaparece a este zoom
+            kept_polygons.append([ring for ring in polygon if ring_size(ring) >= 3])
+
+        # Reindexar solo los arcos que se usan en este nivel
+        def remap(arc):
+            index = ~arc if arc < 0 else arc
+            new = used.setdefault(index, len(used))
+            return ~new if arc < 0 else new
+
+        kept_polygons = [[[remap(arc) for arc in ring] for ring in polygon] for polygon in kept_polygons]
+
+        if not kept_polygons:
+            geometries.append({'type': None, 'properties': props})
+        elif len(kept_polygons) == 1:
+            geometries.append({'type': 'Polygon', 'arcs': kept_polygons[0], 'properties': props})
+        else:
+            geometries.append({'type': 'MultiPolygon', 'arcs': kept_polygons, 'properties': props})
+
+    arcs = [None] * len(used)
+    for index, new in used.items():
+        arcs[new] = encoded[index]
+
+    return {
+        'type': 'Topology',
+        'transform': transform,
+        'bbox': [min_x, min_y, max_x, max_y],
+        'objects': {OBJECT_NAME: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs
+    }
+
+
+# =============================================================================
+# NOMBRES Y ESCRITURA
+# =============================================================================
+
+def feature_properties(features, mapping):
+    """NAME_1/GID_1 del GeoJSON más el nombre usado por el dataset y la API"""
+    dataset_name = {geojson_name: name for name, geojson_name in mapping.items()}
+    properties = []
+    for feature in features:
+        props = feature.get('properties', {})
+        name = props.get('NAME_1') or props.get('name')
+        properties.append({
+            'NAME_1': name,
+            'GID_1': props.get('GID_1'),
+            'department': dataset_name.get(name, name)
+        })
+    return properties
+
+def compress_variants(path, payload):
+    """Escribe .gz y, si brotli está disponible, .br junto al archivo original"""
+    sizes = {}
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(payload, compresslevel=9, mtime=0))
+    sizes['gzip_bytes'] = os.path.getsize(path + '.gz')
+
+    if brotli is None:
+        return sizes
+
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(payload, quality=11))
+    sizes['br_bytes'] = os.path.getsize(path + '.br')
+    return sizes
+
+def write_assets(topologies, output_dir):
+    """Archivos con hash de contenido (cacheables para siempre) + manifest.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(output_dir, f'{OBJECT_NAME}_*.topo.json*')):
+        os.remove(old)
+
+    manifest = {'object': OBJECT_NAME, 'source': SOURCE_URL, 'levels': {}}
+    for name, topology in topologies.items():
+        payload = json.dumps(topology, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(payload).hexdigest()[:12]
+        filename = f'{OBJECT_NAME}_{name}.{digest}.topo.json'
+        path = os.path.join(output_dir, filename)
+        with open(path, 'wb') as f:
+            f.write(payload)
+
+        manifest['levels'][name] = {
+            'file': filename,
+            'min_zoom': LEVELS[name]['min_zoom'],
+            'max_zoom': LEVELS[name]['max_zoom'],
+            'bytes': len(payload),
+            **compress_variants(path, payload)
+        }
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera TopoJSON simplificados de los departamentos')
+    parser.add_argument('--input', help='GeoJSON GADM nivel 1 ya descargado (por defecto se descarga)')
+    parser.add_argument('--mapping', default=MAPPING_FILE)
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("GENERADOR DE MAPAS SIMPLIFICADOS - DEPARTAMENTOS DE COLOMBIA")
+    print("="*80)
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            geojson_data = json.load(f)
+        source_bytes = os.path.getsize(args.input)
+    else:
+        from generate_geojson_mapping import download_geojson
+        geojson_data = download_geojson()
+        source_bytes = len(json.dumps(geojson_data, ensure_ascii=False).encode('utf-8'))
+
+    with open(args.mapping, encoding='utf-8') as f:
+        mapping = json.load(f)
+
+    features = geojson_data.get('features', [])
+    topology = Topology(features)
+    print(f"✓ {len(features)} departamentos, {len(topology.arcs):,} arcos únicos, "
+          f"{sum(len(arc) for arc in topology.arcs):,} vértices")
+
+    properties = feature_properties(features, mapping)
+    unmapped = [p['NAME_1'] for p in properties if p['NAME_1'] not in mapping.values()]
+    if unmapped:
+        print(f"⚠ Sin nombre del dataset (se usa NAME_1): {', '.join(map(str, unmapped))}")
+
+    if brotli is None:
+        print("⚠ Paquete 'brotli' no instalado: solo se generan versiones .gz")
+
+    topologies = {name: build_level(topology, properties, level) for name, level in LEVELS.items()}
+    manifest = write_assets(topologies, args.output)
+
+    print(f"\nGeoJSON original: {source_bytes / 1024:,.0f} KB")
+    for name, info in manifest['levels'].items():
+        compressed = info.get('br_bytes', info['gzip_bytes'])
+        print(f"✓ {name:6s} {info['bytes'] / 1024:8,.0f} KB "
+              f"({compressed / 1024:,.0f} KB comprimido, x{source_bytes / compressed:,.0f} menor) → {info['file']}")
+    print(f"\n✓ Manifest guardado en: {os.path.join(args.output, 'manifest.json')}")
+
+if __name__ == "__main__":
+    main()
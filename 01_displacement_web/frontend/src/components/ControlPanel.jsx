@@ -80,7 +80,7 @@ function ControlPanel({ models, variables, departments, onDepartmentChange, onPr
       const response = await predict({
         model: selectedModel,
         ...formValues
-      });
+      }, { explain: Boolean(localStorage.getItem('gemini_api_key')) });
       
       // Prepare complete context for chatbot
       const resultWithContext = {
@@ -1,8 +1,10 @@
-import React, { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, Polyline, GeoJSON } from 'react-leaflet';
+import React, { useEffect, useRef, useState } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, Polyline, GeoJSON, useMapEvents } from 'react-leaflet';
 import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
+import { feature as topoFeature } from 'topojson-client';
 import { BOGOTA_COORDS, COLORS } from '../utils/constants';
+import { getGeoManifest, getGeoAsset } from '../services/apiService';
 import './MapView.css';
 
 delete L.Icon.Default.prototype._getIconUrl;
@@ -30,17 +32,68 @@ const greenIcon = new L.Icon({
   shadowSize: [41, 41]
 });
 
+const GADM_GEOJSON_URL = 'https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_COL_1.json';
+const INITIAL_ZOOM = 6;
+
+const levelForZoom = (manifest, zoom) => {
+  const levels = Object.entries(manifest.levels);
+  const match = levels.find(([, info]) => zoom >= info.min_zoom && zoom <= info.max_zoom);
+  return (match || levels[levels.length - 1])[0];
+};
+
+function ZoomWatcher({ onZoom }) {
+  useMapEvents({
+    zoomend: (e) => onZoom(e.target.getZoom())
+  });
+  return null;
+}
+
 function MapView({ departments, selectedDepartment }) {
   const [geoJsonData, setGeoJsonData] = useState(null);
+  const [geoLevel, setGeoLevel] = useState(null);
+  const [manifest, setManifest] = useState(null);
+  const [zoom, setZoom] = useState(INITIAL_ZOOM);
   const [selectedDeptInfo, setSelectedDeptInfo] = useState(null);
+  const levelCache = useRef({});
 
+  // Simplified TopoJSON served by the backend; full GADM GeoJSON if not built
   useEffect(() => {
-    fetch('https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_COL_1.json')
-      .then(response => response.json())
-      .then(data => setGeoJsonData(data))
-      .catch(error => console.error('Error loading GeoJSON:', error));
+    getGeoManifest()
+      .then(response => setManifest(response.data))
+      .catch(() => {
+        fetch(GADM_GEOJSON_URL)
+          .then(response => response.json())
+          .then(data => {
+            setGeoJsonData(data);
+            setGeoLevel('gadm');
+          })
+          .catch(error => console.error('Error loading GeoJSON:', error));
+      });
   }, []);
 
+  useEffect(() => {
+    if (!manifest) return;
+
+    const level = levelForZoom(manifest, zoom);
+    if (level === geoLevel) return;
+
+    if (levelCache.current[level]) {
+      setGeoJsonData(levelCache.current[level]);
+      setGeoLevel(level);
+      return;
+    }
+
+    getGeoAsset(manifest.levels[level].file)
+      .then(response => {
+        const topology = response.data;
+        const data = topoFeature(topology, topology.objects[manifest.object]);
+        levelCache.current[level] = data;
+        setGeoJsonData(data);
+        setGeoLevel(level);
+      })
+      .catch(error => console.error('Error loading map level:', error));
+  }, [manifest, zoom, geoLevel]);
+
   useEffect(() => {
     if (selectedDepartment && departments) {
       const deptInfo = departments.find(d => d.department === selectedDepartment);
@@ -51,7 +104,8 @@ function MapView({ departments, selectedDepartment }) {
   }, [selectedDepartment, departments]);
 
   const getDepartmentStyle = (feature) => {
-    const deptName = feature.properties.NAME_1 || feature.properties.name;
+    // `department` (dataset name) is set by build_geo_assets.py
+    const deptName = feature.properties.department || feature.properties.NAME_1 || feature.properties.name;
     
     if (deptName === 'Bogotá D.C.' || deptName === 'Bogota, D.C.') {
       return {
@@ -90,9 +144,11 @@ function MapView({ departments, selectedDepartment }) {
     <div className="map-view">
       <MapContainer
         center={BOGOTA_COORDS}
-        zoom={6}
+        zoom={INITIAL_ZOOM}
         style={{ height: '100%', width: '100%' }}
       >
+        <ZoomWatcher onZoom={setZoom} />
+
         <TileLayer
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
           attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
@@ -100,6 +156,7 @@ function MapView({ departments, selectedDepartment }) {
 
         {geoJsonData && (
           <GeoJSON 
+            key={geoLevel}
             data={geoJsonData} 
             style={getDepartmentStyle}
           />
@@ -12,8 +12,8 @@ function ModelSelector({ models, selectedModel, onModelChange }) {
       >
         <option value="">Selecciona un modelo</option>
         {models.map((model) => (
-          <option key={model.name} value={model.name}>
-            {model.display}
+          <option key={model.name} value={model.name} disabled={model.available === false}>
+            {model.display}{model.available === false ? ' (no disponible)' : ''}
           </option>
         ))}
       </select>
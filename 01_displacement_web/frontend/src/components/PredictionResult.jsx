@@ -55,6 +55,23 @@ function PredictionResult({ result }) {
             <p className="note"><em>{result.submessage}</em></p>
           </div>
         )}
+
+        {result.match_type === 'approximate_match' && (
+          <div className="validation-info warning">
+            <p><strong>{result.message}</strong></p>
+            <ul>
+              <li>{result.displacement_count} casos: Desplazamiento Forzado</li>
+              <li>{result.other_count} casos: Otro Hecho Victimizante</li>
+            </ul>
+            <div className="result-item">
+              <strong>Resultado:</strong>
+              <span className={`result-status ${result.is_consistent ? 'correct' : 'incorrect'}`}>
+                {result.is_consistent ? '✓ CONSISTENTE' : '✗ NO CONSISTENTE'}
+              </span>
+            </div>
+            <p className="note"><em>{result.submessage}</em></p>
+          </div>
+        )}
       </div>
     </div>
   );
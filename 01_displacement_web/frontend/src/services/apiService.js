@@ -16,9 +16,15 @@ export const getDepartments = () => api.get('/departments');
 
 export const getDepartmentGeo = (deptName) => api.get(`/department_geo/${deptName}`);
 
+export const getGeoManifest = () => api.get('/geo/manifest.json');
+
+export const getGeoAsset = (file) => api.get(`/geo/${file}`);
+
 export const validateYear = (year) => api.post('/validate_year', { year });
 
-export const predict = (data) => api.post('/predict', data);
+// Contributions are only read by the chatbot: ask for them only when it will be used
+export const predict = (data, { explain = false } = {}) =>
+  api.post('/predict', data, explain ? { params: { explain: 1 } } : undefined);
 
 export const getRandomValues = () => api.get('/random');
 
@@ -4,8 +4,12 @@ y nombres en el GeoJSON de Colombia
 """
 
 import json
+import os
+import sys
 import requests
-from difflib import get_close_matches
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from preprocessing.name_index import NameIndex
 
 # Coordenadas de departamentos (del código 001)
 URBAN_CENTER_COORDS = {
@@ -44,17 +48,6 @@ URBAN_CENTER_COORDS = {
     'Bogota, D.C.': (4.5981, -74.0758)
 }
 
-def normalize_name(name):
-    """Normaliza nombres para comparación"""
-    import unicodedata
-    # Remover acentos
-    name = ''.join(
-        c for c in unicodedata.normalize('NFD', name)
-        if unicodedata.category(c) != 'Mn'
-    )
-    # Minúsculas y espacios
-    return name.lower().strip()
-
 def download_geojson():
     """Descarga el GeoJSON de Colombia"""
     url = "https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_COL_1.json"
@@ -102,35 +95,23 @@ def create_mapping(dataset_names, geojson_names):
     print("GENERANDO MAPEO")
     print("="*80)
     
+    # Normalizar los nombres del GeoJSON una sola vez (búsqueda exacta + trigramas)
+    index = NameIndex(geojson_names)
+    
     for dataset_name in dataset_names:
-        # Normalizar para comparación
-        normalized_dataset = normalize_name(dataset_name)
-        
-        # Buscar coincidencia exacta (normalizada)
-        exact_match = None
-        for geojson_name in geojson_names:
-            if normalize_name(geojson_name) == normalized_dataset:
-                exact_match = geojson_name
-                break
+        match = index.match(dataset_name, cutoff=0.6)
         
-        if exact_match:
-            mapping[dataset_name] = exact_match
-            print(f"✓ {dataset_name:50s} → {exact_match}")
+        if match and match[2] != 'fuzzy':
+            mapping[dataset_name] = match[0]
+            print(f"✓ {dataset_name:50s} → {match[0]}")
+        elif match:
+            # Tomar la mejor coincidencia cercana
+            mapping[dataset_name] = match[0]
+            print(f"≈ {dataset_name:50s} → {match[0]} (similar)")
         else:
-            # Buscar coincidencias cercanas
-            normalized_geojson = [normalize_name(n) for n in geojson_names]
-            matches = get_close_matches(normalized_dataset, normalized_geojson, n=3, cutoff=0.6)
-            
-            if matches:
-                # Tomar la mejor coincidencia
-                best_match_idx = normalized_geojson.index(matches[0])
-                best_match = geojson_names[best_match_idx]
-                mapping[dataset_name] = best_match
-                print(f"≈ {dataset_name:50s} → {best_match} (similar)")
-            else:
-                unmatched.append(dataset_name)
-                mapping[dataset_name] = dataset_name  # Usar el mismo nombre
-                print(f"✗ {dataset_name:50s} → SIN COINCIDENCIA (usando mismo nombre)")
+            unmatched.append(dataset_name)
+            mapping[dataset_name] = dataset_name  # Usar el mismo nombre
+            print(f"✗ {dataset_name:50s} → SIN COINCIDENCIA (usando mismo nombre)")
     
     if unmatched:
         print(f"\n⚠ {len(unmatched)} departamentos sin coincidencia:")